@@ -0,0 +1,142 @@
+from typing import Callable, Dict, List, Optional, Any
+import itertools
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 从库健康检查间隔（秒）
+REPLICA_HEALTH_CHECK_INTERVAL = int(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", "5"))
+# 用户写入后的读主窗口（秒），应大于从库的正常复制延迟
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+# 写入记录超过该数量时清理已过期的记录
+READ_YOUR_WRITES_MAX_USERS = 100000
+
+class Replica:
+    """
+    一个只读从库：同步引擎用于健康检查，同步/异步会话工厂用于查询
+    """
+
+    def __init__(self, name: str, engine: Engine, session_factory: Callable, async_session_factory: Optional[Callable] = None):
+        self.name = name
+        self.engine = engine
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.healthy = True
+
+class ReplicaRouter:
+    """
+    读写分离路由
+    只读查询在健康的从库之间轮询，没有可用从库时回退到主库；
+    写入和写后读走主库：用户写入后的READ_YOUR_WRITES_WINDOW秒内，该用户的读请求也走主库，避免读到复制延迟前的旧数据；
+    后台线程定期对从库执行SELECT 1，查询中出现连接错误的从库立即摘除，恢复后由健康检查重新加入
+    写入记录只保存在当前进程内，多进程部署时同一用户的请求需保持会话粘性，或适当调大写后读窗口
+    """
+
+    def __init__(self, primary_session_factory: Callable, async_primary_session_factory: Optional[Callable] = None,
+                 replicas: Optional[List[Replica]] = None,
+                 health_check_interval: int = REPLICA_HEALTH_CHECK_INTERVAL,
+                 read_your_writes_window: float = READ_YOUR_WRITES_WINDOW):
+        self.primary_session_factory = primary_session_factory
+        self.async_primary_session_factory = async_primary_session_factory
+        self.replicas = list(replicas or [])
+        self.health_check_interval = health_check_interval
+        self.read_your_writes_window = read_your_writes_window
+        self._round_robin = itertools.count()
+        self._recent_writes: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台健康检查线程，没有配置从库时不启动
+        """
+        if not self.replicas or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._health_check_loop, name="replica-health-checker")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台健康检查线程
+        """
+        self._stop_event.set()
+
+    def record_write(self, *user_ids: Any):
+        """
+        记录用户的写入，窗口期内该用户的读请求走主库
+        """
+        if not self.replicas:
+            return
+        deadline = time.monotonic() + self.read_your_writes_window
+        with self._lock:
+            for user_id in user_ids:
+                if user_id is not None:
+                    self._recent_writes[int(user_id)] = deadline
+            if len(self._recent_writes) > READ_YOUR_WRITES_MAX_USERS:
+                now = time.monotonic()
+                self._recent_writes = {k: v for k, v in self._recent_writes.items() if v > now}
+
+    def has_recent_write(self, user_id: Any) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            deadline = self._recent_writes.get(int(user_id))
+        return deadline is not None and deadline > time.monotonic()
+
+    def pick_replica(self, user_id: Any = None) -> Optional[Replica]:
+        """
+        选择本次读请求使用的从库，返回None表示使用主库
+        """
+        if not self.replicas or self.has_recent_write(user_id):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def read_session_factory(self, user_id: Any = None) -> Callable:
+        replica = self.pick_replica(user_id)
+        return replica.session_factory if replica else self.primary_session_factory
+
+    def async_read_session_factory(self, user_id: Any = None) -> Callable:
+        replica = self.pick_replica(user_id)
+        if replica and replica.async_session_factory:
+            return replica.async_session_factory
+        return self.async_primary_session_factory
+
+    def mark_unhealthy(self, replica: Replica, reason: Any = None):
+        if replica.healthy:
+            logger.warning("读写分离: 从库[%s]不可用，暂停路由: %s", replica.name, reason)
+        replica.healthy = False
+
+    def check_replicas(self):
+        """
+        对所有从库执行一次健康检查
+        """
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception as e:
+                self.mark_unhealthy(replica, e)
+                continue
+            if not replica.healthy:
+                logger.info("读写分离: 从库[%s]已恢复", replica.name)
+            replica.healthy = True
+
+    def _health_check_loop(self):
+        while not self._stop_event.wait(self.health_check_interval):
+            try:
+                self.check_replicas()
+            except Exception as e:
+                logger.error("读写分离: 健康检查失败: %s", e)
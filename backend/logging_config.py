@@ -0,0 +1,166 @@
+from typing import Dict, Optional
+from collections import OrderedDict
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+import zlib
+
+# 全局日志级别
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# 按模块覆盖日志级别，格式: "services.recommender=DEBUG,redis_client=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+# 请求级调试追踪的采样比例（0~1），被采样的请求会输出完整的调试明细
+LOG_TRACE_SAMPLE_RATE = float(os.getenv("LOG_TRACE_SAMPLE_RATE", "0.01"))
+
+# 同一条日志模板在每个时间窗口内最多输出的次数
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "20"))
+LOG_RATE_LIMIT_WINDOW = float(os.getenv("LOG_RATE_LIMIT_WINDOW", "1.0"))
+# 限流跟踪的日志模板数量上限，超过后按LRU淘汰，防止模板不固定（如f-string拼接）时无限增长
+LOG_RATE_LIMIT_KEYS = int(os.getenv("LOG_RATE_LIMIT_KEYS", "1024"))
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - [%(request_id)s] %(message)s"
+
+# 当前请求ID与是否采样
+_request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+_trace_sampled: contextvars.ContextVar = contextvars.ContextVar("trace_sampled", default=False)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def bind_request(request_id: str):
+    """
+    绑定当前请求ID，并按请求ID确定性地决定是否采样调试追踪
+    返回的token用于reset_request恢复上下文
+    """
+    sampled = (zlib.crc32(request_id.encode("utf-8")) % 10000) < LOG_TRACE_SAMPLE_RATE * 10000
+    return _request_id.set(request_id), _trace_sampled.set(sampled)
+
+def reset_request(tokens):
+    request_token, sampled_token = tokens
+    _request_id.reset(request_token)
+    _trace_sampled.reset(sampled_token)
+
+def get_request_id() -> str:
+    return _request_id.get()
+
+def trace_enabled(logger: logging.Logger) -> bool:
+    """
+    当前请求是否需要输出调试明细：请求被采样且logger开启了DEBUG
+    热路径中拼接大对象（如ID集合）前应先调用本函数
+    """
+    return _trace_sampled.get() and logger.isEnabledFor(logging.DEBUG)
+
+class RequestContextFilter(logging.Filter):
+    """
+    为日志记录附加请求ID
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    按(logger, 日志模板)限流，窗口内超出上限的记录被丢弃，
+    下一个窗口输出第一条记录时附带被丢弃的数量
+    只对DEBUG及以下级别限流，INFO及以上级别全部输出；
+    跟踪的模板数量有上限，按LRU淘汰最久未出现的模板
+    """
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, window: float = LOG_RATE_LIMIT_WINDOW, max_keys: int = LOG_RATE_LIMIT_KEYS):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.limit <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            # [窗口开始时间, 窗口内计数, 被丢弃数量]
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window:
+                suppressed = bucket[2] if bucket else 0
+                self._buckets[key] = [now, 1, 0]
+                self._buckets.move_to_end(key)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                if suppressed:
+                    record.msg = f"{record.msg} (上个窗口丢弃 {suppressed} 条)"
+                return True
+            self._buckets.move_to_end(key)
+            if bucket[1] < self.limit:
+                bucket[1] += 1
+                return True
+            bucket[2] += 1
+            return False
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    不在调用线程中格式化日志，消息拼接推迟到后台线程
+    记录只在本进程内传递，无需像默认实现那样提前序列化
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def _parse_module_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging(level: str = LOG_LEVEL, module_levels: str = LOG_LEVELS):
+    """
+    配置日志：根logger只挂一个QueueHandler，格式化和I/O在后台线程的QueueListener中完成，
+    请求线程只需将记录放入队列
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    queue_handler = AsyncQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    for name, module_level in _parse_module_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """
+    停止后台日志线程并输出队列中剩余的记录
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,24 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uvicorn
 import os
+import time
 import logging
 
-# 配置日志
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# 配置日志（异步输出，级别由LOG_LEVEL/LOG_LEVELS环境变量控制）
+from logging_config import setup_logging, bind_request, reset_request, new_request_id
+setup_logging()
+logger = logging.getLogger(__name__)
 
 # 导入自定义JSONResponse
 from utils.json_utils import CustomJSONResponse
 
 # 导入本地模块
-from database import get_db, init_db
+from database import get_db, init_db, replica_router
 from models import models
 from schemas import schemas
 from schemas import etl_schemas
 from routers import posts, events, users, data, model_api, likes, favorites, etl
 from redis_client import check_redis_connection
+from services.stats import stats_service
+from services.invalidation import post_invalidation_bus, user_invalidation_bus
+from services.existence import existence_service
+from services.tag_vocab import tag_vocabulary
+from services.snapshot import snapshot_store
+from services.trending import trending_service
+from services.recent_posts import recent_posts
+from services.impressions import impression_log
+from services.admission import fallback_posts
+from services.model_registry import model_registry
+from services.model_training import model_training_service
+from metrics import registry, REQUEST_LATENCY
 
 # 定义版本信息
 API_VERSION = "1.2.0"
@@ -28,12 +44,11 @@ API_RELEASE_DATE = "2023-06-15"
 app = FastAPI(
     title="迷你推荐系统API",
     version=API_VERSION,
-    description=f"迷你推荐系统后端API，版本{API_VERSION}，发布日期{API_RELEASE_DATE}"
+    description=f"迷你推荐系统后端API，版本{API_VERSION}，发布日期{API_RELEASE_DATE}",
+    # 配置JSON响应，使用orjson编码，确保中文字符不被转义
+    default_response_class=CustomJSONResponse
 )
 
-# 配置JSON响应，确保中文字符不被转义
-app.json_response_class = CustomJSONResponse
-
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +58,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 绑定请求ID，用于日志关联和调试追踪采样
+@app.middleware("http")
+async def bind_request_id(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    tokens = bind_request(request_id)
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        reset_request(tokens)
+
+# 记录每个请求的耗时，按路由模板聚合，避免路径参数导致标签膨胀
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status_code
+        )
+
 # 包含路由
 app.include_router(posts.router, prefix="/api", tags=["posts"])
 app.include_router(events.router, prefix="/api", tags=["events"])
@@ -65,12 +110,70 @@ def startup_event():
         print("警告: Redis连接失败，消重系统将使用数据库进行消重")
     else:
         print("Redis连接成功")
+    
+    # 启动统计数据后台校准
+    stats_service.start()
+    
+    # 启动存在性检查ID集合后台刷新
+    existence_service.start()
+    
+    # 启动从库健康检查
+    replica_router.start()
+    
+    # 加载服务索引快照，新版本发布后自动切换
+    snapshot_store.start()
+    
+    # 启动帖子热度增量的后台写入
+    trending_service.start()
+    
+    # 订阅其他进程广播的帖子和用户变更，使本进程的缓存失效
+    post_invalidation_bus.start()
+    user_invalidation_bus.start()
+    
+    # 启动最新帖子缓冲区后台刷新
+    recent_posts.start()
+    
+    # 启动推荐曝光日志的后台批量写入
+    impression_log.start()
+    
+    # 启动过载降级推荐列表的后台刷新
+    fallback_posts.start()
+    
+    # 加载模型注册表中各模型的当前版本，新版本发布或回滚后在后台预热并切换
+    model_registry.start()
+    
+    # 预加载标签词表，失败时不影响启动，首次使用时再加载
+    try:
+        tag_vocabulary.load()
+    except Exception as e:
+        logger.error("标签词表: 预加载失败: %s", e)
+
+# 关闭事件
+@app.on_event("shutdown")
+def shutdown_event():
+    stats_service.stop()
+    existence_service.stop()
+    replica_router.stop()
+    snapshot_store.stop()
+    trending_service.stop()
+    post_invalidation_bus.stop()
+    user_invalidation_bus.stop()
+    recent_posts.stop()
+    impression_log.stop()
+    fallback_posts.stop()
+    model_registry.stop()
+    model_training_service.shutdown()
 
 # 健康检查
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+# Prometheus指标
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # 根路由
 @app.get("/")
 def read_root():
@@ -0,0 +1,270 @@
+from typing import Dict, Tuple, Callable, List, Optional
+from contextlib import contextmanager
+import bisect
+import inspect
+import logging
+import threading
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 默认延迟分桶（秒），覆盖从亚毫秒级的Redis命令到秒级的慢请求
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """
+    带标签的直方图，按Prometheus累积分桶格式输出
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各分桶计数, 总和, 总数]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Counter:
+    """
+    带标签的单调递增计数器
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Gauge:
+    """
+    在输出时通过回调读取当前值的仪表，用于连接池等状态
+    每个数据源注册一个回调，回调返回 {标签键: 值}
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._callbacks: Dict[str, Callable[[], Dict[LabelKey, float]]] = {}
+
+    def set_callback(self, source: str, callback: Callable[[], Dict[LabelKey, float]]):
+        # 同一数据源重复注册时覆盖，例如引擎重建后
+        self._callbacks[source] = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = {}
+        for source, callback in list(self._callbacks.items()):
+            try:
+                values.update(callback())
+            except Exception as e:
+                logger.warning("指标系统: 读取仪表[%s]数据源[%s]失败: %s", self.name, source, e)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class MetricsRegistry:
+    """
+    指标注册表，负责创建指标并输出Prometheus文本格式
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, documentation, buckets))
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, documentation))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram("http_request_duration_seconds", "HTTP请求耗时（按路由模板）")
+RECOMMENDER_STAGE_LATENCY = registry.histogram("recommender_stage_duration_seconds", "推荐引擎各阶段耗时")
+DB_QUERY_LATENCY = registry.histogram("db_query_duration_seconds", "数据库查询耗时（按语句类型）")
+REDIS_COMMAND_LATENCY = registry.histogram("redis_command_duration_seconds", "Redis命令耗时（按命令名）")
+DB_POOL_CONNECTIONS = registry.gauge("db_pool_connections", "数据库连接池状态")
+REDIS_POOL_CONNECTIONS = registry.gauge("redis_pool_connections", "Redis连接池状态")
+
+@contextmanager
+def timer(histogram: Histogram, **labels):
+    """
+    统计代码块耗时并记录到直方图
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+def instrument_engine(engine, name: str = "primary"):
+    """
+    通过SQLAlchemy事件钩子统计查询次数与耗时，并暴露连接池使用情况
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get("query_start_time")
+        if not start_times:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_LATENCY.observe(time.perf_counter() - start_times.pop(), engine=name, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # 查询抛出异常时不会触发after_cursor_execute，弹出对应的开始时间，避免长连接上的列表无限增长
+        conn = exception_context.connection
+        if conn is None:
+            return
+        start_times = conn.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+    def _pool_stats():
+        pool = engine.pool
+        stats = {}
+        for stat in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, stat):
+                stats[_label_key({"engine": name, "state": stat})] = getattr(pool, stat)()
+        return stats
+
+    DB_POOL_CONNECTIONS.set_callback(name, _pool_stats)
+
+def _timed_callable(func, observe: Callable[[float, tuple], None]):
+    """
+    包装同步或异步（协程函数）的调用，结束后以耗时和调用参数回调observe
+    """
+    if inspect.iscoroutinefunction(func):
+        async def _timed_async(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - start, args)
+        return _timed_async
+
+    def _timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - start, args)
+    return _timed
+
+def instrument_redis(client, name: str = "default"):
+    """
+    包装Redis客户端的execute_command和管道的execute以统计命令耗时，并暴露连接池使用情况
+    管道中的命令不经过客户端的execute_command，整个管道按command="PIPELINE"记录一次
+    """
+    def _observe_command(seconds, args):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        REDIS_COMMAND_LATENCY.observe(seconds, client=name, command=command)
+
+    def _observe_pipeline(seconds, args):
+        REDIS_COMMAND_LATENCY.observe(seconds, client=name, command="PIPELINE")
+
+    # redis.asyncio客户端的execute_command和管道的execute是协程函数
+    client.execute_command = _timed_callable(client.execute_command, _observe_command)
+
+    pipeline = client.pipeline
+
+    def _instrumented_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        pipe.execute = _timed_callable(pipe.execute, _observe_pipeline)
+        return pipe
+
+    client.pipeline = _instrumented_pipeline
+
+    def _pool_stats():
+        pool = client.connection_pool
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        available = len(getattr(pool, "_available_connections", ()))
+        return {
+            _label_key({"client": name, "state": "in_use"}): in_use,
+            _label_key({"client": name, "state": "available"}): available,
+            _label_key({"client": name, "state": "max"}): getattr(pool, "max_connections", 0),
+        }
+
+    REDIS_POOL_CONNECTIONS.set_callback(name, _pool_stats)
@@ -1,8 +1,7 @@
-from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, JSON, func, UniqueConstraint, BigInteger
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, JSON, func, UniqueConstraint, BigInteger, Index, Float
 from sqlalchemy.orm import relationship
 from database import Base
-import time
-import random
+from utils.snowflake import id_generator
 from datetime import datetime
 
 # ETL相关模型
@@ -74,10 +73,8 @@ class ETLLog(Base):
 
 # 生成唯一的bigint ID
 def generate_bigint_id():
-    # 使用时间戳和随机数生成唯一ID
-    timestamp = int(time.time() * 1000)  # 毫秒级时间戳
-    random_part = random.randint(1000, 9999)  # 随机数部分
-    return timestamp * 10000 + random_part  # 组合成唯一ID
+    # 时间戳+worker ID+毫秒内序号，同一进程内严格递增，见utils/snowflake.py
+    return id_generator.next_id()
 
 # 用户模型
 class User(Base):
@@ -87,6 +84,7 @@ class User(Base):
     username = Column(String(64), nullable=False)
     create_time = Column(DateTime, default=datetime.utcnow)
     tags = Column(JSON)
+    tag_ids = Column(JSON)  # 兴趣标签ID列表，与tags.interests一致，见Tag
     preferences = Column(JSON)
     
     # 关系
@@ -103,6 +101,7 @@ class Post(Base):
     author_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
     create_time = Column(DateTime, default=datetime.utcnow)
     tags = Column(JSON)
+    tag_ids = Column(JSON)  # 标签ID列表，与tags.tags一致，见Tag
     view_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
     favorite_count = Column(Integer, default=0)
@@ -110,8 +109,30 @@ class Post(Base):
     # 关系
     author = relationship("User", back_populates="posts")
     events = relationship("Event", back_populates="post")
+    
+    __table_args__ = (Index('idx_posts_create_time', 'create_time'),)
+
+# 标签词表模型
+class Tag(Base):
+    __tablename__ = "tags"
+    
+    # 稠密自增ID，标签匹配按整数比较
+    tag_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(64), nullable=False, unique=True)
+    create_time = Column(DateTime, default=datetime.utcnow)
+
+# 帖子标签关联模型
+class PostTag(Base):
+    __tablename__ = "post_tags"
+    
+    # 主键以tag_id开头，按标签召回帖子时走主键范围扫描
+    tag_id = Column(Integer, ForeignKey("tags.tag_id"), primary_key=True)
+    post_id = Column(BigInteger, ForeignKey("posts.post_id", ondelete="CASCADE"), primary_key=True)
+    
+    __table_args__ = (Index('idx_post_tags_post', 'post_id'),)
 
 # 行为模型
+# MySQL中events按timestamp月分区，主键为(event_id, timestamp)且没有外键约束，见database/init.sql
 class Event(Base):
     __tablename__ = "events"
     
@@ -119,7 +140,7 @@ class Event(Base):
     user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
     post_id = Column(BigInteger, ForeignKey("posts.post_id"), nullable=False)
     event_type = Column(String(32), nullable=False)  # view, click, like, favorite, play, stay
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
     source = Column(String(64))
     device_info = Column(JSON)
     extra = Column(JSON)
@@ -127,6 +148,31 @@ class Event(Base):
     # 关系
     user = relationship("User", back_populates="events")
     post = relationship("Post", back_populates="events")
+    
+    # 热路径查询使用的组合索引，见services/event_queries.py
+    __table_args__ = (
+        Index('idx_events_user_type_time', 'user_id', 'event_type', 'timestamp', 'post_id'),
+        Index('idx_events_post_type_time_user', 'post_id', 'event_type', 'timestamp', 'user_id'),
+        Index('idx_events_user_time', 'user_id', 'timestamp'),
+        Index('idx_events_post_time', 'post_id', 'timestamp'),
+    )
+
+# 曝光日志模型
+# 每行是一次推荐响应中的一个帖子，只追加写入，由services/impressions.py后台批量插入；
+# 不设外键，ETL按served_at增量同步到数据仓库raw.impressions
+class Impression(Base):
+    __tablename__ = "impressions"
+    
+    request_id = Column(BigInteger, primary_key=True)
+    position = Column(Integer, primary_key=True)  # 在推荐结果中的位置（含分页偏移），从0开始
+    user_id = Column(BigInteger, nullable=False)
+    post_id = Column(BigInteger, nullable=False)
+    score = Column(Float)
+    source = Column(String(32))  # 召回源：tag, cf, embedding, trending, random
+    latency_ms = Column(Float)  # 整个请求的推荐耗时
+    served_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (Index('idx_impressions_served_at', 'served_at'),)
 
 # 特征模型
 class Feature(Base):
@@ -138,6 +184,9 @@ class Feature(Base):
     feature_type = Column(String(32), nullable=False)
     feature_value = Column(JSON, nullable=False)
     update_time = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 每个实体的每组特征只有一行，批量任务按该唯一键覆盖写入，在线读取按(entity_type, entity_id)前缀查找
+    __table_args__ = (UniqueConstraint('entity_type', 'entity_id', 'feature_type', name='uix_feature_entity_type'),)
 
 # 点赞模型
 class Like(Base):
@@ -1,11 +1,15 @@
-from typing import Optional
+from typing import Optional, List
 import redis
+import redis.asyncio as aioredis
 import os
+import json
 import logging
 from dotenv import load_dotenv
 
+from metrics import instrument_redis
+from logging_config import trace_enabled
+
 # 配置日志
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # 加载环境变量
@@ -16,9 +20,12 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+REDIS_ASYNC_MAX_CONNECTIONS = int(os.getenv("REDIS_ASYNC_MAX_CONNECTIONS", "100"))
 
 # Redis键前缀
 USER_VIEWED_POSTS_PREFIX = "user:viewed:posts:"
+USER_TAG_WEIGHTS_PREFIX = "user:tag_weights:"  # 由数据仓库ETL任务写入
+FEATURE_PREFIX = "feature:"  # 在线特征哈希 feature:{实体类型}:{实体ID}，由特征批量写入任务写入
 
 # Redis过期时间（秒）
 VIEWED_POSTS_EXPIRE_TIME = 60 * 60 * 24 * 30  # 30天
@@ -32,6 +39,20 @@ redis_client = redis.Redis(
     decode_responses=True  # 自动将字节解码为字符串
 )
 
+# 创建异步Redis客户端，供异步路由使用，所有请求共享同一个连接池
+async_redis_client = aioredis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    password=REDIS_PASSWORD,
+    decode_responses=True,
+    max_connections=REDIS_ASYNC_MAX_CONNECTIONS
+)
+
+# 统计命令耗时与连接池使用情况
+instrument_redis(redis_client)
+instrument_redis(async_redis_client, name="async")
+
 # 检查Redis连接
 def check_redis_connection() -> bool:
     try:
@@ -49,10 +70,10 @@ def record_user_viewed_post(user_id: int, post_id: int) -> bool:
         # 将整数ID转换为字符串存储
         redis_client.sadd(key, str(post_id))
         redis_client.expire(key, VIEWED_POSTS_EXPIRE_TIME)  # 设置过期时间
-        logger.info(f"消重系统: 记录用户[{user_id}]浏览帖子[{post_id}], 键名[{key}]")
+        logger.debug("消重系统: 记录用户[%s]浏览帖子[%s], 键名[%s]", user_id, post_id, key)
         return True
     except Exception as e:
-        logger.error(f"消重系统: 记录用户[{user_id}]浏览帖子[{post_id}]失败: {e}")
+        logger.error("消重系统: 记录用户[%s]浏览帖子[%s]失败: %s", user_id, post_id, e)
         return False
 
 # 获取用户浏览过的所有帖子ID
@@ -66,10 +87,13 @@ def get_user_viewed_posts(user_id: int) -> set:
         str_ids = redis_client.smembers(key)
         # 将字符串ID转换为整数ID
         viewed_posts = {int(post_id) for post_id in str_ids}
-        logger.info(f"消重系统: 获取用户[{user_id}]已浏览帖子, 键名[{key}], 数量[{len(viewed_posts)}], IDs: {viewed_posts}")
+        logger.debug("消重系统: 获取用户[%s]已浏览帖子, 键名[%s], 数量[%d]", user_id, key, len(viewed_posts))
+        # 完整ID集合只在被采样的请求中输出
+        if trace_enabled(logger):
+            logger.debug("消重系统: 用户[%s]已浏览帖子IDs: %s", user_id, sorted(viewed_posts))
         return viewed_posts
     except Exception as e:
-        logger.error(f"消重系统: 获取用户[{user_id}]已浏览帖子失败: {e}")
+        logger.error("消重系统: 获取用户[%s]已浏览帖子失败: %s", user_id, e)
         return set()
 
 # 检查用户是否浏览过指定帖子
@@ -81,8 +105,94 @@ def has_user_viewed_post(user_id: int, post_id: int) -> bool:
         key = f"{USER_VIEWED_POSTS_PREFIX}{user_id}"
         # 将整数ID转换为字符串进行查询
         result = redis_client.sismember(key, str(post_id))
-        logger.info(f"消重系统: 检查用户[{user_id}]是否浏览过帖子[{post_id}], 键名[{key}], 结果: {result}")
+        logger.debug("消重系统: 检查用户[%s]是否浏览过帖子[%s], 键名[%s], 结果: %s", user_id, post_id, key, result)
         return result
     except Exception as e:
-        logger.error(f"消重系统: 检查用户[{user_id}]是否浏览过帖子[{post_id}]失败: {e}")
-        return False
\ No newline at end of file
+        logger.error("消重系统: 检查用户[%s]是否浏览过帖子[%s]失败: %s", user_id, post_id, e)
+        return False
+
+# 异步记录用户浏览的帖子
+async def async_record_user_viewed_post(user_id: int, post_id: int) -> bool:
+    """
+    异步记录用户浏览过的帖子到Redis，SADD和EXPIRE通过管道一次往返完成
+    """
+    try:
+        key = f"{USER_VIEWED_POSTS_PREFIX}{user_id}"
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            pipe.sadd(key, str(post_id))
+            pipe.expire(key, VIEWED_POSTS_EXPIRE_TIME)
+            await pipe.execute()
+        logger.debug("消重系统: 记录用户[%s]浏览帖子[%s], 键名[%s]", user_id, post_id, key)
+        return True
+    except Exception as e:
+        logger.error("消重系统: 记录用户[%s]浏览帖子[%s]失败: %s", user_id, post_id, e)
+        return False
+
+# 异步获取用户浏览过的所有帖子ID
+async def async_get_user_viewed_posts(user_id: int) -> set:
+    """
+    异步获取用户浏览过的所有帖子ID，返回整数ID集合
+    """
+    try:
+        key = f"{USER_VIEWED_POSTS_PREFIX}{user_id}"
+        str_ids = await async_redis_client.smembers(key)
+        viewed_posts = {int(post_id) for post_id in str_ids}
+        logger.debug("消重系统: 获取用户[%s]已浏览帖子, 键名[%s], 数量[%d]", user_id, key, len(viewed_posts))
+        if trace_enabled(logger):
+            logger.debug("消重系统: 用户[%s]已浏览帖子IDs: %s", user_id, sorted(viewed_posts))
+        return viewed_posts
+    except Exception as e:
+        logger.error("消重系统: 获取用户[%s]已浏览帖子失败: %s", user_id, e)
+        return set()
+
+def _parse_tag_weights(value: Optional[str]) -> dict:
+    if not value:
+        return {}
+    weights = json.loads(value).get("weights") or {}
+    # JSON对象的键是字符串，数据仓库按标签ID聚合，忽略无法转换的键
+    return {int(tag_id): float(weight) for tag_id, weight in weights.items() if str(tag_id).isdigit()}
+
+# 获取数据仓库计算的用户标签权重
+def get_user_tag_weights(user_id: int) -> dict:
+    """
+    获取用户标签权重 {标签ID: 权重}，数据由fact_user_tags同步而来，不存在时返回空字典
+    """
+    try:
+        return _parse_tag_weights(redis_client.get(f"{USER_TAG_WEIGHTS_PREFIX}{user_id}"))
+    except Exception as e:
+        logger.error("用户画像: 获取用户[%s]标签权重失败: %s", user_id, e)
+        return {}
+
+async def async_get_user_tag_weights(user_id: int) -> dict:
+    """
+    get_user_tag_weights的异步版本
+    """
+    try:
+        return _parse_tag_weights(await async_redis_client.get(f"{USER_TAG_WEIGHTS_PREFIX}{user_id}"))
+    except Exception as e:
+        logger.error("用户画像: 获取用户[%s]标签权重失败: %s", user_id, e)
+        return {}
+
+
+def feature_key(entity_type: str, entity_id: int) -> str:
+    return f"{FEATURE_PREFIX}{entity_type}:{entity_id}"
+
+# 批量获取在线特征
+def get_feature_hashes(entity_type: str, entity_ids: List[int]) -> List[dict]:
+    """
+    用一次pipeline读取多个实体的特征哈希，返回与entity_ids对齐的 {特征名: 值字符串} 列表
+    Redis不可用时抛出异常，由调用方回退到数据库
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for entity_id in entity_ids:
+        pipe.hgetall(feature_key(entity_type, entity_id))
+    return pipe.execute()
+
+async def async_get_feature_hashes(entity_type: str, entity_ids: List[int]) -> List[dict]:
+    """
+    get_feature_hashes的异步版本
+    """
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        for entity_id in entity_ids:
+            pipe.hgetall(feature_key(entity_type, entity_id))
+        return await pipe.execute()
@@ -6,6 +6,7 @@ from datetime import datetime
 
 from database import get_db
 from schemas import schemas
+from services.stats import stats_service
 
 router = APIRouter()
 
@@ -76,31 +77,13 @@ def get_data_processing_status(task_id: int, db: Session = Depends(get_db)):
     )
 
 @router.get("/data/stats", response_model=Dict[str, Any])
-def get_data_stats(db: Session = Depends(get_db)):
+def get_data_stats():
     """
     获取数据统计信息
+    计数由写入路径增量维护，聚合数据由后台定期校准，不在请求中扫描事件表
+    首次校准完成前返回503
     """
-    # 在实际系统中，这里应该查询数据库获取真实统计信息
-    # 为了MVP简化，这里直接返回模拟数据
-    
-    return {
-        "user_count": 100,
-        "post_count": 500,
-        "event_count": 2000,
-        "event_types": {
-            "view": 1000,
-            "click": 500,
-            "like": 300,
-            "favorite": 200
-        },
-        "top_tags": [
-            {"tag": "技术", "count": 150},
-            {"tag": "娱乐", "count": 120},
-            {"tag": "体育", "count": 100},
-            {"tag": "新闻", "count": 80},
-            {"tag": "科学", "count": 50}
-        ],
-        "daily_active_users": 50,
-        "weekly_active_users": 80,
-        "monthly_active_users": 95
-    }
\ No newline at end of file
+    snapshot = stats_service.get_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Stats not ready")
+    return snapshot
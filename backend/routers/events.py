@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+import asyncio
 import logging
 
-from database import get_db
+from database import get_async_db, get_async_read_db, replica_router
 from models.models import Event, User, Post
 from schemas import schemas
-from redis_client import record_user_viewed_post
+from redis_client import async_record_user_viewed_post
+from services.stats import stats_service
+from services.existence import existence_service
+from services.user_profile import user_profile_cache
+from services.trending import trending_service
+from services.event_queries import user_events_query, post_events_query
+from utils.snowflake import id_generator
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -14,18 +22,16 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/events", response_model=schemas.EventResponse, status_code=201)
-def create_event(event: schemas.EventCreate, db: Session = Depends(get_db)):
+async def create_event(event: schemas.EventCreate, db: AsyncSession = Depends(get_async_db)):
     """
     创建单个用户行为事件
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == int(event.user_id)).first()
-    if not user:
+    if not await existence_service.async_user_exists(db, event.user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == int(event.post_id)).first()
-    if not post:
+    if not await existence_service.async_post_exists(db, event.post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 创建事件
@@ -40,23 +46,30 @@ def create_event(event: schemas.EventCreate, db: Session = Depends(get_db)):
     
     db.add(db_event)
     
-    # 如果是点赞或收藏事件，更新帖子的计数
+    # 如果是点赞或收藏事件，在数据库中原子递增帖子的计数
     if event.event_type == "like":
-        post.like_count += 1
+        await db.execute(update(Post).filter(Post.post_id == event.post_id).values(like_count=Post.like_count + 1))
     elif event.event_type == "favorite":
-        post.favorite_count += 1
+        await db.execute(update(Post).filter(Post.post_id == event.post_id).values(favorite_count=Post.favorite_count + 1))
     
     # 如果是浏览或点击事件，记录到Redis中用于消重
     if event.event_type in ["view", "click"]:
-        record_user_viewed_post(event.user_id, event.post_id)
+        await async_record_user_viewed_post(event.user_id, event.post_id)
     
-    db.commit()
-    db.refresh(db_event)
+    await db.commit()
+    await db.refresh(db_event)
+    replica_router.record_write(db_event.user_id)
+    
+    # 增量更新统计计数、帖子热度和用户画像
+    stats_service.record_event(db_event.event_type)
+    trending_service.record_event(db_event.post_id, db_event.event_type)
+    if db_event.event_type in ["like", "favorite"]:
+        user_profile_cache.record_interaction(db_event.user_id, db_event.post_id)
     
     return db_event
 
 @router.post("/events/batch", response_model=List[schemas.EventResponse], status_code=201)
-def create_batch_events(batch: schemas.BatchEventCreate, db: Session = Depends(get_db)):
+async def create_batch_events(batch: schemas.BatchEventCreate, db: AsyncSession = Depends(get_async_db)):
     """
     批量创建用户行为事件
     """
@@ -64,16 +77,14 @@ def create_batch_events(batch: schemas.BatchEventCreate, db: Session = Depends(g
     user_ids = set([int(event.user_id) for event in batch.events])
     post_ids = set([int(event.post_id) for event in batch.events])
     
-    users = db.query(User).filter(User.user_id.in_(user_ids)).all()
-    posts = db.query(Post).filter(Post.post_id.in_(post_ids)).all()
-    
-    existing_user_ids = set([user.user_id for user in users])
-    existing_post_ids = set([post.post_id for post in posts])
+    existing_user_ids = await existence_service.async_existing_ids(db, User, user_ids)
+    existing_post_ids = await existence_service.async_existing_ids(db, Post, post_ids)
     
     # 创建事件
     db_events = []
     post_like_counts = {}
     post_favorite_counts = {}
+    viewed_records = []
     
     for event in batch.events:
         # 跳过不存在的用户或帖子
@@ -99,53 +110,65 @@ def create_batch_events(batch: schemas.BatchEventCreate, db: Session = Depends(g
         
         # 如果是浏览或点击事件，记录到Redis中用于消重
         if event.event_type in ["view", "click"]:
-            logger.info(f"事件系统: 记录用户[{event.user_id}]的[{event.event_type}]事件到消重系统, 帖子ID[{event.post_id}]")
-            record_user_viewed_post(int(event.user_id), int(event.post_id))
+            logger.debug("事件系统: 记录用户[%s]的[%s]事件到消重系统, 帖子ID[%s]", event.user_id, event.event_type, event.post_id)
+            viewed_records.append(async_record_user_viewed_post(int(event.user_id), int(event.post_id)))
+    
+    # 并发写入Redis消重记录
+    if viewed_records:
+        await asyncio.gather(*viewed_records)
+    
+    # 批量分配事件ID，同一批事件的ID连续递增
+    for db_event, event_id in zip(db_events, id_generator.next_ids(len(db_events))):
+        db_event.event_id = event_id
     
     # 批量添加事件
     db.add_all(db_events)
     
     # 更新帖子的点赞和收藏计数
-    for post in posts:
-        if post.post_id in post_like_counts:
-            post.like_count += post_like_counts[post.post_id]
-        if post.post_id in post_favorite_counts:
-            post.favorite_count += post_favorite_counts[post.post_id]
+    for post_id, count in post_like_counts.items():
+        await db.execute(update(Post).filter(Post.post_id == post_id).values(like_count=Post.like_count + count))
+    for post_id, count in post_favorite_counts.items():
+        await db.execute(update(Post).filter(Post.post_id == post_id).values(favorite_count=Post.favorite_count + count))
     
-    db.commit()
+    await db.commit()
+    replica_router.record_write(*{event.user_id for event in db_events})
     
     # 刷新所有事件
     for event in db_events:
-        db.refresh(event)
+        await db.refresh(event)
+        stats_service.record_event(event.event_type)
+        trending_service.record_event(event.post_id, event.event_type)
+        if event.event_type in ["like", "favorite"]:
+            user_profile_cache.record_interaction(event.user_id, event.post_id)
     
     return db_events
 
 @router.get("/events/user/{user_id}", response_model=List[schemas.EventResponse])
-def get_user_events(user_id: int, limit: int = 50, db: Session = Depends(get_db)):
+async def get_user_events(user_id: int, limit: int = 50, db: AsyncSession = Depends(get_async_read_db)):
     """
     获取用户的行为历史
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not await existence_service.async_user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 获取用户事件
-    events = db.query(Event).filter(Event.user_id == user_id).order_by(Event.timestamp.desc()).limit(limit).all()
+    result = await db.execute(user_events_query(user_id, limit))
+    events = result.scalars().all()
     
     return events
 
 @router.get("/events/post/{post_id}", response_model=List[schemas.EventResponse])
-def get_post_events(post_id: int, limit: int = 50, db: Session = Depends(get_db)):
+async def get_post_events(post_id: int, limit: int = 50, db: AsyncSession = Depends(get_async_read_db)):
     """
     获取帖子的行为历史
     """
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not await existence_service.async_post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 获取帖子事件
-    events = db.query(Event).filter(Event.post_id == post_id).order_by(Event.timestamp.desc()).limit(limit).all()
+    result = await db.execute(post_events_query(post_id, limit))
+    events = result.scalars().all()
     
     return events
\ No newline at end of file
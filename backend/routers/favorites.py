@@ -3,9 +3,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List
 
-from database import get_db
+from database import get_db, get_read_db, replica_router
 from models.models import Favorite, User, Post
 from schemas import schemas
+from services.existence import existence_service
+from services.user_profile import user_profile_cache
 
 router = APIRouter()
 
@@ -15,13 +17,11 @@ def create_favorite(favorite: schemas.FavoriteCreate, db: Session = Depends(get_
     创建收藏
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == int(favorite.user_id)).first()
-    if not user:
+    if not existence_service.user_exists(db, int(favorite.user_id)):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == int(favorite.post_id)).first()
-    if not post:
+    if not existence_service.post_exists(db, int(favorite.post_id)):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 检查是否已经收藏
@@ -53,10 +53,14 @@ def create_favorite(favorite: schemas.FavoriteCreate, db: Session = Depends(get_
     
     try:
         db.add(db_favorite)
-        # 更新帖子的收藏计数
-        post.favorite_count += 1
+        # 更新帖子的收藏计数，直接在数据库中原子递增，无需先加载帖子
+        db.query(Post).filter(Post.post_id == favorite.post_id).update(
+            {Post.favorite_count: Post.favorite_count + 1}, synchronize_session=False
+        )
         db.commit()
         db.refresh(db_favorite)
+        user_profile_cache.record_interaction(favorite.user_id, favorite.post_id)
+        replica_router.record_write(favorite.user_id)
         
         # 构造返回结果
         result = {
@@ -93,13 +97,11 @@ def delete_favorite(user_id: int, post_id: int, db: Session = Depends(get_db)):
     取消收藏
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not existence_service.post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 查找收藏记录
@@ -116,21 +118,23 @@ def delete_favorite(user_id: int, post_id: int, db: Session = Depends(get_db)):
     db.delete(favorite)
     
     # 更新帖子的收藏计数
-    if post.favorite_count > 0:
-        post.favorite_count -= 1
+    db.query(Post).filter(Post.post_id == post_id, Post.favorite_count > 0).update(
+        {Post.favorite_count: Post.favorite_count - 1}, synchronize_session=False
+    )
     
     db.commit()
+    user_profile_cache.remove_interaction(user_id, post_id)
+    replica_router.record_write(user_id)
     
     return {"status": "success"}
 
 @router.get("/favorites/user/{user_id}", response_model=List[schemas.FavoriteResponse])
-def get_user_favorites(user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_user_favorites(user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     获取用户的所有收藏
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 获取用户的收藏列表，明确指定要查询的列，排除notes列
@@ -155,13 +159,12 @@ def get_user_favorites(user_id: int, skip: int = 0, limit: int = 100, db: Sessio
     return result
 
 @router.get("/favorites/post/{post_id}", response_model=List[schemas.FavoriteResponse])
-def get_post_favorites(post_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_post_favorites(post_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     获取帖子的所有收藏
     """
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not existence_service.post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 获取帖子的收藏列表，明确指定要查询的列，排除notes列
@@ -191,13 +194,11 @@ def check_favorite(user_id: int, post_id: int, db: Session = Depends(get_db)):
     检查用户是否收藏了帖子
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not existence_service.post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 查找收藏记录
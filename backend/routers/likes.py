@@ -3,9 +3,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List
 
-from database import get_db
+from database import get_db, get_read_db, replica_router
 from models.models import Like, User, Post
 from schemas import schemas
+from services.existence import existence_service
+from services.user_profile import user_profile_cache
 
 router = APIRouter()
 
@@ -15,13 +17,11 @@ def create_like(like: schemas.LikeCreate, db: Session = Depends(get_db)):
     创建点赞
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == int(like.user_id)).first()
-    if not user:
+    if not existence_service.user_exists(db, int(like.user_id)):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == int(like.post_id)).first()
-    if not post:
+    if not existence_service.post_exists(db, int(like.post_id)):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 检查是否已经点赞
@@ -41,10 +41,14 @@ def create_like(like: schemas.LikeCreate, db: Session = Depends(get_db)):
     
     try:
         db.add(db_like)
-        # 更新帖子的点赞计数
-        post.like_count += 1
+        # 更新帖子的点赞计数，直接在数据库中原子递增，无需先加载帖子
+        db.query(Post).filter(Post.post_id == like.post_id).update(
+            {Post.like_count: Post.like_count + 1}, synchronize_session=False
+        )
         db.commit()
         db.refresh(db_like)
+        user_profile_cache.record_interaction(like.user_id, like.post_id)
+        replica_router.record_write(like.user_id)
         return db_like
     except IntegrityError:
         db.rollback()
@@ -61,13 +65,11 @@ def delete_like(user_id: int, post_id: int, db: Session = Depends(get_db)):
     取消点赞
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not existence_service.post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 查找点赞记录
@@ -84,21 +86,23 @@ def delete_like(user_id: int, post_id: int, db: Session = Depends(get_db)):
     db.delete(like)
     
     # 更新帖子的点赞计数
-    if post.like_count > 0:
-        post.like_count -= 1
+    db.query(Post).filter(Post.post_id == post_id, Post.like_count > 0).update(
+        {Post.like_count: Post.like_count - 1}, synchronize_session=False
+    )
     
     db.commit()
+    user_profile_cache.remove_interaction(user_id, post_id)
+    replica_router.record_write(user_id)
     
     return {"status": "success"}
 
 @router.get("/likes/user/{user_id}", response_model=List[schemas.LikeResponse])
-def get_user_likes(user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_user_likes(user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     获取用户的所有点赞
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 获取用户的点赞列表
@@ -107,13 +111,12 @@ def get_user_likes(user_id: int, skip: int = 0, limit: int = 100, db: Session =
     return likes
 
 @router.get("/likes/post/{post_id}", response_model=List[schemas.LikeResponse])
-def get_post_likes(post_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_post_likes(post_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     获取帖子的所有点赞
     """
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not existence_service.post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 获取帖子的点赞列表
@@ -127,13 +130,11 @@ def check_like(user_id: int, post_id: int, db: Session = Depends(get_db)):
     检查用户是否点赞了帖子
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
     # 验证帖子是否存在
-    post = db.query(Post).filter(Post.post_id == post_id).first()
-    if not post:
+    if not existence_service.post_exists(db, post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 查找点赞记录
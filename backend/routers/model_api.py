@@ -1,90 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from typing import Dict, Any, Optional
-import uuid
-from datetime import datetime
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
 
-from database import get_db
 from schemas import schemas
+from services.model_training import model_training_service
+from services.model_registry import model_registry
 
 router = APIRouter()
 
-# 模拟模型任务存储
-model_tasks = {}
+def _task_response(task_record: Dict[str, Any]) -> schemas.ModelTaskResponse:
+    return schemas.ModelTaskResponse(
+        task_id=task_record["task_id"],
+        model_type=task_record["model_type"],
+        status=task_record["status"],
+        created_at=task_record["created_at"],
+        updated_at=task_record.get("updated_at"),
+        metrics=task_record.get("metrics"),
+        version=task_record.get("version"),
+        error=task_record.get("error")
+    )
 
 @router.post("/models/train", response_model=schemas.ModelTaskResponse)
-def trigger_model_training(task: schemas.ModelTaskCreate, db: Session = Depends(get_db)):
+def trigger_model_training(task: schemas.ModelTaskCreate):
     """
     触发模型训练任务
+    训练在进程池中异步执行，通过 /models/train/{task_id} 查询状态
     """
-    task_id = str(uuid.uuid4())
+    try:
+        task_record = model_training_service.submit(task.model_type, task.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # 创建任务记录
-    task_record = {
-        "task_id": task_id,
-        "model_type": task.model_type,
-        "status": "pending",
-        "created_at": datetime.utcnow(),
-        "params": task.params or {}
-    }
-    
-    # 存储任务
-    model_tasks[task_id] = task_record
-    
-    # 在实际系统中，这里应该异步触发模型训练任务
-    # 例如使用Celery或其他任务队列
-    # 为了MVP简化，这里直接模拟任务状态变更
-    task_record["status"] = "training"
-    
-    return schemas.ModelTaskResponse(
-        task_id=task_id,
-        model_type=task.model_type,
-        status="training",
-        created_at=task_record["created_at"],
-        updated_at=datetime.utcnow()
-    )
+    return _task_response(task_record)
 
 @router.get("/models/train/{task_id}", response_model=schemas.ModelTaskResponse)
-def get_model_training_status(task_id: int, db: Session = Depends(get_db)):
+def get_model_training_status(task_id: int):
     """
     获取模型训练任务状态
     """
-    if task_id not in model_tasks:
+    task_record = model_training_service.get(task_id)
+    if task_record is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task_record = model_tasks[task_id]
-    
-    # 模拟任务完成
-    if task_record["status"] == "training":
-        # 随机模拟任务完成
-        import random
-        if random.random() > 0.7:
-            task_record["status"] = "completed"
-            task_record["updated_at"] = datetime.utcnow()
-            task_record["metrics"] = {
-                "accuracy": random.uniform(0.7, 0.95),
-                "precision": random.uniform(0.7, 0.95),
-                "recall": random.uniform(0.7, 0.95),
-                "f1_score": random.uniform(0.7, 0.95)
-            }
-    
-    return schemas.ModelTaskResponse(
-        task_id=task_record["task_id"],
-        model_type=task_record["model_type"],
-        status=task_record["status"],
-        created_at=task_record["created_at"],
-        updated_at=task_record.get("updated_at"),
-        metrics=task_record.get("metrics")
-    )
+    return _task_response(task_record)
 
 @router.get("/models/list", response_model=Dict[str, Any])
-def list_available_models(db: Session = Depends(get_db)):
+def list_available_models():
     """
     列出可用的模型
+    标签召回和协同过滤为内置规则，其余为模型注册表中已发布的版本
     """
-    # 在实际系统中，这里应该查询数据库或文件系统获取可用模型
-    # 为了MVP简化，这里直接返回模拟数据
-    
     return {
         "models": [
             {
@@ -92,12 +56,7 @@ def list_available_models(db: Session = Depends(get_db)):
                 "model_type": "tag_based",
                 "version": "1.0",
                 "created_at": "2023-01-01T00:00:00",
-                "metrics": {
-                    "accuracy": 0.85,
-                    "precision": 0.83,
-                    "recall": 0.87,
-                    "f1_score": 0.85
-                },
+                "metrics": None,
                 "status": "active"
             },
             {
@@ -105,13 +64,21 @@ def list_available_models(db: Session = Depends(get_db)):
                 "model_type": "collaborative_filtering",
                 "version": "1.0",
                 "created_at": "2023-01-15T00:00:00",
-                "metrics": {
-                    "accuracy": 0.82,
-                    "precision": 0.80,
-                    "recall": 0.84,
-                    "f1_score": 0.82
-                },
+                "metrics": None,
                 "status": "active"
             }
-        ]
-    }
\ No newline at end of file
+        ] + model_registry.versions()
+    }
+
+@router.post("/models/{model_type}/versions/{version}/activate", response_model=Dict[str, Any])
+def activate_model_version(model_type: str, version: str):
+    """
+    上线或回滚到已发布的模型版本
+    校验通过后切换CURRENT，本进程立即加载，其他worker在下一次检查时切换
+    """
+    try:
+        return model_registry.activate(model_type, version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=f"模型文件校验失败: {e}")
@@ -1,14 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body
+from sqlalchemy import select
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
+import asyncio
 import logging
+import time
 
-from database import get_db
-from models.models import Post, User, Event
+from database import get_db, get_read_db, get_async_read_db, replica_router
+from models.models import Post, PostTag, User, Event
 from schemas import schemas
-from services.recommender import RecommenderService
+from services.recommender import RecommenderService, order_by_ids
+from services.async_recommender import AsyncRecommenderService
+from services.stats import stats_service
+from services.existence import existence_service
+from services.user_profile import user_profile_cache
+from services.tag_vocab import tag_vocabulary, post_tag_list, post_tag_ids, replace_post_tags
+from services.post_fragments import post_fragment_cache
+from services.invalidation import post_invalidation_bus, UPDATED, DELETED
+from services.snapshot import snapshot_store
+from services.trending import trending_service
+from services.recent_posts import recent_posts
+from services.admission import admission_controller, fallback_posts
+from utils.json_utils import RawJSONResponse
 from routers import likes, favorites
-from redis_client import record_user_viewed_post
+from redis_client import record_user_viewed_post, async_get_user_viewed_posts
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -16,25 +33,74 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/posts", response_model=schemas.RecommendationResponse)
-def get_posts(user_id: int = Query(..., description="用户ID"),
-              count: int = Query(10, description="返回数量"),
-              offset: int = Query(0, description="偏移量"),
-              filters: Optional[str] = Query(None, description="过滤条件，JSON字符串格式"),
-              db: Session = Depends(get_db)):
+async def get_posts(user_id: int = Query(..., description="用户ID"),
+                    count: int = Query(10, description="返回数量"),
+                    offset: int = Query(0, description="偏移量"),
+                    filters: Optional[str] = Query(None, description="过滤条件，JSON字符串格式"),
+                    db: AsyncSession = Depends(get_async_read_db)):
     """
     获取推荐内容列表
     集成了推荐引擎，根据用户ID返回个性化推荐内容
+    异步处理，不占用线程池
+    只读查询走从库，用户写入后的短时间内走主库
+    响应由预编码的帖子片段拼接，不再逐条构建响应模型
+    过载（执行中的请求过多或连接池等待过长）时返回去除已浏览帖子的全局热门列表，响应头X-Degraded为降级原因
     """
-    # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    reason = admission_controller.try_acquire()
+    if reason:
+        return await degraded_posts(user_id, count, offset, reason)
+    try:
+        # 先获取连接并记录连接池等待时间，等待超过降级阈值时不再继续排队
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.connection(), admission_controller.pool_wait_threshold_ms / 1000)
+        except (asyncio.TimeoutError, PoolTimeoutError):
+            admission_controller.observe_pool_wait(time.perf_counter() - start)
+            return await degraded_posts(user_id, count, offset, "pool_timeout")
+        admission_controller.observe_pool_wait(time.perf_counter() - start)
+
+        # 验证用户是否存在，同时预热用户画像，推荐引擎直接从缓存读取
+        user = await user_profile_cache.async_get(db, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # 使用异步推荐引擎获取推荐内容
+        recommender = AsyncRecommenderService(db, session_factory=replica_router.async_read_session_factory(user_id))
+        recommendations = await recommender.get_recommendations(user_id, count, offset, filters)
+        
+        return RawJSONResponse(post_fragment_cache.encode_recommendations(recommendations))
+    finally:
+        admission_controller.release()
+
+async def degraded_posts(user_id: int, count: int, offset: int, reason: str) -> RawJSONResponse:
+    """
+    降级响应：只读取Redis中的已浏览集合，不访问数据库，不校验用户是否存在，也不应用过滤条件
+    """
+    viewed = await async_get_user_viewed_posts(user_id)
+    logger.debug("推荐系统: 过载降级[%s] 用户[%s]", reason, user_id)
+    return RawJSONResponse(fallback_posts.page(count, offset, viewed), headers={"X-Degraded": reason})
+
+@router.get("/posts/trending", response_model=List[schemas.PostResponse])
+async def get_trending_posts(limit: int = Query(20, ge=1, le=100, description="返回数量"),
+                             tag: Optional[str] = Query(None, description="标签名称，为空时返回全局热门"),
+                             db: AsyncSession = Depends(get_async_read_db)):
+    """
+    获取实时热门帖子
+    按指数衰减的行为计数排序，数据来自热度服务维护的Redis有序集合
+    """
+    tag_id = None
+    if tag is not None:
+        tag_ids = tag_vocabulary.lookup([tag])
+        if not tag_ids:
+            return RawJSONResponse(b"[]")
+        tag_id = tag_ids[0]
     
-    # 使用推荐引擎获取推荐内容
-    recommender = RecommenderService(db)
-    recommendations = recommender.get_recommendations(user_id, count, offset, filters)
+    post_ids = [post_id for post_id, _ in (await trending_service.async_top_posts_many([tag_id], limit))[0]]
+    if not post_ids:
+        return RawJSONResponse(b"[]")
     
-    return recommendations
+    result = await db.execute(select(Post).filter(Post.post_id.in_(post_ids)))
+    return RawJSONResponse(post_fragment_cache.encode_posts(order_by_ids(result.scalars().all(), post_ids)))
 
 @router.get("/posts/{post_id}", response_model=schemas.PostDetailResponse)
 def get_post_detail(post_id: int = Path(..., description="帖子ID"),
@@ -55,11 +121,11 @@ def get_post_detail(post_id: int = Path(..., description="帖子ID"),
     
     # 如果提供了用户ID，记录用户浏览记录到Redis
     if user_id:
-        logger.info(f"帖子系统: 记录用户[{user_id}]浏览帖子[{post_id}]到消重系统")
+        logger.debug("帖子系统: 记录用户[%s]浏览帖子[%s]到消重系统", user_id, post_id)
         record_user_viewed_post(user_id, post_id)
     
     # 获取作者信息
-    author = db.query(User).filter(User.user_id == post.author_id).first()
+    author = db.get(User, post.author_id)
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
     
@@ -101,7 +167,7 @@ def get_post_detail(post_id: int = Path(..., description="帖子ID"),
 def get_related_posts(post_id: int = Path(..., description="帖子ID"),
                       user_id: Optional[int] = Query(None, description="用户ID，用于个性化相关推荐"),
                       count: int = Query(5, description="返回数量"),
-                      db: Session = Depends(get_db)):
+                      db: Session = Depends(get_read_db)):
     """
     获取相关推荐内容
     根据帖子ID和可选的用户ID返回相关推荐
@@ -112,14 +178,24 @@ def get_related_posts(post_id: int = Path(..., description="帖子ID"),
         raise HTTPException(status_code=404, detail="Post not found")
     
     # 基于标签的相关推荐
-    post_tags = post.tags or []
+    post_tags = post_tag_ids(post)
     related_posts = []
     
-    if post_tags:
-        # 查询包含相同标签的帖子
-        for tag in post_tags:
-            tag_posts = db.query(Post).filter(
-                Post.tags.contains([tag]),
+    snapshot = snapshot_store.snapshot
+    if snapshot is not None:
+        # 从共享内存快照中取共同交互近邻和同标签帖子，一次查询取回
+        candidate_ids = snapshot.neighbors(post_id, count)
+        for tag_id in post_tags:
+            candidate_ids.extend(snapshot.posts_for_tag(tag_id, count + 1))
+        candidate_ids = [pid for pid in dict.fromkeys(candidate_ids) if pid != post_id]
+        if candidate_ids:
+            posts_by_id = {p.post_id: p for p in db.query(Post).filter(Post.post_id.in_(candidate_ids)).all()}
+            related_posts = [posts_by_id[pid] for pid in candidate_ids if pid in posts_by_id]
+    elif post_tags:
+        # 通过post_tags查询包含相同标签的帖子
+        for tag_id in post_tags:
+            tag_posts = db.query(Post).join(PostTag, PostTag.post_id == Post.post_id).filter(
+                PostTag.tag_id == tag_id,
                 Post.post_id != post_id  # 排除当前帖子
             ).limit(count).all()
             related_posts.extend(tag_posts)
@@ -139,12 +215,12 @@ def get_related_posts(post_id: int = Path(..., description="帖子ID"),
     
     # 如果提供了用户ID，使用推荐引擎进行个性化排序
     if user_id:
-        user = db.query(User).filter(User.user_id == user_id).first()
+        user = user_profile_cache.get(db, user_id)
         if user:
             recommender = RecommenderService(db)
             related_posts = recommender._rank_posts(user, related_posts)
     
-    return related_posts[:count]
+    return RawJSONResponse(post_fragment_cache.encode_posts(related_posts[:count]))
 
 @router.post("/posts", response_model=schemas.PostResponse, status_code=201)
 def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
@@ -152,8 +228,7 @@ def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
     创建新帖子
     """
     # 验证作者是否存在
-    user = db.query(User).filter(User.user_id == post.author_id).first()
-    if not user:
+    if not existence_service.user_exists(db, post.author_id):
         raise HTTPException(status_code=404, detail="Author not found")
     
     # 创建帖子
@@ -161,13 +236,21 @@ def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
         title=post.title,
         content=post.content,
         author_id=post.author_id,
-        tags=post.tags
+        tags=post.tags,
+        tag_ids=tag_vocabulary.encode(post_tag_list(post.tags))
     )
     
     db.add(db_post)
+    db.flush()
+    replace_post_tags(db, db_post.post_id, db_post.tag_ids)
     db.commit()
     db.refresh(db_post)
     
+    stats_service.record_post_created()
+    existence_service.add_post(db_post.post_id)
+    recent_posts.add(db_post.post_id, db_post.author_id, db_post.create_time)
+    replica_router.record_write(db_post.author_id)
+    
     return db_post
 
 @router.put("/posts/{post_id}", response_model=schemas.PostResponse)
@@ -187,9 +270,13 @@ def update_post(post_id: str, post_update: schemas.PostUpdate, db: Session = Dep
         db_post.content = post_update.content
     if post_update.tags is not None:
         db_post.tags = post_update.tags
+        db_post.tag_ids = tag_vocabulary.encode(post_tag_list(post_update.tags))
+        replace_post_tags(db, db_post.post_id, db_post.tag_ids)
     
     db.commit()
     db.refresh(db_post)
+    post_invalidation_bus.publish(db_post.post_id, UPDATED)
+    replica_router.record_write(db_post.author_id)
     
     return db_post
 
@@ -203,8 +290,13 @@ def delete_post(post_id: str, db: Session = Depends(get_db)):
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # 删除帖子
+    # 删除帖子及其标签关联
+    replace_post_tags(db, db_post.post_id, [])
     db.delete(db_post)
     db.commit()
     
+    recent_posts.remove(db_post.post_id)
+    post_invalidation_bus.publish(db_post.post_id, DELETED)
+    replica_router.record_write(db_post.author_id)
+    
     return None
\ No newline at end of file
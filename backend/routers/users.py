@@ -2,9 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from database import get_db
-from models.models import User, Event
+from database import get_db, replica_router
+from models.models import User
 from schemas import schemas
+from services.stats import stats_service
+from services.existence import existence_service
+from services.invalidation import user_invalidation_bus, UPDATED, DELETED
+from services.tag_vocab import tag_vocabulary, user_interest_tags
+from services.event_queries import user_events_query
 
 router = APIRouter()
 
@@ -28,19 +33,11 @@ def get_user_activity(user_id: int = Path(..., description="用户ID"),
     获取用户活动历史
     """
     # 验证用户是否存在
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    if not existence_service.user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="User not found")
     
-    # 构建查询
-    query = db.query(Event).filter(Event.user_id == user_id)
-    
-    # 应用事件类型过滤
-    if event_type:
-        query = query.filter(Event.event_type == event_type)
-    
-    # 获取最近的活动
-    activities = query.order_by(Event.timestamp.desc()).limit(limit).all()
+    # 获取最近的活动，可按事件类型过滤
+    activities = db.execute(user_events_query(user_id, limit, event_type)).scalars().all()
     
     return activities
 
@@ -53,6 +50,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db_user = User(
         username=user.username,
         tags=user.tags,
+        tag_ids=tag_vocabulary.encode(user_interest_tags(user.tags)),
         preferences=user.preferences
     )
     
@@ -60,6 +58,10 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(db_user)
     
+    stats_service.record_user_created()
+    existence_service.add_user(db_user.user_id)
+    replica_router.record_write(db_user.user_id)
+    
     return db_user
 
 @router.put("/users/{user_id}", response_model=schemas.UserResponse)
@@ -77,12 +79,17 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
         db_user.username = user_update.username
     if user_update.tags is not None:
         db_user.tags = user_update.tags
+        db_user.tag_ids = tag_vocabulary.encode(user_interest_tags(user_update.tags))
     if user_update.preferences is not None:
         db_user.preferences = user_update.preferences
     
     db.commit()
     db.refresh(db_user)
     
+    # 写穿失效用户画像缓存，写后读窗口内从主库重新加载画像
+    user_invalidation_bus.publish(user_id, UPDATED)
+    replica_router.record_write(user_id)
+    
     return db_user
 
 @router.delete("/users/{user_id}", status_code=204)
@@ -99,4 +106,6 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     db.delete(db_user)
     db.commit()
     
+    user_invalidation_bus.publish(user_id, DELETED)
+    
     return None
\ No newline at end of file
@@ -161,4 +161,6 @@ class ModelTaskResponse(BaseModel):
     status: str
     created_at: datetime
     updated_at: Optional[datetime] = None
-    metrics: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    metrics: Optional[Dict[str, Any]] = None
+    version: Optional[str] = None
+    error: Optional[str] = None
\ No newline at end of file
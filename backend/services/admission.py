@@ -0,0 +1,181 @@
+from typing import List, Optional, Callable, Iterable, Tuple
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW
+from models.models import Post
+from metrics import registry
+from services.trending import trending_service
+from services.post_fragments import post_fragment_cache
+from services.async_recommender import CONNECTIONS_PER_REQUEST
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 同时执行完整推荐流程的请求数上限，超过后直接返回降级结果；默认按异步连接池容量推算，保证放行的请求不在连接池上排队
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT",
+                                        str(max(1, (ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW) // CONNECTIONS_PER_REQUEST))))
+# 连接池等待时间（毫秒，指数移动平均）超过该值时降级
+ADMISSION_POOL_WAIT_MS = float(os.getenv("ADMISSION_POOL_WAIT_MS", "200"))
+# 等待时间信号的半衰期（秒），降级期间没有新的采样，信号随时间衰减后重新放行请求探测数据库
+ADMISSION_RECOVERY_HALF_LIFE = float(os.getenv("ADMISSION_RECOVERY_HALF_LIFE", "5"))
+# 指数移动平均中新采样的权重
+POOL_WAIT_SMOOTHING = 0.2
+
+# 降级推荐列表的长度
+FALLBACK_POSTS_SIZE = int(os.getenv("FALLBACK_POSTS_SIZE", "500"))
+# 降级推荐列表的刷新间隔（秒）
+FALLBACK_REFRESH_INTERVAL = int(os.getenv("FALLBACK_REFRESH_INTERVAL", "30"))
+
+ADMISSION_REQUESTS = registry.counter("admission_requests_total", "推荐接口准入结果（admitted: 完整推荐, degraded: 返回降级列表，按原因区分）")
+
+class AdmissionController:
+    """
+    推荐接口的过载保护
+    跟踪正在执行完整推荐流程的请求数和连接池等待时间，任一超过阈值时拒绝进入完整流程，由调用方返回降级结果，
+    避免数据库变慢时请求在连接池上排队、线程和协程堆积导致整体不可用。
+    等待时间按采样的指数移动平均计算，并按半衰期随时间衰减：降级期间请求不再访问数据库、没有新的采样，
+    信号衰减到阈值以下后放行的请求会重新采样，数据库仍然缓慢时再次降级
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, pool_wait_threshold_ms: float = ADMISSION_POOL_WAIT_MS,
+                 recovery_half_life: float = ADMISSION_RECOVERY_HALF_LIFE):
+        self.max_in_flight = max_in_flight
+        self.pool_wait_threshold_ms = pool_wait_threshold_ms
+        self.recovery_half_life = recovery_half_life
+        self._in_flight = 0
+        self._pool_wait_ms = 0.0
+        self._observed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self, now: Optional[float] = None) -> Optional[str]:
+        """
+        尝试进入完整推荐流程，成功时返回None（结束后必须调用release），过载时返回降级原因
+        """
+        if self.pool_wait_ms(now) >= self.pool_wait_threshold_ms:
+            ADMISSION_REQUESTS.inc(result="degraded", reason="pool_wait")
+            return "pool_wait"
+        with self._lock:
+            admitted = self._in_flight < self.max_in_flight
+            if admitted:
+                self._in_flight += 1
+        if not admitted:
+            ADMISSION_REQUESTS.inc(result="degraded", reason="in_flight")
+            return "in_flight"
+        ADMISSION_REQUESTS.inc(result="admitted")
+        return None
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def observe_pool_wait(self, seconds: float, now: Optional[float] = None):
+        """
+        记录一次从连接池获取连接的耗时
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            current = self._decayed(now)
+            self._pool_wait_ms = current + POOL_WAIT_SMOOTHING * (seconds * 1000 - current)
+            self._observed_at = now
+
+    def pool_wait_ms(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._decayed(now)
+
+    def _decayed(self, now: float) -> float:
+        elapsed = max(0.0, now - self._observed_at)
+        return self._pool_wait_ms * 0.5 ** (elapsed / self.recovery_half_life)
+
+class FallbackPosts:
+    """
+    降级推荐列表
+    后台线程定期取实时热门帖子（不足时用最新发布的帖子补足），预先编码为JSON片段后整体替换；
+    降级请求只在内存中过滤用户已浏览的帖子并拼接响应，不访问数据库。
+    刷新失败时保留上一次的列表
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, size: int = FALLBACK_POSTS_SIZE,
+                 refresh_interval: int = FALLBACK_REFRESH_INTERVAL):
+        self.session_factory = session_factory
+        self.size = size
+        self.refresh_interval = refresh_interval
+        # ((帖子ID, 帖子JSON), ...)，按排名排列
+        self._entries: Tuple[Tuple[int, bytes], ...] = ()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台刷新线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="fallback-posts-refresher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台刷新线程
+        """
+        self._stop_event.set()
+
+    def refresh(self):
+        """
+        重新加载热门帖子并编码
+        """
+        post_ids = [post_id for post_id, _ in trending_service.top_posts(self.size)]
+        db = self.session_factory()
+        try:
+            posts = {}
+            if post_ids:
+                posts = {post.post_id: post for post in db.execute(select(Post).filter(Post.post_id.in_(post_ids))).scalars()}
+            ranked = [posts[post_id] for post_id in post_ids if post_id in posts]
+            if len(ranked) < self.size:
+                latest = db.execute(select(Post).order_by(Post.create_time.desc()).limit(self.size)).scalars()
+                ranked.extend(post for post in latest if post.post_id not in posts)
+            self._entries = tuple((post.post_id, post_fragment_cache.encode_post(post)) for post in ranked[:self.size])
+        finally:
+            db.close()
+        logger.debug("降级推荐: 已刷新 帖子[%d]", len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def page(self, count: int, offset: int = 0, exclude: Optional[Iterable[int]] = None) -> bytes:
+        """
+        过滤exclude中的帖子后分页，编码结果与schemas.RecommendationResponse的输出一致
+        """
+        exclude = exclude if exclude is not None else set()
+        encoded: List[bytes] = [post for post_id, post in self._entries if post_id not in exclude]
+        end = offset + count
+        return b"{\"items\":[%s],\"has_more\":%s,\"total\":%d}" % (
+            b",".join(encoded[offset:end]),
+            b"true" if end < len(encoded) else b"false",
+            len(encoded)
+        )
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("降级推荐: 刷新失败: %s", e)
+            self._stop_event.wait(self.refresh_interval)
+
+# 全局准入控制器
+admission_controller = AdmissionController()
+# 全局降级推荐列表
+fallback_posts = FallbackPosts()
@@ -0,0 +1,384 @@
+"""
+隐式反馈矩阵分解（ALS）与向量召回
+
+训练：从events（浏览/点击）、likes、favorites构建稀疏的 用户 x 帖子 交互矩阵（CSR），
+按Hu, Koren, Volinsky的隐式ALS交替求解用户和帖子向量，置信度为 1 + alpha * log(1 + 交互权重)。
+每轮求解中 Y^T Y 和各行的小矩阵运算都走NumPy的BLAS，多线程由BLAS库控制（OPENBLAS_NUM_THREADS等）。
+
+产物发布到模型注册表（见services/model_registry.py），与服务快照使用相同的版本目录格式：
+    MODEL_REGISTRY_DIR/als/
+        CURRENT
+        20240101T000000Z/
+            manifest.json       训练参数、离线指标和各文件的校验和
+            user_ids.npy / item_ids.npy             升序，与因子矩阵的行对齐
+            user_factors.npy / item_factors.npy     float32
+
+召回：按块计算帖子向量与用户向量的点积，每块只保留前K个，内存占用与帖子总量无关。
+
+训练: python -m services.als --output /data/models/als
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+from collections import defaultdict
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.models import Event, Like, Favorite
+from services.event_queries import VIEW_EVENT_TYPES, lookback_start
+from services.snapshot import publish_arrays, read_manifest
+from services.model_registry import model_registry
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 模型产物根目录
+ALS_MODEL_DIR = model_registry.path("als")
+# 默认训练参数，可以在训练请求的params中覆盖
+ALS_FACTORS = int(os.getenv("ALS_FACTORS", "64"))
+ALS_REGULARIZATION = float(os.getenv("ALS_REGULARIZATION", "0.05"))
+ALS_ITERATIONS = int(os.getenv("ALS_ITERATIONS", "15"))
+ALS_ALPHA = float(os.getenv("ALS_ALPHA", "20"))
+# 离线评估抽取的用户数，每个用户留出一个交互
+ALS_EVAL_USERS = int(os.getenv("ALS_EVAL_USERS", "200"))
+ALS_EVAL_K = 20
+# 召回时每次计算点积的帖子数
+RETRIEVAL_BLOCK_SIZE = int(os.getenv("RETRIEVAL_BLOCK_SIZE", "16384"))
+# 保留的历史版本数量
+ALS_KEEP_VERSIONS = 3
+# 每次交替更新中共轭梯度的迭代步数，从上一轮的向量开始迭代，步数等于向量维度时为精确解
+ALS_CG_STEPS = int(os.getenv("ALS_CG_STEPS", "3"))
+# 每批展开的交互向量占用的内存上限（字节），决定每批包含的交互数
+ALS_SOLVE_BATCH_BYTES = 64 * 1024 * 1024
+
+# 各类交互的权重，点赞和收藏以likes/favorites表的当前状态为准（取消后不再计入）
+INTERACTION_WEIGHTS = {
+    "view": 1.0,
+    "click": 2.0,
+    "like": 4.0,
+    "favorite": 8.0,
+}
+
+class InteractionMatrix:
+    """
+    CSR格式的交互矩阵，行是用户，列是帖子，行内列号升序
+    """
+
+    def __init__(self, row_ids: np.ndarray, col_ids: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray, data: np.ndarray):
+        self.row_ids = row_ids
+        self.col_ids = col_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.row_ids), len(self.col_ids)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def row(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def transpose(self) -> "InteractionMatrix":
+        n_rows, n_cols = self.shape
+        rows = np.repeat(np.arange(n_rows, dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(n_cols + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(self.indices, minlength=n_cols))
+        return InteractionMatrix(self.col_ids, self.row_ids, indptr, rows[order], self.data[order])
+
+    def without(self, removed: Dict[int, int]) -> "InteractionMatrix":
+        """
+        去掉部分 (行号 -> 列号) 交互后的矩阵，用于留出评估
+        """
+        keep = np.ones(self.nnz, dtype=bool)
+        for row, col in removed.items():
+            start, end = self.indptr[row], self.indptr[row + 1]
+            keep[start + int(np.searchsorted(self.indices[start:end], col))] = False
+        rows = np.repeat(np.arange(len(self.row_ids)), np.diff(self.indptr))
+        indptr = np.zeros(len(self.row_ids) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(rows[keep], minlength=len(self.row_ids)))
+        return InteractionMatrix(self.row_ids, self.col_ids, indptr, self.indices[keep], self.data[keep])
+
+def build_interaction_matrix(interactions: Iterable[Tuple[int, int, float]]) -> InteractionMatrix:
+    """
+    由 (user_id, post_id, 权重) 构建交互矩阵，同一用户和帖子的权重相加后取log(1 + 权重)
+    """
+    weights: Dict[Tuple[int, int], float] = defaultdict(float)
+    for user_id, post_id, weight in interactions:
+        weights[(int(user_id), int(post_id))] += float(weight)
+    if not weights:
+        empty = np.zeros(0, dtype=np.int64)
+        return InteractionMatrix(empty, empty, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+    pairs = np.array(list(weights.keys()), dtype=np.int64)
+    values = np.log1p(np.array(list(weights.values()), dtype=np.float32))
+    row_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    col_ids, cols = np.unique(pairs[:, 1], return_inverse=True)
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(len(row_ids) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=len(row_ids)))
+    return InteractionMatrix(row_ids, col_ids, indptr, cols[order].astype(np.int32), values[order])
+
+def load_interactions(db: Session):
+    """
+    读取训练用的交互：最近EVENT_LOOKBACK_DAYS天的浏览/点击次数，以及当前的点赞和收藏
+    """
+    views = db.query(Event.user_id, Event.post_id, Event.event_type, func.count()).filter(
+        Event.event_type.in_(VIEW_EVENT_TYPES),
+        Event.timestamp >= lookback_start()
+    ).group_by(Event.user_id, Event.post_id, Event.event_type).yield_per(10000)
+    for user_id, post_id, event_type, count in views:
+        yield user_id, post_id, INTERACTION_WEIGHTS[event_type] * count
+    for user_id, post_id in db.query(Like.user_id, Like.post_id).yield_per(10000):
+        yield user_id, post_id, INTERACTION_WEIGHTS["like"]
+    for user_id, post_id in db.query(Favorite.user_id, Favorite.post_id).yield_per(10000):
+        yield user_id, post_id, INTERACTION_WEIGHTS["favorite"]
+
+def _solve_side(matrix: InteractionMatrix, fixed: np.ndarray, target: np.ndarray, regularization: float, alpha: float,
+                cg_steps: int = ALS_CG_STEPS, batch_bytes: int = ALS_SOLVE_BATCH_BYTES):
+    """
+    固定一侧向量，求解另一侧：(Y^T Y + Y_u^T (C_u - I) Y_u + λI) x_u = Y_u^T C_u p_u
+    不逐行构造矩阵求解（每行O(f^3)），而是以target中的当前值为起点，对一批行同时做cg_steps步共轭梯度：
+    矩阵向量乘只需Y^T Y和该行交互的帖子向量，整批按交互展开后用向量化运算完成，每步代价O(交互数 * f)。
+    行按CSR顺序切分为连续的批，每批展开的交互向量不超过batch_bytes（单行超过上限时独占一批）
+    """
+    factors = fixed.shape[1]
+    fixed64 = fixed.astype(np.float64)
+    gram = fixed64.T @ fixed64 + regularization * np.eye(factors)
+    max_entries = max(1, batch_bytes // (factors * 8))
+    indptr = matrix.indptr
+    target[np.diff(indptr) == 0] = 0
+
+    start = 0
+    while start < matrix.shape[0]:
+        stop = max(start + 1, int(np.searchsorted(indptr, indptr[start] + max_entries, side="right")) - 1)
+        _conjugate_gradient(matrix, fixed64, gram, target, start, min(stop, matrix.shape[0]), alpha, cg_steps)
+        start = stop
+
+def _conjugate_gradient(matrix: InteractionMatrix, fixed64: np.ndarray, gram: np.ndarray, target: np.ndarray,
+                        start: int, stop: int, alpha: float, steps: int):
+    """
+    对[start, stop)中有交互的行同时做共轭梯度迭代，各行的步长独立计算
+    """
+    counts = np.diff(matrix.indptr[start:stop + 1])
+    local = np.flatnonzero(counts)
+    if len(local) == 0:
+        return
+    low, high = matrix.indptr[start], matrix.indptr[stop]
+    offsets = matrix.indptr[start + local] - low
+    entry_rows = np.repeat(np.arange(len(local)), counts[local])
+    # 按(向量维度, 交互)存放，沿交互方向分段求和时访问连续内存
+    factors_t = np.ascontiguousarray(fixed64[matrix.indices[low:high]].T)
+    confidence = alpha * matrix.data[low:high].astype(np.float64)
+
+    def segment_sum(values_t: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(values_t, offsets, axis=1).T
+
+    def product(vectors: np.ndarray) -> np.ndarray:
+        weights = confidence * np.einsum("fe,fe->e", factors_t, np.ascontiguousarray(vectors.T)[:, entry_rows])
+        return vectors @ gram + segment_sum(factors_t * weights)
+
+    rows = start + local
+    x = target[rows].astype(np.float64)
+    residual = segment_sum(factors_t * (1.0 + confidence)) - product(x)
+    direction = residual.copy()
+    norm = np.einsum("uf,uf->u", residual, residual)
+    for _ in range(steps):
+        projected = product(direction)
+        curvature = np.einsum("uf,uf->u", direction, projected)
+        step = np.divide(norm, curvature, out=np.zeros_like(norm), where=curvature > 0)
+        x += step[:, None] * direction
+        residual -= step[:, None] * projected
+        new_norm = np.einsum("uf,uf->u", residual, residual)
+        beta = np.divide(new_norm, norm, out=np.zeros_like(norm), where=norm > 0)
+        direction = residual + beta[:, None] * direction
+        norm = new_norm
+    target[rows] = x
+
+def train_als(matrix: InteractionMatrix, factors: int = ALS_FACTORS, regularization: float = ALS_REGULARIZATION,
+              iterations: int = ALS_ITERATIONS, alpha: float = ALS_ALPHA, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    训练隐式ALS，返回(用户向量, 帖子向量)
+    """
+    rng = np.random.default_rng(seed)
+    n_users, n_items = matrix.shape
+    user_factors = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float32)
+    item_matrix = matrix.transpose()
+    for iteration in range(iterations):
+        _solve_side(matrix, item_factors, user_factors, regularization, alpha)
+        _solve_side(item_matrix, user_factors, item_factors, regularization, alpha)
+        logger.debug("ALS: 第%d/%d轮完成", iteration + 1, iterations)
+    return user_factors, item_factors
+
+def top_k_rows(item_factors: np.ndarray, vector: np.ndarray, k: int, exclude_rows: Optional[Iterable[int]] = None,
+               block_size: int = RETRIEVAL_BLOCK_SIZE) -> List[int]:
+    """
+    按块计算点积，返回分数最高的k个行号（降序），跳过exclude_rows
+    """
+    exclude = set(int(row) for row in exclude_rows) if exclude_rows is not None else set()
+    need = k + len(exclude)
+    if k <= 0 or need <= 0:
+        return []
+    best_rows = np.zeros(0, dtype=np.int64)
+    best_scores = np.zeros(0, dtype=np.float32)
+    for start in range(0, len(item_factors), block_size):
+        scores = np.asarray(item_factors[start:start + block_size]) @ vector
+        rows = np.arange(start, start + len(scores), dtype=np.int64)
+        if len(scores) > need:
+            keep = np.argpartition(-scores, need - 1)[:need]
+            rows, scores = rows[keep], scores[keep]
+        best_rows = np.concatenate([best_rows, rows])
+        best_scores = np.concatenate([best_scores, scores])
+        if len(best_scores) > need:
+            keep = np.argpartition(-best_scores, need - 1)[:need]
+            best_rows, best_scores = best_rows[keep], best_scores[keep]
+    order = np.lexsort((best_rows, -best_scores))
+    return [int(row) for row in best_rows[order] if int(row) not in exclude][:k]
+
+def holdout(matrix: InteractionMatrix, users: int = ALS_EVAL_USERS, seed: int = 0) -> Dict[int, int]:
+    """
+    为至少有两个交互的用户随机留出一个交互，返回 {行号: 留出的列号}
+    """
+    rng = np.random.default_rng(seed)
+    candidates = np.flatnonzero(np.diff(matrix.indptr) >= 2)
+    if len(candidates) == 0:
+        return {}
+    chosen = rng.choice(candidates, size=min(users, len(candidates)), replace=False)
+    removed = {}
+    for row in chosen:
+        cols, _ = matrix.row(int(row))
+        removed[int(row)] = int(cols[rng.integers(len(cols))])
+    return removed
+
+def recall_at_k(train: InteractionMatrix, removed: Dict[int, int], user_factors: np.ndarray,
+                item_factors: np.ndarray, k: int = ALS_EVAL_K) -> Optional[float]:
+    """
+    留出交互出现在前k个召回结果（排除训练交互）中的比例
+    """
+    if not removed:
+        return None
+    hits = 0
+    for row, col in removed.items():
+        seen, _ = train.row(row)
+        hits += col in top_k_rows(item_factors, user_factors[row], k, seen)
+    return hits / len(removed)
+
+def train_and_publish(interactions: Iterable[Tuple[int, int, float]], root: str = ALS_MODEL_DIR,
+                      params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    构建交互矩阵，留出评估后在全量数据上训练并发布新版本，返回版本号和指标
+    """
+    params = dict(params or {})
+    train_params = {
+        "factors": int(params.get("factors", ALS_FACTORS)),
+        "regularization": float(params.get("regularization", ALS_REGULARIZATION)),
+        "iterations": int(params.get("iterations", ALS_ITERATIONS)),
+        "alpha": float(params.get("alpha", ALS_ALPHA)),
+        "seed": int(params.get("seed", 0)),
+    }
+    start = time.perf_counter()
+    matrix = build_interaction_matrix(interactions)
+    n_users, n_items = matrix.shape
+    if n_users == 0 or n_items == 0:
+        raise ValueError("没有可用于训练的交互数据")
+
+    metrics: Dict[str, Any] = {"users": n_users, "items": n_items, "interactions": matrix.nnz}
+    removed = holdout(matrix, int(params.get("eval_users", ALS_EVAL_USERS)), train_params["seed"])
+    if removed:
+        train = matrix.without(removed)
+        metrics[f"recall_at_{ALS_EVAL_K}"] = recall_at_k(train, removed, *train_als(train, **train_params))
+        metrics["eval_users"] = len(removed)
+
+    user_factors, item_factors = train_als(matrix, **train_params)
+    metrics["train_seconds"] = time.perf_counter() - start
+    version = publish_arrays({
+        "user_ids": matrix.row_ids,
+        "item_ids": matrix.col_ids,
+        "user_factors": user_factors,
+        "item_factors": item_factors,
+    }, {"model_type": "als", "params": train_params, "metrics": metrics}, root, keep=ALS_KEEP_VERSIONS)
+    logger.info("ALS: 已发布版本[%s] 用户[%d] 帖子[%d] 指标%s", version, n_users, n_items, metrics)
+    return {"version": version, "metrics": metrics}
+
+def run_training(params: Optional[Dict[str, Any]] = None, root: str = ALS_MODEL_DIR) -> Dict[str, Any]:
+    """
+    训练任务入口，在spawn启动的独立进程中执行，进程重新导入database模块，连接池中没有从父进程继承的连接
+    """
+    db = SessionLocal()
+    try:
+        return train_and_publish(load_interactions(db), root, params)
+    finally:
+        db.close()
+
+class EmbeddingModel:
+    """
+    一个已加载的模型版本，向量以只读mmap方式加载
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest = read_manifest(path)
+        self.version = self.manifest["version"]
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.user_ids = load("user_ids")
+        self.item_ids = load("item_ids")
+        self.user_factors = load("user_factors")
+        self.item_factors = load("item_factors")
+
+    @staticmethod
+    def _rows(ids: np.ndarray, values: Iterable[int]) -> np.ndarray:
+        """
+        ID在升序数组ids中的行号，忽略不存在的ID
+        """
+        values = np.fromiter((int(value) for value in values), dtype=np.int64)
+        if len(values) == 0 or len(ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+        return rows[ids[rows] == values]
+
+    def recommend(self, user_id: int, k: int, exclude_post_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        向量点积最高的k个帖子ID，用户不在模型中时返回空列表
+        """
+        user_rows = self._rows(self.user_ids, [user_id])
+        if len(user_rows) == 0:
+            return []
+        exclude_rows = self._rows(self.item_ids, exclude_post_ids or ())
+        rows = top_k_rows(self.item_factors, np.asarray(self.user_factors[user_rows[0]]), k, exclude_rows.tolist())
+        return self.item_ids[rows].tolist()
+
+    def warm(self):
+        """
+        切换前为一个用户计算一次召回，使帖子向量全部映射进内存
+        """
+        if len(self.user_ids):
+            self.recommend(int(self.user_ids[0]), 1)
+
+# 全局ALS模型加载器，由模型注册表统一启动
+embedding_store = model_registry.register("als", EmbeddingModel)
+
+def main():
+    parser = argparse.ArgumentParser(description='训练隐式ALS模型')
+    parser.add_argument('--output', default=ALS_MODEL_DIR, help='模型产物根目录')
+    parser.add_argument('--factors', type=int, default=ALS_FACTORS, help='向量维度')
+    parser.add_argument('--iterations', type=int, default=ALS_ITERATIONS, help='迭代轮数')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(run_training({"factors": args.factors, "iterations": args.iterations}, args.output), ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Post, PostTag
+from database import AsyncSessionLocal
+from redis_client import async_get_user_viewed_posts
+from metrics import timer, RECOMMENDER_STAGE_LATENCY
+from services.recommender import (
+    parse_filters, apply_post_filters, merge_recall_results, score_posts, trending_candidate_ids, order_by_ids,
+    RANKING_FEATURES, TRENDING_RECALL_TAGS
+)
+from services.feature_store import feature_store
+from services.trending import trending_service
+from services.recent_posts import recent_posts
+from services.als import embedding_store
+from services.impressions import impression_log
+from services.recall import RecallOrchestrator, recall_orchestrator
+from services.user_profile import UserProfile, user_profile_cache
+from services.event_queries import similar_users_query, users_interactions_query, viewed_posts_query
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 一次推荐最多同时占用的异步连接数：请求会话（用户画像、已浏览帖子回退查询）1个，
+# 加上并发执行的标签、协同过滤、向量、热度、随机召回各1个；异步连接池和准入控制按此估算并发上限
+CONNECTIONS_PER_REQUEST = 6
+
+class AsyncRecommenderService:
+    """
+    异步推荐引擎服务类，召回逻辑与RecommenderService一致
+    各召回源互不依赖，在延迟预算内并发执行；
+    AsyncSession不支持并发查询，用户画像和已浏览帖子使用请求会话，每个召回阶段使用独立会话，
+    每个请求最多同时占用CONNECTIONS_PER_REQUEST个连接
+    """
+
+    def __init__(self, db: AsyncSession, session_factory=AsyncSessionLocal, orchestrator: RecallOrchestrator = recall_orchestrator):
+        self.db = db
+        self.session_factory = session_factory
+        self.orchestrator = orchestrator
+
+    async def get_recommendations(self, user_id: int, count: int = 10, offset: int = 0, filters: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取推荐内容
+        根据用户ID、数量、偏移量和过滤条件获取推荐内容，返回的一页结果记入曝光日志
+        """
+        start_time = time.perf_counter()
+        filter_dict = parse_filters(filters)
+
+        # 获取用户画像，热点用户直接命中缓存
+        user = await user_profile_cache.async_get(self.db, user_id)
+        if not user:
+            return {"items": [], "has_more": False, "total": 0}
+
+        # 已浏览帖子只获取一次，供各召回源共享
+        viewed_post_ids = await self._get_viewed_post_ids(user_id)
+
+        # 并发执行各召回源，超出延迟预算的召回源会被取消
+        recall = await self.orchestrator.run_async({
+            "tag": lambda: self._recommend_by_tags(user, count * 2, filter_dict, viewed_post_ids),
+            "cf": lambda: self._recommend_by_collaborative_filtering(user, count * 2, filter_dict, viewed_post_ids),
+            "embedding": lambda: self._recommend_by_embedding(user, count * 2, filter_dict, viewed_post_ids),
+            "trending": lambda: self._recommend_trending(user, count * 2, filter_dict, viewed_post_ids),
+            "random": lambda: self._recommend_random(count, filter_dict, viewed_post_ids)
+        })
+        sources: Dict[int, str] = {}
+        recommended_posts = merge_recall_results(count, recall.get("tag"), recall.get("cf"), recall.get("random"),
+                                                 recall.get("trending"), recall.get("embedding"), sources=sources)
+
+        # 对推荐结果进行排序
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="rank"):
+            post_ids = [post.post_id for post in recommended_posts]
+            features = await feature_store.async_get_features("post", post_ids, RANKING_FEATURES)
+            trending = await trending_service.async_scores(post_ids)
+            scored_posts = score_posts(user, recommended_posts, features, trending)
+
+        # 分页处理
+        start = offset
+        end = offset + count
+        page = scored_posts[start:end]
+        impression_log.record(user.user_id, page, sources, offset, (time.perf_counter() - start_time) * 1000)
+        return {
+            "items": [post for post, _ in page],
+            "has_more": end < len(scored_posts),
+            "total": len(scored_posts)
+        }
+
+    async def _recommend_by_tags(self, user: UserProfile, count: int, filters: Dict[str, Any], viewed_post_ids: set) -> List[Post]:
+        """
+        基于标签的推荐算法
+        """
+        user_tags = user.interests
+        if not user_tags:
+            return []
+
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="tag_recall"):
+            posts = []
+            async with self.session_factory() as session:
+                for tag_id in user_tags:
+                    query = select(Post).join(PostTag, PostTag.post_id == Post.post_id).filter(PostTag.tag_id == tag_id)
+                    query = apply_post_filters(query, filters)
+                    result = await session.execute(query.limit(count))
+                    posts.extend(result.scalars().all())
+
+        # 去重并过滤掉已浏览的帖子
+        unique_posts = list({post.post_id: post for post in posts}.values())
+        filtered_posts = [post for post in unique_posts if post.post_id not in viewed_post_ids]
+        logger.debug("推荐系统: 用户[%s]标签召回数量: %d, 消重过滤掉: %d篇",
+                     user.user_id, len(filtered_posts), len(unique_posts) - len(filtered_posts))
+        return filtered_posts[:count]
+
+    async def _recommend_by_collaborative_filtering(self, user: UserProfile, count: int, filters: Dict[str, Any], viewed_post_ids: set) -> List[Post]:
+        """
+        基于协同过滤的推荐算法
+        MVP阶段使用简化版的基于用户的协同过滤
+        """
+        # 用户最近喜欢/收藏的帖子ID，来自用户画像
+        user_post_ids = user.interacted_post_ids
+        if not user_post_ids:
+            return []
+
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="cf_recall"):
+            async with self.session_factory() as session:
+                # 找到与当前用户有相似行为的用户
+                result = await session.execute(similar_users_query(user_post_ids, user.user_id))
+                similar_user_ids = result.scalars().all()
+                if not similar_user_ids:
+                    return []
+
+                # 统计相似用户喜欢/收藏的帖子次数，排除用户已经喜欢/收藏的帖子
+                result = await session.execute(users_interactions_query(similar_user_ids))
+                post_counts = {}
+                for post_id in result.scalars().all():
+                    if post_id not in user_post_ids:
+                        post_counts[post_id] = post_counts.get(post_id, 0) + 1
+
+                sorted_post_ids = sorted(post_counts.keys(), key=lambda x: post_counts[x], reverse=True)
+                if not sorted_post_ids:
+                    return []
+
+                query = apply_post_filters(select(Post).filter(Post.post_id.in_(sorted_post_ids[:count])), filters)
+                result = await session.execute(query)
+                recommended_posts = result.scalars().all()
+
+        return [post for post in recommended_posts if post.post_id not in viewed_post_ids]
+
+    async def _recommend_by_embedding(self, user: UserProfile, count: int, filters: Dict[str, Any], viewed_post_ids: set) -> List[Post]:
+        """
+        向量召回，使用最新发布的ALS模型，未加载模型时为空
+        点积计算在线程池中执行，NumPy矩阵运算期间释放GIL，不阻塞事件循环
+        """
+        model = embedding_store.snapshot
+        if model is None:
+            return []
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="embedding_recall"):
+            post_ids = await asyncio.get_running_loop().run_in_executor(
+                None, model.recommend, user.user_id, count, viewed_post_ids | user.interacted_post_ids
+            )
+            if not post_ids:
+                return []
+            async with self.session_factory() as session:
+                query = apply_post_filters(select(Post).filter(Post.post_id.in_(post_ids)), filters)
+                result = await session.execute(query)
+                return order_by_ids(result.scalars().all(), post_ids)
+
+    async def _recommend_trending(self, user: UserProfile, count: int, filters: Dict[str, Any], viewed_post_ids: set) -> List[Post]:
+        """
+        热度召回，合并全局和用户兴趣标签的实时热门榜单
+        """
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="trending_recall"):
+            ranked_lists = await trending_service.async_top_posts_many([None] + list(user.interests[:TRENDING_RECALL_TAGS]), count)
+            post_ids = trending_candidate_ids(ranked_lists, viewed_post_ids, count)
+            if not post_ids:
+                return []
+            async with self.session_factory() as session:
+                query = apply_post_filters(select(Post).filter(Post.post_id.in_(post_ids)), filters)
+                result = await session.execute(query)
+                return order_by_ids(result.scalars().all(), post_ids)
+
+    async def _recommend_random(self, count: int, filters: Dict[str, Any], viewed_post_ids: set) -> List[Post]:
+        """
+        随机（探索）召回，从最新帖子的环形缓冲区中无放回采样，优先最近一周发布的帖子
+        """
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="random_recall"):
+            # 缓冲区由后台线程加载，第一次加载完成前不提供探索结果
+            if not recent_posts.loaded:
+                return []
+            post_ids = recent_posts.sample(count, viewed_post_ids, filters)
+            if not post_ids:
+                return []
+            async with self.session_factory() as session:
+                query = apply_post_filters(select(Post).filter(Post.post_id.in_(post_ids)), filters)
+                result = await session.execute(query)
+                return order_by_ids(result.scalars().all(), post_ids)
+
+    async def _get_viewed_post_ids(self, user_id: int) -> set:
+        """
+        获取用户已浏览的帖子ID，优先从Redis获取，Redis中没有数据时从数据库获取
+        """
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="dedup"):
+            viewed_post_ids = await async_get_user_viewed_posts(user_id)
+            if viewed_post_ids:
+                return viewed_post_ids
+
+            logger.debug("推荐系统: 用户[%s]的Redis消重数据为空，从数据库获取", user_id)
+            result = await self.db.execute(viewed_posts_query(user_id))
+            return set(result.scalars().all())
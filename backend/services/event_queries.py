@@ -0,0 +1,84 @@
+from typing import Iterable, Optional
+from datetime import datetime, timedelta
+import os
+
+from sqlalchemy import select
+
+from models.models import Event
+
+# 热路径上的行为表查询，同步和异步服务共用
+# 每条查询都对应database/migrations/中的一个组合索引，
+# 只选择需要的列，使查询能够由覆盖索引直接返回，修改时需同步检查tests/backend/test_query_plans.py
+
+# 点赞/收藏类事件，代表用户的正向反馈
+INTERACTION_EVENT_TYPES = ("like", "favorite")
+# 浏览/点击类事件，用于消重
+VIEW_EVENT_TYPES = ("view", "click")
+
+# 召回和消重只读取最近N天的行为，events按月分区，时间条件使查询只访问最近的分区
+EVENT_LOOKBACK_DAYS = int(os.getenv("EVENT_LOOKBACK_DAYS", "90"))
+
+def lookback_start() -> datetime:
+    return datetime.utcnow() - timedelta(days=EVENT_LOOKBACK_DAYS)
+
+def recent_interactions_query(user_id: int, limit: int):
+    """
+    用户最近点赞/收藏的帖子ID
+    索引: idx_events_user_type_time (user_id, event_type, timestamp, post_id)
+    """
+    return select(Event.post_id).filter(
+        Event.user_id == user_id,
+        Event.event_type.in_(INTERACTION_EVENT_TYPES),
+        Event.timestamp >= lookback_start()
+    ).order_by(Event.timestamp.desc()).limit(limit)
+
+def viewed_posts_query(user_id: int):
+    """
+    用户浏览/点击过的帖子ID
+    索引: idx_events_user_type_time (user_id, event_type, timestamp, post_id)
+    """
+    return select(Event.post_id).filter(
+        Event.user_id == user_id,
+        Event.event_type.in_(VIEW_EVENT_TYPES),
+        Event.timestamp >= lookback_start()
+    )
+
+def similar_users_query(post_ids: Iterable[int], exclude_user_id: int):
+    """
+    点赞/收藏过指定帖子的其他用户
+    索引: idx_events_post_type_time_user (post_id, event_type, timestamp, user_id)
+    """
+    return select(Event.user_id).filter(
+        Event.post_id.in_(list(post_ids)),
+        Event.user_id != exclude_user_id,
+        Event.event_type.in_(INTERACTION_EVENT_TYPES),
+        Event.timestamp >= lookback_start()
+    ).distinct()
+
+def users_interactions_query(user_ids: Iterable[int]):
+    """
+    一组用户点赞/收藏过的帖子ID（每个事件一行，用于计数）
+    索引: idx_events_user_type_time (user_id, event_type, timestamp, post_id)
+    """
+    return select(Event.post_id).filter(
+        Event.user_id.in_(list(user_ids)),
+        Event.event_type.in_(INTERACTION_EVENT_TYPES),
+        Event.timestamp >= lookback_start()
+    )
+
+def user_events_query(user_id: int, limit: int, event_type: Optional[str] = None):
+    """
+    用户最近的行为，返回完整事件
+    索引: idx_events_user_time (user_id, timestamp)，按事件类型过滤时使用 idx_events_user_type_time
+    """
+    query = select(Event).filter(Event.user_id == user_id)
+    if event_type:
+        query = query.filter(Event.event_type == event_type)
+    return query.order_by(Event.timestamp.desc()).limit(limit)
+
+def post_events_query(post_id: int, limit: int):
+    """
+    帖子最近的行为，返回完整事件
+    索引: idx_events_post_time (post_id, timestamp)
+    """
+    return select(Event).filter(Event.post_id == post_id).order_by(Event.timestamp.desc()).limit(limit)
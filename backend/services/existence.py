@@ -0,0 +1,160 @@
+from typing import Dict, Iterable, Optional, Callable, Set
+import logging
+import os
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.models import User, Post
+from services.invalidation import post_invalidation_bus, user_invalidation_bus, DELETED
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 全量刷新间隔（秒），用于纠正变更广播丢失导致的过期
+EXISTENCE_REFRESH_INTERVAL = int(os.getenv("EXISTENCE_REFRESH_INTERVAL", "300"))
+
+class ExistenceService:
+    """
+    用户/帖子存在性检查服务
+    内存中维护用户ID和帖子ID集合，写入路径在提交后同步更新，后台线程定期全量刷新；
+    删除通过变更广播同步到所有进程的集合，广播丢失时由全量刷新纠正；
+    集合命中时不访问数据库，未命中时回退到数据库查询（可能是其他进程刚创建的数据），查到后补入集合
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 refresh_interval: int = EXISTENCE_REFRESH_INTERVAL):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._ids: Dict[type, Set[int]] = {User: set(), Post: set()}
+        # 刷新期间删除的ID，刷新完成时从新集合中剔除
+        self._removed_during_refresh: Dict[type, Set[int]] = {User: set(), Post: set()}
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台刷新线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="existence-refresher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台刷新线程
+        """
+        self._stop_event.set()
+
+    def refresh(self):
+        """
+        从数据库全量加载用户ID和帖子ID并整体替换
+        """
+        with self._lock:
+            self._refreshing = True
+        try:
+            db = self.session_factory()
+            try:
+                loaded = {model: self._load_ids(db, model) for model in self._ids}
+            finally:
+                db.close()
+            with self._lock:
+                for model, ids in loaded.items():
+                    self._ids[model] = ids - self._removed_during_refresh[model]
+                logger.debug("存在性检查: 已刷新 用户[%d] 帖子[%d]", len(self._ids[User]), len(self._ids[Post]))
+        finally:
+            with self._lock:
+                self._refreshing = False
+                for removed in self._removed_during_refresh.values():
+                    removed.clear()
+
+    def user_exists(self, db: Session, user_id: int) -> bool:
+        return int(user_id) in self.existing_ids(db, User, [user_id])
+
+    def post_exists(self, db: Session, post_id: int) -> bool:
+        return int(post_id) in self.existing_ids(db, Post, [post_id])
+
+    def existing_ids(self, db: Session, model: type, ids: Iterable[int]) -> Set[int]:
+        """
+        返回ids中存在的ID，未命中的ID批量回退到数据库查询
+        """
+        known, missing = self._split(model, ids)
+        if missing:
+            pk = self._primary_key(model)
+            found = {row[0] for row in db.query(pk).filter(pk.in_(missing)).all()}
+            self._add(model, found)
+            known |= found
+        return known
+
+    async def async_user_exists(self, db, user_id: int) -> bool:
+        return int(user_id) in await self.async_existing_ids(db, User, [user_id])
+
+    async def async_post_exists(self, db, post_id: int) -> bool:
+        return int(post_id) in await self.async_existing_ids(db, Post, [post_id])
+
+    async def async_existing_ids(self, db, model: type, ids: Iterable[int]) -> Set[int]:
+        """
+        existing_ids的异步版本，使用AsyncSession回退查询
+        """
+        known, missing = self._split(model, ids)
+        if missing:
+            pk = self._primary_key(model)
+            result = await db.execute(select(pk).filter(pk.in_(missing)))
+            found = set(result.scalars().all())
+            self._add(model, found)
+            known |= found
+        return known
+
+    def add_user(self, user_id: int):
+        self._add(User, [int(user_id)])
+
+    def add_post(self, post_id: int):
+        self._add(Post, [int(post_id)])
+
+    def remove_user(self, user_id: int):
+        self._remove(User, int(user_id))
+
+    def remove_post(self, post_id: int):
+        self._remove(Post, int(post_id))
+
+    def _split(self, model: type, ids: Iterable[int]):
+        ids = {int(i) for i in ids}
+        with self._lock:
+            known = ids & self._ids[model]
+        return known, ids - known
+
+    def _add(self, model: type, ids: Iterable[int]):
+        with self._lock:
+            self._ids[model].update(ids)
+
+    def _remove(self, model: type, id_value: int):
+        with self._lock:
+            self._ids[model].discard(id_value)
+            if self._refreshing:
+                self._removed_during_refresh[model].add(id_value)
+
+    def _primary_key(self, model: type):
+        return User.user_id if model is User else Post.post_id
+
+    def _load_ids(self, db: Session, model: type) -> Set[int]:
+        return {row[0] for row in db.query(self._primary_key(model)).yield_per(10000)}
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("存在性检查: 刷新ID集合失败: %s", e)
+            self._stop_event.wait(self.refresh_interval)
+
+# 全局存在性检查服务实例
+existence_service = ExistenceService()
+post_invalidation_bus.subscribe(existence_service.remove_post, events=(DELETED,))
+user_invalidation_bus.subscribe(existence_service.remove_user, events=(DELETED,))
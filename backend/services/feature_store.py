@@ -0,0 +1,257 @@
+from typing import Dict, Iterable, List, Optional, Callable, Sequence
+from collections import defaultdict
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import redis_client
+from database import SessionLocal, AsyncSessionLocal
+from models.models import Feature
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每种实体在进程内缓存的实体数量上限，超过后循环覆盖最早写入的行
+FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "100000"))
+# 进程内缓存的过期时间（秒），特征由批量任务定期刷新
+FEATURE_CACHE_TTL = int(os.getenv("FEATURE_CACHE_TTL", "300"))
+
+def _parse_values(values: Dict) -> Dict[str, float]:
+    """
+    只保留数值特征，非数值（如字符串、列表）无法放入列式缓存，忽略
+    """
+    parsed = {}
+    for name, value in (values or {}).items():
+        if isinstance(value, bool):
+            value = float(value)
+        try:
+            parsed[str(name)] = float(value)
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+class FeatureBlock:
+    """
+    一次多取的结果，列式存储：values的行与ids对齐，列与names对齐，缺失的特征为NaN
+    """
+    __slots__ = ("ids", "names", "values", "_rows", "_cols")
+
+    def __init__(self, ids: Sequence[int], names: Sequence[str], values: np.ndarray):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.values = values
+        self._rows = {entity_id: row for row, entity_id in enumerate(self.ids)}
+        self._cols = {name: col for col, name in enumerate(self.names)}
+
+    def column(self, name: str, default: float = np.nan) -> np.ndarray:
+        """
+        某个特征在所有实体上的取值，缺失值以default填充
+        """
+        col = self._cols.get(name)
+        if col is None:
+            return np.full(len(self.ids), default)
+        column = self.values[:, col]
+        return column if np.isnan(default) else np.where(np.isnan(column), default, column)
+
+    def get(self, entity_id: int, name: str, default: Optional[float] = None) -> Optional[float]:
+        row, col = self._rows.get(entity_id), self._cols.get(name)
+        if row is None or col is None or np.isnan(self.values[row, col]):
+            return default
+        return float(self.values[row, col])
+
+class FeatureTable:
+    """
+    单个实体类型的进程内列式缓存
+    data的每行是一个实体的全部特征，每列是一个特征名，出现新特征名时扩展列；
+    行按写入顺序循环复用，复用时淘汰原来的实体
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.full((capacity, 0), np.nan)
+        self.row_ids = np.full(capacity, -1, dtype=np.int64)
+        self.loaded_at = np.zeros(capacity)
+        self.index: Dict[int, int] = {}
+        self.columns: Dict[str, int] = {}
+        self._next_row = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, ids: List[int], names: List[str], ttl: float):
+        """
+        返回(values, missing)：values为len(ids) x len(names)的矩阵，未命中或已过期的实体ID在missing中
+        """
+        now = time.monotonic()
+        with self._lock:
+            rows = np.array([self.index.get(entity_id, -1) for entity_id in ids], dtype=np.int64)
+            hit = rows >= 0
+            hit[hit] &= (now - self.loaded_at[rows[hit]]) <= ttl
+            cols = [self.columns.get(name, -1) for name in names]
+            values = np.full((len(ids), len(names)), np.nan)
+            known = [i for i, col in enumerate(cols) if col >= 0]
+            if known and hit.any():
+                values[np.ix_(np.flatnonzero(hit), known)] = self.data[np.ix_(rows[hit], [cols[i] for i in known])]
+        missing = [entity_id for entity_id, ok in zip(ids, hit) if not ok]
+        return values, missing
+
+    def store(self, features: Dict[int, Dict[str, float]]):
+        """
+        写入实体的全部特征，没有任何特征的实体也会写入一行空值，避免重复回源
+        """
+        now = time.monotonic()
+        with self._lock:
+            new_names = {name for values in features.values() for name in values if name not in self.columns}
+            if new_names:
+                for name in sorted(new_names):
+                    self.columns[name] = len(self.columns)
+                self.data = np.hstack([self.data, np.full((self.capacity, len(new_names)), np.nan)])
+            for entity_id, values in features.items():
+                row = self.index.get(entity_id)
+                if row is None:
+                    row = self._next_row
+                    self._next_row = (self._next_row + 1) % self.capacity
+                    if self.row_ids[row] >= 0:
+                        self.index.pop(int(self.row_ids[row]), None)
+                    self.row_ids[row] = entity_id
+                    self.index[entity_id] = row
+                self.data[row, :] = np.nan
+                for name, value in values.items():
+                    self.data[row, self.columns[name]] = value
+                self.loaded_at[row] = now
+
+    def invalidate(self, ids: Iterable[int]):
+        with self._lock:
+            for entity_id in ids:
+                row = self.index.get(int(entity_id))
+                if row is not None:
+                    self.loaded_at[row] = -np.inf
+
+class FeatureStore:
+    """
+    在线特征存储
+    features表是特征的持久化存储，每行为一个实体的一组特征（feature_type为组名，feature_value为 {特征名: 值}）；
+    Redis中每个实体一个哈希 feature:{实体类型}:{实体ID}，合并了该实体所有组的特征；
+    读取顺序为 进程内列式缓存 -> Redis（一次pipeline） -> features表（一次IN查询）
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, async_session_factory=AsyncSessionLocal,
+                 capacity: int = FEATURE_CACHE_SIZE, ttl: int = FEATURE_CACHE_TTL):
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.capacity = capacity
+        self.ttl = ttl
+        self._tables: Dict[str, FeatureTable] = {}
+        self._lock = threading.Lock()
+
+    def get_features(self, entity_type: str, ids: Iterable[int], names: Sequence[str]) -> FeatureBlock:
+        """
+        批量获取一组实体的指定特征
+        """
+        ids, names = [int(entity_id) for entity_id in ids], list(names)
+        table = self._table(entity_type)
+        values, missing = table.lookup(ids, names, self.ttl)
+        if missing:
+            loaded = self._from_redis(entity_type, missing)
+            unresolved = [entity_id for entity_id in missing if entity_id not in loaded]
+            if unresolved:
+                loaded.update(self._from_db(entity_type, unresolved))
+            self._fill(table, loaded, missing, ids, names, values)
+        return FeatureBlock(ids, names, values)
+
+    async def async_get_features(self, entity_type: str, ids: Iterable[int], names: Sequence[str]) -> FeatureBlock:
+        """
+        get_features的异步版本
+        """
+        ids, names = [int(entity_id) for entity_id in ids], list(names)
+        table = self._table(entity_type)
+        values, missing = table.lookup(ids, names, self.ttl)
+        if missing:
+            loaded = await self._async_from_redis(entity_type, missing)
+            unresolved = [entity_id for entity_id in missing if entity_id not in loaded]
+            if unresolved:
+                loaded.update(await self._async_from_db(entity_type, unresolved))
+            self._fill(table, loaded, missing, ids, names, values)
+        return FeatureBlock(ids, names, values)
+
+    def invalidate(self, entity_type: str, ids: Iterable[int]):
+        self._table(entity_type).invalidate(ids)
+
+    def clear(self):
+        with self._lock:
+            self._tables = {}
+
+    def _table(self, entity_type: str) -> FeatureTable:
+        table = self._tables.get(entity_type)
+        if table is None:
+            with self._lock:
+                table = self._tables.setdefault(entity_type, FeatureTable(self.capacity))
+        return table
+
+    def _fill(self, table: FeatureTable, loaded: Dict[int, Dict[str, float]], missing: List[int],
+              ids: List[int], names: List[str], values: np.ndarray):
+        """
+        缓存回源结果（包括没有任何特征的实体），并填入结果矩阵
+        """
+        resolved = {entity_id: loaded.get(entity_id, {}) for entity_id in missing}
+        table.store(resolved)
+        for row, entity_id in enumerate(ids):
+            features = resolved.get(entity_id)
+            if features is not None:
+                values[row] = [features.get(name, np.nan) for name in names]
+
+    def _from_redis(self, entity_type: str, ids: List[int]) -> Dict[int, Dict[str, float]]:
+        try:
+            hashes = redis_client.get_feature_hashes(entity_type, ids)
+        except Exception as e:
+            logger.error("特征存储: 读取Redis特征失败，回退到数据库: %s", e)
+            return {}
+        return {entity_id: _parse_values(values) for entity_id, values in zip(ids, hashes) if values}
+
+    async def _async_from_redis(self, entity_type: str, ids: List[int]) -> Dict[int, Dict[str, float]]:
+        try:
+            hashes = await redis_client.async_get_feature_hashes(entity_type, ids)
+        except Exception as e:
+            logger.error("特征存储: 读取Redis特征失败，回退到数据库: %s", e)
+            return {}
+        return {entity_id: _parse_values(values) for entity_id, values in zip(ids, hashes) if values}
+
+    @staticmethod
+    def _features_query(entity_type: str, ids: List[int]):
+        return select(Feature.entity_id, Feature.feature_value).filter(
+            Feature.entity_type == entity_type,
+            Feature.entity_id.in_(ids)
+        )
+
+    @staticmethod
+    def _merge_rows(rows) -> Dict[int, Dict[str, float]]:
+        merged: Dict[int, Dict[str, float]] = defaultdict(dict)
+        for entity_id, feature_value in rows:
+            if isinstance(feature_value, dict):
+                merged[int(entity_id)].update(_parse_values(feature_value))
+        return merged
+
+    def _from_db(self, entity_type: str, ids: List[int]) -> Dict[int, Dict[str, float]]:
+        db = self.session_factory()
+        try:
+            return self._merge_rows(db.execute(self._features_query(entity_type, ids)).all())
+        except Exception as e:
+            logger.error("特征存储: 读取数据库特征失败: %s", e)
+            return {}
+        finally:
+            db.close()
+
+    async def _async_from_db(self, entity_type: str, ids: List[int]) -> Dict[int, Dict[str, float]]:
+        try:
+            async with self.async_session_factory() as db:
+                result = await db.execute(self._features_query(entity_type, ids))
+                return self._merge_rows(result.all())
+        except Exception as e:
+            logger.error("特征存储: 读取数据库特征失败: %s", e)
+            return {}
+
+# 全局特征存储
+feature_store = FeatureStore()
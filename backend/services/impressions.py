@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Callable, Tuple
+from collections import deque
+from datetime import datetime
+import logging
+import os
+import threading
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.models import Impression, Post
+from metrics import registry
+from utils.snowflake import id_generator
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 缓冲区最多保留的推荐响应数，写入跟不上时丢弃新的曝光而不是占用更多内存
+IMPRESSION_BUFFER_SIZE = int(os.getenv("IMPRESSION_BUFFER_SIZE", "50000"))
+# 缓冲区写入数据库的间隔（秒）
+IMPRESSION_FLUSH_INTERVAL = float(os.getenv("IMPRESSION_FLUSH_INTERVAL", "1"))
+# 每条INSERT语句写入的行数
+IMPRESSION_BATCH_SIZE = 2000
+
+IMPRESSION_ROWS = registry.counter("impression_log_rows_total", "曝光日志行数（written: 已写入, dropped: 缓冲区已满或写入失败而丢弃）")
+
+# (请求ID, 用户ID, 响应时间, 分页偏移, 推荐耗时毫秒, ((帖子ID, 分数, 召回源), ...))
+ImpressionPage = Tuple[int, int, datetime, int, float, Tuple[Tuple[int, float, Optional[str]], ...]]
+
+class ImpressionLog:
+    """
+    推荐曝光日志
+    推荐接口返回结果后将整页曝光追加到内存缓冲区（deque的append/popleft在GIL下是原子的，请求路径不加锁、不访问数据库），
+    后台线程定期取出缓冲区中的曝光，展开为每个帖子一行，批量插入只追加的impressions表，再由ETL同步到数据仓库。
+    写入失败的批次直接丢弃并计数，不在内存中重试
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, capacity: int = IMPRESSION_BUFFER_SIZE,
+                 flush_interval: float = IMPRESSION_FLUSH_INTERVAL, batch_size: int = IMPRESSION_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pages: deque = deque()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台写入线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="impression-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台写入线程，并写入缓冲区中剩余的曝光
+        """
+        self._stop_event.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("曝光日志: 写入剩余曝光失败: %s", e)
+
+    def record(self, user_id: int, scored_posts: List[Tuple[Post, float]], sources: Dict[int, str],
+               offset: int = 0, latency_ms: float = 0.0) -> Optional[int]:
+        """
+        记录一次推荐响应，scored_posts为本页按顺序排列的 [(帖子, 排序分数)]，sources为帖子ID -> 召回源
+        返回请求ID，本页为空或缓冲区已满时返回None
+        """
+        if not scored_posts:
+            return None
+        if len(self._pages) >= self.capacity:
+            IMPRESSION_ROWS.inc(len(scored_posts), result="dropped")
+            return None
+        items = tuple((post.post_id, float(score), sources.get(post.post_id)) for post, score in scored_posts)
+        request_id = id_generator.next_id()
+        self._pages.append((request_id, int(user_id), datetime.utcnow(), offset, latency_ms, items))
+        return request_id
+
+    def pending(self) -> int:
+        return len(self._pages)
+
+    def flush(self) -> int:
+        """
+        写入缓冲区中的曝光，返回写入的行数
+        只取出开始时已在缓冲区中的曝光，之后追加的留到下一次，避免高负载时一直无法返回
+        """
+        written, rows = 0, []
+        for _ in range(len(self._pages)):
+            try:
+                page = self._pages.popleft()
+            except IndexError:
+                break
+            rows.extend(self._rows(page))
+            if len(rows) >= self.batch_size:
+                written += self._write(rows)
+                rows = []
+        if rows:
+            written += self._write(rows)
+        return written
+
+    @staticmethod
+    def _rows(page: ImpressionPage) -> List[Dict]:
+        request_id, user_id, served_at, offset, latency_ms, items = page
+        return [{
+            "request_id": request_id,
+            "position": offset + i,
+            "user_id": user_id,
+            "post_id": post_id,
+            "score": score,
+            "source": source,
+            "latency_ms": latency_ms,
+            "served_at": served_at,
+        } for i, (post_id, score, source) in enumerate(items)]
+
+    def _write(self, rows: List[Dict]) -> int:
+        db = self.session_factory()
+        try:
+            db.execute(insert(Impression), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("曝光日志: 批量写入%d行失败: %s", len(rows), e)
+            IMPRESSION_ROWS.inc(len(rows), result="dropped")
+            return 0
+        finally:
+            db.close()
+        IMPRESSION_ROWS.inc(len(rows), result="written")
+        return len(rows)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("曝光日志: 写入曝光失败: %s", e)
+
+# 全局曝光日志
+impression_log = ImpressionLog()
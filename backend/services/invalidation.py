@@ -0,0 +1,108 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+import threading
+
+import redis_client
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 变更广播的Redis频道，消息格式为"{事件}:{ID}"
+POST_INVALIDATION_CHANNEL = "posts:invalidated"
+USER_INVALIDATION_CHANNEL = "users:invalidated"
+# 变更事件
+UPDATED = "updated"
+DELETED = "deleted"
+EVENTS = (UPDATED, DELETED)
+
+# 订阅连接断开后重连的等待时间（秒）
+RESUBSCRIBE_DELAY = 1.0
+
+class InvalidationBus:
+    """
+    实体（帖子、用户）变更广播，每个实体类型一个频道
+    更新或删除时先在本进程内执行失效回调，再通过Redis发布订阅通知其他进程；
+    后台线程订阅频道，收到消息后执行同样的回调（回调需要幂等，本进程也会收到自己发布的消息）。
+    发布订阅不保证送达，订阅断开期间的消息会丢失，各缓存仍需保留TTL兜底
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._handlers: Dict[str, List[Callable[[int], None]]] = {event: [] for event in EVENTS}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, handler: Callable[[int], None], events: Tuple[str, ...] = EVENTS):
+        """
+        注册失效回调，参数为实体ID
+        """
+        for event in events:
+            self._handlers[event].append(handler)
+
+    def publish(self, entity_id: int, event: str):
+        """
+        广播变更，Redis不可用时只在本进程内失效
+        """
+        self._dispatch(int(entity_id), event)
+        try:
+            redis_client.redis_client.publish(self.channel, f"{event}:{int(entity_id)}")
+        except Exception as e:
+            logger.error("变更广播: 发布[%s] %s:%s失败: %s", self.channel, event, entity_id, e)
+
+    def start(self):
+        """
+        启动后台订阅线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._listen_loop, name=f"{self.channel}-listener")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台订阅线程
+        """
+        self._stop_event.set()
+
+    def handle_message(self, data: str):
+        """
+        处理频道消息，格式错误的消息被忽略
+        """
+        event, _, entity_id = data.partition(":")
+        if event not in self._handlers or not entity_id.isdigit():
+            logger.warning("变更广播: [%s]忽略无效消息[%s]", self.channel, data)
+            return
+        self._dispatch(int(entity_id), event)
+
+    def _dispatch(self, entity_id: int, event: str):
+        for handler in self._handlers[event]:
+            try:
+                handler(entity_id)
+            except Exception as e:
+                logger.error("变更广播: [%s]处理%s:%s失败: %s", self.channel, event, entity_id, e)
+
+    def _listen_loop(self):
+        while not self._stop_event.is_set():
+            pubsub = None
+            try:
+                pubsub = redis_client.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while not self._stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self.handle_message(message["data"])
+            except Exception as e:
+                logger.error("变更广播: [%s]订阅中断: %s", self.channel, e)
+                self._stop_event.wait(RESUBSCRIBE_DELAY)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+# 全局帖子、用户变更广播
+post_invalidation_bus = InvalidationBus(POST_INVALIDATION_CHANNEL)
+user_invalidation_bus = InvalidationBus(USER_INVALIDATION_CHANNEL)
@@ -0,0 +1,121 @@
+"""
+模型注册表
+
+每种模型类型一个目录，目录内是services/snapshot.py格式的版本目录：
+    MODEL_REGISTRY_DIR/
+        als/
+            CURRENT                 当前上线的版本，训练发布或手动激活（回滚）时原子替换
+            20240101T000000Z/
+                manifest.json       model_type、训练参数、离线指标，以及各文件的大小和SHA-256
+                *.npy
+
+每个worker为每种模型类型维护一个SnapshotStore：后台校验、加载、预热新版本后再切换引用，
+推荐请求读取到的始终是完整可用的版本，上线和回滚不需要重启进程。
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import os
+
+from services.snapshot import SnapshotStore, MANIFEST_FILE, read_manifest, verify_checksums, write_current
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 模型产物根目录
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "/data/models")
+# 检查新版本模型的间隔（秒）
+MODEL_RELOAD_INTERVAL = int(os.getenv("MODEL_RELOAD_INTERVAL", "60"))
+
+class ModelRegistry:
+    """
+    模型注册表，管理各模型类型的版本目录和本进程中已加载的版本
+    """
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR, reload_interval: int = MODEL_RELOAD_INTERVAL):
+        self.root = root
+        self.reload_interval = reload_interval
+        self._stores: Dict[str, SnapshotStore] = {}
+
+    def path(self, model_type: str) -> str:
+        return os.path.join(self.root, model_type)
+
+    def register(self, model_type: str, loader: Callable[[str], Any]) -> SnapshotStore:
+        """
+        注册模型类型及其加载函数（版本目录 -> 模型对象），返回该类型的加载器
+        """
+        store = self._stores.get(model_type)
+        if store is None:
+            store = SnapshotStore(self.path(model_type), self.reload_interval, loader=loader, name=model_type)
+            self._stores[model_type] = store
+        return store
+
+    def model(self, model_type: str) -> Optional[Any]:
+        """
+        本进程当前使用的模型对象，尚未加载时返回None
+        """
+        store = self._stores.get(model_type)
+        return store.snapshot if store is not None else None
+
+    def start(self):
+        for store in self._stores.values():
+            store.start()
+
+    def stop(self):
+        for store in self._stores.values():
+            store.stop()
+
+    def versions(self, model_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        已发布的模型版本，按模型类型、版本号降序
+        CURRENT指向的版本状态为active，loaded表示本进程是否正在使用该版本
+        """
+        model_types = [model_type] if model_type else sorted(self._stores)
+        versions = []
+        for name in model_types:
+            store = self._stores.get(name)
+            if store is None:
+                continue
+            current = store.current_version()
+            loaded = store.status()["version"]
+            try:
+                names = sorted((version for version in os.listdir(store.root) if not version.startswith(".")), reverse=True)
+            except FileNotFoundError:
+                continue
+            for version in names:
+                try:
+                    manifest = read_manifest(os.path.join(store.root, version))
+                except (FileNotFoundError, NotADirectoryError, ValueError):
+                    continue
+                versions.append({
+                    "model_id": f"{name}_{version}",
+                    "model_type": name,
+                    "version": version,
+                    "created_at": manifest.get("created_at"),
+                    "params": manifest.get("params"),
+                    "metrics": manifest.get("metrics"),
+                    "checksums": {file: meta.get("sha256") for file, meta in manifest.get("files", {}).items()},
+                    "status": "active" if version == current else "inactive",
+                    "loaded": version == loaded
+                })
+        return versions
+
+    def activate(self, model_type: str, version: str) -> Dict[str, Any]:
+        """
+        将模型类型的CURRENT指向已发布的version（用于回滚或重新上线），并在本进程中立即加载
+        其他worker在下一次检查时切换；模型类型或版本不存在时抛出KeyError，校验和不一致时抛出ValueError
+        """
+        store = self._stores.get(model_type)
+        if store is None:
+            raise KeyError(f"未注册的模型类型: {model_type}")
+        path = os.path.join(store.root, version)
+        if version != os.path.basename(version) or version.startswith(".") or not os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            raise KeyError(f"模型版本不存在: {model_type}/{version}")
+        verify_checksums(path)
+        write_current(store.root, version)
+        logger.info("模型注册表: [%s]已激活版本[%s]", model_type, version)
+        store.reload()
+        return store.status()
+
+# 全局模型注册表
+model_registry = ModelRegistry()
@@ -0,0 +1,113 @@
+from typing import Dict, Any, Optional, Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from datetime import datetime
+import copy
+import logging
+import multiprocessing
+import os
+import threading
+
+from logging_config import setup_logging
+from services.als import run_training
+from utils.snowflake import id_generator
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 同时执行的训练任务数，每个任务在独立进程中运行，BLAS在进程内再使用多线程
+MODEL_TRAINING_WORKERS = int(os.getenv("MODEL_TRAINING_WORKERS", "1"))
+# 内存中保留的任务记录数量，超过后淘汰最早完成的任务
+MODEL_TASK_HISTORY = 100
+
+# 支持的模型类型 -> 训练入口，入口函数接收params并返回{"version": ..., "metrics": {...}}
+TRAINING_JOBS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "als": run_training,
+}
+
+def _init_worker():
+    # 子进程不继承父进程的日志队列监听线程，重新配置日志
+    setup_logging()
+
+class ModelTrainingService:
+    """
+    模型训练任务服务
+    训练提交到进程池执行，不占用API进程的GIL；任务状态 pending -> training -> completed/failed 保存在内存中，
+    进程池在第一次提交时创建。
+    子进程用spawn方式启动：API进程中有多个后台线程，fork出的子进程可能继承其他线程持有的锁而死锁
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, jobs: Optional[Dict[str, Callable]] = None,
+                 max_workers: int = MODEL_TRAINING_WORKERS):
+        self._executor = executor
+        self.jobs = jobs if jobs is not None else TRAINING_JOBS
+        self.max_workers = max_workers
+        self._tasks: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker)
+        return self._executor
+
+    def submit(self, model_type: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        提交训练任务，返回任务记录；不支持的模型类型抛出ValueError
+        """
+        job = self.jobs.get(model_type)
+        if job is None:
+            raise ValueError(f"不支持的模型类型: {model_type}，可选: {sorted(self.jobs)}")
+        now = datetime.utcnow()
+        task = {
+            "task_id": id_generator.next_id(),
+            "model_type": model_type,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now,
+            "params": params or {},
+        }
+        with self._lock:
+            self._tasks[task["task_id"]] = task
+            self._trim()
+        future = self.executor.submit(job, task["params"])
+        self._update(task["task_id"], status="training")
+        future.add_done_callback(lambda f, task_id=task["task_id"]: self._finish(task_id, f))
+        logger.info("模型训练: 已提交任务[%s] 模型[%s]", task["task_id"], model_type)
+        return self.get(task["task_id"])
+
+    def get(self, task_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return copy.deepcopy(task) if task is not None else None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _finish(self, task_id: int, future: Future):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error("模型训练: 任务[%s]失败: %s", task_id, e)
+            self._update(task_id, status="failed", error=str(e))
+            return
+        self._update(task_id, status="completed", version=result.get("version"), metrics=result.get("metrics"))
+        logger.info("模型训练: 任务[%s]完成 版本[%s]", task_id, result.get("version"))
+
+    def _update(self, task_id: int, **fields):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            # 训练很快结束时，完成回调可能先于"training"状态写入
+            if task is None or (fields.get("status") == "training" and task["status"] != "pending"):
+                return
+            task.update(fields, updated_at=datetime.utcnow())
+
+    def _trim(self):
+        finished = [task_id for task_id, task in self._tasks.items() if task["status"] in ("completed", "failed")]
+        for task_id in finished[:max(0, len(self._tasks) - MODEL_TASK_HISTORY)]:
+            del self._tasks[task_id]
+
+# 全局模型训练服务
+model_training_service = ModelTrainingService()
@@ -0,0 +1,96 @@
+from typing import Iterable
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+
+from utils.json_utils import dumps
+from services.invalidation import post_invalidation_bus
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 缓存的帖子片段数量上限，超过后按LRU淘汰
+POST_FRAGMENT_CACHE_SIZE = int(os.getenv("POST_FRAGMENT_CACHE_SIZE", "50000"))
+# 片段过期时间（秒），限制变更广播丢失时造成的不一致
+POST_FRAGMENT_TTL = int(os.getenv("POST_FRAGMENT_TTL", "600"))
+
+# 帖子中创建后只会由更新接口修改的字段，顺序与schemas.PostResponse一致
+FRAGMENT_FIELDS = ("title", "content", "tags", "post_id", "author_id", "create_time")
+
+class PostFragmentCache:
+    """
+    帖子JSON片段缓存
+    缓存帖子不可变字段预编码后的JSON字节串（不含首尾花括号），列表接口直接拼接片段，
+    只重新编码浏览/点赞/收藏计数，跳过逐条的Pydantic校验和编码；
+    帖子更新或删除时通过变更广播在所有进程中失效，TTL兜底广播丢失的情况
+    """
+
+    def __init__(self, capacity: int = POST_FRAGMENT_CACHE_SIZE, ttl: int = POST_FRAGMENT_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._fragments: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fragment(self, post) -> bytes:
+        """
+        获取帖子不可变字段的JSON片段，未命中时编码并缓存
+        """
+        post_id = int(post.post_id)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._fragments.get(post_id)
+            if cached is not None and now - cached[1] <= self.ttl:
+                self._fragments.move_to_end(post_id)
+                return cached[0]
+
+        encoded = dumps({field: getattr(post, field) for field in FRAGMENT_FIELDS})[1:-1]
+        with self._lock:
+            self._fragments[post_id] = (encoded, now)
+            self._fragments.move_to_end(post_id)
+            while len(self._fragments) > self.capacity:
+                self._fragments.popitem(last=False)
+        return encoded
+
+    def encode_post(self, post) -> bytes:
+        """
+        拼接完整的帖子JSON，计数字段每次重新编码
+        """
+        return b"{%s,\"view_count\":%d,\"like_count\":%d,\"favorite_count\":%d}" % (
+            self.fragment(post),
+            post.view_count or 0,
+            post.like_count or 0,
+            post.favorite_count or 0
+        )
+
+    def encode_posts(self, posts: Iterable) -> bytes:
+        """
+        编码帖子列表，与List[schemas.PostResponse]的输出一致
+        """
+        return b"[" + b",".join(self.encode_post(post) for post in posts) + b"]"
+
+    def encode_recommendations(self, recommendations: dict) -> bytes:
+        """
+        编码推荐结果，与schemas.RecommendationResponse的输出一致
+        """
+        return b"{\"items\":%s,\"has_more\":%s,\"total\":%d}" % (
+            self.encode_posts(recommendations["items"]),
+            b"true" if recommendations["has_more"] else b"false",
+            recommendations["total"]
+        )
+
+    def invalidate(self, post_id: int):
+        """
+        帖子更新或删除后使片段失效
+        """
+        with self._lock:
+            self._fragments.pop(int(post_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+# 全局帖子片段缓存
+post_fragment_cache = PostFragmentCache()
+post_invalidation_bus.subscribe(post_fragment_cache.invalidate)
@@ -0,0 +1,139 @@
+from typing import List, Dict, Any, Callable, Awaitable
+from concurrent.futures import ThreadPoolExecutor, wait
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+from metrics import registry
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 单次请求召回阶段的延迟预算（毫秒）
+RECALL_LATENCY_BUDGET_MS = int(os.getenv("RECALL_LATENCY_BUDGET_MS", "200"))
+# 同步召回使用的线程数，每个线程执行时占用一个数据库连接；
+# 默认为同步连接池容量的一半，其余连接留给请求会话，超时的召回源不会耗尽连接池
+RECALL_MAX_WORKERS = int(os.getenv("RECALL_MAX_WORKERS", str(max(1, (DB_POOL_SIZE + DB_MAX_OVERFLOW) // 2))))
+
+RECALL_TIMEOUTS = registry.counter("recommender_recall_timeouts_total", "召回源超出延迟预算的次数")
+RECALL_ERRORS = registry.counter("recommender_recall_errors_total", "召回源执行失败的次数")
+RECALL_CANCELLED = registry.counter("recommender_recall_cancelled_total", "超出延迟预算后在下一次查询前被取消的同步召回源次数")
+
+class RecallCancelled(Exception):
+    """
+    同步召回源超出延迟预算后被取消
+    """
+
+def bind_deadline(session: Session, deadline: float, stage: str = ""):
+    """
+    会话在截止时间（time.monotonic()）之后发起的查询抛出RecallCancelled
+    线程中执行的查询无法中断，超时的召回源在当前查询返回后停止，由调用方关闭会话归还连接
+    """
+    def check(orm_execute_state):
+        if time.monotonic() >= deadline:
+            RECALL_CANCELLED.inc(stage=stage)
+            raise RecallCancelled(stage)
+    event.listen(session, "do_orm_execute", check)
+
+class RecallResult:
+    """
+    一次召回的结果：各召回源返回的帖子列表，以及超时和失败的召回源
+    超时或失败的召回源在results中为空列表
+    """
+
+    def __init__(self, results: Dict[str, List[Any]], timed_out: List[str], failed: List[str], elapsed: float):
+        self.results = results
+        self.timed_out = timed_out
+        self.failed = failed
+        self.elapsed = elapsed
+
+    def get(self, source: str) -> List[Any]:
+        return self.results.get(source, [])
+
+class RecallOrchestrator:
+    """
+    召回编排器，并发执行各召回源，在延迟预算到期时合并已返回的结果
+    超时的召回源不再等待，只记录到指标中，不影响请求的p99
+    """
+
+    def __init__(self, budget_ms: int = RECALL_LATENCY_BUDGET_MS, executor: ThreadPoolExecutor = None):
+        self.budget = budget_ms / 1000
+        self._executor = executor
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # 线程池延迟创建，异步服务不需要
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=RECALL_MAX_WORKERS, thread_name_prefix="recall")
+        return self._executor
+
+    def deadline(self) -> float:
+        """
+        从现在开始计算的召回截止时间（time.monotonic()）
+        """
+        return time.monotonic() + self.budget
+
+    def run(self, sources: Dict[str, Callable[[], List[Any]]]) -> RecallResult:
+        """
+        在线程池中并发执行同步召回源
+        尚未开始的超时任务直接取消；已在执行的任务无法中断，召回源应通过bind_deadline在下一次查询前停止，并自行关闭会话
+        """
+        start = time.perf_counter()
+        futures = {self.executor.submit(fn): name for name, fn in sources.items()}
+        done, pending = wait(futures, timeout=self.budget)
+
+        results = {name: [] for name in sources}
+        failed = []
+        cancelled = []
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except RecallCancelled:
+                cancelled.append(name)
+            except Exception as e:
+                failed.append(name)
+                logger.error("召回系统: 召回源[%s]执行失败: %s", name, e)
+        for future in pending:
+            future.cancel()
+        timed_out = [futures[future] for future in pending] + cancelled
+        return self._finish(results, timed_out, failed, start)
+
+    async def run_async(self, sources: Dict[str, Callable[[], Awaitable[List[Any]]]]) -> RecallResult:
+        """
+        在事件循环中并发执行异步召回源，超时的任务会被取消
+        """
+        start = time.perf_counter()
+        tasks = {asyncio.ensure_future(fn()): name for name, fn in sources.items()}
+        done, pending = await asyncio.wait(tasks, timeout=self.budget)
+
+        results = {name: [] for name in sources}
+        failed = []
+        for task in done:
+            name = tasks[task]
+            try:
+                results[name] = task.result()
+            except Exception as e:
+                failed.append(name)
+                logger.error("召回系统: 召回源[%s]执行失败: %s", name, e)
+        for task in pending:
+            task.cancel()
+        timed_out = [tasks[task] for task in pending]
+        return self._finish(results, timed_out, failed, start)
+
+    def _finish(self, results: Dict[str, List[Any]], timed_out: List[str], failed: List[str], start: float) -> RecallResult:
+        for name in timed_out:
+            RECALL_TIMEOUTS.inc(source=name)
+        for name in failed:
+            RECALL_ERRORS.inc(source=name)
+        if timed_out:
+            logger.info("召回系统: 召回源%s超出延迟预算[%dms]", sorted(timed_out), self.budget * 1000)
+        return RecallResult(results, sorted(timed_out), sorted(failed), time.perf_counter() - start)
+
+# 全局召回编排器
+recall_orchestrator = RecallOrchestrator()
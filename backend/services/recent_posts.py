@@ -0,0 +1,228 @@
+from typing import Dict, Iterable, List, Optional, Callable, Any
+from datetime import datetime, timedelta
+import logging
+import os
+import random
+import threading
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.models import Post
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 环形缓冲区保留的最新帖子数量
+RECENT_POSTS_SIZE = int(os.getenv("RECENT_POSTS_SIZE", "5000"))
+# 全量刷新间隔（秒），用于同步其他进程创建和删除的帖子
+RECENT_POSTS_REFRESH_INTERVAL = int(os.getenv("RECENT_POSTS_REFRESH_INTERVAL", "60"))
+# 优先从最近多少天发布的帖子中采样
+RECENT_POSTS_FRESH_DAYS = int(os.getenv("RECENT_POSTS_FRESH_DAYS", "7"))
+# 每个采样名额最多抽取的位置数，超过后对剩余位置逐个检查
+SAMPLE_OVERDRAW = 4
+
+EPOCH = datetime(1970, 1, 1)
+
+def _seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+def _created_after(filters: Optional[Dict[str, Any]]) -> Optional[float]:
+    value = (filters or {}).get("created_after")
+    if isinstance(value, datetime):
+        return _seconds(value)
+    try:
+        return _seconds(datetime.fromisoformat(str(value))) if value else None
+    except ValueError:
+        return None
+
+class RecentPosts:
+    """
+    最新帖子的环形缓冲区，供随机（探索）召回采样
+    按发布时间从旧到新保存最近RECENT_POSTS_SIZE个帖子的ID、作者和发布时间，写满后覆盖最旧的帖子；
+    本进程创建和删除帖子时同步更新，后台线程定期从数据库按create_time索引重新加载最新的帖子，第一次加载完成前loaded为False，
+    随机召回此时返回空结果而不在请求路径上加载。
+    采样时先用二分查找定位最近RECENT_POSTS_FRESH_DAYS天的区间，在区间内随机抽取位置并跳过已浏览和不满足过滤条件的帖子，
+    耗时与采样数量成正比，与帖子总量无关
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, capacity: int = RECENT_POSTS_SIZE,
+                 refresh_interval: int = RECENT_POSTS_REFRESH_INTERVAL, fresh_days: int = RECENT_POSTS_FRESH_DAYS):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.fresh_days = fresh_days
+        self._post_ids = np.full(capacity, -1, dtype=np.int64)  # -1 表示已删除
+        self._author_ids = np.zeros(capacity, dtype=np.int64)
+        self._times = np.zeros(capacity)
+        self._slots: Dict[int, int] = {}
+        self._start = 0  # 最旧帖子所在的位置
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def start(self):
+        """
+        启动后台刷新线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="recent-posts-refresher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台刷新线程
+        """
+        self._stop_event.set()
+
+    def refresh(self):
+        """
+        从数据库加载最新的capacity个帖子并整体替换
+        """
+        db = self.session_factory()
+        try:
+            rows = db.execute(self._recent_query()).all()
+        finally:
+            db.close()
+        self._replace(rows)
+
+    def add(self, post_id: int, author_id: int, create_time: Optional[datetime] = None):
+        """
+        追加新发布的帖子，缓冲区已满时覆盖最旧的帖子
+        """
+        post_id = int(post_id)
+        with self._lock:
+            if post_id in self._slots:
+                return
+            if self._size < self.capacity:
+                slot = (self._start + self._size) % self.capacity
+                self._size += 1
+            else:
+                slot = self._start
+                self._start = (self._start + 1) % self.capacity
+                self._slots.pop(int(self._post_ids[slot]), None)
+            self._post_ids[slot] = post_id
+            self._author_ids[slot] = int(author_id)
+            self._times[slot] = _seconds(create_time or datetime.utcnow())
+            self._slots[post_id] = slot
+
+    def remove(self, post_id: int):
+        with self._lock:
+            slot = self._slots.pop(int(post_id), None)
+            if slot is not None:
+                self._post_ids[slot] = -1
+
+    def clear(self):
+        with self._lock:
+            self._post_ids[:] = -1
+            self._slots = {}
+            self._start = 0
+            self._size = 0
+            self._loaded = False
+
+    def sample(self, count: int, exclude: Optional[Iterable[int]] = None,
+               filters: Optional[Dict[str, Any]] = None, now: Optional[datetime] = None) -> List[int]:
+        """
+        无放回地随机抽取最多count个帖子ID，优先抽取最近fresh_days天内发布的帖子，不足时再从更早的帖子中补足
+        exclude为需要排除的帖子ID（如已浏览的帖子），filters支持author_id和created_after
+        """
+        exclude = exclude if exclude is not None else set()
+        author_id = (filters or {}).get("author_id")
+        author_id = int(author_id) if author_id is not None else None
+        created_after = _created_after(filters)
+        fresh_after = _seconds((now or datetime.utcnow()) - timedelta(days=self.fresh_days))
+
+        picked: List[int] = []
+        with self._lock:
+            boundary = self._first_after(fresh_after)
+            for lo, hi in ((boundary, self._size), (0, boundary)):
+                if len(picked) >= count:
+                    break
+                self._sample_range(lo, hi, count, exclude, author_id, created_after, picked)
+        return picked
+
+    def _sample_range(self, lo: int, hi: int, count: int, exclude, author_id: Optional[int],
+                      created_after: Optional[float], picked: List[int]):
+        """
+        在逻辑位置[lo, hi)中抽取，先随机抽取有限个位置，仍不足时按随机顺序检查剩余位置
+        """
+        width = hi - lo
+        if width <= 0:
+            return
+        drawn = random.sample(range(lo, hi), min(width, (count - len(picked)) * SAMPLE_OVERDRAW))
+        self._take(drawn, count, exclude, author_id, created_after, picked)
+        if len(picked) < count and len(drawn) < width:
+            seen = set(drawn)
+            rest = [position for position in range(lo, hi) if position not in seen]
+            random.shuffle(rest)
+            self._take(rest, count, exclude, author_id, created_after, picked)
+
+    def _take(self, positions, count: int, exclude, author_id: Optional[int],
+              created_after: Optional[float], picked: List[int]):
+        for position in positions:
+            if len(picked) >= count:
+                return
+            slot = (self._start + position) % self.capacity
+            post_id = int(self._post_ids[slot])
+            if post_id < 0 or post_id in exclude:
+                continue
+            if author_id is not None and self._author_ids[slot] != author_id:
+                continue
+            if created_after is not None and self._times[slot] < created_after:
+                continue
+            picked.append(post_id)
+
+    def _first_after(self, timestamp: float) -> int:
+        """
+        二分查找第一个发布时间不早于timestamp的逻辑位置
+        """
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._times[(self._start + mid) % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _recent_query(self):
+        return select(Post.post_id, Post.author_id, Post.create_time).order_by(
+            Post.create_time.desc()
+        ).limit(self.capacity)
+
+    def _replace(self, rows):
+        rows = sorted(rows, key=lambda row: row[2] or EPOCH)
+        with self._lock:
+            self._post_ids[:] = -1
+            self._slots = {}
+            self._start = 0
+            self._size = len(rows)
+            for slot, (post_id, author_id, create_time) in enumerate(rows):
+                self._post_ids[slot] = post_id
+                self._author_ids[slot] = author_id
+                self._times[slot] = _seconds(create_time or EPOCH)
+                self._slots[int(post_id)] = slot
+            self._loaded = True
+        logger.debug("最新帖子: 已加载 %d 个帖子", len(rows))
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("最新帖子: 刷新失败: %s", e)
+            self._stop_event.wait(self.refresh_interval)
+
+# 全局最新帖子缓冲区
+recent_posts = RecentPosts()
@@ -1,69 +1,206 @@
-from typing import List, Dict, Any, Optional
-import random
+from typing import List, Dict, Any, Optional, Tuple
+from itertools import zip_longest
 import json
 import logging
+import os
+import time
 from sqlalchemy.orm import Session
-from models.models import User, Post, Event, Feature
+from models.models import User, Post, PostTag, Event, Feature
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+from database import SessionLocal
 from redis_client import get_user_viewed_posts
+from metrics import timer, RECOMMENDER_STAGE_LATENCY
+from logging_config import trace_enabled
+from services.recall import RecallOrchestrator, recall_orchestrator, bind_deadline
+from services.user_profile import UserProfile, user_profile_cache
+from services.tag_vocab import post_tag_ids
+from services.event_queries import similar_users_query, users_interactions_query, viewed_posts_query
+from services.feature_store import FeatureBlock, feature_store
+from services.trending import trending_service
+from services.recent_posts import recent_posts
+from services.als import embedding_store
+from services.impressions import impression_log
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 排序使用的帖子特征，一次从特征存储中批量获取
+RANKING_FEATURES = ("ctr",)
+# 点击率在排序总分中的权重
+RANK_CTR_WEIGHT = float(os.getenv("RANK_CTR_WEIGHT", "1.0"))
+# 热度召回除全局榜单外，额外读取用户权重最高的几个兴趣标签的榜单
+TRENDING_RECALL_TAGS = int(os.getenv("TRENDING_RECALL_TAGS", "3"))
+
+def parse_filters(filters: Optional[str]) -> Dict[str, Any]:
+    """
+    解析JSON字符串格式的过滤条件，解析失败时忽略
+    """
+    if not filters:
+        return {}
+    try:
+        filter_dict = json.loads(filters)
+    except json.JSONDecodeError:
+        return {}
+    return filter_dict if isinstance(filter_dict, dict) else {}
+
+def apply_post_filters(query, filters: Optional[Dict[str, Any]]):
+    """
+    对帖子查询应用过滤条件，同时支持ORM Query和2.0风格的select
+    Post没有category字段，按类别过滤的条件会被忽略
+    """
+    if not filters:
+        return query
+    
+    # 按创建时间过滤
+    if 'created_after' in filters:
+        query = query.filter(Post.create_time >= filters['created_after'])
+    
+    # 按作者过滤
+    if 'author_id' in filters:
+        query = query.filter(Post.author_id == filters['author_id'])
+    
+    return query
+
+def merge_recall_results(count: int, tag_posts: List[Post], cf_posts: List[Post], random_posts: List[Post],
+                         trending_posts: Optional[List[Post]] = None, embedding_posts: Optional[List[Post]] = None,
+                         sources: Optional[Dict[int, str]] = None) -> List[Post]:
+    """
+    按优先级合并各召回源的结果并按post_id去重：
+    标签召回最多取count * 2，协同过滤、向量召回和热度召回依次补足到count * 2，随机召回补足到count
+    传入sources时写入每个帖子最终采用的召回源（帖子ID -> 召回源名称）
+    """
+    merged = {}
+    for source, posts, limit in (("tag", tag_posts, count * 2), ("cf", cf_posts, count * 2),
+                                 ("embedding", embedding_posts or [], count * 2),
+                                 ("trending", trending_posts or [], count * 2), ("random", random_posts, count)):
+        for post in posts:
+            if len(merged) >= limit:
+                break
+            if post.post_id not in merged:
+                merged[post.post_id] = post
+                if sources is not None:
+                    sources[post.post_id] = source
+    return list(merged.values())
+
+def trending_candidate_ids(ranked_lists: List[List], viewed_post_ids: set, limit: int) -> List[int]:
+    """
+    按榜单顺序依次交错合并多个热门榜单的帖子ID，去重并排除已浏览的帖子
+    """
+    candidates = {}
+    for entries in zip_longest(*ranked_lists):
+        for entry in entries:
+            if entry is not None and entry[0] not in viewed_post_ids:
+                candidates.setdefault(entry[0], None)
+    return list(candidates)[:limit]
+
+def order_by_ids(posts: List[Post], post_ids: List[int]) -> List[Post]:
+    by_id = {post.post_id: post for post in posts}
+    return [by_id[post_id] for post_id in post_ids if post_id in by_id]
+
+def rank_posts(profile: UserProfile, posts: List[Post], features: Optional[FeatureBlock] = None,
+               trending: Optional[List[float]] = None) -> List[Post]:
+    """
+    对推荐结果进行排序
+    """
+    return [post for post, _ in score_posts(profile, posts, features, trending)]
+
+def score_posts(profile: UserProfile, posts: List[Post], features: Optional[FeatureBlock] = None,
+                trending: Optional[List[float]] = None) -> List[Tuple[Post, float]]:
+    """
+    计算排序分数，返回按分数降序的 [(帖子, 分数)]
+    MVP阶段使用简单的排序规则：
+    1. 根据用户标签匹配度（命中的兴趣标签权重之和）
+    2. 根据帖子热度：优先使用热度服务的衰减计数，trending为None（Redis不可用）时回退到累计的浏览量、点赞量、收藏量
+    3. 根据时间新鲜度
+    4. 根据特征存储中数据仓库计算的点击率（features为None或缺失时不计分）
+    """
+    ctr = features.column("ctr", default=0.0) if features is not None else None
+    
+    # 计算每个帖子的分数
+    post_scores = []
+    for i, post in enumerate(posts):
+        # 标签匹配度分数
+        tag_score = profile.tag_score(post_tag_ids(post))
+        
+        # 热度分数 = 浏览量 * 0.1 + 点赞量 * 0.5 + 收藏量 * 1.0，衰减计数使用相同的权重
+        if trending is not None:
+            popularity_score = trending[i]
+        else:
+            popularity_score = post.view_count * 0.1 + post.like_count * 0.5 + post.favorite_count * 1.0
+        
+        # 时间新鲜度分数，最近发布的帖子分数更高
+        time_diff = (datetime.utcnow() - post.create_time).total_seconds() / 86400  # 转换为天数
+        freshness_score = max(0, 7 - time_diff) / 7  # 最近7天内的帖子，分数从1递减到0
+        
+        # 总分 = 标签匹配度 * 2.0 + 热度 * 1.0 + 新鲜度 * 1.5
+        total_score = tag_score * 2.0 + popularity_score * 1.0 + freshness_score * 1.5
+        if ctr is not None:
+            total_score += float(ctr[i]) * RANK_CTR_WEIGHT
+        
+        post_scores.append((post, total_score))
+    
+    # 按分数降序排序
+    return sorted(post_scores, key=lambda x: x[1], reverse=True)
+
 class RecommenderService:
     """
     推荐引擎服务类，实现基础的推荐算法
     MVP阶段实现简单的基于标签的推荐和协同过滤
+    各召回源在延迟预算内并发执行，Session不是线程安全的，每个召回源使用独立会话
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, session_factory=SessionLocal, orchestrator: RecallOrchestrator = recall_orchestrator):
         self.db = db
+        self.session_factory = session_factory
+        self.orchestrator = orchestrator
     
     def get_recommendations(self, user_id: str, count: int = 10, offset: int = 0, filters: Optional[str] = None) -> Dict[str, Any]:
         """
         获取推荐内容
-        根据用户ID、数量、偏移量和过滤条件获取推荐内容
+        根据用户ID、数量、偏移量和过滤条件获取推荐内容，返回的一页结果记入曝光日志
         """
+        start_time = time.perf_counter()
+        
         # 解析过滤条件
-        filter_dict = {}
-        if filters:
-            try:
-                filter_dict = json.loads(filters)
-                if not isinstance(filter_dict, dict):
-                    filter_dict = {}
-            except json.JSONDecodeError:
-                # 如果JSON解析失败，忽略filters
-                pass
+        filter_dict = parse_filters(filters)
         
         # 添加用户ID到过滤条件，用于随机推荐时过滤已浏览内容
         filter_dict['user_id'] = user_id
                 
-        # 获取用户信息
-        user = self.db.query(User).filter(User.user_id == user_id).first()
+        # 获取用户画像，热点用户直接命中缓存
+        user = user_profile_cache.get(self.db, user_id)
         if not user:
             return {"items": [], "has_more": False, "total": 0}
         
-        # 根据用户标签和偏好进行推荐
-        recommended_posts = self._recommend_by_tags(user, count * 2, filter_dict)  # 获取更多候选，以便后续排序
+        # 已浏览帖子只获取一次，供各召回源共享
+        viewed_post_ids = self._get_viewed_post_ids(user.user_id)
         
-        # 如果基于标签的推荐不足，补充协同过滤推荐
-        if len(recommended_posts) < count * 2:
-            cf_posts = self._recommend_by_collaborative_filtering(user, count * 2 - len(recommended_posts), filter_dict)
-            recommended_posts.extend(cf_posts)
+        # 各召回源并发执行，超出延迟预算的召回源结果为空，并在下一次查询前停止
+        deadline = self.orchestrator.deadline()
+        recall = self.orchestrator.run({
+            "tag": self._isolated("tag_recall", deadline, self._recommend_by_tags, user, count * 2, filter_dict, viewed_post_ids),  # 获取更多候选，以便后续排序
+            "cf": self._isolated("cf_recall", deadline, self._recommend_by_collaborative_filtering, user, count * 2, filter_dict, viewed_post_ids),
+            "embedding": self._isolated("embedding_recall", deadline, self._recommend_by_embedding, user, count * 2, filter_dict, viewed_post_ids),
+            "trending": self._isolated("trending_recall", deadline, self._recommend_trending, user, count * 2, filter_dict, viewed_post_ids),
+            "random": self._isolated("random_recall", deadline, self._recommend_random, count, filter_dict, viewed_post_ids)
+        })
         
-        # 如果推荐仍然不足，补充随机推荐
-        if len(recommended_posts) < count:
-            random_posts = self._recommend_random(count - len(recommended_posts), filter_dict)
-            recommended_posts.extend(random_posts)
+        # 按标签、协同过滤、向量、热度、随机的优先级合并
+        sources: Dict[int, str] = {}
+        recommended_posts = merge_recall_results(count, recall.get("tag"), recall.get("cf"), recall.get("random"),
+                                                 recall.get("trending"), recall.get("embedding"), sources=sources)
         
         # 对推荐结果进行排序
-        ranked_posts = self._rank_posts(user, recommended_posts)
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="rank"):
+            scored_posts = self._score_posts(user, recommended_posts)
         
         # 分页处理
         start = offset
         end = offset + count
-        result_posts = ranked_posts[start:end]
+        page = scored_posts[start:end]
+        result_posts = [post for post, _ in page]
+        impression_log.record(user.user_id, page, sources, offset, (time.perf_counter() - start_time) * 1000)
         
         # 确保所有帖子的tags字段保持原始的JSON格式
         # 数据库中的tags字段是JSON格式，前端期望它是一个对象，包含tags数组
@@ -72,41 +209,45 @@ class RecommenderService:
         # 构建响应
         return {
             "items": result_posts,
-            "has_more": end < len(ranked_posts),
-            "total": len(ranked_posts)
+            "has_more": end < len(scored_posts),
+            "total": len(scored_posts)
         }
     
-    def _recommend_by_tags(self, user: User, count: int, filters: Optional[Dict[str, Any]] = None) -> List[Post]:
+    def _isolated(self, stage: str, deadline: float, method, *args):
+        """
+        包装召回方法，使其在独立会话中执行并记录阶段耗时
+        超过截止时间后会话上的下一次查询抛出RecallCancelled，会话随即关闭归还连接
+        """
+        def call():
+            db = self.session_factory()
+            bind_deadline(db, deadline, stage)
+            try:
+                with timer(RECOMMENDER_STAGE_LATENCY, stage=stage):
+                    return method(*args, db=db)
+            finally:
+                db.close()
+        return call
+    
+    def _recommend_by_tags(self, user: UserProfile, count: int, filters: Optional[Dict[str, Any]] = None,
+                           viewed_post_ids: Optional[set] = None, db: Optional[Session] = None) -> List[Post]:
         """
         基于标签的推荐算法
         """
-        # 获取用户标签
-        user_tags = []
-        if user.tags and isinstance(user.tags, dict) and 'interests' in user.tags:
-            user_tags = user.tags['interests']
+        db = db or self.db
+        # 获取用户兴趣标签ID，按权重从高到低
+        user_tags = user.interests
         if not user_tags:
             return []
         
         # 查询包含用户标签的帖子
         posts = []
-        for tag in user_tags:
+        for tag_id in user_tags:
             # 构建基本查询
-            # 数据库中的tags字段是JSON格式，需要检查tags.tags数组是否包含指定标签
-            query = self.db.query(Post).filter(Post.tags['tags'].contains([tag]))
+            # 通过post_tags关联表按标签ID查询，走(tag_id, post_id)主键范围扫描
+            query = db.query(Post).join(PostTag, PostTag.post_id == Post.post_id).filter(PostTag.tag_id == tag_id)
             
             # 应用过滤条件
-            if filters:
-                # 按类别过滤
-                if 'category' in filters:
-                    query = query.filter(Post.category == filters['category'])
-                
-                # 按创建时间过滤
-                if 'created_after' in filters:
-                    query = query.filter(Post.created_at >= filters['created_after'])
-                
-                # 按作者过滤
-                if 'author_id' in filters:
-                    query = query.filter(Post.author_id == filters['author_id'])
+            query = apply_post_filters(query, filters)
             
             # 获取结果
             tag_posts = query.limit(count).all()
@@ -114,77 +255,51 @@ class RecommenderService:
         
         # 去重
         unique_posts = list({post.post_id: post for post in posts}.values())
-        logger.info(f"推荐系统: 用户[{user.user_id}]推荐前去重后的帖子数量: {len(unique_posts)}")
+        logger.debug("推荐系统: 用户[%s]推荐前去重后的帖子数量: %d", user.user_id, len(unique_posts))
         
         # 获取用户已浏览的帖子ID（优先从Redis获取，Redis不可用时从数据库获取）
-        redis_viewed_post_ids = get_user_viewed_posts(user.user_id)
-        
-        # 如果Redis中没有数据，则从数据库获取
-        if not redis_viewed_post_ids:
-            logger.info(f"推荐系统: 用户[{user.user_id}]的Redis消重数据为空，从数据库获取")
-            db_viewed_post_ids = set([
-                event.post_id for event in self.db.query(Event).filter(
-                    Event.user_id == user.user_id,
-                    Event.event_type.in_(["view", "click"])
-                ).all()
-            ])
-            viewed_post_ids = db_viewed_post_ids
-            logger.info(f"推荐系统: 用户[{user.user_id}]从数据库获取的已浏览帖子数量: {len(viewed_post_ids)}")
-        else:
-            viewed_post_ids = redis_viewed_post_ids
-            logger.info(f"推荐系统: 用户[{user.user_id}]从Redis获取的已浏览帖子数量: {len(viewed_post_ids)}")
+        if viewed_post_ids is None:
+            viewed_post_ids = self._get_viewed_post_ids(user.user_id, db)
         
         # 过滤掉已浏览的帖子
         filtered_posts = [post for post in unique_posts if post.post_id not in viewed_post_ids]
-        logger.info(f"推荐系统: 用户[{user.user_id}]消重后的推荐帖子数量: {len(filtered_posts)}, 过滤掉: {len(unique_posts) - len(filtered_posts)}篇")
+        logger.debug("推荐系统: 用户[%s]消重后的推荐帖子数量: %d, 过滤掉: %d篇",
+                     user.user_id, len(filtered_posts), len(unique_posts) - len(filtered_posts))
         
-        # 记录被过滤掉的帖子ID
-        if len(unique_posts) > len(filtered_posts):
+        # 记录被过滤掉的帖子ID，只在被采样的请求中输出
+        if len(unique_posts) > len(filtered_posts) and trace_enabled(logger):
             filtered_post_ids = [post.post_id for post in unique_posts if post.post_id in viewed_post_ids]
-            logger.info(f"推荐系统: 用户[{user.user_id}]被过滤掉的帖子IDs: {filtered_post_ids}")
+            logger.debug("推荐系统: 用户[%s]被过滤掉的帖子IDs: %s", user.user_id, filtered_post_ids)
         
         return filtered_posts[:count]
     
-    def _recommend_by_collaborative_filtering(self, user: User, count: int, filters: Optional[Dict[str, Any]] = None) -> List[Post]:
+    def _recommend_by_collaborative_filtering(self, user: UserProfile, count: int, filters: Optional[Dict[str, Any]] = None,
+                                              viewed_post_ids: Optional[set] = None, db: Optional[Session] = None) -> List[Post]:
         """
         基于协同过滤的推荐算法
         MVP阶段使用简化版的基于用户的协同过滤
         """
-        # 获取用户的行为数据
-        user_events = self.db.query(Event).filter(
-            Event.user_id == user.user_id,
-            Event.event_type.in_(["like", "favorite"])
-        ).all()
+        db = db or self.db
         
-        if not user_events:
+        # 用户最近喜欢/收藏的帖子ID，来自用户画像
+        user_post_ids = user.interacted_post_ids
+        if not user_post_ids:
             return []
         
-        # 获取用户喜欢/收藏的帖子ID
-        user_post_ids = [event.post_id for event in user_events]
-        
         # 找到与当前用户有相似行为的用户
-        similar_users = self.db.query(Event.user_id).filter(
-            Event.post_id.in_(user_post_ids),
-            Event.user_id != user.user_id,
-            Event.event_type.in_(["like", "favorite"])
-        ).distinct().all()
-        
-        similar_user_ids = [u[0] for u in similar_users]
+        similar_user_ids = db.execute(similar_users_query(user_post_ids, user.user_id)).scalars().all()
         
         if not similar_user_ids:
             return []
         
-        # 获取相似用户喜欢/收藏的帖子
-        similar_user_events = self.db.query(Event).filter(
-            Event.user_id.in_(similar_user_ids),
-            Event.event_type.in_(["like", "favorite"])
-        ).all()
+        # 获取相似用户喜欢/收藏的帖子ID，只读取覆盖索引中的post_id
+        similar_user_post_ids = db.execute(users_interactions_query(similar_user_ids)).scalars().all()
         
         # 统计帖子被喜欢/收藏的次数
         post_counts = {}
-        for event in similar_user_events:
-            if event.post_id not in user_post_ids:  # 排除用户已经喜欢/收藏的帖子
-                post_counts[event.post_id] = post_counts.get(event.post_id, 0) + 1
+        for post_id in similar_user_post_ids:
+            if post_id not in user_post_ids:  # 排除用户已经喜欢/收藏的帖子
+                post_counts[post_id] = post_counts.get(post_id, 0) + 1
         
         # 按照被喜欢/收藏的次数排序
         sorted_post_ids = sorted(post_counts.keys(), key=lambda x: post_counts[x], reverse=True)
@@ -193,147 +308,96 @@ class RecommenderService:
         recommended_posts = []
         if sorted_post_ids:
             # 构建基本查询
-            query = self.db.query(Post).filter(Post.post_id.in_(sorted_post_ids[:count]))
+            query = db.query(Post).filter(Post.post_id.in_(sorted_post_ids[:count]))
             
             # 应用过滤条件
-            if filters:
-                # 按类别过滤
-                if 'category' in filters:
-                    query = query.filter(Post.category == filters['category'])
-                
-                # 按创建时间过滤
-                if 'created_after' in filters:
-                    query = query.filter(Post.created_at >= filters['created_after'])
-                
-                # 按作者过滤
-                if 'author_id' in filters:
-                    query = query.filter(Post.author_id == filters['author_id'])
+            query = apply_post_filters(query, filters)
             
             # 获取结果
-        recommended_posts = query.all()
+            recommended_posts = query.all()
         
         # 获取用户已浏览的帖子ID（优先从Redis获取，Redis不可用时从数据库获取）
-        redis_viewed_post_ids = get_user_viewed_posts(user.user_id)
-        
-        # 如果Redis中没有数据，则从数据库获取
-        if not redis_viewed_post_ids:
-            db_viewed_post_ids = set([
-                event.post_id for event in self.db.query(Event).filter(
-                    Event.user_id == user.user_id,
-                    Event.event_type.in_(["view", "click"])
-                ).all()
-            ])
-            viewed_post_ids = db_viewed_post_ids
-        else:
-            viewed_post_ids = redis_viewed_post_ids
+        if viewed_post_ids is None:
+            viewed_post_ids = self._get_viewed_post_ids(user.user_id, db)
         
         # 过滤掉已浏览的帖子
         filtered_posts = [post for post in recommended_posts if post.post_id not in viewed_post_ids]
         
         return filtered_posts
     
-    def _recommend_random(self, count: int, filters: Optional[Dict[str, Any]] = None) -> List[Post]:
+    def _recommend_by_embedding(self, user: UserProfile, count: int, filters: Optional[Dict[str, Any]] = None,
+                                viewed_post_ids: Optional[set] = None, db: Optional[Session] = None) -> List[Post]:
         """
-        随机推荐
+        向量召回，使用最新发布的ALS模型按用户向量与帖子向量的点积取前count个，未加载模型时为空
         """
-        # 构建基本查询 - 最近一周的帖子
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        query = self.db.query(Post).filter(Post.create_time >= one_week_ago)
-        
-        # 应用过滤条件
-        if filters:
-            # 按类别过滤
-            if 'category' in filters:
-                query = query.filter(Post.category == filters['category'])
-            
-            # 按创建时间过滤
-            if 'created_after' in filters:
-                query = query.filter(Post.created_at >= filters['created_after'])
-            
-            # 按作者过滤
-            if 'author_id' in filters:
-                query = query.filter(Post.author_id == filters['author_id'])
-        
-        # 获取结果
-        recent_posts = query.all()
-        
-        # 如果最近一周的帖子不足，则获取所有帖子（仍然应用过滤条件）
-        if len(recent_posts) < count:
-            query = self.db.query(Post)
-            
-            # 应用过滤条件
-            if filters:
-                # 按类别过滤
-                if 'category' in filters:
-                    query = query.filter(Post.category == filters['category'])
-                
-                # 按创建时间过滤
-                if 'created_after' in filters:
-                    query = query.filter(Post.created_at >= filters['created_after'])
-                
-                # 按作者过滤
-                if 'author_id' in filters:
-                    query = query.filter(Post.author_id == filters['author_id'])
-            
-            # 获取结果
-            recent_posts = query.all()
+        db = db or self.db
+        model = embedding_store.snapshot
+        if model is None:
+            return []
+        post_ids = model.recommend(user.user_id, count, (viewed_post_ids or set()) | user.interacted_post_ids)
+        if not post_ids:
+            return []
+        query = apply_post_filters(db.query(Post).filter(Post.post_id.in_(post_ids)), filters)
+        return order_by_ids(query.all(), post_ids)
+    
+    def _recommend_trending(self, user: UserProfile, count: int, filters: Optional[Dict[str, Any]] = None,
+                            viewed_post_ids: Optional[set] = None, db: Optional[Session] = None) -> List[Post]:
+        """
+        热度召回，合并全局和用户兴趣标签的实时热门榜单
+        """
+        db = db or self.db
+        ranked_lists = trending_service.top_posts_many([None] + list(user.interests[:TRENDING_RECALL_TAGS]), count)
+        post_ids = trending_candidate_ids(ranked_lists, viewed_post_ids or set(), count)
+        if not post_ids:
+            return []
+        query = apply_post_filters(db.query(Post).filter(Post.post_id.in_(post_ids)), filters)
+        return order_by_ids(query.all(), post_ids)
+    
+    def _recommend_random(self, count: int, filters: Optional[Dict[str, Any]] = None,
+                          viewed_post_ids: Optional[set] = None, db: Optional[Session] = None) -> List[Post]:
+        """
+        随机（探索）召回
+        从最新帖子的环形缓冲区中无放回采样，优先最近一周发布的帖子，只按主键查询采样到的帖子
+        """
+        db = db or self.db
+        # 缓冲区由后台线程加载，第一次加载完成前不提供探索结果，避免启动时每个请求各自全量加载
+        if not recent_posts.loaded:
+            return []
         
         # 获取用户已浏览的帖子ID（优先从Redis获取，Redis不可用时从数据库获取）
         user_id = filters.get('user_id') if filters else None
-        if user_id:
-            redis_viewed_post_ids = get_user_viewed_posts(user_id)
-            
-            # 如果Redis中没有数据，则从数据库获取
-            if not redis_viewed_post_ids:
-                db_viewed_post_ids = set([
-                    event.post_id for event in self.db.query(Event).filter(
-                        Event.user_id == user_id,
-                        Event.event_type.in_(["view", "click"])
-                    ).all()
-                ])
-                viewed_post_ids = db_viewed_post_ids
-            else:
-                viewed_post_ids = redis_viewed_post_ids
-            
-            # 过滤掉已浏览的帖子
-            recent_posts = [post for post in recent_posts if post.post_id not in viewed_post_ids]
+        if viewed_post_ids is None and user_id:
+            viewed_post_ids = self._get_viewed_post_ids(user_id, db)
         
-        # 随机选择
-        if len(recent_posts) <= count:
-            return recent_posts
-        else:
-            return random.sample(recent_posts, count)
+        post_ids = recent_posts.sample(count, viewed_post_ids, filters)
+        if not post_ids:
+            return []
+        query = apply_post_filters(db.query(Post).filter(Post.post_id.in_(post_ids)), filters)
+        return order_by_ids(query.all(), post_ids)
     
-    def _rank_posts(self, user: User, posts: List[Post]) -> List[Post]:
+    def _get_viewed_post_ids(self, user_id: int, db: Optional[Session] = None) -> set:
         """
-        对推荐结果进行排序
-        MVP阶段使用简单的排序规则：
-        1. 根据用户标签匹配度
-        2. 根据帖子热度（浏览量、点赞量、收藏量）
-        3. 根据时间新鲜度
+        获取用户已浏览的帖子ID，优先从Redis获取，Redis中没有数据时从数据库获取
         """
-        user_tags = set(user.tags or [])
-        
-        # 计算每个帖子的分数
-        post_scores = []
-        for post in posts:
-            # 标签匹配度分数
-            post_tags = set(post.tags or [])
-            tag_score = len(user_tags.intersection(post_tags)) if user_tags else 0
+        db = db or self.db
+        with timer(RECOMMENDER_STAGE_LATENCY, stage="dedup"):
+            viewed_post_ids = get_user_viewed_posts(user_id)
+            if viewed_post_ids:
+                logger.debug("推荐系统: 用户[%s]从Redis获取的已浏览帖子数量: %d", user_id, len(viewed_post_ids))
+                return viewed_post_ids
             
-            # 热度分数 = 浏览量 * 0.1 + 点赞量 * 0.5 + 收藏量 * 1.0
-            popularity_score = post.view_count * 0.1 + post.like_count * 0.5 + post.favorite_count * 1.0
-            
-            # 时间新鲜度分数，最近发布的帖子分数更高
-            time_diff = (datetime.utcnow() - post.create_time).total_seconds() / 86400  # 转换为天数
-            freshness_score = max(0, 7 - time_diff) / 7  # 最近7天内的帖子，分数从1递减到0
-            
-            # 总分 = 标签匹配度 * 2.0 + 热度 * 1.0 + 新鲜度 * 1.5
-            total_score = tag_score * 2.0 + popularity_score * 1.0 + freshness_score * 1.5
-            
-            post_scores.append((post, total_score))
-        
-        # 按分数降序排序
-        sorted_posts = [post for post, score in sorted(post_scores, key=lambda x: x[1], reverse=True)]
-        
-        return sorted_posts
\ No newline at end of file
+            logger.debug("推荐系统: 用户[%s]的Redis消重数据为空，从数据库获取", user_id)
+            viewed_post_ids = set(db.execute(viewed_posts_query(user_id)).scalars().all())
+            logger.debug("推荐系统: 用户[%s]从数据库获取的已浏览帖子数量: %d", user_id, len(viewed_post_ids))
+            return viewed_post_ids
+    
+    def _rank_posts(self, user: UserProfile, posts: List[Post]) -> List[Post]:
+        """
+        对推荐结果进行排序
+        """
+        return [post for post, _ in self._score_posts(user, posts)]
+    
+    def _score_posts(self, user: UserProfile, posts: List[Post]) -> List[Tuple[Post, float]]:
+        post_ids = [post.post_id for post in posts]
+        features = feature_store.get_features("post", post_ids, RANKING_FEATURES)
+        return score_posts(user, posts, features, trending_service.scores(post_ids))
@@ -0,0 +1,362 @@
+"""
+只读服务索引快照
+
+离线构建器把标签倒排表和帖子近邻表写成扁平的NumPy .npy文件，
+各个Uvicorn/Gunicorn worker以只读mmap方式加载，多个进程共享操作系统页缓存中的同一份物理内存。
+
+目录结构：
+    SERVING_SNAPSHOT_DIR/
+        CURRENT                 当前版本的目录名，通过os.replace原子替换
+        20240101T000000Z/       一个版本的快照，写完后再整体重命名到位
+            manifest.json       含各文件的大小和SHA-256，加载前校验
+            post_ids.npy        帖子ID，升序，倒排表和近邻表中的行号即为其下标
+            tag_offsets.npy     标签倒排表（CSR），标签ID为t的帖子行号为tag_postings[tag_offsets[t]:tag_offsets[t+1]]
+            tag_postings.npy    按发布时间降序
+            neighbor_offsets.npy / neighbor_rows.npy / neighbor_scores.npy
+                                帖子近邻表（CSR，按帖子行号索引），由共同点赞/收藏的用户数计算，按分数降序
+
+构建: python -m services.snapshot --output /data/snapshots
+由docker/scripts/cron_jobs.sh snapshot定时执行，见docker/scripts/crontab.txt
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Iterable
+from collections import defaultdict
+from datetime import datetime, timedelta
+import argparse
+import hashlib
+import heapq
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.models import Post, PostTag, Event
+from services.event_queries import INTERACTION_EVENT_TYPES, EVENT_LOOKBACK_DAYS
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 快照根目录
+SERVING_SNAPSHOT_DIR = os.getenv("SERVING_SNAPSHOT_DIR", "/data/snapshots")
+# 检查新版本快照的间隔（秒）
+SNAPSHOT_RELOAD_INTERVAL = int(os.getenv("SNAPSHOT_RELOAD_INTERVAL", "60"))
+# 每个帖子保留的近邻数量
+SNAPSHOT_NEIGHBORS = int(os.getenv("SNAPSHOT_NEIGHBORS", "50"))
+# 计算近邻时每个用户最多使用的交互帖子数，限制共现计算量
+SNAPSHOT_MAX_USER_ITEMS = 200
+# 保留的历史版本数量
+SNAPSHOT_KEEP_VERSIONS = 3
+# 计算校验和时每次读取的字节数
+CHECKSUM_CHUNK_SIZE = 1 << 20
+
+UNIX_EPOCH = datetime(1970, 1, 1)
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+ARRAY_FILES = ("post_ids", "tag_offsets", "tag_postings", "neighbor_offsets", "neighbor_rows", "neighbor_scores")
+
+def _csr(groups: List[List[int]], dtype=np.int32):
+    """
+    将按行分组的列表转换为(offsets, values)
+    """
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(group) for group in groups])
+    values = np.fromiter((value for group in groups for value in group), dtype=dtype, count=int(offsets[-1]))
+    return offsets, values
+
+def build_snapshot_arrays(posts: List[tuple], post_tags: Iterable[tuple], interactions: Iterable[tuple],
+                          neighbors: int = SNAPSHOT_NEIGHBORS) -> Dict[str, np.ndarray]:
+    """
+    由查询结果计算快照数组
+    posts: (post_id, create_time)
+    post_tags: (tag_id, post_id)
+    interactions: (user_id, post_id)，点赞/收藏
+    """
+    posts = sorted(posts, key=lambda row: row[0])
+    arrays = {"post_ids": np.array([row[0] for row in posts], dtype=np.int64)}
+    row_of = {post_id: row for row, post_id in enumerate(arrays["post_ids"].tolist())}
+    # 数据库中为UTC的naive datetime，只用于倒排表排序
+    create_time = [int((row[1] - UNIX_EPOCH).total_seconds()) if row[1] else 0 for row in posts]
+
+    # 标签倒排表，同一标签下按发布时间降序
+    postings: Dict[int, List[int]] = defaultdict(list)
+    for tag_id, post_id in post_tags:
+        row = row_of.get(post_id)
+        if row is not None:
+            postings[int(tag_id)].append(row)
+    max_tag_id = max(postings) if postings else -1
+    tag_groups = [sorted(postings.get(tag_id, []), key=lambda row: (-create_time[row], row)) for tag_id in range(max_tag_id + 1)]
+    arrays["tag_offsets"], arrays["tag_postings"] = _csr(tag_groups)
+
+    # 帖子近邻：两个帖子被同一用户点赞/收藏的次数
+    user_rows: Dict[int, List[int]] = defaultdict(list)
+    for user_id, post_id in interactions:
+        row = row_of.get(post_id)
+        if row is not None:
+            user_rows[user_id].append(row)
+    co_counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    for rows in user_rows.values():
+        rows = list(dict.fromkeys(rows))[-SNAPSHOT_MAX_USER_ITEMS:]
+        for a in rows:
+            counts = co_counts[a]
+            for b in rows:
+                if a != b:
+                    counts[b] += 1
+    neighbor_groups, score_groups = [], []
+    for row in range(len(posts)):
+        top = heapq.nlargest(neighbors, co_counts.get(row, {}).items(), key=lambda item: (item[1], -item[0]))
+        neighbor_groups.append([b for b, _ in top])
+        score_groups.append([count for _, count in top])
+    arrays["neighbor_offsets"], arrays["neighbor_rows"] = _csr(neighbor_groups)
+    arrays["neighbor_scores"] = _csr(score_groups, dtype=np.float32)[1]
+    return arrays
+
+def write_snapshot(arrays: Dict[str, np.ndarray], root: str = SERVING_SNAPSHOT_DIR,
+                   version: Optional[str] = None, keep: int = SNAPSHOT_KEEP_VERSIONS) -> str:
+    """
+    写入新版本快照并原子切换CURRENT，返回版本号
+    """
+    return publish_arrays({name: arrays[name] for name in ARRAY_FILES}, {
+        "posts": int(len(arrays["post_ids"])),
+        "tags": int(len(arrays["tag_offsets"]) - 1),
+        "postings": int(len(arrays["tag_postings"])),
+        "neighbors": int(len(arrays["neighbor_rows"]))
+    }, root, version, keep)
+
+def publish_arrays(arrays: Dict[str, np.ndarray], manifest: Dict, root: str,
+                   version: Optional[str] = None, keep: int = SNAPSHOT_KEEP_VERSIONS) -> str:
+    """
+    将一组数组写成一个新版本目录（每个数组一个.npy文件，另加manifest.json），并原子切换CURRENT，返回版本号
+    先写入临时目录再重命名，CURRENT通过os.replace替换，读取方不会看到写了一半的版本；
+    manifest的files记录每个文件的大小和SHA-256，加载方据此校验
+    """
+    version = version or datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = os.path.join(root, f".{version}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    files = {}
+    for name, array in arrays.items():
+        path = os.path.join(tmp_dir, f"{name}.npy")
+        np.save(path, np.ascontiguousarray(array))
+        files[f"{name}.npy"] = {"bytes": os.path.getsize(path), "sha256": file_checksum(path)}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(dict(manifest, version=version, created_at=datetime.utcnow().isoformat(), files=files), f)
+    os.rename(tmp_dir, os.path.join(root, version))
+
+    write_current(root, version)
+    logger.info("服务快照: 已发布版本[%s] 目录[%s]", version, root)
+
+    # 清理旧版本，已被worker映射的文件在解除映射前仍然有效
+    versions = sorted(name for name in os.listdir(root)
+                      if not name.startswith(".") and os.path.isdir(os.path.join(root, name)))
+    for name in versions[:-keep] if keep > 0 else []:
+        if name != version:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return version
+
+def write_current(root: str, version: str):
+    """
+    原子地将CURRENT指向version
+    """
+    pointer_tmp = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_FILE))
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def verify_checksums(path: str):
+    """
+    按manifest校验版本目录中每个文件的大小和SHA-256，不一致时抛出ValueError
+    早于校验和功能发布的版本没有files字段，不做校验
+    """
+    for name, expected in read_manifest(path).get("files", {}).items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            raise ValueError(f"缺少文件 {name}")
+        if os.path.getsize(file_path) != expected["bytes"]:
+            raise ValueError(f"文件大小不一致 {name}")
+        if file_checksum(file_path) != expected["sha256"]:
+            raise ValueError(f"校验和不一致 {name}")
+
+def build_snapshot(db: Session, root: str = SERVING_SNAPSHOT_DIR, neighbors: int = SNAPSHOT_NEIGHBORS) -> str:
+    """
+    从数据库构建并发布快照
+    """
+    posts = db.query(Post.post_id, Post.create_time).all()
+    post_tags = db.query(PostTag.tag_id, PostTag.post_id).yield_per(10000)
+    interactions = db.query(Event.user_id, Event.post_id).filter(
+        Event.event_type.in_(INTERACTION_EVENT_TYPES),
+        Event.timestamp >= datetime.utcnow() - timedelta(days=EVENT_LOOKBACK_DAYS)
+    ).yield_per(10000)
+    return write_snapshot(build_snapshot_arrays(posts, post_tags, interactions, neighbors), root)
+
+class ServingSnapshot:
+    """
+    一个已加载的快照版本，所有数组都是只读的内存映射
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest = read_manifest(path)
+        self.version = self.manifest["version"]
+        self.arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAY_FILES}
+        self.post_ids = self.arrays["post_ids"]
+
+    def post_row(self, post_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self.post_ids, post_id))
+        if row < len(self.post_ids) and self.post_ids[row] == post_id:
+            return row
+        return None
+
+    def posts_for_tag(self, tag_id: int, limit: int) -> List[int]:
+        """
+        标签下最新的帖子ID
+        """
+        offsets = self.arrays["tag_offsets"]
+        if not 0 <= tag_id < len(offsets) - 1:
+            return []
+        start = int(offsets[tag_id])
+        rows = self.arrays["tag_postings"][start:min(int(offsets[tag_id + 1]), start + limit)]
+        return self.post_ids[rows].tolist()
+
+    def neighbors(self, post_id: int, limit: int) -> List[int]:
+        """
+        与帖子共同被点赞/收藏最多的帖子ID
+        """
+        row = self.post_row(post_id)
+        if row is None:
+            return []
+        offsets = self.arrays["neighbor_offsets"]
+        start = int(offsets[row])
+        rows = self.arrays["neighbor_rows"][start:min(int(offsets[row + 1]), start + limit)]
+        return self.post_ids[rows].tolist()
+
+class SnapshotStore:
+    """
+    快照加载器（双缓冲）
+    读取CURRENT指向的版本，后台线程定期检查CURRENT，版本变化时在后台依次校验校验和、加载并预热新版本，
+    期间请求继续使用旧版本；完成后一次赋值替换引用，并丢弃对旧版本的引用。
+    正在使用旧快照的请求持有旧对象，不受替换影响，旧映射在最后一个请求结束、对象回收时释放；
+    新版本校验或加载失败时继续使用旧版本。
+    loader为版本目录 -> 快照对象的构造函数（需要version和manifest属性，可选的warm()方法在切换前调用），默认为ServingSnapshot
+    """
+
+    def __init__(self, root: str = SERVING_SNAPSHOT_DIR, reload_interval: int = SNAPSHOT_RELOAD_INTERVAL,
+                 loader: Callable[[str], Any] = None, name: str = "snapshot"):
+        self.root = root
+        self.reload_interval = reload_interval
+        self.loader = loader or ServingSnapshot
+        self.name = name
+        self._snapshot: Optional[ServingSnapshot] = None
+        self._loaded_at: Optional[datetime] = None
+        self._load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> Optional[Any]:
+        return self._snapshot
+
+    def start(self):
+        """
+        加载当前快照并启动后台检查线程
+        """
+        self.reload()
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._reload_loop, name=f"{self.name}-reloader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        """
+        本进程已加载的版本
+        """
+        snapshot = self._snapshot
+        return {
+            "name": self.name,
+            "version": snapshot.version if snapshot is not None else None,
+            "loaded_at": self._loaded_at.isoformat() if self._loaded_at else None,
+            "load_seconds": self._load_seconds,
+        }
+
+    def reload(self) -> bool:
+        """
+        CURRENT指向的版本与已加载的不同时加载新快照，返回是否发生切换
+        """
+        version = self.current_version()
+        with self._lock:
+            if version is None or (self._snapshot is not None and self._snapshot.version == version):
+                return False
+            start = time.perf_counter()
+            try:
+                path = os.path.join(self.root, version)
+                verify_checksums(path)
+                snapshot = self.loader(path)
+                # 预热：在切换前触发mmap缺页和首次计算，避免切换后的第一批请求变慢
+                if hasattr(snapshot, "warm"):
+                    snapshot.warm()
+            except Exception as e:
+                logger.error("服务快照: [%s]加载版本[%s]失败，继续使用旧版本: %s", self.name, version, e)
+                return False
+            previous, self._snapshot = self._snapshot, snapshot
+            self._loaded_at = datetime.utcnow()
+            self._load_seconds = time.perf_counter() - start
+        logger.info("服务快照: [%s]已从版本[%s]切换到[%s] 耗时[%.3fs]",
+                    self.name, previous.version if previous else None, version, self._load_seconds)
+        return True
+
+    def _reload_loop(self):
+        while not self._stop_event.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error("服务快照: 检查新版本失败: %s", e)
+
+# 全局快照加载器
+snapshot_store = SnapshotStore()
+
+def main():
+    parser = argparse.ArgumentParser(description='构建服务索引快照')
+    parser.add_argument('--output', default=SERVING_SNAPSHOT_DIR, help='快照根目录')
+    parser.add_argument('--neighbors', type=int, default=SNAPSHOT_NEIGHBORS, help='每个帖子保留的近邻数量')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        build_snapshot(db, args.output, args.neighbors)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
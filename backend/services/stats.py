@@ -0,0 +1,180 @@
+from typing import Dict, Any, Optional, Callable
+from collections import Counter
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy import func, distinct
+from sqlalchemy.orm import Session
+
+import redis_client
+from database import SessionLocal
+from models.models import User, Post, Event
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 后台线程的检查间隔（秒）
+STATS_REFRESH_INTERVAL = int(os.getenv("STATS_REFRESH_INTERVAL", "60"))
+# 全量校准间隔（秒），所有进程中只有抢到锁的一个进程执行全表聚合
+STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", "600"))
+
+# 热门标签数量
+TOP_TAGS_LIMIT = 5
+
+# Redis键：增量计数（哈希）、全量聚合结果（JSON）和校准锁
+STATS_COUNTERS_KEY = "stats:counters"
+STATS_AGGREGATES_KEY = "stats:aggregates"
+STATS_RECONCILE_LOCK_KEY = "stats:reconcile_lock"
+EVENT_TYPE_FIELD_PREFIX = "event_type:"
+
+class StatsService:
+    """
+    数据统计服务
+    用户数、帖子数和各类事件数保存在Redis哈希中，写入路径用HINCRBY增量更新，所有进程共享；
+    热门标签和活跃用户数需要全表聚合，由抢到校准锁的一个进程定期计算，同时以数据库结果校准计数。
+    /api/data/stats 只读取Redis，首次校准完成前返回None，由路由返回"未就绪"
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 refresh_interval: int = STATS_REFRESH_INTERVAL, reconcile_interval: int = STATS_RECONCILE_INTERVAL):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.reconcile_interval = reconcile_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台校准线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="stats-refresher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台校准线程
+        """
+        self._stop_event.set()
+
+    def get_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        获取当前统计数据，首次校准尚未完成或Redis不可用时返回None
+        """
+        try:
+            pipe = redis_client.redis_client.pipeline(transaction=False)
+            pipe.get(STATS_AGGREGATES_KEY)
+            pipe.hgetall(STATS_COUNTERS_KEY)
+            aggregates, counters = pipe.execute()
+        except Exception as e:
+            logger.error("统计系统: 读取统计数据失败: %s", e)
+            return None
+        if aggregates is None:
+            return None
+        snapshot = json.loads(aggregates)
+        event_types = {
+            field[len(EVENT_TYPE_FIELD_PREFIX):]: int(value)
+            for field, value in counters.items() if field.startswith(EVENT_TYPE_FIELD_PREFIX)
+        }
+        snapshot.update({
+            "user_count": int(counters.get("user_count", 0)),
+            "post_count": int(counters.get("post_count", 0)),
+            "event_count": sum(event_types.values()),
+            "event_types": event_types
+        })
+        return snapshot
+
+    def reconcile(self, force: bool = False) -> bool:
+        """
+        从数据库全量计算统计数据，写入Redis并校准增量计数
+        未到校准时间（其他进程持有锁）时直接返回False；force为True时跳过锁检查
+        """
+        client = redis_client.redis_client
+        if not force and not client.set(STATS_RECONCILE_LOCK_KEY, "1", nx=True, ex=self.reconcile_interval):
+            return False
+        db = self.session_factory()
+        try:
+            snapshot = self._compute_snapshot(db)
+        except Exception:
+            # 计算失败时释放锁，由其他进程在下一轮重试
+            client.delete(STATS_RECONCILE_LOCK_KEY)
+            raise
+        finally:
+            db.close()
+        # 计算期间写入的增量会被覆盖，误差在下一次校准时修正
+        counters = {"user_count": snapshot.pop("user_count"), "post_count": snapshot.pop("post_count")}
+        counters.update({f"{EVENT_TYPE_FIELD_PREFIX}{event_type}": count
+                         for event_type, count in snapshot.pop("event_types").items()})
+        event_count = snapshot.pop("event_count")
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(STATS_COUNTERS_KEY)
+        pipe.hset(STATS_COUNTERS_KEY, mapping=counters)
+        pipe.set(STATS_AGGREGATES_KEY, json.dumps(snapshot))
+        pipe.execute()
+        logger.info("统计系统: 已校准统计数据, 事件数[%d]", event_count)
+        return True
+
+    def record_event(self, event_type: str, count: int = 1):
+        """
+        事件写入后增量更新计数
+        """
+        self._increment(f"{EVENT_TYPE_FIELD_PREFIX}{event_type}", count)
+
+    def record_user_created(self):
+        self._increment("user_count")
+
+    def record_post_created(self):
+        self._increment("post_count")
+
+    def _increment(self, field: str, count: int = 1):
+        try:
+            redis_client.redis_client.hincrby(STATS_COUNTERS_KEY, field, count)
+        except Exception as e:
+            # 统计是近似值，写入失败时丢弃增量，由下一次校准修正
+            logger.error("统计系统: 更新计数[%s]失败: %s", field, e)
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error("统计系统: 校准统计数据失败: %s", e)
+            self._stop_event.wait(self.refresh_interval)
+
+    def _compute_snapshot(self, db: Session) -> Dict[str, Any]:
+        now = datetime.utcnow()
+
+        event_types = {
+            event_type: count for event_type, count in
+            db.query(Event.event_type, func.count(Event.event_id)).group_by(Event.event_type).all()
+        }
+
+        # 标签存储在JSON字段中，在Python中按批次统计
+        tag_counter = Counter()
+        for (tags,) in db.query(Post.tags).yield_per(1000):
+            if isinstance(tags, dict):
+                tag_counter.update(tag for tag in tags.get("tags") or [] if isinstance(tag, str))
+
+        return {
+            "user_count": db.query(func.count(User.user_id)).scalar() or 0,
+            "post_count": db.query(func.count(Post.post_id)).scalar() or 0,
+            "event_count": sum(event_types.values()),
+            "event_types": event_types,
+            "top_tags": [{"tag": tag, "count": count} for tag, count in tag_counter.most_common(TOP_TAGS_LIMIT)],
+            "daily_active_users": self._count_active_users(db, now - timedelta(days=1)),
+            "weekly_active_users": self._count_active_users(db, now - timedelta(days=7)),
+            "monthly_active_users": self._count_active_users(db, now - timedelta(days=30)),
+            "updated_at": now.isoformat()
+        }
+
+    def _count_active_users(self, db: Session, since: datetime) -> int:
+        return db.query(func.count(distinct(Event.user_id))).filter(Event.timestamp >= since).scalar() or 0
+
+# 全局统计服务实例
+stats_service = StatsService()
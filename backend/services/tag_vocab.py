@@ -0,0 +1,195 @@
+from typing import Dict, Iterable, List, Optional, Callable, Any
+import logging
+import threading
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.models import Tag, PostTag
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 标签名称的最大长度，与tags表的name字段一致
+MAX_TAG_LENGTH = 64
+
+def normalize_tag(name: Any) -> Optional[str]:
+    """
+    规范化标签名称，去除首尾空白，非字符串、空字符串或超长的标签返回None
+    """
+    if not isinstance(name, str):
+        return None
+    name = name.strip()
+    if not name or len(name) > MAX_TAG_LENGTH:
+        return None
+    return name
+
+def post_tag_list(tags: Any) -> List[str]:
+    """
+    从帖子的tags字段中取出标签列表
+    数据库中的格式为 {"tags": [...]}，也兼容直接存储列表
+    """
+    if isinstance(tags, dict):
+        tags = tags.get("tags")
+    if not isinstance(tags, list):
+        return []
+    return [tag for tag in tags if isinstance(tag, str)]
+
+def user_interest_tags(tags: Any) -> List[str]:
+    """
+    从用户的tags字段中取出兴趣标签列表
+    数据库中的格式为 {"interests": [...]}，也兼容直接存储列表
+    """
+    if isinstance(tags, dict):
+        tags = tags.get("interests")
+    if not isinstance(tags, list):
+        return []
+    return [tag for tag in tags if isinstance(tag, str)]
+
+class TagVocabulary:
+    """
+    标签词表服务，为标签分配稠密的整数ID
+    内存中维护 名称<->ID 的双向映射，首次使用时从tags表全量加载；
+    新标签在独立会话中写入并立即提交，并发写入同一标签时以数据库唯一约束为准
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        从数据库全量加载词表
+        """
+        db = self.session_factory()
+        try:
+            rows = db.query(Tag.tag_id, Tag.name).all()
+        finally:
+            db.close()
+        with self._lock:
+            self._ids = {name: tag_id for tag_id, name in rows}
+            self._names = {tag_id: name for tag_id, name in rows}
+            self._loaded = True
+        logger.debug("标签词表: 已加载 %d 个标签", len(rows))
+
+    def encode(self, names: Iterable[Any], create: bool = True) -> List[int]:
+        """
+        将标签名称转换为标签ID，保持原有顺序并去重
+        create为True时为新标签分配ID，否则忽略未知标签
+        """
+        self._ensure_loaded()
+        ordered = []
+        for name in names:
+            name = normalize_tag(name)
+            if name is not None and name not in ordered:
+                ordered.append(name)
+
+        with self._lock:
+            missing = [name for name in ordered if name not in self._ids]
+        if missing:
+            self._resolve(missing, create)
+
+        with self._lock:
+            return [self._ids[name] for name in ordered if name in self._ids]
+
+    def lookup(self, names: Iterable[Any]) -> List[int]:
+        """
+        只查询内存中的词表，不访问数据库，用于请求的热路径
+        """
+        self._ensure_loaded()
+        with self._lock:
+            ids = []
+            for name in names:
+                tag_id = self._ids.get(normalize_tag(name))
+                if tag_id is not None and tag_id not in ids:
+                    ids.append(tag_id)
+            return ids
+
+    def decode(self, tag_ids: Iterable[int]) -> List[str]:
+        """
+        将标签ID转换为标签名称，忽略未知ID
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return [self._names[tag_id] for tag_id in tag_ids if tag_id in self._names]
+
+    def name(self, tag_id: int) -> Optional[str]:
+        self._ensure_loaded()
+        with self._lock:
+            return self._names.get(tag_id)
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+            self._names = {}
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            try:
+                self.load()
+            except Exception as e:
+                logger.error("标签词表: 加载失败: %s", e)
+
+    def _resolve(self, names: List[str], create: bool):
+        """
+        从数据库读取其他进程已创建的标签，必要时为剩余标签分配ID
+        """
+        db = self.session_factory()
+        try:
+            found = dict(db.query(Tag.name, Tag.tag_id).filter(Tag.name.in_(names)).all())
+            if create:
+                for name in names:
+                    if name in found:
+                        continue
+                    tag = Tag(name=name)
+                    db.add(tag)
+                    try:
+                        db.commit()
+                        found[name] = tag.tag_id
+                        logger.info("标签词表: 新增标签[%s] ID[%s]", name, tag.tag_id)
+                    except IntegrityError:
+                        # 其他进程已写入同名标签
+                        db.rollback()
+                        tag_id = db.query(Tag.tag_id).filter(Tag.name == name).scalar()
+                        if tag_id is not None:
+                            found[name] = tag_id
+        finally:
+            db.close()
+
+        with self._lock:
+            for name, tag_id in found.items():
+                self._ids[name] = tag_id
+                self._names[tag_id] = name
+
+# 全局标签词表
+tag_vocabulary = TagVocabulary()
+
+def post_tag_ids(post) -> List[int]:
+    """
+    帖子的标签ID列表，tag_ids尚未回填的旧数据按名称从内存词表转换
+    """
+    if post.tag_ids is not None:
+        return post.tag_ids
+    return tag_vocabulary.lookup(post_tag_list(post.tags))
+
+def user_tag_ids(user) -> List[int]:
+    """
+    用户兴趣标签ID列表，tag_ids尚未回填的旧数据按名称从内存词表转换
+    """
+    if user.tag_ids is not None:
+        return user.tag_ids
+    return tag_vocabulary.lookup(user_interest_tags(user.tags))
+
+def replace_post_tags(db: Session, post_id: int, tag_ids: Iterable[int]):
+    """
+    用新的标签ID替换帖子在post_tags中的关联行，由调用方提交事务
+    """
+    db.query(PostTag).filter(PostTag.post_id == post_id).delete(synchronize_session=False)
+    rows = [{"post_id": post_id, "tag_id": tag_id} for tag_id in dict.fromkeys(tag_ids)]
+    if rows:
+        db.execute(PostTag.__table__.insert(), rows)
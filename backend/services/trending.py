@@ -0,0 +1,280 @@
+from typing import Dict, List, Optional, Callable, Iterable, Tuple
+from collections import defaultdict
+import logging
+import math
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+import redis_client
+from database import SessionLocal
+from models.models import PostTag
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 热度半衰期（秒），一次互动的贡献每经过一个半衰期减半
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", str(6 * 60 * 60)))
+# 增量缓冲区写入Redis的间隔（秒）
+TRENDING_FLUSH_INTERVAL = float(os.getenv("TRENDING_FLUSH_INTERVAL", "2"))
+# 每个有序集合保留的帖子数量上限，写入时裁剪掉分数最低的帖子
+TRENDING_MAX_SIZE = int(os.getenv("TRENDING_MAX_SIZE", "10000"))
+# 基准时间的切换周期（秒），见TrendingService的说明
+TRENDING_REBASE_PERIOD = int(os.getenv("TRENDING_REBASE_PERIOD", str(7 * 24 * 60 * 60)))
+
+# Redis键前缀，完整键为 trending:{基准时间}:global 和 trending:{基准时间}:tag:{标签ID}
+TRENDING_PREFIX = "trending:"
+
+# 各类行为对热度的贡献，与排序中按累计计数计算热度的权重一致
+EVENT_WEIGHTS = {
+    "view": 0.1,
+    "click": 0.2,
+    "like": 0.5,
+    "favorite": 1.0,
+}
+
+def trending_key(epoch: int, tag_id: Optional[int] = None) -> str:
+    if tag_id is None:
+        return f"{TRENDING_PREFIX}{epoch}:global"
+    return f"{TRENDING_PREFIX}{epoch}:tag:{tag_id}"
+
+class TrendingService:
+    """
+    实时热度服务，按指数衰减的行为计数维护全局和各标签的热门帖子
+    采用前向衰减：t时刻的一次互动以 权重 * 2^((t - 基准时间) / 半衰期) 累加到Redis有序集合中，
+    所有成员按同一比例放大，排名即为衰减后的排名，不需要周期性地衰减全部成员；
+    读取时乘以 2^(-(当前时间 - 基准时间) / 半衰期) 还原为当前时刻的衰减计数。
+    为避免指数溢出，基准时间每TRENDING_REBASE_PERIOD切换一次，新键由旧键按比例缩放合并而来。
+    事件写入路径只累加进程内缓冲区，后台线程定期用一次pipeline写入，ZINCRBY和ZREVRANGE均为O(log n)
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 half_life: float = TRENDING_HALF_LIFE, flush_interval: float = TRENDING_FLUSH_INTERVAL,
+                 max_size: int = TRENDING_MAX_SIZE, rebase_period: int = TRENDING_REBASE_PERIOD):
+        self.session_factory = session_factory
+        self.half_life = half_life
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        # 切换周期内放大倍数不超过2^512，远小于浮点数上限
+        self.rebase_period = max(1, min(rebase_period, int(half_life * 512)))
+        # {基准时间: {帖子ID: 放大后的增量}}，跨过基准时间切换点时两个周期的增量分开写入
+        self._pending: Dict[int, Dict[int, float]] = {}
+        self._rebased_epoch: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台写入线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="trending-flusher")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台写入线程，并写入缓冲区中剩余的增量
+        """
+        self._stop_event.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("热度系统: 写入剩余增量失败: %s", e)
+
+    def record_event(self, post_id: int, event_type: str, count: int = 1, now: Optional[float] = None):
+        """
+        事件写入后累加帖子的热度增量，下一次flush时写入Redis
+        """
+        weight = EVENT_WEIGHTS.get(event_type)
+        if not weight:
+            return
+        now = time.time() if now is None else now
+        epoch = self._epoch_for(now)
+        increment = weight * count * self._growth(now, epoch)
+        with self._lock:
+            pending = self._pending.setdefault(epoch, defaultdict(float))
+            pending[int(post_id)] += increment
+
+    def flush(self) -> int:
+        """
+        将缓冲区中的增量写入全局和帖子所属标签的有序集合，返回写入的帖子数量
+        缓冲区在锁内整体替换，写入Redis期间不阻塞事件写入路径
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return sum(self._write(epoch, increments) for epoch, increments in sorted(pending.items()))
+
+    def top_posts(self, limit: int, tag_id: Optional[int] = None, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        全局或某个标签下的热门帖子，返回按衰减计数降序的 [(帖子ID, 衰减计数)]，Redis不可用时返回空列表
+        """
+        return self.top_posts_many([tag_id], limit, now)[0]
+
+    def top_posts_many(self, tag_ids: List[Optional[int]], limit: int, now: Optional[float] = None) -> List[List[Tuple[int, float]]]:
+        """
+        一次pipeline读取多个榜单，tag_ids中的None表示全局榜单
+        """
+        now = time.time() if now is None else now
+        epoch = self._epoch_for(now)
+        try:
+            pipe = redis_client.redis_client.pipeline(transaction=False)
+            for tag_id in tag_ids:
+                pipe.zrevrange(trending_key(epoch, tag_id), 0, limit - 1, withscores=True)
+            results = pipe.execute()
+        except Exception as e:
+            logger.error("热度系统: 读取热门帖子失败: %s", e)
+            return [[] for _ in tag_ids]
+        return [self._decode(members, now, epoch) for members in results]
+
+    async def async_top_posts_many(self, tag_ids: List[Optional[int]], limit: int, now: Optional[float] = None) -> List[List[Tuple[int, float]]]:
+        """
+        top_posts_many的异步版本
+        """
+        now = time.time() if now is None else now
+        epoch = self._epoch_for(now)
+        try:
+            async with redis_client.async_redis_client.pipeline(transaction=False) as pipe:
+                for tag_id in tag_ids:
+                    pipe.zrevrange(trending_key(epoch, tag_id), 0, limit - 1, withscores=True)
+                results = await pipe.execute()
+        except Exception as e:
+            logger.error("热度系统: 读取热门帖子失败: %s", e)
+            return [[] for _ in tag_ids]
+        return [self._decode(members, now, epoch) for members in results]
+
+    def scores(self, post_ids: Iterable[int], now: Optional[float] = None) -> Optional[List[float]]:
+        """
+        一组帖子当前的全局衰减计数，不在榜单中的帖子为0；Redis不可用时返回None，由调用方回退
+        """
+        post_ids = list(post_ids)
+        now = time.time() if now is None else now
+        epoch = self._epoch_for(now)
+        key = trending_key(epoch)
+        try:
+            pipe = redis_client.redis_client.pipeline(transaction=False)
+            for post_id in post_ids:
+                pipe.zscore(key, str(post_id))
+            results = pipe.execute()
+        except Exception as e:
+            logger.error("热度系统: 读取帖子热度失败: %s", e)
+            return None
+        return self._decay(results, now, epoch)
+
+    async def async_scores(self, post_ids: Iterable[int], now: Optional[float] = None) -> Optional[List[float]]:
+        """
+        scores的异步版本
+        """
+        post_ids = list(post_ids)
+        now = time.time() if now is None else now
+        epoch = self._epoch_for(now)
+        key = trending_key(epoch)
+        try:
+            async with redis_client.async_redis_client.pipeline(transaction=False) as pipe:
+                for post_id in post_ids:
+                    pipe.zscore(key, str(post_id))
+                results = await pipe.execute()
+        except Exception as e:
+            logger.error("热度系统: 读取帖子热度失败: %s", e)
+            return None
+        return self._decay(results, now, epoch)
+
+    def _epoch_for(self, now: float) -> int:
+        return int(now // self.rebase_period) * self.rebase_period
+
+    def _growth(self, now: float, epoch: int) -> float:
+        return math.pow(2.0, (now - epoch) / self.half_life)
+
+    def _decode(self, members, now: float, epoch: int) -> List[Tuple[int, float]]:
+        factor = 1.0 / self._growth(now, epoch)
+        return [(int(member), float(score) * factor) for member, score in members]
+
+    def _decay(self, raw_scores, now: float, epoch: int) -> List[float]:
+        factor = 1.0 / self._growth(now, epoch)
+        return [float(score) * factor if score is not None else 0.0 for score in raw_scores]
+
+    def _write(self, epoch: int, pending: Dict[int, float]) -> int:
+        try:
+            post_tags = self._post_tags(list(pending))
+            self._rebase(epoch)
+            keys = {trending_key(epoch)}
+            pipe = redis_client.redis_client.pipeline(transaction=False)
+            for post_id, score in pending.items():
+                pipe.zincrby(trending_key(epoch), score, str(post_id))
+                for tag_id in post_tags.get(post_id, ()):
+                    key = trending_key(epoch, tag_id)
+                    pipe.zincrby(key, score, str(post_id))
+                    keys.add(key)
+            for key in keys:
+                # 只保留分数最高的max_size个帖子
+                pipe.zremrangebyrank(key, 0, -self.max_size - 1)
+                pipe.expire(key, self.rebase_period * 2)
+            pipe.sadd(f"{TRENDING_PREFIX}{epoch}:keys", *keys)
+            pipe.expire(f"{TRENDING_PREFIX}{epoch}:keys", self.rebase_period * 2)
+            pipe.execute()
+        except Exception as e:
+            # 热度是近似统计，写入失败时丢弃这一批增量，不影响事件写入
+            logger.error("热度系统: 写入%d个帖子的热度增量失败: %s", len(pending), e)
+            return 0
+        return len(pending)
+
+    def _rebase(self, epoch: int):
+        """
+        基准时间切换后，由第一个写入的进程把上一周期的榜单按比例缩放合并到新键
+        合并成功后才记录本进程已完成切换；合并失败时释放标记，由下一次写入（任意进程）重试
+        """
+        if self._rebased_epoch == epoch:
+            return
+        client = redis_client.redis_client
+        previous = epoch - self.rebase_period
+        marker = f"{TRENDING_PREFIX}{epoch}:rebased"
+        if not client.set(marker, "1", nx=True, ex=self.rebase_period * 2):
+            # 其他进程已负责合并
+            self._rebased_epoch = epoch
+            return
+        try:
+            factor = 1.0 / self._growth(epoch, previous)
+            old_keys = client.smembers(f"{TRENDING_PREFIX}{previous}:keys")
+            new_keys = []
+            if old_keys:
+                pipe = client.pipeline(transaction=False)
+                for old_key in old_keys:
+                    new_key = f"{TRENDING_PREFIX}{epoch}:" + old_key.split(":", 2)[2]
+                    # 新键中可能已有其他进程写入的增量，一并合并
+                    pipe.zunionstore(new_key, {new_key: 1.0, old_key: factor})
+                    pipe.expire(new_key, self.rebase_period * 2)
+                    new_keys.append(new_key)
+                pipe.sadd(f"{TRENDING_PREFIX}{epoch}:keys", *new_keys)
+                pipe.execute()
+        except Exception:
+            client.delete(marker)
+            raise
+        self._rebased_epoch = epoch
+        if new_keys:
+            logger.info("热度系统: 基准时间切换到[%s]，合并了%d个榜单", epoch, len(new_keys))
+
+    def _post_tags(self, post_ids: List[int]) -> Dict[int, List[int]]:
+        db = self.session_factory()
+        try:
+            rows = db.query(PostTag.post_id, PostTag.tag_id).filter(PostTag.post_id.in_(post_ids)).all()
+        finally:
+            db.close()
+        post_tags = defaultdict(list)
+        for post_id, tag_id in rows:
+            post_tags[post_id].append(tag_id)
+        return post_tags
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("热度系统: 写入热度增量失败: %s", e)
+
+# 全局热度服务
+trending_service = TrendingService()
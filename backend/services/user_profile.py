@@ -0,0 +1,164 @@
+from typing import Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models.models import User
+from redis_client import get_user_tag_weights, async_get_user_tag_weights
+from services.tag_vocab import user_tag_ids
+from services.event_queries import recent_interactions_query
+from services.invalidation import user_invalidation_bus
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 缓存的用户画像数量上限，超过后按LRU淘汰
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+# 画像过期时间（秒），限制其他进程写入造成的不一致
+USER_PROFILE_TTL = int(os.getenv("USER_PROFILE_TTL", "300"))
+# 保留的最近点赞/收藏帖子数量
+RECENT_INTERACTIONS_LIMIT = 200
+# 参与召回的兴趣标签数量上限
+MAX_INTEREST_TAGS = 10
+
+# 用户显式设置的兴趣标签的默认权重
+EXPLICIT_TAG_WEIGHT = 1.0
+
+class UserProfile:
+    """
+    预计算的用户画像
+    interests为按权重降序排列的标签ID，tag_weights合并了显式兴趣和数据仓库计算的权重（按标签ID），
+    recent_post_ids为最近点赞/收藏的帖子（新的在前，最多RECENT_INTERACTIONS_LIMIT个），interacted_post_ids为其集合
+    """
+    __slots__ = ("user_id", "interests", "tag_weights", "recent_post_ids", "interacted_post_ids", "loaded_at")
+
+    def __init__(self, user_id: int, interests: Tuple[int, ...], tag_weights: Dict[int, float],
+                 recent_post_ids: Tuple[int, ...], loaded_at: float = None):
+        self.user_id = user_id
+        self.interests = interests
+        self.tag_weights = tag_weights
+        self.loaded_at = loaded_at if loaded_at is not None else time.monotonic()
+        self.set_interactions(recent_post_ids)
+
+    @classmethod
+    def build(cls, user: User, warehouse_weights: Dict[int, float], interacted_post_ids) -> "UserProfile":
+        tag_weights = dict(warehouse_weights)
+        for tag in user_tag_ids(user):
+            tag_weights[tag] = max(tag_weights.get(tag, 0.0), EXPLICIT_TAG_WEIGHT)
+        interests = tuple(sorted(tag_weights, key=lambda tag: tag_weights[tag], reverse=True)[:MAX_INTEREST_TAGS])
+        return cls(user.user_id, interests, tag_weights, tuple(interacted_post_ids))
+
+    def set_interactions(self, post_ids: Iterable[int]):
+        """
+        替换最近交互的帖子，去重并保留最新的RECENT_INTERACTIONS_LIMIT个
+        """
+        recent = tuple(dict.fromkeys(int(post_id) for post_id in post_ids))[:RECENT_INTERACTIONS_LIMIT]
+        self.recent_post_ids = recent
+        self.interacted_post_ids = frozenset(recent)
+
+    def tag_score(self, tag_ids: Iterable[int]) -> float:
+        """
+        帖子标签与用户兴趣的匹配分数（命中标签的权重之和）
+        """
+        weights = self.tag_weights
+        return sum(weights.get(tag, 0.0) for tag in tag_ids)
+
+class UserProfileCache:
+    """
+    热点用户画像缓存
+    LRU淘汰加TTL过期，用户信息更新或删除时通过变更广播在所有进程中失效，点赞/收藏及取消时增量更新，
+    命中时召回和排序不再访问数据库读取用户
+    """
+
+    def __init__(self, capacity: int = USER_PROFILE_CACHE_SIZE, ttl: int = USER_PROFILE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._profiles: "OrderedDict[int, UserProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> Optional[UserProfile]:
+        """
+        获取用户画像，未命中时从数据库加载，用户不存在时返回None
+        """
+        profile = self._lookup(user_id)
+        if profile is not None:
+            return profile
+
+        user = db.get(User, user_id)
+        if not user:
+            return None
+        interacted = db.execute(recent_interactions_query(user_id, RECENT_INTERACTIONS_LIMIT)).scalars().all()
+        profile = UserProfile.build(user, get_user_tag_weights(user_id), interacted)
+        self._store(profile)
+        return profile
+
+    async def async_get(self, db, user_id: int) -> Optional[UserProfile]:
+        """
+        get的异步版本，使用AsyncSession加载
+        """
+        profile = self._lookup(user_id)
+        if profile is not None:
+            return profile
+
+        user = await db.get(User, user_id)
+        if not user:
+            return None
+        result = await db.execute(recent_interactions_query(user_id, RECENT_INTERACTIONS_LIMIT))
+        profile = UserProfile.build(user, await async_get_user_tag_weights(user_id), result.scalars().all())
+        self._store(profile)
+        return profile
+
+    def invalidate(self, user_id: int):
+        """
+        用户信息变更后使缓存失效，下次访问时重新加载
+        """
+        with self._lock:
+            self._profiles.pop(int(user_id), None)
+
+    def record_interaction(self, user_id: int, post_id: int):
+        """
+        点赞/收藏后更新已缓存画像的交互集合
+        """
+        with self._lock:
+            profile = self._profiles.get(int(user_id))
+            if profile is not None:
+                profile.set_interactions((int(post_id),) + profile.recent_post_ids)
+
+    def remove_interaction(self, user_id: int, post_id: int):
+        """
+        取消点赞/收藏后从已缓存画像的交互集合中移除
+        """
+        with self._lock:
+            profile = self._profiles.get(int(user_id))
+            if profile is not None:
+                profile.set_interactions(p for p in profile.recent_post_ids if p != int(post_id))
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def _lookup(self, user_id: int) -> Optional[UserProfile]:
+        with self._lock:
+            profile = self._profiles.get(int(user_id))
+            if profile is None:
+                return None
+            if time.monotonic() - profile.loaded_at > self.ttl:
+                del self._profiles[int(user_id)]
+                return None
+            self._profiles.move_to_end(int(user_id))
+            return profile
+
+    def _store(self, profile: UserProfile):
+        with self._lock:
+            self._profiles[profile.user_id] = profile
+            self._profiles.move_to_end(profile.user_id)
+            while len(self._profiles) > self.capacity:
+                self._profiles.popitem(last=False)
+
+# 全局用户画像缓存
+user_profile_cache = UserProfileCache()
+user_invalidation_bus.subscribe(user_profile_cache.invalidate)
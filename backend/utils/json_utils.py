@@ -1,17 +1,43 @@
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    """
+    将内容编码为UTF-8的JSON字节串，中文字符不转义
+    安装了orjson时使用orjson（原生支持datetime和非字符串键），否则回退到标准库json
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,  # 确保中文字符不被转义
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
 class CustomJSONResponse(JSONResponse):
     """
     自定义JSONResponse类，确保中文字符不被转义
     """
     media_type = "application/json; charset=utf-8"
-    
+
     def render(self, content):
-        return json.dumps(
-            content,
-            ensure_ascii=False,  # 确保中文字符不被转义
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
\ No newline at end of file
+        return dumps(content)
+
+class RawJSONResponse(Response):
+    """
+    直接返回已编码的JSON字节串，跳过响应模型校验和再次编码
+    """
+    media_type = "application/json; charset=utf-8"
@@ -0,0 +1,161 @@
+from typing import List, Optional
+import fcntl
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# ID结构（共63位，保证为正的BIGINT）：
+# | 41位 毫秒时间戳（自ID_EPOCH_MS起） | 10位 worker ID | 12位 毫秒内序号 |
+# 起始时间为2020-01-01，新ID始终大于旧的 毫秒时间戳*10000+随机数 格式的ID，可以与历史数据共存
+ID_EPOCH_MS = 1577836800000
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+# 保留给docker/scripts中的批量写入任务（如在线特征同步）的worker ID区间[RESERVED_WORKER_ID, MAX_WORKER_ID]，
+# 批量任务从该区间租用，后端进程租用的worker ID不会落在其中
+RESERVED_WORKER_SLOTS = 4
+RESERVED_WORKER_ID = MAX_WORKER_ID + 1 - RESERVED_WORKER_SLOTS
+# 每台主机可同时运行的生成ID的进程数（uvicorn worker、子进程等），每个进程租用 基准ID + 槽位 中的一个
+ID_WORKER_SLOTS = int(os.getenv("ID_WORKER_SLOTS", "16"))
+# 租约锁文件目录，同一主机上的进程必须使用同一目录
+ID_WORKER_LOCK_DIR = os.getenv("ID_WORKER_LOCK_DIR", os.path.join(tempfile.gettempdir(), "snowflake-workers"))
+
+def worker_id_base(slots: int = ID_WORKER_SLOTS) -> int:
+    """
+    本主机worker ID区间的起点
+    多机部署时应为每台主机配置ID_WORKER_ID，且各主机的 [ID_WORKER_ID, ID_WORKER_ID + ID_WORKER_SLOTS) 区间互不重叠；
+    未配置时由主机名推导，不同主机的推导结果可能重叠
+    """
+    configured = os.getenv("ID_WORKER_ID")
+    if configured is not None:
+        base = int(configured)
+    else:
+        digest = hashlib.md5(socket.gethostname().encode("utf-8")).digest()
+        base = int.from_bytes(digest[:4], "big") % (RESERVED_WORKER_ID // slots) * slots
+        logger.warning("ID生成: 未配置ID_WORKER_ID，由主机名推导worker ID区间[%d, %d)，多机部署时可能与其他主机重叠", base, base + slots)
+    if base < 0 or base + slots > RESERVED_WORKER_ID:
+        raise ValueError(f"worker ID区间[{base}, {base + slots})超出范围，ID_WORKER_ID + ID_WORKER_SLOTS不能超过{RESERVED_WORKER_ID}")
+    return base
+
+class WorkerIdLease:
+    """
+    worker ID租约
+    每个worker ID对应锁目录下的一个锁文件，进程依次尝试对区间内的锁文件加非阻塞排他锁（flock），
+    成功即独占该ID直到进程退出（锁由内核随进程释放，进程崩溃也不会泄漏）；区间内的ID全部被占用时抛出RuntimeError，
+    不会退化为可能重复的ID
+    """
+
+    def __init__(self, base: Optional[int] = None, slots: int = ID_WORKER_SLOTS, lock_dir: str = ID_WORKER_LOCK_DIR):
+        self.base = base
+        self.slots = slots
+        self.lock_dir = lock_dir
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> int:
+        base = self.base if self.base is not None else worker_id_base(self.slots)
+        os.makedirs(self.lock_dir, exist_ok=True)
+        for worker_id in range(base, base + self.slots):
+            fd = os.open(os.path.join(self.lock_dir, f"{worker_id}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            os.ftruncate(fd, 0)
+            os.write(fd, f"{socket.gethostname()}:{os.getpid()}\n".encode("utf-8"))
+            self._fd = fd
+            logger.info("ID生成: 进程[%d]租用worker ID[%d]", os.getpid(), worker_id)
+            return worker_id
+        raise RuntimeError(f"没有可用的worker ID: {self.lock_dir}下[{base}, {base + self.slots})均已被占用，请增大ID_WORKER_SLOTS")
+
+    def forget(self):
+        """
+        fork出的子进程调用：关闭继承的锁文件描述符，不释放父进程持有的锁
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class SnowflakeIdGenerator:
+    """
+    Snowflake风格的ID生成器
+    同一进程内生成的ID严格递增，新插入的行集中在主键B树的右侧；
+    同一毫秒内序号用尽时借用下一毫秒，时钟回拨时沿用上次的时间戳继续递增，不会生成重复ID。
+    未指定worker_id时在第一次生成ID时租用（见WorkerIdLease），fork出的子进程重新租用
+    """
+
+    def __init__(self, worker_id: Optional[int] = None, epoch_ms: int = ID_EPOCH_MS, lease: Optional[WorkerIdLease] = None):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id必须在0到{MAX_WORKER_ID}之间")
+        self.worker_id = worker_id
+        self.lease = lease if lease is not None or worker_id is not None else WorkerIdLease()
+        self.epoch_ms = epoch_ms
+        self._last_ms = -1
+        self._sequence = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        return self.next_ids(1)[0]
+
+    def next_ids(self, n: int) -> List[int]:
+        """
+        一次分配n个连续递增的ID，批量插入时只加一次锁
+        """
+        if n <= 0:
+            return []
+        with self._lock:
+            self._check_fork()
+            if self.worker_id is None:
+                self.worker_id = self.lease.acquire()
+            ids = []
+            now = int(time.time() * 1000) - self.epoch_ms
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # 同一毫秒或时钟回拨，从上次的位置继续
+                self._sequence += 1
+            while len(ids) < n:
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+                count = min(n - len(ids), MAX_SEQUENCE - self._sequence + 1)
+                base = (self._last_ms << (WORKER_ID_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS)
+                ids.extend(base | seq for seq in range(self._sequence, self._sequence + count))
+                self._sequence += count
+            # 指向最后一个已分配的序号，下次调用时加一
+            self._sequence -= 1
+            return ids
+
+    def _check_fork(self):
+        """
+        fork出的子进程会继承父进程的状态，租用的worker ID需要重新租用，避免父子进程生成相同ID
+        """
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            if self.lease is not None:
+                self.lease.forget()
+                self.worker_id = None
+
+    def parse(self, id_value: int) -> dict:
+        """
+        拆分ID，用于排查问题
+        """
+        return {
+            "timestamp_ms": (id_value >> (WORKER_ID_BITS + SEQUENCE_BITS)) + self.epoch_ms,
+            "worker_id": (id_value >> SEQUENCE_BITS) & MAX_WORKER_ID,
+            "sequence": id_value & MAX_SEQUENCE
+        }
+
+# 全局ID生成器
+id_generator = SnowflakeIdGenerator()
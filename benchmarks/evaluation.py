@@ -0,0 +1,335 @@
+"""
+离线回放评估
+
+把历史events按时间切分为训练段和测试段：各策略先用训练段构建索引，然后按时间顺序把测试段分成若干窗口逐个回放——
+每个窗口开始时向窗口内有正向行为的用户请求推荐，与该用户在窗口内新交互的帖子比较，再把窗口内的事件交给各策略更新状态。
+这样每次推荐只能看到请求时刻之前的数据，与线上一致。
+
+策略实现Strategy接口即可接入（召回和排序可以任意组合），内置：
+    PopularityStrategy  训练数据中的热门帖子
+    PoolStrategy        预计算的用户推荐池（如数据仓库mart.user_recommendation_pool的导出），无推荐池的用户回退到热门
+    EmbeddingStrategy   隐式ALS向量召回，每个窗口结束后重新训练
+线上RecommenderService的回放封装在replay_eval.py中。
+
+指标：recall@K、NDCG@K（二值相关性）、覆盖率（被推荐过的不同帖子数 / 帖子总数），
+以及每个策略的单次推荐延迟分位数、构建耗时和构建后常驻内存（tracemalloc统计）。
+用户按分片在进程池中并行评估，子进程通过fork继承各策略当前的状态。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import logging
+import math
+import multiprocessing
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from services.als import INTERACTION_WEIGHTS, build_interaction_matrix, train_als, top_k_rows
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 视为相关（推荐命中）的行为类型
+RELEVANT_EVENT_TYPES = ("click", "like", "favorite")
+# 每个工作进程分到的任务分片数，分片越多负载越均衡
+SHARDS_PER_WORKER = 4
+
+# (时间, 用户ID, 帖子ID, 事件类型)
+ReplayEvent = Tuple[datetime, int, int, str]
+
+def recall_at_k(recommended: Sequence[int], relevant: Set[int], k: int) -> float:
+    if not relevant:
+        return 0.0
+    return len(set(recommended[:k]) & relevant) / len(relevant)
+
+def ndcg_at_k(recommended: Sequence[int], relevant: Set[int], k: int) -> float:
+    if not relevant:
+        return 0.0
+    dcg = sum(1.0 / math.log2(rank + 2) for rank, post_id in enumerate(recommended[:k]) if post_id in relevant)
+    idcg = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return dcg / idcg
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """
+    延迟分位数（毫秒）
+    """
+    if not latencies:
+        return {"count": 0}
+    values = np.array(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+def split_windows(events: List[ReplayEvent], windows: int) -> List[List[ReplayEvent]]:
+    """
+    将按时间排序的事件切分为事件数相近的连续窗口
+    """
+    if not events:
+        return []
+    bounds = np.linspace(0, len(events), min(windows, len(events)) + 1).astype(int)
+    return [events[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+class Strategy:
+    """
+    回放评估的策略接口
+    prepare在评估开始前用训练段事件构建状态，observe在每个窗口回放后接收该窗口的事件；
+    recommend返回排好序的帖子ID，exclude为用户此前交互过的帖子
+    """
+    name = "strategy"
+
+    def prepare(self, events: List[ReplayEvent]):
+        pass
+
+    def observe(self, events: List[ReplayEvent]):
+        pass
+
+    def recommend(self, user_id: int, k: int, exclude: Set[int]) -> List[int]:
+        raise NotImplementedError
+
+    def after_fork(self):
+        """
+        在工作进程中调用，重建不能跨fork使用的资源（线程池、数据库连接等）
+        """
+        pass
+
+class PopularityStrategy(Strategy):
+    """
+    按交互权重累计的热门帖子
+    """
+    name = "popularity"
+
+    def __init__(self):
+        self.scores: Dict[int, float] = defaultdict(float)
+        self.ranked: List[int] = []
+
+    def prepare(self, events: List[ReplayEvent]):
+        self.observe(events)
+
+    def observe(self, events: List[ReplayEvent]):
+        for _, _, post_id, event_type in events:
+            self.scores[post_id] += INTERACTION_WEIGHTS.get(event_type, 0.0)
+        self.ranked = sorted(self.scores, key=lambda post_id: (-self.scores[post_id], post_id))
+
+    def recommend(self, user_id: int, k: int, exclude: Set[int]) -> List[int]:
+        result = []
+        for post_id in self.ranked:
+            if len(result) >= k:
+                break
+            if post_id not in exclude:
+                result.append(post_id)
+        return result
+
+class PoolStrategy(PopularityStrategy):
+    """
+    预计算的推荐池：pools为用户ID -> 按优先级排列的帖子ID，推荐池不足k个时用热门帖子补足
+    推荐池在评估期间不更新，与离线批量生成、按天刷新的推荐池一致
+    """
+    name = "pool"
+
+    def __init__(self, pools: Dict[int, List[int]]):
+        super().__init__()
+        self.pools = pools
+
+    def recommend(self, user_id: int, k: int, exclude: Set[int]) -> List[int]:
+        result = [post_id for post_id in self.pools.get(user_id, []) if post_id not in exclude][:k]
+        if len(result) < k:
+            chosen = exclude | set(result)
+            result.extend(super().recommend(user_id, k - len(result), chosen))
+        return result
+
+class EmbeddingStrategy(Strategy):
+    """
+    隐式ALS向量召回，每次observe后在累计的交互上重新训练，对应按天重新训练并发布模型
+    """
+    name = "als"
+
+    def __init__(self, factors: int = 32, iterations: int = 10, regularization: float = 0.05, alpha: float = 20.0):
+        self.params = {"factors": factors, "iterations": iterations, "regularization": regularization, "alpha": alpha}
+        self.interactions: List[Tuple[int, int, float]] = []
+        self.user_rows: Dict[int, int] = {}
+        self.col_ids = np.zeros(0, dtype=np.int64)
+        self.user_factors = self.item_factors = None
+
+    def prepare(self, events: List[ReplayEvent]):
+        self.observe(events)
+
+    def observe(self, events: List[ReplayEvent]):
+        self.interactions.extend((user_id, post_id, INTERACTION_WEIGHTS[event_type])
+                                 for _, user_id, post_id, event_type in events if event_type in INTERACTION_WEIGHTS)
+        matrix = build_interaction_matrix(self.interactions)
+        if matrix.nnz == 0:
+            return
+        self.user_factors, self.item_factors = train_als(matrix, **self.params)
+        self.user_rows = {user_id: row for row, user_id in enumerate(matrix.row_ids.tolist())}
+        self.col_ids = matrix.col_ids
+
+    def recommend(self, user_id: int, k: int, exclude: Set[int]) -> List[int]:
+        row = self.user_rows.get(user_id)
+        if row is None:
+            return []
+        exclude_ids = np.fromiter(exclude, dtype=np.int64, count=len(exclude))
+        # 帖子ID在升序的col_ids中的行号，忽略模型中不存在的帖子
+        exclude_rows = np.minimum(np.searchsorted(self.col_ids, exclude_ids), len(self.col_ids) - 1)
+        exclude_rows = exclude_rows[self.col_ids[exclude_rows] == exclude_ids]
+        return self.col_ids[top_k_rows(self.item_factors, self.user_factors[row], k, exclude_rows.tolist())].tolist()
+
+# 工作进程通过fork继承的评估状态：(策略列表, K)
+_worker_state: Optional[Tuple[List[Strategy], int]] = None
+
+def _init_worker():
+    for strategy in _worker_state[0]:
+        strategy.after_fork()
+
+def _evaluate_shard(tasks: List[Tuple[int, Set[int], Set[int]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    评估一组 (用户ID, 相关帖子, 已交互帖子)，返回各策略的指标累计值
+    """
+    strategies, k = _worker_state
+    totals = {}
+    for strategy in strategies:
+        recall_sum = ndcg_sum = 0.0
+        recommended_ids: Set[int] = set()
+        latencies = []
+        for user_id, relevant, seen in tasks:
+            start = time.perf_counter()
+            recommended = strategy.recommend(user_id, k, seen)
+            latencies.append(time.perf_counter() - start)
+            recall_sum += recall_at_k(recommended, relevant, k)
+            ndcg_sum += ndcg_at_k(recommended, relevant, k)
+            recommended_ids.update(recommended[:k])
+        totals[strategy.name] = {"recall": recall_sum, "ndcg": ndcg_sum, "users": len(tasks),
+                                 "recommended": recommended_ids, "latencies": latencies}
+    return totals
+
+class ReplayEvaluator:
+    """
+    离线回放评估器
+    workers > 1时每个窗口fork一个进程池并行评估用户分片，子进程看到的是fork时刻的策略状态；
+    max_users限制每个窗口评估的用户数（按seed随机抽样），为None时评估全部用户
+    """
+
+    def __init__(self, strategies: List[Strategy], k: int = 20, windows: int = 4, workers: int = 1,
+                 max_users: Optional[int] = None, relevant_types: Iterable[str] = RELEVANT_EVENT_TYPES, seed: int = 0):
+        names = [strategy.name for strategy in strategies]
+        if len(set(names)) != len(names):
+            raise ValueError(f"策略名称重复: {names}")
+        self.strategies = strategies
+        self.k = k
+        self.windows = windows
+        self.workers = workers
+        self.max_users = max_users
+        self.relevant_types = set(relevant_types)
+        self.random = random.Random(seed)
+
+    def run(self, train_events: List[ReplayEvent], test_events: List[ReplayEvent], catalog_size: int) -> Dict[str, Any]:
+        """
+        执行回放评估，返回各策略的质量和性能指标
+        """
+        seen: Dict[int, Set[int]] = defaultdict(set)
+        for _, user_id, post_id, _ in train_events:
+            seen[user_id].add(post_id)
+
+        report = {strategy.name: {"prepare": self._prepare(strategy, train_events)} for strategy in self.strategies}
+        totals = {strategy.name: {"recall": 0.0, "ndcg": 0.0, "users": 0, "recommended": set(), "latencies": []}
+                  for strategy in self.strategies}
+        window_reports = []
+
+        for window in split_windows(test_events, self.windows):
+            tasks = self._tasks(window, seen)
+            results = self._evaluate(tasks) if tasks else []
+            window_totals = {strategy.name: {"recall": 0.0, "ndcg": 0.0, "users": 0} for strategy in self.strategies}
+            for shard in results:
+                for name, values in shard.items():
+                    for key in ("recall", "ndcg", "users"):
+                        window_totals[name][key] += values[key]
+                        totals[name][key] += values[key]
+                    totals[name]["recommended"] |= values["recommended"]
+                    totals[name]["latencies"].extend(values["latencies"])
+            window_reports.append({
+                "start": window[0][0].isoformat(),
+                "end": window[-1][0].isoformat(),
+                "events": len(window),
+                "users": len(tasks),
+                "strategies": {name: self._quality(values) for name, values in window_totals.items()},
+            })
+
+            for strategy in self.strategies:
+                strategy.observe(window)
+            for _, user_id, post_id, _ in window:
+                seen[user_id].add(post_id)
+            logger.info("回放评估: 窗口[%s ~ %s] 用户[%d]", window_reports[-1]["start"], window_reports[-1]["end"], len(tasks))
+
+        for name, values in totals.items():
+            report[name].update(self._quality(values))
+            report[name]["coverage"] = len(values["recommended"]) / catalog_size if catalog_size else 0.0
+            report[name]["latency"] = latency_summary(values["latencies"])
+        return {
+            "k": self.k,
+            "train_events": len(train_events),
+            "test_events": len(test_events),
+            "catalog_size": catalog_size,
+            "workers": self.workers,
+            "strategies": report,
+            "windows": window_reports,
+        }
+
+    def _prepare(self, strategy: Strategy, train_events: List[ReplayEvent]) -> Dict[str, Any]:
+        """
+        构建策略状态，统计耗时和tracemalloc记录的常驻/峰值内存
+        """
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        strategy.prepare(train_events)
+        seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        if not tracing:
+            tracemalloc.stop()
+        return {"seconds": seconds, "memory_bytes": max(0, current - baseline), "peak_memory_bytes": max(0, peak - baseline)}
+
+    def _tasks(self, window: List[ReplayEvent], seen: Dict[int, Set[int]]) -> List[Tuple[int, Set[int], Set[int]]]:
+        """
+        窗口内每个用户新交互（此前未交互过）的相关帖子
+        """
+        relevant: Dict[int, Set[int]] = defaultdict(set)
+        for _, user_id, post_id, event_type in window:
+            if event_type in self.relevant_types and post_id not in seen[user_id]:
+                relevant[user_id].add(post_id)
+        users = sorted(relevant)
+        if self.max_users is not None and len(users) > self.max_users:
+            users = sorted(self.random.sample(users, self.max_users))
+        return [(user_id, relevant[user_id], set(seen[user_id])) for user_id in users]
+
+    def _evaluate(self, tasks: List[Tuple[int, Set[int], Set[int]]]) -> List[Dict[str, Dict[str, Any]]]:
+        global _worker_state
+        _worker_state = (self.strategies, self.k)
+        try:
+            if self.workers <= 1:
+                return [_evaluate_shard(tasks)]
+            shards = [tasks[i::self.workers * SHARDS_PER_WORKER] for i in range(self.workers * SHARDS_PER_WORKER)]
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"),
+                                     initializer=_init_worker) as executor:
+                return list(executor.map(_evaluate_shard, [shard for shard in shards if shard]))
+        finally:
+            _worker_state = None
+
+    @staticmethod
+    def _quality(values: Dict[str, Any]) -> Dict[str, Any]:
+        users = values["users"]
+        return {
+            "users": users,
+            "recall_at_k": values["recall"] / users if users else 0.0,
+            "ndcg_at_k": values["ndcg"] / users if users else 0.0,
+        }
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+"""
+进程内Redis替身
+
+只实现基准测试和推荐链路用到的命令，接口与redis.Redis(decode_responses=True)一致，
+异步替身FakeAsyncRedis与同步替身共享数据，
+用于在没有Redis服务的环境中运行基准测试。
+"""
+
+import queue
+import threading
+import time
+from typing import Dict, List, Set, Optional
+
+class FakeRedis:
+    def __init__(self):
+        self._sets: Dict[str, Set[str]] = {}
+        self._strings: Dict[str, str] = {}
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._zsets: Dict[str, Dict[str, float]] = {}
+        self._expire_at: Dict[str, float] = {}
+        self._subscribers: List["FakePubSub"] = []
+        self._lock = threading.Lock()
+
+    def _expired(self, key: str) -> bool:
+        expire_at = self._expire_at.get(key)
+        if expire_at is not None and expire_at <= time.time():
+            self._sets.pop(key, None)
+            self._strings.pop(key, None)
+            self._hashes.pop(key, None)
+            self._zsets.pop(key, None)
+            self._expire_at.pop(key, None)
+            return True
+        return False
+
+    def ping(self) -> bool:
+        return True
+
+    def sadd(self, key: str, *members) -> int:
+        with self._lock:
+            self._expired(key)
+            target = self._sets.setdefault(key, set())
+            before = len(target)
+            target.update(str(m) for m in members)
+            return len(target) - before
+
+    def smembers(self, key: str) -> Set[str]:
+        with self._lock:
+            if self._expired(key):
+                return set()
+            return set(self._sets.get(key, ()))
+
+    def sismember(self, key: str, member) -> bool:
+        with self._lock:
+            if self._expired(key):
+                return False
+            return str(member) in self._sets.get(key, ())
+
+    def scard(self, key: str) -> int:
+        with self._lock:
+            if self._expired(key):
+                return 0
+            return len(self._sets.get(key, ()))
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if self._expired(key):
+                return None
+            return self._strings.get(key)
+
+    def set(self, key: str, value, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and not self._expired(key) and key in self._strings:
+                return None
+            self._strings[key] = str(value)
+            if ex:
+                self._expire_at[key] = time.time() + ex
+            else:
+                self._expire_at.pop(key, None)
+            return True
+
+    def hset(self, key: str, field=None, value=None, mapping: Optional[Dict] = None) -> int:
+        with self._lock:
+            self._expired(key)
+            target = self._hashes.setdefault(key, {})
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = len(set(items) - set(target))
+            target.update({str(k): str(v) for k, v in items.items()})
+            return added
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            if self._expired(key):
+                return {}
+            return dict(self._hashes.get(key, {}))
+
+    def hincrby(self, key: str, field, amount: int = 1) -> int:
+        with self._lock:
+            self._expired(key)
+            target = self._hashes.setdefault(key, {})
+            value = int(target.get(str(field), 0)) + amount
+            target[str(field)] = str(value)
+            return value
+
+    def zincrby(self, key: str, amount: float, member) -> float:
+        with self._lock:
+            self._expired(key)
+            target = self._zsets.setdefault(key, {})
+            target[str(member)] = target.get(str(member), 0.0) + float(amount)
+            return target[str(member)]
+
+    def zscore(self, key: str, member) -> Optional[float]:
+        with self._lock:
+            if self._expired(key):
+                return None
+            return self._zsets.get(key, {}).get(str(member))
+
+    def _ranked(self, key: str, reverse: bool):
+        return sorted(self._zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]), reverse=reverse)
+
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False):
+        with self._lock:
+            if self._expired(key):
+                return []
+            ranked = self._ranked(key, reverse=True)
+            selected = ranked[start:] if end == -1 else ranked[start:end + 1]
+            return selected if withscores else [member for member, _ in selected]
+
+    def zremrangebyrank(self, key: str, start: int, end: int) -> int:
+        with self._lock:
+            if self._expired(key):
+                return 0
+            ranked = self._ranked(key, reverse=False)
+            size = len(ranked)
+            start, end = (start + size if start < 0 else start), (end + size if end < 0 else end)
+            removed = ranked[max(start, 0):end + 1] if end >= 0 else []
+            for member, _ in removed:
+                del self._zsets[key][member]
+            return len(removed)
+
+    def zunionstore(self, dest: str, keys: Dict[str, float]) -> int:
+        with self._lock:
+            union: Dict[str, float] = {}
+            for key, weight in keys.items():
+                if self._expired(key):
+                    continue
+                for member, score in self._zsets.get(key, {}).items():
+                    union[member] = union.get(member, 0.0) + score * weight
+            self._zsets[dest] = union
+            self._expire_at.pop(dest, None)
+            return len(union)
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if not any(key in store for store in (self._sets, self._strings, self._hashes, self._zsets)):
+                return False
+            self._expire_at[key] = time.time() + seconds
+            return True
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if any(store.pop(key, None) is not None for store in (self._sets, self._strings, self._hashes, self._zsets)):
+                    removed += 1
+                self._expire_at.pop(key, None)
+            return removed
+
+    def publish(self, channel: str, message) -> int:
+        with self._lock:
+            subscribers = [sub for sub in self._subscribers if channel in sub.channels]
+        for sub in subscribers:
+            sub.messages.put({"type": "message", "channel": channel, "data": str(message)})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "FakePubSub":
+        return FakePubSub(self)
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._sets.clear()
+            self._strings.clear()
+            self._hashes.clear()
+            self._zsets.clear()
+            self._expire_at.clear()
+            return True
+
+class FakePubSub:
+    """
+    redis发布订阅的替身，只投递订阅之后发布的消息，不产生订阅确认消息
+    """
+
+    def __init__(self, backend: FakeRedis):
+        self._backend = backend
+        self.channels: Set[str] = set()
+        self.messages: "queue.Queue[dict]" = queue.Queue()
+
+    def subscribe(self, *channels):
+        with self._backend._lock:
+            self.channels.update(channels)
+            if self not in self._backend._subscribers:
+                self._backend._subscribers.append(self)
+
+    def get_message(self, timeout: float = 0.0) -> Optional[dict]:
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        with self._backend._lock:
+            if self in self._backend._subscribers:
+                self._backend._subscribers.remove(self)
+
+class FakePipeline:
+    """
+    redis同步管道的替身，命令在execute时依次执行
+    """
+
+    def __init__(self, backend: FakeRedis):
+        self._backend = backend
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._backend, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+class FakeAsyncPipeline:
+    """
+    redis.asyncio管道的替身，命令在execute时依次执行
+    """
+
+    def __init__(self, backend: FakeRedis):
+        self._backend = backend
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._backend, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+class FakeAsyncRedis:
+    """
+    redis.asyncio.Redis的替身，与同步替身共享数据
+    """
+
+    def __init__(self, backend: FakeRedis):
+        self._backend = backend
+
+    def pipeline(self, transaction: bool = True) -> FakeAsyncPipeline:
+        return FakeAsyncPipeline(self._backend)
+
+    def __getattr__(self, name):
+        method = getattr(self._backend, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成数据生成器
+
+按可配置规模生成用户、带标签分布的帖子和服从Zipf分布的行为事件，
+可写入SQLite/MySQL（任意SQLAlchemy URL），并把浏览记录写入Redis（或FakeRedis）用于消重。
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterator
+
+import numpy as np
+from sqlalchemy import bindparam
+
+# 标签词表，按下标顺序从热到冷
+TAG_VOCABULARY = [
+    "科技", "编程", "人工智能", "娱乐", "体育", "新闻", "科学", "音乐", "电影", "游戏",
+    "美食", "旅行", "摄影", "健康", "财经", "教育", "汽车", "时尚", "历史", "文学",
+    "动漫", "宠物", "家居", "育儿", "职场", "心理", "设计", "数码", "军事", "天文"
+]
+
+EVENT_TYPES = ["view", "click", "like", "favorite"]
+EVENT_TYPE_WEIGHTS = [0.6, 0.2, 0.12, 0.08]
+
+EVENT_SOURCES = ["recommendation", "home", "search", "related"]
+
+class SyntheticDataConfig:
+    """
+    合成数据规模配置
+    默认用户数为帖子数的1/10，事件数为帖子数的5倍
+    """
+
+    def __init__(self, post_count: int, user_count: int = None, event_count: int = None,
+                 tag_skew: float = 1.1, post_skew: float = 1.05, user_skew: float = 0.8,
+                 days: int = 30, seed: int = 42):
+        self.post_count = post_count
+        self.user_count = user_count or max(post_count // 10, 10)
+        self.event_count = event_count if event_count is not None else post_count * 5
+        self.tag_skew = tag_skew      # 标签热度的Zipf指数
+        self.post_skew = post_skew    # 帖子被交互次数的Zipf指数
+        self.user_skew = user_skew    # 用户活跃度的Zipf指数
+        self.days = days              # 数据覆盖的天数
+        self.seed = seed
+
+def zipf_probabilities(n: int, skew: float) -> np.ndarray:
+    """
+    有限集合上的Zipf分布：第i个元素的概率正比于 1 / i^skew
+    """
+    weights = 1.0 / np.power(np.arange(1, n + 1, dtype=np.float64), skew)
+    return weights / weights.sum()
+
+class SyntheticDataGenerator:
+    """
+    合成数据生成器，ID从1开始连续分配，便于基准测试按ID采样
+    """
+
+    def __init__(self, config: SyntheticDataConfig):
+        self.config = config
+        self.rng = np.random.default_rng(config.seed)
+        self.random = random.Random(config.seed)
+        self.now = datetime.utcnow()
+        self.tag_probabilities = zipf_probabilities(len(TAG_VOCABULARY), config.tag_skew)
+        self.post_probabilities = zipf_probabilities(config.post_count, config.post_skew)
+        self.user_probabilities = zipf_probabilities(config.user_count, config.user_skew)
+
+    def _sample_tags(self, low: int, high: int):
+        """
+        采样标签，返回 (标签名称列表, 标签ID列表)，标签ID为词表下标加1
+        """
+        size = int(self.rng.integers(low, high + 1))
+        indexes = self.rng.choice(len(TAG_VOCABULARY), size=size, replace=False, p=self.tag_probabilities)
+        return [TAG_VOCABULARY[i] for i in indexes], [int(i) + 1 for i in indexes]
+
+    def tags(self) -> List[Dict[str, Any]]:
+        # 按热度顺序分配标签ID，与线上回填规则一致
+        return [{"tag_id": i + 1, "name": name, "create_time": self.now} for i, name in enumerate(TAG_VOCABULARY)]
+
+    def _random_time(self) -> datetime:
+        return self.now - timedelta(seconds=int(self.rng.integers(0, self.config.days * 86400)))
+
+    def users(self, batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for user_id in range(1, self.config.user_count + 1):
+            names, tag_ids = self._sample_tags(2, 4)
+            batch.append({
+                "user_id": user_id,
+                "username": f"bench_user_{user_id}",
+                "create_time": self._random_time(),
+                "tags": {"interests": names},
+                "tag_ids": tag_ids,
+                "preferences": {}
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def posts(self, batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for post_id in range(1, self.config.post_count + 1):
+            names, tag_ids = self._sample_tags(1, 3)
+            batch.append({
+                "post_id": post_id,
+                "title": f"合成帖子 {post_id}",
+                "content": f"这是第{post_id}篇合成帖子的内容，" * 8,
+                "author_id": int(self.rng.integers(1, self.config.user_count + 1)),
+                "create_time": self._random_time(),
+                "tags": {"tags": names},
+                "tag_ids": tag_ids,
+                "view_count": 0,
+                "like_count": 0,
+                "favorite_count": 0
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def events(self, batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        热门帖子和活跃用户都服从Zipf分布，按批次生成
+        """
+        event_id = 1
+        remaining = self.config.event_count
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            user_ids = self.rng.choice(self.config.user_count, size=size, p=self.user_probabilities) + 1
+            post_ids = self.rng.choice(self.config.post_count, size=size, p=self.post_probabilities) + 1
+            event_types = self.rng.choice(len(EVENT_TYPES), size=size, p=EVENT_TYPE_WEIGHTS)
+            batch = []
+            for user_id, post_id, event_type in zip(user_ids, post_ids, event_types):
+                batch.append({
+                    "event_id": event_id,
+                    "user_id": int(user_id),
+                    "post_id": int(post_id),
+                    "event_type": EVENT_TYPES[event_type],
+                    "timestamp": self._random_time(),
+                    "source": self.random.choice(EVENT_SOURCES),
+                    "device_info": {"type": "benchmark"},
+                    "extra": None
+                })
+                event_id += 1
+            remaining -= size
+            yield batch
+
+    def sample_user_ids(self, size: int) -> List[int]:
+        """
+        按活跃度分布采样请求用户
+        """
+        return [int(u) + 1 for u in self.rng.choice(self.config.user_count, size=size, p=self.user_probabilities)]
+
+    def sample_post_ids(self, size: int) -> List[int]:
+        """
+        按热度分布采样请求帖子
+        """
+        return [int(p) + 1 for p in self.rng.choice(self.config.post_count, size=size, p=self.post_probabilities)]
+
+def load_synthetic_data(generator: SyntheticDataGenerator, session_factory, redis_conn=None,
+                        batch_size: int = 10000) -> Dict[str, int]:
+    """
+    将合成数据写入数据库，并把浏览/点击记录写入Redis消重集合
+    返回各表写入的行数
+    """
+    from models.models import User, Post, PostTag, Event, Tag
+    from redis_client import USER_VIEWED_POSTS_PREFIX
+
+    counts = {"tags": 0, "users": 0, "posts": 0, "events": 0}
+    db = session_factory()
+    try:
+        tags = generator.tags()
+        db.execute(Tag.__table__.insert(), tags)
+        counts["tags"] = len(tags)
+        for batch in generator.users(batch_size):
+            db.execute(User.__table__.insert(), batch)
+            counts["users"] += len(batch)
+        for batch in generator.posts(batch_size):
+            db.execute(Post.__table__.insert(), batch)
+            db.execute(PostTag.__table__.insert(),
+                       [{"tag_id": tag_id, "post_id": post["post_id"]} for post in batch for tag_id in post["tag_ids"]])
+            counts["posts"] += len(batch)
+
+        post_counters: Dict[int, Dict[str, int]] = {}
+        for batch in generator.events(batch_size):
+            db.execute(Event.__table__.insert(), batch)
+            counts["events"] += len(batch)
+            for event in batch:
+                counter = post_counters.setdefault(event["post_id"], {"view_count": 0, "like_count": 0, "favorite_count": 0})
+                if event["event_type"] in ("view", "click"):
+                    counter["view_count"] += 1
+                    if redis_conn is not None:
+                        redis_conn.sadd(f"{USER_VIEWED_POSTS_PREFIX}{event['user_id']}", str(event["post_id"]))
+                elif event["event_type"] == "like":
+                    counter["like_count"] += 1
+                elif event["event_type"] == "favorite":
+                    counter["favorite_count"] += 1
+
+        # 回填帖子的计数字段
+        # bindparam不能与列同名，统一加b_前缀
+        rows = [{f"b_{key}": value for key, value in dict(counter, post_id=post_id).items()}
+                for post_id, counter in post_counters.items()]
+        update = Post.__table__.update().where(Post.__table__.c.post_id == bindparam("b_post_id")).values(
+            view_count=bindparam("b_view_count"),
+            like_count=bindparam("b_like_count"),
+            favorite_count=bindparam("b_favorite_count")
+        )
+        for i in range(0, len(rows), batch_size):
+            db.execute(update, rows[i:i + batch_size])
+
+        db.commit()
+    finally:
+        db.close()
+    return counts
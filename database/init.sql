@@ -15,6 +15,7 @@ CREATE TABLE IF NOT EXISTS users (
     username VARCHAR(64) NOT NULL,
     create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     tags JSON,
+    tag_ids JSON,
     preferences JSON
 );
 
@@ -26,24 +27,46 @@ CREATE TABLE IF NOT EXISTS posts (
     author_id BIGINT NOT NULL,
     create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     tags JSON,
+    tag_ids JSON,
     view_count INT DEFAULT 0,
     like_count INT DEFAULT 0,
     favorite_count INT DEFAULT 0,
     FOREIGN KEY (author_id) REFERENCES users(user_id)
 );
 
--- 行为表
+-- 标签词表，为标签分配稠密的整数ID
+CREATE TABLE IF NOT EXISTS tags (
+    tag_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(64) NOT NULL,
+    create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uix_tags_name (name)
+);
+
+-- 帖子标签关联表，主键以tag_id开头，按标签召回帖子时走索引范围扫描
+CREATE TABLE IF NOT EXISTS post_tags (
+    tag_id INT NOT NULL,
+    post_id BIGINT NOT NULL,
+    PRIMARY KEY (tag_id, post_id),
+    FOREIGN KEY (tag_id) REFERENCES tags(tag_id),
+    FOREIGN KEY (post_id) REFERENCES posts(post_id) ON DELETE CASCADE
+);
+
+-- 行为表，按月范围分区
+-- 分区表的主键必须包含分区键，且不支持外键，user_id/post_id的有效性由写入接口校验；
+-- p_future接收尚未建立月分区的数据，由docker/scripts/event_partitions.py拆分出新的月分区并清理过期分区
 CREATE TABLE IF NOT EXISTS events (
-    event_id BIGINT PRIMARY KEY,
+    event_id BIGINT NOT NULL,
     user_id BIGINT NOT NULL,
     post_id BIGINT NOT NULL,
     event_type VARCHAR(32) NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     source VARCHAR(64),
     device_info JSON,
     extra JSON,
-    FOREIGN KEY (user_id) REFERENCES users(user_id),
-    FOREIGN KEY (post_id) REFERENCES posts(post_id)
+    PRIMARY KEY (event_id, timestamp)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
 );
 
 -- 特征表
@@ -53,7 +76,8 @@ CREATE TABLE IF NOT EXISTS features (
     entity_id BIGINT NOT NULL,
     feature_type VARCHAR(32) NOT NULL,
     feature_value JSON NOT NULL,
-    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uix_feature_entity_type (entity_type, entity_id, feature_type)
 );
 
 -- 点赞表
@@ -79,16 +103,36 @@ CREATE TABLE IF NOT EXISTS favorites (
     UNIQUE KEY (user_id, post_id)
 );
 
+-- 推荐曝光日志表，只追加写入，每行是一次推荐响应中的一个帖子
+-- 由backend/services/impressions.py后台批量插入，不设外键；ETL按served_at增量同步到数据仓库
+CREATE TABLE IF NOT EXISTS impressions (
+    request_id BIGINT NOT NULL,
+    position INT NOT NULL,
+    user_id BIGINT NOT NULL,
+    post_id BIGINT NOT NULL,
+    score FLOAT,
+    source VARCHAR(32),
+    latency_ms FLOAT,
+    served_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (request_id, position)
+);
+
 -- 创建索引
 CREATE INDEX idx_posts_author ON posts(author_id);
-CREATE INDEX idx_events_user ON events(user_id);
-CREATE INDEX idx_events_post ON events(post_id);
+CREATE INDEX idx_post_tags_post ON post_tags(post_id);
+CREATE INDEX idx_posts_create_time ON posts(create_time);
+-- 行为表的组合索引与services/event_queries.py中的热路径查询一一对应，
+-- 前两个为覆盖索引，查询只读取索引即可返回
+CREATE INDEX idx_events_user_type_time ON events(user_id, event_type, timestamp, post_id);
+CREATE INDEX idx_events_post_type_time_user ON events(post_id, event_type, timestamp, user_id);
+CREATE INDEX idx_events_user_time ON events(user_id, timestamp);
+CREATE INDEX idx_events_post_time ON events(post_id, timestamp);
 CREATE INDEX idx_events_type ON events(event_type);
-CREATE INDEX idx_features_entity ON features(entity_type, entity_id);
 CREATE INDEX idx_likes_user ON likes(user_id);
 CREATE INDEX idx_likes_post ON likes(post_id);
 CREATE INDEX idx_favorites_user ON favorites(user_id);
 CREATE INDEX idx_favorites_post ON favorites(post_id);
+CREATE INDEX idx_impressions_served_at ON impressions(served_at);
 
 -- 创建示例用户数据
 INSERT INTO users (user_id, username, tags, preferences)
@@ -278,4 +322,33 @@ VALUES
 (3077, 1004, 2013, 'view', 'search', '{"type": "tablet", "os": "iPadOS"}'),
 (3078, 1005, 2014, 'view', 'home', '{"type": "desktop", "os": "macOS"}'),
 (3079, 1006, 2001, 'view', 'recommendation', '{"type": "mobile", "os": "Android"}'),
-(3080, 1007, 2002, 'view', 'search', '{"type": "tablet", "os": "iPadOS"}');
\ No newline at end of file
+(3080, 1007, 2002, 'view', 'search', '{"type": "tablet", "os": "iPadOS"}');
+
+-- 根据示例数据生成标签词表，出现次数越多的标签ID越小
+INSERT IGNORE INTO tags (name)
+SELECT name FROM (
+    SELECT jt.name FROM posts, JSON_TABLE(posts.tags, '$.tags[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+    UNION ALL
+    SELECT jt.name FROM users, JSON_TABLE(users.tags, '$.interests[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+) all_tags
+WHERE name IS NOT NULL AND name <> ''
+GROUP BY name
+ORDER BY COUNT(*) DESC, name;
+
+-- 回填帖子和用户的标签ID
+UPDATE posts SET tag_ids = (
+    SELECT COALESCE(JSON_ARRAYAGG(t.tag_id), JSON_ARRAY())
+    FROM JSON_TABLE(posts.tags, '$.tags[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+    JOIN tags t ON t.name = jt.name
+);
+UPDATE users SET tag_ids = (
+    SELECT COALESCE(JSON_ARRAYAGG(t.tag_id), JSON_ARRAY())
+    FROM JSON_TABLE(users.tags, '$.interests[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+    JOIN tags t ON t.name = jt.name
+);
+
+-- 生成帖子标签关联
+INSERT IGNORE INTO post_tags (tag_id, post_id)
+SELECT jt.tag_id, posts.post_id
+FROM posts, JSON_TABLE(posts.tag_ids, '$[*]' COLUMNS (tag_id INT PATH '$')) jt
+WHERE jt.tag_id IS NOT NULL;
@@ -0,0 +1,39 @@
+-- 标签词表迁移：为已有数据库增加tags表和帖子/用户的tag_ids字段，并回填历史数据
+-- 新部署直接使用init.sql，无需执行本脚本
+USE recommender;
+
+CREATE TABLE IF NOT EXISTS tags (
+    tag_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(64) NOT NULL,
+    create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uix_tags_name (name)
+);
+
+ALTER TABLE posts ADD COLUMN tag_ids JSON AFTER tags;
+ALTER TABLE users ADD COLUMN tag_ids JSON AFTER tags;
+
+-- 出现次数越多的标签ID越小，已存在的标签保持原ID
+INSERT IGNORE INTO tags (name)
+SELECT name FROM (
+    SELECT jt.name FROM posts, JSON_TABLE(posts.tags, '$.tags[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+    UNION ALL
+    SELECT jt.name FROM users, JSON_TABLE(users.tags, '$.interests[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+) all_tags
+WHERE name IS NOT NULL AND name <> ''
+GROUP BY name
+ORDER BY COUNT(*) DESC, name;
+
+-- 回填标签ID，只处理尚未回填的行，可重复执行
+UPDATE posts SET tag_ids = (
+    SELECT COALESCE(JSON_ARRAYAGG(t.tag_id), JSON_ARRAY())
+    FROM JSON_TABLE(posts.tags, '$.tags[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+    JOIN tags t ON t.name = jt.name
+)
+WHERE tag_ids IS NULL;
+
+UPDATE users SET tag_ids = (
+    SELECT COALESCE(JSON_ARRAYAGG(t.tag_id), JSON_ARRAY())
+    FROM JSON_TABLE(users.tags, '$.interests[*]' COLUMNS (name VARCHAR(64) PATH '$')) jt
+    JOIN tags t ON t.name = jt.name
+)
+WHERE tag_ids IS NULL;
@@ -0,0 +1,18 @@
+-- 帖子标签关联表迁移：按标签召回帖子由JSON全表扫描改为post_tags主键范围扫描
+-- 依赖001_tag_vocabulary.sql回填的posts.tag_ids；新部署直接使用init.sql，无需执行本脚本
+USE recommender;
+
+CREATE TABLE IF NOT EXISTS post_tags (
+    tag_id INT NOT NULL,
+    post_id BIGINT NOT NULL,
+    PRIMARY KEY (tag_id, post_id),
+    KEY idx_post_tags_post (post_id),
+    FOREIGN KEY (tag_id) REFERENCES tags(tag_id),
+    FOREIGN KEY (post_id) REFERENCES posts(post_id) ON DELETE CASCADE
+);
+
+-- 回填已有帖子的标签关联，可重复执行
+INSERT IGNORE INTO post_tags (tag_id, post_id)
+SELECT jt.tag_id, posts.post_id
+FROM posts, JSON_TABLE(posts.tag_ids, '$[*]' COLUMNS (tag_id INT PATH '$')) jt
+WHERE jt.tag_id IS NOT NULL;
@@ -0,0 +1,21 @@
+-- 行为表组合索引迁移：用与热路径查询匹配的组合/覆盖索引替换单列索引
+-- 新部署直接使用init.sql，无需执行本脚本；查询与索引的对应关系见backend/services/event_queries.py
+USE recommender;
+
+-- 用户画像最近交互、消重、协同过滤第二步：(user_id, event_type) 等值/IN过滤，按timestamp排序，覆盖post_id
+CREATE INDEX idx_events_user_type_time ON events(user_id, event_type, timestamp, post_id);
+-- 协同过滤第一步：post_id IN + event_type IN，覆盖user_id
+CREATE INDEX idx_events_post_type_user ON events(post_id, event_type, user_id);
+-- 用户/帖子行为历史：按timestamp倒序取最近N条
+CREATE INDEX idx_events_user_time ON events(user_id, timestamp);
+CREATE INDEX idx_events_post_time ON events(post_id, timestamp);
+-- 随机召回按最近一周过滤帖子
+CREATE INDEX idx_posts_create_time ON posts(create_time);
+
+-- 单列索引是新组合索引的前缀，外键可以使用组合索引，删除以减少写入放大
+DROP INDEX idx_events_user ON events;
+DROP INDEX idx_events_post ON events;
+
+-- 迁移后可用以下语句确认执行计划（type应为ref/range，Extra包含Using index）：
+-- EXPLAIN SELECT post_id FROM events WHERE user_id = 1001 AND event_type IN ('like', 'favorite') ORDER BY timestamp DESC LIMIT 200;
+-- EXPLAIN SELECT DISTINCT user_id FROM events WHERE post_id IN (2001, 2002) AND user_id != 1001 AND event_type IN ('like', 'favorite');
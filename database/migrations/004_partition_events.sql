@@ -0,0 +1,25 @@
+-- 行为表按月分区迁移：events按timestamp范围分区，过期月份由docker/scripts/event_partitions.py整体删除
+-- 新部署直接使用init.sql，无需执行本脚本
+-- 分区表不支持外键，且主键必须包含分区列；events数据量较大时请在低峰期执行
+USE recommender;
+
+-- 1. 删除外键约束，约束名由MySQL自动生成，可用以下语句查询后替换：
+-- SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+-- WHERE CONSTRAINT_SCHEMA = 'recommender' AND TABLE_NAME = 'events';
+ALTER TABLE events DROP FOREIGN KEY events_ibfk_1, DROP FOREIGN KEY events_ibfk_2;
+
+-- 2. 分区列不允许为空，主键加入timestamp
+UPDATE events SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL;
+ALTER TABLE events
+    MODIFY timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (event_id, timestamp);
+
+-- 3. 协同过滤索引加入timestamp，使带时间窗口的查询仍由覆盖索引返回
+CREATE INDEX idx_events_post_type_time_user ON events(post_id, event_type, timestamp, user_id);
+DROP INDEX idx_events_post_type_user ON events;
+
+-- 4. 所有历史数据先放入p_future，再执行 python docker/scripts/event_partitions.py --no-retention 拆分出月分区
+ALTER TABLE events PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
@@ -0,0 +1,16 @@
+-- 在线特征存储迁移：features表按(实体类型, 实体ID, 特征组)唯一，批量任务使用ON DUPLICATE KEY UPDATE覆盖写入
+-- 新部署直接使用init.sql，无需执行本脚本；读取逻辑见backend/services/feature_store.py
+USE recommender;
+
+-- 清理重复行，每组特征只保留最近更新的一行
+DELETE f1 FROM features f1
+JOIN features f2
+  ON f1.entity_type = f2.entity_type
+ AND f1.entity_id = f2.entity_id
+ AND f1.feature_type = f2.feature_type
+ AND (f1.update_time < f2.update_time OR (f1.update_time = f2.update_time AND f1.feature_id < f2.feature_id));
+
+ALTER TABLE features ADD UNIQUE KEY uix_feature_entity_type (entity_type, entity_id, feature_type);
+
+-- 原索引是唯一键的前缀，删除以减少写入放大
+DROP INDEX idx_features_entity ON features;
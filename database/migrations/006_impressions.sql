@@ -0,0 +1,17 @@
+-- 推荐曝光日志表，由backend/services/impressions.py后台批量写入，ETL同步到raw.impressions
+-- 新部署直接使用init.sql，无需执行本脚本
+USE recommender;
+
+CREATE TABLE IF NOT EXISTS impressions (
+    request_id BIGINT NOT NULL,
+    position INT NOT NULL,
+    user_id BIGINT NOT NULL,
+    post_id BIGINT NOT NULL,
+    score FLOAT,
+    source VARCHAR(32),
+    latency_ms FLOAT,
+    served_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (request_id, position)
+);
+
+CREATE INDEX idx_impressions_served_at ON impressions(served_at);
@@ -16,6 +16,10 @@ SCRIPT_DIR="$(dirname "$0")"
 # 日志文件
 LOG_FILE="$LOG_DIR/etl_$TIMESTAMP.log"
 
+# 后端代码目录和服务快照目录（需与后端容器挂载同一目录）
+BACKEND_DIR="${BACKEND_DIR:-/backend}"
+SERVING_SNAPSHOT_DIR="${SERVING_SNAPSHOT_DIR:-/data/snapshots}"
+
 # 函数：执行全量同步
 full_sync() {
     echo "开始执行全量同步..." | tee -a "$LOG_FILE"
@@ -60,6 +64,28 @@ sync_only() {
     fi
 }
 
+# 函数：维护行为表分区
+event_partitions() {
+    echo "开始维护行为表分区..." | tee -a "$LOG_FILE"
+    python "$SCRIPT_DIR/event_partitions.py" >> "$LOG_FILE" 2>&1
+    if [ $? -eq 0 ]; then
+        echo "行为表分区维护完成" | tee -a "$LOG_FILE"
+    else
+        echo "行为表分区维护失败，请查看日志文件：$LOG_FILE" | tee -a "$LOG_FILE"
+    fi
+}
+
+# 函数：构建相关推荐的服务索引快照（标签倒排表、帖子近邻表），后端进程检测到新版本后自动切换
+serving_snapshot() {
+    echo "开始构建服务索引快照..." | tee -a "$LOG_FILE"
+    (cd "$BACKEND_DIR" && python -m services.snapshot --output "$SERVING_SNAPSHOT_DIR") >> "$LOG_FILE" 2>&1
+    if [ $? -eq 0 ]; then
+        echo "服务索引快照构建完成" | tee -a "$LOG_FILE"
+    else
+        echo "服务索引快照构建失败，请查看日志文件：$LOG_FILE" | tee -a "$LOG_FILE"
+    fi
+}
+
 # 函数：清理旧日志
 clean_old_logs() {
     echo "清理7天前的日志文件..." | tee -a "$LOG_FILE"
@@ -82,6 +108,12 @@ main() {
         "sync")
             sync_only
             ;;
+        "partitions")
+            event_partitions
+            ;;
+        "snapshot")
+            serving_snapshot
+            ;;
         *)
             incremental_sync
             ;;
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+行为表分区维护脚本
+
+MySQL的events表和PostgreSQL的raw.events表都按月范围分区，本脚本负责：
+1. 提前创建未来几个月的分区（MySQL从p_future拆分，PostgreSQL创建raw.events_YYYYMM）
+2. 将raw.events中超过保留期的月分区压缩为dw.fact_event_daily_counts日汇总后删除
+3. 删除MySQL中超过保留期且已同步到数据仓库的月分区
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta, date
+from typing import List, Dict, Optional
+
+from mysql_to_postgres import connect_mysql, connect_postgres, logger
+
+# 提前创建的分区月数
+EVENT_PARTITION_MONTHS_AHEAD = int(os.getenv("EVENT_PARTITION_MONTHS_AHEAD", "3"))
+# MySQL events表的保留天数，需大于后端召回和消重使用的EVENT_LOOKBACK_DAYS
+MYSQL_EVENTS_RETENTION_DAYS = int(os.getenv("MYSQL_EVENTS_RETENTION_DAYS", "120"))
+# 数据仓库raw.events明细的保留天数，更早的数据只保留日汇总
+RAW_EVENTS_RETENTION_DAYS = int(os.getenv("RAW_EVENTS_RETENTION_DAYS", "180"))
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(value: date, months: int) -> date:
+    years, month = divmod(value.month - 1 + months, 12)
+    return date(value.year + years, month + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"p{month.strftime('%Y%m')}"
+
+def partition_month(name: str) -> Optional[date]:
+    """
+    从分区名（pYYYYMM或raw.events_YYYYMM）解析月份，不是月分区时返回None
+    """
+    suffix = name[-6:]
+    if not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+def get_mysql_event_partitions(cursor) -> List[str]:
+    cursor.execute("""
+        SELECT PARTITION_NAME
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'events' AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    return [row['PARTITION_NAME'] for row in cursor.fetchall()]
+
+def ensure_mysql_event_partitions(months_ahead: int = EVENT_PARTITION_MONTHS_AHEAD):
+    """
+    从p_future拆分出截至未来months_ahead个月的月分区
+    第一次拆分出的分区同时包含更早的历史数据
+    """
+    conn = connect_mysql()
+    try:
+        with conn.cursor() as cursor:
+            partitions = get_mysql_event_partitions(cursor)
+            if 'p_future' not in partitions:
+                logger.warning("events表没有p_future分区，跳过MySQL分区维护")
+                return
+
+            months = [partition_month(name) for name in partitions if partition_month(name)]
+            first = add_months(max(months), 1) if months else month_start(datetime.utcnow())
+            last = add_months(month_start(datetime.utcnow()), months_ahead)
+            new_months = []
+            month = first
+            while month <= last:
+                new_months.append(month)
+                month = add_months(month, 1)
+            if not new_months:
+                logger.info("MySQL events分区已是最新")
+                return
+
+            definitions = [
+                f"PARTITION {partition_name(m)} VALUES LESS THAN (UNIX_TIMESTAMP('{add_months(m, 1).isoformat()} 00:00:00'))"
+                for m in new_months
+            ]
+            definitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+            cursor.execute(f"ALTER TABLE events REORGANIZE PARTITION p_future INTO ({', '.join(definitions)})")
+        conn.commit()
+        logger.info(f"MySQL events新增分区: {[partition_name(m) for m in new_months]}")
+    finally:
+        conn.close()
+
+def ensure_postgres_event_partitions(months_ahead: int = EVENT_PARTITION_MONTHS_AHEAD):
+    """
+    创建当前月到未来months_ahead个月的raw.events分区
+    默认分区中已有对应月份数据时，先把这些行移到新建的表中再挂载为分区
+    """
+    conn = connect_postgres()
+    try:
+        cursor = conn.cursor()
+        partitions = get_postgres_event_partitions(cursor)
+        current = month_start(datetime.utcnow())
+        for i in range(months_ahead + 1):
+            month = add_months(current, i)
+            name = f"events_{month.strftime('%Y%m')}"
+            if name in partitions:
+                continue
+            try:
+                if 'events_default' in partitions:
+                    moved = create_postgres_partition_from_default(cursor, name, month)
+                    if moved:
+                        logger.info("已将默认分区中%d行移入新分区raw.%s", moved, name)
+                else:
+                    cursor.execute(
+                        f"CREATE TABLE raw.{name} PARTITION OF raw.events FOR VALUES FROM (%s) TO (%s)",
+                        (month, add_months(month, 1))
+                    )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error("创建raw.events分区[%s]失败: %s", month.strftime('%Y%m'), e)
+        cursor.close()
+        logger.info("raw.events分区检查完成")
+    finally:
+        conn.close()
+
+def create_postgres_partition_from_default(cursor, name: str, month: date) -> int:
+    """
+    在同一事务中新建普通表，把默认分区中该月的行移入后挂载为raw.events的分区，返回移动的行数
+    挂载时PostgreSQL会扫描默认分区确认没有落在该月范围内的行，这些行已在同一事务中删除
+    """
+    bounds = (month, add_months(month, 1))
+    cursor.execute(f"CREATE TABLE raw.{name} (LIKE raw.events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM raw.events_default WHERE timestamp >= %s AND timestamp < %s RETURNING *
+        )
+        INSERT INTO raw.{name} SELECT * FROM moved
+        """,
+        bounds
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE raw.events ATTACH PARTITION raw.{name} FOR VALUES FROM (%s) TO (%s)", bounds)
+    return moved
+
+def get_postgres_event_partitions(cursor) -> Dict[str, Optional[date]]:
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        JOIN pg_namespace n ON n.oid = p.relnamespace
+        WHERE n.nspname = 'raw' AND p.relname = 'events'
+    """)
+    return {row[0]: partition_month(row[0]) for row in cursor.fetchall()}
+
+# 将一段明细按(日期, 用户, 帖子, 事件类型, 来源)汇总写入日汇总表
+# 已有汇总时累加：每次压缩都与删除对应明细在同一事务中提交，后续压缩的只会是之后才过期的新明细（如默认分区中迟到的行）
+COMPACT_SQL = """
+    INSERT INTO dw.fact_event_daily_counts (event_date, user_id, post_id, event_type, source, event_count, update_time)
+    SELECT
+        timestamp::DATE as event_date,
+        user_id,
+        post_id,
+        event_type,
+        COALESCE(source, '') as source,
+        COUNT(*) as event_count,
+        NOW() as update_time
+    FROM {table}
+    WHERE timestamp < %s
+    GROUP BY timestamp::DATE, user_id, post_id, event_type, COALESCE(source, '')
+    ON CONFLICT (event_date, user_id, post_id, event_type, source) DO UPDATE
+    SET event_count = dw.fact_event_daily_counts.event_count + EXCLUDED.event_count,
+        update_time = EXCLUDED.update_time
+"""
+
+def compact_raw_events(retention_days: int = RAW_EVENTS_RETENTION_DAYS):
+    """
+    压缩raw.events中超过保留期的数据：
+    整月都已过期的分区汇总后直接删除，默认分区中过期的行汇总后删除
+    """
+    cutoff = month_start(datetime.utcnow() - timedelta(days=retention_days))
+    conn = connect_postgres()
+    try:
+        cursor = conn.cursor()
+        partitions = get_postgres_event_partitions(cursor)
+        expired = sorted(name for name, month in partitions.items() if month and add_months(month, 1) <= cutoff)
+        for name in expired:
+            cursor.execute(COMPACT_SQL.format(table=f"raw.{name}"), (cutoff,))
+            rows = cursor.rowcount
+            cursor.execute(f"DROP TABLE raw.{name}")
+            conn.commit()
+            logger.info(f"已压缩并删除分区raw.{name}，写入日汇总{rows}行")
+
+        if 'events_default' in partitions:
+            cursor.execute(COMPACT_SQL.format(table="raw.events_default"), (cutoff,))
+            cursor.execute("DELETE FROM raw.events_default WHERE timestamp < %s", (cutoff,))
+            conn.commit()
+            logger.info(f"已压缩默认分区中{cursor.rowcount}行过期数据")
+        cursor.close()
+    finally:
+        conn.close()
+
+def drop_mysql_event_partitions(retention_days: int = MYSQL_EVENTS_RETENTION_DAYS):
+    """
+    删除MySQL中超过保留期的月分区，只删除已经同步到数据仓库的分区
+    """
+    pg_conn = connect_postgres()
+    try:
+        cursor = pg_conn.cursor()
+        cursor.execute("""
+            SELECT GREATEST(
+                (SELECT MAX(timestamp)::DATE FROM raw.events),
+                (SELECT MAX(event_date) + 1 FROM dw.fact_event_daily_counts)
+            )
+        """)
+        synced_until = cursor.fetchone()[0]
+        cursor.close()
+    finally:
+        pg_conn.close()
+    if not synced_until:
+        logger.warning("数据仓库中没有行为数据，跳过MySQL分区清理")
+        return
+
+    cutoff = min(month_start(datetime.utcnow() - timedelta(days=retention_days)), synced_until)
+    conn = connect_mysql()
+    try:
+        with conn.cursor() as cursor:
+            partitions = get_mysql_event_partitions(cursor)
+            month_partitions = [name for name in partitions if partition_month(name)]
+            expired = [name for name in month_partitions if add_months(partition_month(name), 1) <= cutoff]
+            # 至少保留一个月分区，避免边界变化
+            expired = expired[:max(len(month_partitions) - 1, 0)]
+            if not expired:
+                logger.info("MySQL events没有需要清理的分区")
+                return
+            cursor.execute(f"ALTER TABLE events DROP PARTITION {', '.join(expired)}")
+        conn.commit()
+        logger.info(f"MySQL events已删除分区: {expired}")
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='行为表分区维护脚本')
+    parser.add_argument('--skip-mysql', action='store_true', help='不维护MySQL分区')
+    parser.add_argument('--skip-postgres', action='store_true', help='不维护PostgreSQL分区')
+    parser.add_argument('--no-retention', action='store_true', help='只创建分区，不压缩或删除过期数据')
+    args = parser.parse_args()
+
+    try:
+        if not args.skip_postgres:
+            ensure_postgres_event_partitions()
+            if not args.no_retention:
+                compact_raw_events()
+        if not args.skip_mysql:
+            ensure_mysql_event_partitions()
+            if not args.no_retention:
+                drop_mysql_event_partitions()
+    except Exception as e:
+        logger.error(f"分区维护失败: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
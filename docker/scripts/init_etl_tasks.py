@@ -41,6 +41,7 @@ MYSQL_CONFIG = {
 TABLE_MAPPINGS = {
     'users': 'raw.users',
     'posts': 'raw.posts',
+    'tags': 'raw.tags',
     'events': 'raw.events',
     'features': 'raw.features',
     'likes': 'raw.likes',
@@ -51,6 +52,7 @@ TABLE_MAPPINGS = {
 INCREMENTAL_FIELDS = {
     'users': 'create_time',
     'posts': 'create_time',
+    'tags': 'create_time',
     'events': 'timestamp',
     'features': 'update_time',
     'likes': 'create_time',
@@ -387,6 +389,23 @@ PREDEFINED_TASKS = [
             "target_connection": "postgres"
         },
         "schedule": "0 5 * * *"  # 每天凌晨5点执行
+    },
+    {
+        "name": "用户标签权重同步到Redis",
+        "description": "将fact_user_tags中的用户标签权重按用户聚合（以标签ID为键）后写入Redis，供在线用户画像缓存读取",
+        "task_type": "postgres_to_redis",
+        "config": {
+            "source_query": """
+            SELECT user_id, json_object_agg(tag_id, tag_weight) AS weights
+            FROM dw.fact_user_tags
+            WHERE tag_id IS NOT NULL
+            GROUP BY user_id
+            """,
+            "key_prefix": "user:tag_weights:",
+            "key_field": "user_id",
+            "expire_seconds": 172800  # 2天，ETL停止运行时权重自然失效
+        },
+        "schedule": "30 4 * * *"  # 每天凌晨4点30分执行，在用户标签处理之后
     }
 ]
 
@@ -565,6 +584,10 @@ def create_etl_tasks(connection_ids):
                     task_config.pop("target_connection", None)
                 else:
                     task_config = task["config"]
+            elif task["task_type"] == "postgres_to_redis":
+                source_connection_id = connection_ids["postgres"]
+                target_connection_id = connection_ids["redis"]
+                task_config = task["config"]
             else:
                 task_config = task["config"]
             
@@ -0,0 +1,45 @@
+-- 数据仓库raw.events按月分区迁移
+-- 新部署直接使用postgres_init.sql，无需执行本脚本；执行后运行 python event_partitions.py 创建后续分区
+BEGIN;
+
+ALTER TABLE raw.events RENAME TO events_legacy;
+ALTER TABLE raw.events_legacy RENAME CONSTRAINT events_pkey TO events_legacy_pkey;
+
+CREATE TABLE raw.events (
+    event_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    post_id BIGINT NOT NULL,
+    event_type VARCHAR(32) NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    source VARCHAR(64),
+    device_info JSONB,
+    extra JSONB,
+    import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE raw.events_default PARTITION OF raw.events DEFAULT;
+
+-- 按历史数据覆盖的月份创建分区
+DO $$
+DECLARE
+    m DATE;
+BEGIN
+    FOR m IN
+        SELECT DISTINCT date_trunc('month', timestamp)::DATE FROM raw.events_legacy WHERE timestamp IS NOT NULL
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS raw.events_%s PARTITION OF raw.events FOR VALUES FROM (%L) TO (%L)',
+            to_char(m, 'YYYYMM'), m, (m + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO raw.events
+SELECT event_id, user_id, post_id, event_type, COALESCE(timestamp, import_time, CURRENT_TIMESTAMP),
+       source, device_info, extra, import_time
+FROM raw.events_legacy;
+
+DROP TABLE raw.events_legacy;
+
+COMMIT;
@@ -0,0 +1,22 @@
+-- 数据仓库标签ID列迁移
+-- 新部署直接使用postgres_init.sql，无需执行本脚本；已有部署在同步posts/users之前执行，否则同步写入tag_ids列失败
+BEGIN;
+
+ALTER TABLE raw.users ADD COLUMN IF NOT EXISTS tag_ids JSONB;
+ALTER TABLE raw.posts ADD COLUMN IF NOT EXISTS tag_ids JSONB;
+
+CREATE TABLE IF NOT EXISTS raw.tags (
+    tag_id INT PRIMARY KEY,
+    name VARCHAR(64) NOT NULL,
+    create_time TIMESTAMP,
+    import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 标签ID，对应raw.tags，标签关联按ID比较
+ALTER TABLE dw.fact_user_tags ADD COLUMN IF NOT EXISTS tag_id INT;
+ALTER TABLE dw.fact_post_tags ADD COLUMN IF NOT EXISTS tag_id INT;
+
+CREATE INDEX IF NOT EXISTS idx_fact_user_tags_tag_id ON dw.fact_user_tags(tag_id);
+CREATE INDEX IF NOT EXISTS idx_fact_post_tags_tag_id ON dw.fact_post_tags(tag_id);
+
+COMMIT;
@@ -17,8 +17,10 @@ import argparse
 from datetime import datetime, timedelta
 import pymysql
 import psycopg2
+import redis
 import pandas as pd
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 # 配置日志
 logging.basicConfig(
@@ -49,26 +51,60 @@ POSTGRES_CONFIG = {
     'dbname': 'datawarehouse'
 }
 
+REDIS_CONFIG = {
+    'host': 'redis',
+    'port': 6379,
+    'password': 'redispassword'
+}
+
+# 在线特征哈希的键前缀和过期时间，与backend/redis_client.py一致
+FEATURE_PREFIX = "feature:"
+FEATURE_EXPIRE_TIME = 60 * 60 * 48  # 48小时，ETL中断两天后在线读取回退到features表
+# 在线特征每批写入的实体数量
+FEATURE_BATCH_SIZE = 1000
+
 # 表映射配置
 TABLE_MAPPINGS = {
     'users': 'raw.users',
     'posts': 'raw.posts',
+    'tags': 'raw.tags',
     'events': 'raw.events',
     'features': 'raw.features',
     'likes': 'raw.likes',
-    'favorites': 'raw.favorites'
+    'favorites': 'raw.favorites',
+    'impressions': 'raw.impressions'
 }
 
 # 增量同步的时间字段配置
 INCREMENTAL_FIELDS = {
     'users': 'create_time',
     'posts': 'create_time',
+    'tags': 'create_time',
     'events': 'timestamp',
     'features': 'update_time',
     'likes': 'create_time',
-    'favorites': 'create_time'
+    'favorites': 'create_time',
+    'impressions': 'served_at'
+}
+
+# 只追加的表按主键去重写入：增量查询的时间窗口与上一次同步重叠（见get_last_sync_time），
+# 重叠部分的行已经存在，直接追加会因主键冲突导致整批写入失败
+CONFLICT_KEYS = {
+    'impressions': ['request_id', 'position']
 }
 
+def insert_ignore_conflicts(conflict_columns):
+    """
+    pandas to_sql的写入方法，使用 INSERT ... ON CONFLICT DO NOTHING 跳过已存在的行
+    """
+    def method(table, conn, keys, data_iter):
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        if not rows:
+            return 0
+        stmt = pg_insert(table.table).values(rows).on_conflict_do_nothing(index_elements=conflict_columns)
+        return conn.execute(stmt).rowcount
+    return method
+
 def connect_mysql():
     """
     连接MySQL数据库
@@ -119,13 +155,14 @@ def get_sqlalchemy_engines():
     
     return mysql_engine, postgres_engine
 
-def get_last_sync_time(pg_conn, table_name):
+def get_last_sync_time(pg_conn, table_name, time_field='import_time'):
     """
     获取上次同步时间
+    time_field为已同步数据中的时间列，默认按导入时间；按源表的时间列取时不受ETL主机时区影响
     """
     try:
         cursor = pg_conn.cursor()
-        cursor.execute(f"SELECT MAX(import_time) FROM {table_name}")
+        cursor.execute(f"SELECT MAX({time_field}) FROM {table_name}")
         result = cursor.fetchone()
         cursor.close()
         
@@ -151,7 +188,12 @@ def sync_table(mysql_engine, postgres_engine, mysql_table, pg_table, incremental
         last_sync_time = None
         if incremental:
             with postgres_engine.connect() as conn:
-                last_sync_time = get_last_sync_time(conn, pg_table)
+                # get_last_sync_time使用DBAPI游标
+                # 按主键去重的表直接以已同步数据中最大的源时间为水位，重叠的一小时覆盖缓冲区延迟写入的行
+                if mysql_table in CONFLICT_KEYS:
+                    last_sync_time = get_last_sync_time(conn.connection, pg_table, INCREMENTAL_FIELDS[mysql_table])
+                else:
+                    last_sync_time = get_last_sync_time(conn.connection, pg_table)
                 logger.info(f"上次同步时间: {last_sync_time}")
         
         # 构建查询
@@ -186,6 +228,7 @@ def sync_table(mysql_engine, postgres_engine, mysql_table, pg_table, incremental
         total_rows = len(df)
         logger.info(f"需要同步 {total_rows} 行数据")
         
+        conflict_columns = CONFLICT_KEYS.get(mysql_table)
         for i in range(0, total_rows, batch_size):
             batch_df = df.iloc[i:i+batch_size]
             batch_df.to_sql(
@@ -193,7 +236,8 @@ def sync_table(mysql_engine, postgres_engine, mysql_table, pg_table, incremental
                 postgres_engine,
                 schema=pg_table.split('.')[0] if '.' in pg_table else None,
                 if_exists='append',
-                index=False
+                index=False,
+                method=insert_ignore_conflicts(conflict_columns) if conflict_columns else None
             )
             logger.info(f"已同步 {min(i+batch_size, total_rows)}/{total_rows} 行")
         
@@ -269,12 +313,20 @@ def process_user_tags():
                 SELECT 
                     e.user_id,
                     pt.tag_name,
-                    COUNT(CASE WHEN e.event_type = 'view' THEN 1 END) * 0.2 +
-                    COUNT(CASE WHEN e.event_type = 'like' THEN 1 END) * 0.5 +
-                    COUNT(CASE WHEN e.event_type = 'favorite' THEN 1 END) * 1.0 as weight
-                FROM raw.events e
+                    SUM(CASE WHEN e.event_type = 'view' THEN e.event_count ELSE 0 END) * 0.2 +
+                    SUM(CASE WHEN e.event_type = 'like' THEN e.event_count ELSE 0 END) * 0.5 +
+                    SUM(CASE WHEN e.event_type = 'favorite' THEN e.event_count ELSE 0 END) * 1.0 as weight
+                FROM (
+                    -- 近期明细与压缩后的历史日汇总
+                    SELECT user_id, post_id, event_type, 1 as event_count
+                    FROM raw.events
+                    WHERE event_type IN ('view', 'like', 'favorite')
+                    UNION ALL
+                    SELECT user_id, post_id, event_type, event_count
+                    FROM dw.fact_event_daily_counts
+                    WHERE event_type IN ('view', 'like', 'favorite')
+                ) e
                 JOIN post_tags pt ON e.post_id = pt.post_id
-                WHERE e.event_type IN ('view', 'like', 'favorite')
                 GROUP BY e.user_id, pt.tag_name
                 HAVING COUNT(*) > 0
             )
@@ -294,6 +346,14 @@ def process_user_tags():
                 update_time = EXCLUDED.update_time
         """)
         
+        # 按名称关联标签词表，回填标签ID，只更新新增或ID变化的行，避免每次重写整张表
+        cursor.execute("""
+            UPDATE dw.fact_user_tags f
+            SET tag_id = t.tag_id
+            FROM raw.tags t
+            WHERE t.name = f.tag_name AND f.tag_id IS DISTINCT FROM t.tag_id
+        """)
+        
         conn.commit()
         cursor.close()
         conn.close()
@@ -333,6 +393,14 @@ def process_post_tags():
                 update_time = EXCLUDED.update_time
         """)
         
+        # 按名称关联标签词表，回填标签ID，只更新新增或ID变化的行，避免每次重写整张表
+        cursor.execute("""
+            UPDATE dw.fact_post_tags f
+            SET tag_id = t.tag_id
+            FROM raw.tags t
+            WHERE t.name = f.tag_name AND f.tag_id IS DISTINCT FROM t.tag_id
+        """)
+        
         conn.commit()
         cursor.close()
         conn.close()
@@ -480,11 +548,20 @@ def update_dim_users():
                     FROM raw.events e
                     WHERE e.user_id = u.user_id
                       AND e.event_type = 'view'
+                ), 0) + COALESCE((
+                    SELECT SUM(c.event_count)
+                    FROM dw.fact_event_daily_counts c
+                    WHERE c.user_id = u.user_id
+                      AND c.event_type = 'view'
                 ), 0) as view_count,
                 COALESCE((
                     SELECT MAX(e.timestamp)
                     FROM raw.events e
                     WHERE e.user_id = u.user_id
+                ), (
+                    SELECT MAX(c.event_date)::TIMESTAMP
+                    FROM dw.fact_event_daily_counts c
+                    WHERE c.user_id = u.user_id
                 ), u.create_time) as last_active_time,
                 CASE
                     WHEN (
@@ -567,7 +644,9 @@ def update_dim_posts():
                 p.favorite_count,
                 CASE 
                     WHEN p.view_count > 0 THEN 
-                        (SELECT COUNT(*) FROM raw.events e WHERE e.post_id = p.post_id AND e.event_type = 'click')::FLOAT / p.view_count 
+                        ((SELECT COUNT(*) FROM raw.events e WHERE e.post_id = p.post_id AND e.event_type = 'click') +
+                         COALESCE((SELECT SUM(c.event_count) FROM dw.fact_event_daily_counts c
+                                   WHERE c.post_id = p.post_id AND c.event_type = 'click'), 0))::FLOAT / p.view_count 
                     ELSE 0 
                 END as ctr,
                 CASE 
@@ -690,35 +769,35 @@ def update_user_activity_analysis():
                     (SELECT COUNT(*) FROM raw.users) as total_users,
                     (SELECT COUNT(DISTINCT user_id) 
                      FROM raw.events 
-                     WHERE timestamp::DATE = d.analysis_date) as active_users_1d,
+                     WHERE timestamp >= d.analysis_date AND timestamp < d.analysis_date + INTERVAL '1 day') as active_users_1d,
                     (SELECT COUNT(DISTINCT user_id) 
                      FROM raw.events 
-                     WHERE timestamp::DATE BETWEEN d.analysis_date - INTERVAL '6 days' AND d.analysis_date) as active_users_7d,
+                     WHERE timestamp >= d.analysis_date - INTERVAL '6 days' AND timestamp < d.analysis_date + INTERVAL '1 day') as active_users_7d,
                     (SELECT COUNT(DISTINCT user_id) 
                      FROM raw.events 
-                     WHERE timestamp::DATE BETWEEN d.analysis_date - INTERVAL '29 days' AND d.analysis_date) as active_users_30d,
+                     WHERE timestamp >= d.analysis_date - INTERVAL '29 days' AND timestamp < d.analysis_date + INTERVAL '1 day') as active_users_30d,
                     (SELECT COUNT(*) 
                      FROM raw.users 
                      WHERE create_time::DATE = d.analysis_date) as new_users,
                     (SELECT COUNT(DISTINCT user_id) 
                      FROM raw.events 
-                     WHERE timestamp::DATE = d.analysis_date
+                     WHERE timestamp >= d.analysis_date AND timestamp < d.analysis_date + INTERVAL '1 day'
                        AND user_id IN (
                            SELECT DISTINCT user_id 
                            FROM raw.events 
-                           WHERE timestamp::DATE BETWEEN d.analysis_date - INTERVAL '30 days' AND d.analysis_date - INTERVAL '1 day'
+                           WHERE timestamp >= d.analysis_date - INTERVAL '30 days' AND timestamp < d.analysis_date
                        )) as returning_users,
                     (SELECT COUNT(DISTINCT user_id) 
                      FROM raw.events 
-                     WHERE timestamp::DATE = d.analysis_date - INTERVAL '1 day'
+                     WHERE timestamp >= d.analysis_date - INTERVAL '1 day' AND timestamp < d.analysis_date
                        AND user_id NOT IN (
                            SELECT DISTINCT user_id 
                            FROM raw.events 
-                           WHERE timestamp::DATE = d.analysis_date
+                           WHERE timestamp >= d.analysis_date AND timestamp < d.analysis_date + INTERVAL '1 day'
                        )) as churned_users,
                     (SELECT COALESCE(COUNT(*) / NULLIF(COUNT(DISTINCT user_id), 0), 0) 
                      FROM raw.events 
-                     WHERE timestamp::DATE = d.analysis_date) as average_events_per_user
+                     WHERE timestamp >= d.analysis_date AND timestamp < d.analysis_date + INTERVAL '1 day') as average_events_per_user
                 FROM date_series d
             )
             SELECT 
@@ -753,9 +832,91 @@ def update_user_activity_analysis():
     except Exception as e:
         logger.error(f"更新用户活跃度分析失败: {e}")
 
+def update_fact_post_daily_stats():
+    """
+    更新内容日粒度事实表
+    单次扫描上次处理日期之后的raw.events，按日期、内容、来源聚合，
+    内容表现分析和推荐效果分析都基于该表计算，不再重复扫描原始事件
+    """
+    try:
+        logger.info("开始更新内容日粒度事实表")
+        
+        # 连接PostgreSQL
+        conn = connect_postgres()
+        cursor = conn.cursor()
+        
+        # 获取最近一次处理的日期
+        cursor.execute("SELECT MAX(stat_date) FROM dw.fact_post_daily_stats")
+        last_stat_date = cursor.fetchone()[0]
+        
+        if last_stat_date:
+            # 重新计算最后一天及前一天，覆盖当时未同步完整的事件
+            window_start = datetime.combine(last_stat_date - timedelta(days=1), datetime.min.time())
+        else:
+            # 如果没有处理记录，回填全部历史事件
+            window_start = datetime(1970, 1, 1)
+        
+        logger.info(f"聚合 {window_start} 之后的事件数据")
+        
+        # 先按(日期, 内容, 来源, 用户)聚合得到浏览时长，再汇总到(日期, 内容, 来源)
+        cursor.execute("""
+            WITH user_post_events AS (
+                SELECT 
+                    timestamp::DATE as stat_date,
+                    post_id,
+                    COALESCE(source, 'unknown') as source,
+                    user_id,
+                    COUNT(*) FILTER (WHERE event_type = 'view') as view_count,
+                    COUNT(*) FILTER (WHERE event_type = 'click') as click_count,
+                    COUNT(*) FILTER (WHERE event_type = 'like') as like_count,
+                    COUNT(*) FILTER (WHERE event_type = 'favorite') as favorite_count,
+                    EXTRACT(EPOCH FROM (
+                        MAX(timestamp) FILTER (WHERE event_type IN ('view', 'click')) -
+                        MIN(timestamp) FILTER (WHERE event_type IN ('view', 'click'))
+                    )) as view_duration
+                FROM raw.events
+                WHERE timestamp >= %s
+                GROUP BY timestamp::DATE, post_id, COALESCE(source, 'unknown'), user_id
+            )
+            INSERT INTO dw.fact_post_daily_stats (
+                stat_date, post_id, source, view_count, click_count, like_count, favorite_count,
+                view_sessions, view_duration_seconds, update_time
+            )
+            SELECT 
+                stat_date,
+                post_id,
+                source,
+                SUM(view_count) as view_count,
+                SUM(click_count) as click_count,
+                SUM(like_count) as like_count,
+                SUM(favorite_count) as favorite_count,
+                COUNT(view_duration) as view_sessions,
+                COALESCE(SUM(view_duration), 0) as view_duration_seconds,
+                NOW() as update_time
+            FROM user_post_events
+            GROUP BY stat_date, post_id, source
+            ON CONFLICT (stat_date, post_id, source) DO UPDATE 
+            SET view_count = EXCLUDED.view_count,
+                click_count = EXCLUDED.click_count,
+                like_count = EXCLUDED.like_count,
+                favorite_count = EXCLUDED.favorite_count,
+                view_sessions = EXCLUDED.view_sessions,
+                view_duration_seconds = EXCLUDED.view_duration_seconds,
+                update_time = EXCLUDED.update_time
+        """, (window_start,))
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        logger.info("内容日粒度事实表更新完成")
+    except Exception as e:
+        logger.error(f"更新内容日粒度事实表失败: {e}")
+
 def update_content_performance_analysis():
     """
     更新内容表现分析
+    点击数来自dw.fact_post_daily_stats，不再逐帖子扫描raw.events
     """
     try:
         logger.info("开始更新内容表现分析")
@@ -777,54 +938,62 @@ def update_content_performance_analysis():
                     INTERVAL '1 day'
                 )::DATE as analysis_date
             ),
-            daily_stats AS (
+            post_clicks AS (
                 SELECT 
-                    d.analysis_date,
-                    (SELECT COUNT(*) FROM raw.posts) as total_posts,
-                    (SELECT COUNT(*) 
-                     FROM raw.posts 
-                     WHERE create_time::DATE = d.analysis_date) as new_posts,
-                    (SELECT SUM(view_count) FROM raw.posts) as total_views,
-                    (SELECT SUM(like_count) FROM raw.posts) as total_likes,
-                    (SELECT SUM(favorite_count) FROM raw.posts) as total_favorites,
-                    (SELECT AVG(CASE WHEN view_count > 0 THEN like_count::FLOAT / view_count ELSE 0 END) 
-                     FROM raw.posts) as average_like_ratio,
-                    (SELECT AVG(CASE WHEN view_count > 0 THEN favorite_count::FLOAT / view_count ELSE 0 END) 
-                     FROM raw.posts) as average_favorite_ratio,
-                    (SELECT AVG(
-                        CASE 
-                            WHEN view_count > 0 THEN 
-                                (SELECT COUNT(*) FROM raw.events e WHERE e.post_id = p.post_id AND e.event_type = 'click')::FLOAT / view_count 
-                            ELSE 0 
-                        END
-                     ) 
-                     FROM raw.posts p) as average_ctr,
-                    (SELECT jsonb_agg(tag_info)
-                     FROM (
-                         SELECT jsonb_build_object(
-                             'tag', tag_name,
-                             'count', COUNT(*)
-                         ) as tag_info
-                         FROM dw.fact_post_tags
-                         GROUP BY tag_name
-                         ORDER BY COUNT(*) DESC
-                         LIMIT 10
-                     ) t) as top_tags
-                FROM date_series d
+                    post_id,
+                    SUM(click_count) as click_count
+                FROM dw.fact_post_daily_stats
+                GROUP BY post_id
+            ),
+            post_stats AS (
+                SELECT 
+                    COUNT(*) as total_posts,
+                    SUM(p.view_count) as total_views,
+                    SUM(p.like_count) as total_likes,
+                    SUM(p.favorite_count) as total_favorites,
+                    AVG(CASE WHEN p.view_count > 0 THEN COALESCE(c.click_count, 0)::FLOAT / p.view_count ELSE 0 END) as average_ctr,
+                    AVG(CASE WHEN p.view_count > 0 THEN p.like_count::FLOAT / p.view_count ELSE 0 END) as average_like_ratio,
+                    AVG(CASE WHEN p.view_count > 0 THEN p.favorite_count::FLOAT / p.view_count ELSE 0 END) as average_favorite_ratio
+                FROM raw.posts p
+                LEFT JOIN post_clicks c ON c.post_id = p.post_id
+            ),
+            new_posts AS (
+                SELECT 
+                    create_time::DATE as create_date,
+                    COUNT(*) as new_posts
+                FROM raw.posts
+                WHERE create_time >= (SELECT MIN(analysis_date) FROM date_series)
+                GROUP BY create_time::DATE
+            ),
+            top_tags AS (
+                SELECT jsonb_agg(tag_info) as top_tags
+                FROM (
+                    SELECT jsonb_build_object(
+                        'tag', tag_name,
+                        'count', COUNT(*)
+                    ) as tag_info
+                    FROM dw.fact_post_tags
+                    GROUP BY tag_name
+                    ORDER BY COUNT(*) DESC
+                    LIMIT 10
+                ) t
             )
             SELECT 
-                analysis_date,
-                total_posts,
-                new_posts,
-                total_views,
-                total_likes,
-                total_favorites,
-                average_ctr,
-                average_like_ratio,
-                average_favorite_ratio,
-                top_tags,
+                d.analysis_date,
+                s.total_posts,
+                COALESCE(n.new_posts, 0) as new_posts,
+                COALESCE(s.total_views, 0) as total_views,
+                COALESCE(s.total_likes, 0) as total_likes,
+                COALESCE(s.total_favorites, 0) as total_favorites,
+                COALESCE(s.average_ctr, 0) as average_ctr,
+                COALESCE(s.average_like_ratio, 0) as average_like_ratio,
+                COALESCE(s.average_favorite_ratio, 0) as average_favorite_ratio,
+                t.top_tags,
                 NOW() as update_time
-            FROM daily_stats
+            FROM date_series d
+            CROSS JOIN post_stats s
+            CROSS JOIN top_tags t
+            LEFT JOIN new_posts n ON n.create_date = d.analysis_date
             ON CONFLICT (analysis_date) DO UPDATE 
             SET total_posts = EXCLUDED.total_posts,
                 new_posts = EXCLUDED.new_posts,
@@ -849,6 +1018,8 @@ def update_content_performance_analysis():
 def update_recommendation_performance_analysis():
     """
     更新推荐效果分析
+    有曝光日志（raw.impressions）的日期按实际曝光统计推荐次数、点击和召回源分布，点击为曝光后24小时内同一用户对该帖子的click事件；
+    没有曝光日志的历史日期仍从dw.fact_post_daily_stats中来源为recommendation/home的浏览推断
     """
     try:
         logger.info("开始更新推荐效果分析")
@@ -873,86 +1044,108 @@ def update_recommendation_performance_analysis():
             ),
             daily_stats AS (
                 SELECT 
-                    d.analysis_date,
-                    (SELECT COUNT(*) 
-                     FROM raw.events 
-                     WHERE event_type = 'view' 
-                       AND source IN ('recommendation', 'home')
-                       AND timestamp::DATE = d.analysis_date) as total_recommendations,
-                    (SELECT COUNT(*) 
-                     FROM raw.events 
-                     WHERE event_type = 'click' 
-                       AND source IN ('recommendation', 'home')
-                       AND timestamp::DATE = d.analysis_date) as clicked_recommendations,
-                    CASE 
-                        WHEN (SELECT COUNT(*) 
-                              FROM raw.events 
-                              WHERE event_type = 'view' 
-                                AND source IN ('recommendation', 'home')
-                                AND timestamp::DATE = d.analysis_date) > 0 
-                        THEN (SELECT COUNT(*) 
-                              FROM raw.events 
-                              WHERE event_type = 'click' 
-                                AND source IN ('recommendation', 'home')
-                                AND timestamp::DATE = d.analysis_date)::FLOAT / 
-                             (SELECT COUNT(*) 
-                              FROM raw.events 
-                              WHERE event_type = 'view' 
-                                AND source IN ('recommendation', 'home')
-                                AND timestamp::DATE = d.analysis_date) 
-                        ELSE 0 
-                    END as recommendation_ctr,
-                    (SELECT AVG(EXTRACT(EPOCH FROM (MAX(timestamp) - MIN(timestamp)))) 
-                     FROM raw.events 
-                     WHERE event_type IN ('view', 'click') 
-                       AND source IN ('recommendation', 'home')
-                       AND timestamp::DATE = d.analysis_date 
-                     GROUP BY user_id, post_id) as average_view_duration,
-                    (SELECT COUNT(*) 
-                     FROM raw.events 
-                     WHERE event_type = 'like' 
-                       AND post_id IN (
-                           SELECT DISTINCT post_id 
-                           FROM raw.events 
-                           WHERE event_type = 'view' 
-                             AND source IN ('recommendation', 'home')
-                             AND timestamp::DATE = d.analysis_date
-                       )
-                       AND timestamp::DATE = d.analysis_date) as like_from_recommendation,
-                    (SELECT COUNT(*) 
-                     FROM raw.events 
-                     WHERE event_type = 'favorite' 
-                       AND post_id IN (
-                           SELECT DISTINCT post_id 
-                           FROM raw.events 
-                           WHERE event_type = 'view' 
-                             AND source IN ('recommendation', 'home')
-                             AND timestamp::DATE = d.analysis_date
-                       )
-                       AND timestamp::DATE = d.analysis_date) as favorite_from_recommendation,
-                    (SELECT jsonb_object_agg(source, count)
-                     FROM (
-                         SELECT 
-                             source,
-                             COUNT(*) as count
-                         FROM raw.events
-                         WHERE event_type = 'view'
-                           AND timestamp::DATE = d.analysis_date
-                         GROUP BY source
-                     ) s) as recommendation_sources
-                FROM date_series d
+                    s.*,
+                    s.source IN ('recommendation', 'home') as is_recommendation
+                FROM dw.fact_post_daily_stats s
+                WHERE s.stat_date >= (SELECT MIN(analysis_date) FROM date_series)
+            ),
+            recommendation_stats AS (
+                SELECT 
+                    stat_date,
+                    SUM(view_count) as total_recommendations,
+                    SUM(click_count) as clicked_recommendations,
+                    SUM(view_duration_seconds) / NULLIF(SUM(view_sessions), 0) as average_view_duration
+                FROM daily_stats
+                WHERE is_recommendation
+                GROUP BY stat_date
+            ),
+            impression_stats AS (
+                SELECT 
+                    i.served_at::DATE as stat_date,
+                    COUNT(*) as total_recommendations,
+                    COUNT(*) FILTER (WHERE EXISTS (
+                        SELECT 1 FROM raw.events e
+                        WHERE e.user_id = i.user_id
+                          AND e.post_id = i.post_id
+                          AND e.event_type = 'click'
+                          AND e.timestamp >= i.served_at
+                          AND e.timestamp < i.served_at + INTERVAL '1 day'
+                    )) as clicked_recommendations
+                FROM raw.impressions i
+                WHERE i.served_at >= (SELECT MIN(analysis_date) FROM date_series)
+                  AND i.served_at < CURRENT_DATE
+                GROUP BY i.served_at::DATE
+            ),
+            impression_sources AS (
+                SELECT 
+                    stat_date,
+                    jsonb_object_agg(source, impression_count) as recommendation_sources
+                FROM (
+                    SELECT 
+                        served_at::DATE as stat_date,
+                        COALESCE(source, 'unknown') as source,
+                        COUNT(*) as impression_count
+                    FROM raw.impressions
+                    WHERE served_at >= (SELECT MIN(analysis_date) FROM date_series)
+                      AND served_at < CURRENT_DATE
+                    GROUP BY served_at::DATE, COALESCE(source, 'unknown')
+                ) s
+                GROUP BY stat_date
+            ),
+            post_conversions AS (
+                -- 当天被推荐曝光过的内容，在当天获得的点赞和收藏（不区分来源）
+                SELECT 
+                    stat_date,
+                    SUM(like_count) as like_from_recommendation,
+                    SUM(favorite_count) as favorite_from_recommendation
+                FROM (
+                    SELECT 
+                        stat_date,
+                        post_id,
+                        SUM(like_count) as like_count,
+                        SUM(favorite_count) as favorite_count
+                    FROM daily_stats
+                    GROUP BY stat_date, post_id
+                    HAVING SUM(view_count) FILTER (WHERE is_recommendation) > 0
+                ) p
+                GROUP BY stat_date
+            ),
+            source_stats AS (
+                SELECT 
+                    stat_date,
+                    jsonb_object_agg(source, view_count) as recommendation_sources
+                FROM (
+                    SELECT 
+                        stat_date,
+                        source,
+                        SUM(view_count) as view_count
+                    FROM daily_stats
+                    GROUP BY stat_date, source
+                    HAVING SUM(view_count) > 0
+                ) s
+                GROUP BY stat_date
             )
             SELECT 
-                analysis_date,
-                total_recommendations,
-                clicked_recommendations,
-                recommendation_ctr,
-                average_view_duration,
-                like_from_recommendation,
-                favorite_from_recommendation,
-                recommendation_sources,
+                d.analysis_date,
+                COALESCE(i.total_recommendations, r.total_recommendations, 0) as total_recommendations,
+                COALESCE(i.clicked_recommendations, r.clicked_recommendations, 0) as clicked_recommendations,
+                CASE 
+                    WHEN COALESCE(i.total_recommendations, r.total_recommendations, 0) > 0 
+                    THEN COALESCE(i.clicked_recommendations, r.clicked_recommendations)::FLOAT
+                         / COALESCE(i.total_recommendations, r.total_recommendations)
+                    ELSE 0 
+                END as recommendation_ctr,
+                r.average_view_duration,
+                COALESCE(c.like_from_recommendation, 0) as like_from_recommendation,
+                COALESCE(c.favorite_from_recommendation, 0) as favorite_from_recommendation,
+                COALESCE(si.recommendation_sources, s.recommendation_sources) as recommendation_sources,
                 NOW() as update_time
-            FROM daily_stats
+            FROM date_series d
+            LEFT JOIN impression_stats i ON i.stat_date = d.analysis_date
+            LEFT JOIN impression_sources si ON si.stat_date = d.analysis_date
+            LEFT JOIN recommendation_stats r ON r.stat_date = d.analysis_date
+            LEFT JOIN post_conversions c ON c.stat_date = d.analysis_date
+            LEFT JOIN source_stats s ON s.stat_date = d.analysis_date
             ON CONFLICT (analysis_date) DO UPDATE 
             SET total_recommendations = EXCLUDED.total_recommendations,
                 clicked_recommendations = EXCLUDED.clicked_recommendations,
@@ -1025,7 +1218,7 @@ def update_user_similarity_matrix():
                         a.tag_weight as weight_a,
                         b.tag_weight as weight_b
                     FROM dw.fact_user_tags a
-                    JOIN dw.fact_user_tags b ON a.tag_name = b.tag_name
+                    JOIN dw.fact_user_tags b ON a.tag_id = b.tag_id
                     WHERE a.user_id < b.user_id
                 ) t ON p.user_id_a = t.user_id_a AND p.user_id_b = t.user_id_b
                 GROUP BY p.user_id_a, p.user_id_b
@@ -1120,7 +1313,7 @@ def update_post_similarity_matrix():
                         a.tag_weight as weight_a,
                         b.tag_weight as weight_b
                     FROM dw.fact_post_tags a
-                    JOIN dw.fact_post_tags b ON a.tag_name = b.tag_name
+                    JOIN dw.fact_post_tags b ON a.tag_id = b.tag_id
                     WHERE a.post_id < b.post_id
                 ) t ON p.post_id_a = t.post_id_a AND p.post_id_b = t.post_id_b
                 GROUP BY p.post_id_a, p.post_id_b
@@ -1272,7 +1465,7 @@ def generate_user_recommendation_pool():
                     fut.tag_weight * fpt.tag_weight as score,
                     'tag_based' as reason
                 FROM dw.fact_user_tags fut
-                JOIN dw.fact_post_tags fpt ON fut.tag_name = fpt.tag_name
+                JOIN dw.fact_post_tags fpt ON fut.tag_id = fpt.tag_id
                 WHERE fut.tag_weight > 0.5
                 AND NOT EXISTS (
                     SELECT 1 
@@ -1355,12 +1548,7 @@ def generate_user_recommendation_pool():
         recommendations = cursor.fetchall()
         
         # 连接Redis
-        redis_conn = redis.Redis(
-            host='redis',
-            port=6379,
-            password='redispassword',
-            decode_responses=True
-        )
+        redis_conn = connect_redis()
         
         # 将推荐池写入Redis
         for user_id, recs in recommendations:
@@ -1376,6 +1564,125 @@ def generate_user_recommendation_pool():
     except Exception as e:
         logger.error(f"生成用户推荐池失败: {e}")
 
+def connect_redis():
+    """
+    连接Redis
+    """
+    return redis.Redis(
+        host=REDIS_CONFIG['host'],
+        port=REDIS_CONFIG['port'],
+        password=REDIS_CONFIG['password'],
+        decode_responses=True
+    )
+
+# 后端代码目录，特征ID使用后端utils/snowflake.py生成
+BACKEND_DIR = os.getenv("BACKEND_DIR", "/backend")
+
+_feature_id_generator = None
+
+def next_feature_ids(n):
+    """
+    生成n个不与后端及其他并发运行的同步任务冲突的features表主键
+    worker ID从保留给批量任务的区间中租用（同一主机上的任务需使用同一个ID_WORKER_LOCK_DIR），区间用尽时抛出RuntimeError
+    """
+    global _feature_id_generator
+    if _feature_id_generator is None:
+        if BACKEND_DIR not in sys.path:
+            sys.path.append(BACKEND_DIR)
+        from utils.snowflake import SnowflakeIdGenerator, WorkerIdLease, RESERVED_WORKER_ID, RESERVED_WORKER_SLOTS
+        _feature_id_generator = SnowflakeIdGenerator(
+            lease=WorkerIdLease(base=RESERVED_WORKER_ID, slots=RESERVED_WORKER_SLOTS)
+        )
+    return _feature_id_generator.next_ids(n)
+
+def write_online_features(entity_type, feature_type, rows):
+    """
+    将一组实体的特征写入MySQL features表（持久化）和Redis特征哈希（在线读取）
+    rows: [(实体ID, {特征名: 数值})]
+    """
+    if not rows:
+        return 0
+    mysql_conn = connect_mysql()
+    redis_conn = connect_redis()
+    now = datetime.utcnow()
+    try:
+        for i in range(0, len(rows), FEATURE_BATCH_SIZE):
+            batch = rows[i:i + FEATURE_BATCH_SIZE]
+            feature_ids = next_feature_ids(len(batch))
+            with mysql_conn.cursor() as cursor:
+                cursor.executemany("""
+                    INSERT INTO features (feature_id, entity_type, entity_id, feature_type, feature_value, update_time)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE feature_value = VALUES(feature_value), update_time = VALUES(update_time)
+                """, [
+                    (feature_id, entity_type, entity_id, feature_type, json.dumps(values), now)
+                    for feature_id, (entity_id, values) in zip(feature_ids, batch)
+                ])
+            mysql_conn.commit()
+
+            pipe = redis_conn.pipeline(transaction=False)
+            for entity_id, values in batch:
+                key = f"{FEATURE_PREFIX}{entity_type}:{entity_id}"
+                pipe.hset(key, mapping=values)
+                pipe.expire(key, FEATURE_EXPIRE_TIME)
+            pipe.execute()
+        return len(rows)
+    finally:
+        mysql_conn.close()
+        redis_conn.close()
+
+def sync_online_features():
+    """
+    将数据仓库计算的帖子和用户特征写入在线特征存储
+    帖子特征来自dw.dim_posts，用户特征来自dw.fact_user_tags
+    """
+    try:
+        logger.info("开始同步在线特征")
+        conn = connect_postgres()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT post_id, ctr, like_ratio, favorite_ratio, popularity_score
+            FROM dw.dim_posts
+        """)
+        post_rows = [
+            (post_id, {
+                "ctr": float(ctr or 0),
+                "like_ratio": float(like_ratio or 0),
+                "favorite_ratio": float(favorite_ratio or 0),
+                "popularity_score": float(popularity_score or 0)
+            })
+            for post_id, ctr, like_ratio, favorite_ratio, popularity_score in cursor.fetchall()
+        ]
+
+        cursor.execute("""
+            SELECT
+                user_id,
+                COUNT(*) as tag_count,
+                COUNT(*) FILTER (WHERE tag_source = 'explicit') as explicit_tag_count,
+                COALESCE(SUM(tag_weight) FILTER (WHERE tag_source = 'implicit'), 0) as implicit_tag_weight,
+                MAX(tag_weight) as max_tag_weight
+            FROM dw.fact_user_tags
+            GROUP BY user_id
+        """)
+        user_rows = [
+            (user_id, {
+                "tag_count": int(tag_count),
+                "explicit_tag_count": int(explicit_tag_count),
+                "implicit_tag_weight": float(implicit_tag_weight),
+                "max_tag_weight": float(max_tag_weight or 0)
+            })
+            for user_id, tag_count, explicit_tag_count, implicit_tag_weight, max_tag_weight in cursor.fetchall()
+        ]
+        cursor.close()
+        conn.close()
+
+        posts = write_online_features("post", "post_stats", post_rows)
+        users = write_online_features("user", "user_tags", user_rows)
+        logger.info(f"在线特征同步完成: 帖子{posts}个，用户{users}个")
+    except Exception as e:
+        logger.error(f"同步在线特征失败: {e}")
+
 def run_etl_pipeline():
     """
     运行完整的ETL流程
@@ -1399,6 +1706,7 @@ def run_etl_pipeline():
         
         # 5. 更新事实表
         update_fact_events()
+        update_fact_post_daily_stats()
         
         # 6. 更新分析表
         update_user_activity_analysis()
@@ -1412,6 +1720,9 @@ def run_etl_pipeline():
         # 8. 生成推荐池
         generate_user_recommendation_pool()
         
+        # 9. 同步在线特征
+        sync_online_features()
+        
         logger.info("ETL流程运行完成")
     except Exception as e:
         logger.error(f"ETL流程运行失败: {e}")
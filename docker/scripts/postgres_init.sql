@@ -17,6 +17,7 @@ CREATE TABLE IF NOT EXISTS raw.users (
     username VARCHAR(64) NOT NULL,
     create_time TIMESTAMP,
     tags JSONB,
+    tag_ids JSONB,
     preferences JSONB,
     import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -29,24 +30,52 @@ CREATE TABLE IF NOT EXISTS raw.posts (
     author_id BIGINT NOT NULL,
     create_time TIMESTAMP,
     tags JSONB,
+    tag_ids JSONB,
     view_count INT DEFAULT 0,
     like_count INT DEFAULT 0,
     favorite_count INT DEFAULT 0,
     import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- 原始数据表 - 行为表
+-- 原始数据表 - 标签词表
+CREATE TABLE IF NOT EXISTS raw.tags (
+    tag_id INT PRIMARY KEY,
+    name VARCHAR(64) NOT NULL,
+    create_time TIMESTAMP,
+    import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 原始数据表 - 行为表，按月范围分区
+-- 按时间过滤的ETL阶段只扫描相关月份的分区；超过保留期的分区由event_partitions.py压缩为日汇总后删除
 CREATE TABLE IF NOT EXISTS raw.events (
-    event_id BIGINT PRIMARY KEY,
+    event_id BIGINT NOT NULL,
     user_id BIGINT NOT NULL,
     post_id BIGINT NOT NULL,
     event_type VARCHAR(32) NOT NULL,
-    timestamp TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL,
     source VARCHAR(64),
     device_info JSONB,
     extra JSONB,
-    import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- 默认分区接收尚未建立月分区的数据
+CREATE TABLE IF NOT EXISTS raw.events_default PARTITION OF raw.events DEFAULT;
+
+-- 创建最近12个月和未来3个月的月分区
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN -12..3 LOOP
+        month_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE;
+        EXECUTE format('CREATE TABLE IF NOT EXISTS raw.events_%s PARTITION OF raw.events FOR VALUES FROM (%L) TO (%L)',
+                      to_char(month_start, 'YYYYMM'),
+                      month_start,
+                      (month_start + INTERVAL '1 month')::DATE);
+    END LOOP;
+END $$;
 
 -- 原始数据表 - 特征表
 CREATE TABLE IF NOT EXISTS raw.features (
@@ -78,6 +107,20 @@ CREATE TABLE IF NOT EXISTS raw.favorites (
     import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 原始数据表 - 推荐曝光日志，每行是一次推荐响应中的一个帖子
+CREATE TABLE IF NOT EXISTS raw.impressions (
+    request_id BIGINT NOT NULL,
+    position INT NOT NULL,
+    user_id BIGINT NOT NULL,
+    post_id BIGINT NOT NULL,
+    score FLOAT,
+    source VARCHAR(32),
+    latency_ms FLOAT,
+    served_at TIMESTAMP NOT NULL,
+    import_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (request_id, position)
+);
+
 -- 数据仓库表 - 用户维度表
 CREATE TABLE IF NOT EXISTS dw.dim_users (
     user_id BIGINT PRIMARY KEY,
@@ -162,6 +205,7 @@ CREATE TABLE IF NOT EXISTS dw.fact_user_tags (
     user_tag_id SERIAL PRIMARY KEY,
     user_id BIGINT NOT NULL,
     tag_name VARCHAR(64) NOT NULL,
+    tag_id INT, -- 标签ID，对应raw.tags，标签关联按ID比较
     tag_weight FLOAT NOT NULL, -- 标签权重
     tag_source VARCHAR(32) NOT NULL, -- 标签来源：explicit（用户明确设置）, implicit（系统推断）
     update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -173,12 +217,40 @@ CREATE TABLE IF NOT EXISTS dw.fact_post_tags (
     post_tag_id SERIAL PRIMARY KEY,
     post_id BIGINT NOT NULL,
     tag_name VARCHAR(64) NOT NULL,
+    tag_id INT, -- 标签ID，对应raw.tags，标签关联按ID比较
     tag_weight FLOAT NOT NULL, -- 标签权重
     tag_source VARCHAR(32) NOT NULL, -- 标签来源：explicit（作者设置）, implicit（系统推断）
     update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE (post_id, tag_name)
 );
 
+-- 数据仓库表 - 行为日汇总表，保存超过保留期后从raw.events压缩的历史行为
+CREATE TABLE IF NOT EXISTS dw.fact_event_daily_counts (
+    event_date DATE NOT NULL,
+    user_id BIGINT NOT NULL,
+    post_id BIGINT NOT NULL,
+    event_type VARCHAR(32) NOT NULL,
+    source VARCHAR(64) NOT NULL DEFAULT '',
+    event_count INT NOT NULL,
+    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_date, user_id, post_id, event_type, source)
+);
+
+-- 数据仓库表 - 内容日粒度事实表（按日期、内容、来源单次扫描raw.events聚合）
+CREATE TABLE IF NOT EXISTS dw.fact_post_daily_stats (
+    stat_date DATE NOT NULL,
+    post_id BIGINT NOT NULL,
+    source VARCHAR(64) NOT NULL, -- 事件来源，NULL归并为unknown
+    view_count INT NOT NULL DEFAULT 0,
+    click_count INT NOT NULL DEFAULT 0,
+    like_count INT NOT NULL DEFAULT 0,
+    favorite_count INT NOT NULL DEFAULT 0,
+    view_sessions INT NOT NULL DEFAULT 0, -- 有浏览/点击行为的(用户, 内容)对数
+    view_duration_seconds FLOAT NOT NULL DEFAULT 0, -- 上述会话的浏览时长之和（秒）
+    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (stat_date, post_id, source)
+);
+
 -- 数据集市表 - 用户活跃度分析
 CREATE TABLE IF NOT EXISTS mart.user_activity_analysis (
     analysis_id SERIAL PRIMARY KEY,
@@ -265,6 +337,7 @@ CREATE TABLE IF NOT EXISTS mart.user_recommendation_pool (
 CREATE INDEX IF NOT EXISTS idx_raw_users_create_time ON raw.users(create_time);
 CREATE INDEX IF NOT EXISTS idx_raw_posts_author ON raw.posts(author_id);
 CREATE INDEX IF NOT EXISTS idx_raw_posts_create_time ON raw.posts(create_time);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_tags_name ON raw.tags(name);
 CREATE INDEX IF NOT EXISTS idx_raw_events_user ON raw.events(user_id);
 CREATE INDEX IF NOT EXISTS idx_raw_events_post ON raw.events(post_id);
 CREATE INDEX IF NOT EXISTS idx_raw_events_type ON raw.events(event_type);
@@ -274,6 +347,7 @@ CREATE INDEX IF NOT EXISTS idx_raw_likes_user ON raw.likes(user_id);
 CREATE INDEX IF NOT EXISTS idx_raw_likes_post ON raw.likes(post_id);
 CREATE INDEX IF NOT EXISTS idx_raw_favorites_user ON raw.favorites(user_id);
 CREATE INDEX IF NOT EXISTS idx_raw_favorites_post ON raw.favorites(post_id);
+CREATE INDEX IF NOT EXISTS idx_raw_impressions_served_at ON raw.impressions(served_at);
 
 CREATE INDEX IF NOT EXISTS idx_dim_users_create_time ON dw.dim_users(create_time);
 CREATE INDEX IF NOT EXISTS idx_dim_users_last_active ON dw.dim_users(last_active_time);
@@ -295,12 +369,20 @@ CREATE INDEX IF NOT EXISTS idx_fact_user_funnels_complete ON dw.fact_user_funnel
 
 CREATE INDEX IF NOT EXISTS idx_fact_user_tags_user ON dw.fact_user_tags(user_id);
 CREATE INDEX IF NOT EXISTS idx_fact_user_tags_tag ON dw.fact_user_tags(tag_name);
+CREATE INDEX IF NOT EXISTS idx_fact_user_tags_tag_id ON dw.fact_user_tags(tag_id);
 CREATE INDEX IF NOT EXISTS idx_fact_user_tags_weight ON dw.fact_user_tags(tag_weight);
 
 CREATE INDEX IF NOT EXISTS idx_fact_post_tags_post ON dw.fact_post_tags(post_id);
 CREATE INDEX IF NOT EXISTS idx_fact_post_tags_tag ON dw.fact_post_tags(tag_name);
+CREATE INDEX IF NOT EXISTS idx_fact_post_tags_tag_id ON dw.fact_post_tags(tag_id);
 CREATE INDEX IF NOT EXISTS idx_fact_post_tags_weight ON dw.fact_post_tags(tag_weight);
 
+CREATE INDEX IF NOT EXISTS idx_fact_event_daily_counts_user ON dw.fact_event_daily_counts(user_id, event_type);
+CREATE INDEX IF NOT EXISTS idx_fact_event_daily_counts_post ON dw.fact_event_daily_counts(post_id, event_type);
+
+CREATE INDEX IF NOT EXISTS idx_fact_post_daily_stats_post ON dw.fact_post_daily_stats(post_id);
+CREATE INDEX IF NOT EXISTS idx_fact_post_daily_stats_source ON dw.fact_post_daily_stats(source, stat_date);
+
 CREATE INDEX IF NOT EXISTS idx_user_similarity_user_a ON mart.user_similarity_matrix(user_id_a);
 CREATE INDEX IF NOT EXISTS idx_user_similarity_user_b ON mart.user_similarity_matrix(user_id_b);
 CREATE INDEX IF NOT EXISTS idx_user_similarity_score ON mart.user_similarity_matrix(similarity_score);
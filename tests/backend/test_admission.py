@@ -0,0 +1,161 @@
+import sys
+import os
+import json
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend和benchmarks目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../benchmarks')))
+
+from fake_redis import FakeRedis, FakeAsyncRedis
+from services.admission import AdmissionController, FallbackPosts, ADMISSION_REQUESTS
+from routers import posts
+from services.trending import TrendingService
+from models.models import Post, PostTag
+
+NOW = 1700000000.0
+
+class TestAdmissionController(unittest.TestCase):
+    def test_in_flight_limit(self):
+        controller = AdmissionController(max_in_flight=2, pool_wait_threshold_ms=100)
+        degraded = ADMISSION_REQUESTS.value(result="degraded", reason="in_flight")
+        self.assertIsNone(controller.try_acquire())
+        self.assertIsNone(controller.try_acquire())
+        self.assertEqual(controller.try_acquire(), "in_flight")
+        self.assertEqual(controller.in_flight, 2)
+        self.assertEqual(ADMISSION_REQUESTS.value(result="degraded", reason="in_flight"), degraded + 1)
+
+        controller.release()
+        self.assertIsNone(controller.try_acquire())
+
+    def test_pool_wait_degrades_and_recovers(self):
+        controller = AdmissionController(max_in_flight=10, pool_wait_threshold_ms=100, recovery_half_life=1.0)
+        # 单次偶发的慢获取不会触发降级
+        controller.observe_pool_wait(0.2, now=NOW)
+        self.assertIsNone(controller.try_acquire(now=NOW))
+        controller.release()
+
+        for i in range(10):
+            controller.observe_pool_wait(0.5, now=NOW)
+        self.assertGreater(controller.pool_wait_ms(now=NOW), 100)
+        self.assertEqual(controller.try_acquire(now=NOW), "pool_wait")
+        self.assertEqual(controller.in_flight, 0)
+
+        # 没有新的采样时信号按半衰期衰减，之后重新放行
+        self.assertEqual(controller.try_acquire(now=NOW + 1), "pool_wait")
+        self.assertIsNone(controller.try_acquire(now=NOW + 5))
+        controller.release()
+
+class TestFallbackPosts(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Post.__table__.create(bind=engine)
+        PostTag.__table__.create(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        created = datetime(2024, 1, 1)
+        db = self.session_factory()
+        db.add_all([Post(post_id=i, title=f"帖子{i}", content="内容", author_id=1, tags=[], tag_ids=[],
+                         create_time=created + timedelta(hours=i), view_count=0, like_count=0, favorite_count=0)
+                    for i in range(1, 6)])
+        db.commit()
+        db.close()
+
+        self.redis = FakeRedis()
+        self.trending = TrendingService(session_factory=self.session_factory)
+        self.patches = [
+            patch("redis_client.redis_client", self.redis),
+            patch("services.admission.trending_service", self.trending),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_trending_then_latest(self):
+        self.trending.record_event(2, "favorite")
+        self.trending.record_event(3, "like")
+        self.trending.flush()
+
+        fallback = FallbackPosts(session_factory=self.session_factory, size=4)
+        self.assertEqual(json.loads(fallback.page(10)), {"items": [], "has_more": False, "total": 0})
+        fallback.refresh()
+        self.assertEqual(len(fallback), 4)
+
+        page = json.loads(fallback.page(2, 0, exclude={3}))
+        self.assertEqual([item["post_id"] for item in page["items"]], [2, 5])
+        self.assertEqual((page["has_more"], page["total"]), (True, 3))
+        page = json.loads(fallback.page(2, 2, exclude={3}))
+        self.assertEqual([item["post_id"] for item in page["items"]], [4])
+        self.assertFalse(page["has_more"])
+
+class SlowConnectionSession:
+    """
+    测试用异步会话：获取连接耗时delay秒
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def connection(self):
+        await asyncio.sleep(self.delay)
+
+class TestGetPostsAdmission(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.redis.sadd("user:viewed:posts:1", "2")
+        self.controller = AdmissionController(max_in_flight=1, pool_wait_threshold_ms=50)
+        self.fallback = FallbackPosts()
+        self.fallback._entries = ((1, b'{"post_id":1}'), (2, b'{"post_id":2}'), (3, b'{"post_id":3}'))
+        self.patches = [
+            patch("redis_client.redis_client", self.redis),
+            patch("redis_client.async_redis_client", FakeAsyncRedis(self.redis)),
+            patch("routers.posts.admission_controller", self.controller),
+            patch("routers.posts.fallback_posts", self.fallback),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def get_posts(self, db):
+        return asyncio.run(posts.get_posts(user_id=1, count=10, offset=0, filters=None, db=db))
+
+    def assertDegraded(self, response, reason):
+        self.assertEqual(response.headers["X-Degraded"], reason)
+        self.assertEqual([item["post_id"] for item in json.loads(response.body)["items"]], [1, 3])
+
+    def test_in_flight_degraded(self):
+        self.assertIsNone(self.controller.try_acquire())
+        self.assertDegraded(self.get_posts(SlowConnectionSession()), "in_flight")
+        self.assertEqual(self.controller.in_flight, 1)
+
+    def test_slow_checkout_degraded_and_released(self):
+        self.assertDegraded(self.get_posts(SlowConnectionSession(delay=1.0)), "pool_timeout")
+        self.assertEqual(self.controller.in_flight, 0)
+        self.assertGreater(self.controller.pool_wait_ms(), 0)
+
+    def test_missing_user_released(self):
+        async def missing_user(db, user_id):
+            return None
+
+        with patch("routers.posts.user_profile_cache.async_get", missing_user):
+            with self.assertRaises(HTTPException) as ctx:
+                self.get_posts(SlowConnectionSession())
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(self.controller.in_flight, 0)
+
+if __name__ == '__main__':
+    unittest.main()
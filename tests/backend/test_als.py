@@ -0,0 +1,145 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.als import build_interaction_matrix, train_als, top_k_rows, train_and_publish, EmbeddingModel, _solve_side
+from services.model_registry import ModelRegistry
+from services.model_training import ModelTrainingService
+
+def clustered_interactions():
+    """
+    两组用户各自只与一组帖子交互：用户1-10与帖子100-104，用户11-20与帖子200-204
+    每个用户缺少组内的一个帖子
+    """
+    interactions = []
+    for user_id in range(1, 21):
+        base = 100 if user_id <= 10 else 200
+        for offset in range(5):
+            if offset != user_id % 5:
+                interactions.append((user_id, base + offset, 4.0))
+    return interactions
+
+class TestAls(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_interaction_matrix(self):
+        matrix = build_interaction_matrix([(2, 20, 1.0), (1, 30, 2.0), (1, 10, 1.0), (1, 30, 1.0)])
+        self.assertEqual(matrix.shape, (2, 3))
+        self.assertEqual(matrix.row_ids.tolist(), [1, 2])
+        self.assertEqual(matrix.col_ids.tolist(), [10, 20, 30])
+        cols, values = matrix.row(0)
+        self.assertEqual(cols.tolist(), [0, 2])
+        np.testing.assert_allclose(values, np.log1p([1.0, 3.0]), rtol=1e-6)
+
+        transposed = matrix.transpose()
+        self.assertEqual(transposed.shape, (3, 2))
+        self.assertEqual(transposed.row(2)[0].tolist(), [0])
+
+        reduced = matrix.without({0: 2})
+        self.assertEqual(reduced.row(0)[0].tolist(), [0])
+        self.assertEqual(reduced.row(1)[0].tolist(), [1])
+
+    def test_blocked_top_k_matches_full_sort(self):
+        rng = np.random.default_rng(1)
+        items = rng.standard_normal((1000, 8)).astype(np.float32)
+        vector = rng.standard_normal(8).astype(np.float32)
+        expected = [int(row) for row in np.argsort(-(items @ vector)) if row not in (3, 7)][:15]
+        self.assertEqual(top_k_rows(items, vector, 15, [3, 7], block_size=64), expected)
+        self.assertEqual(top_k_rows(items, vector, 0), [])
+
+    def test_batched_solve_matches_per_row(self):
+        rng = np.random.default_rng(2)
+        interactions = [(int(u), int(p), float(w)) for u, p, w in
+                        zip(rng.integers(0, 30, 400), rng.integers(0, 50, 400), rng.integers(1, 5, 400))]
+        # 用户0的交互数超过每批上限，独占一批
+        interactions += [(0, post_id, 1.0) for post_id in range(50)]
+        matrix = build_interaction_matrix(interactions)
+        fixed = rng.standard_normal((matrix.shape[1], 4)).astype(np.float32)
+
+        expected = np.zeros((matrix.shape[0], 4), dtype=np.float32)
+        gram = fixed.T.astype(np.float64) @ fixed + 0.1 * np.eye(4)
+        for row in range(matrix.shape[0]):
+            cols, values = matrix.row(row)
+            factors_u = fixed[cols].astype(np.float64)
+            confidence = 10 * values.astype(np.float64)
+            expected[row] = np.linalg.solve(gram + (factors_u.T * confidence) @ factors_u, factors_u.T @ (1 + confidence))
+
+        # 共轭梯度的步数等于向量维度时收敛到精确解
+        target = np.zeros_like(expected)
+        _solve_side(matrix, fixed, target, 0.1, 10, cg_steps=8, batch_bytes=40 * 4 * 8)
+        np.testing.assert_allclose(target, expected, rtol=1e-3, atol=1e-4)
+
+    def test_train_recovers_clusters(self):
+        matrix = build_interaction_matrix(clustered_interactions())
+        user_factors, item_factors = train_als(matrix, factors=2, iterations=10, regularization=0.1, alpha=10)
+        for row, user_id in enumerate(matrix.row_ids.tolist()):
+            seen, _ = matrix.row(row)
+            top = matrix.col_ids[top_k_rows(item_factors, user_factors[row], 1, seen)].tolist()
+            expected_base = 100 if user_id <= 10 else 200
+            self.assertEqual(top, [expected_base + user_id % 5])
+
+    def test_publish_and_serve(self):
+        registry = ModelRegistry(self.root)
+        store = registry.register("als", EmbeddingModel)
+        result = train_and_publish(clustered_interactions(), registry.path("als"), {"factors": 2, "iterations": 10, "regularization": 0.1, "alpha": 10, "eval_users": 20})
+        self.assertEqual(result["metrics"]["users"], 20)
+        self.assertEqual(result["metrics"]["items"], 10)
+        self.assertEqual(result["metrics"]["eval_users"], 20)
+        self.assertGreaterEqual(result["metrics"]["recall_at_20"], 0.9)
+
+        self.assertTrue(store.reload())
+        model = registry.model("als")
+        self.assertEqual(model.version, result["version"])
+        # 用户1所在的组中只缺少帖子101（两组数据的秩为2，向量维度与之相同）
+        self.assertEqual(model.recommend(1, 1, exclude_post_ids=[100, 102, 103, 104, 999]), [101])
+        self.assertEqual(len(model.recommend(1, 20)), 10)
+        self.assertEqual(model.recommend(42, 5), [])
+
+        versions = registry.versions()
+        self.assertEqual([(v["version"], v["status"], v["loaded"]) for v in versions], [(result["version"], "active", True)])
+        self.assertEqual(set(versions[0]["checksums"]), {"user_ids.npy", "item_ids.npy", "user_factors.npy", "item_factors.npy"})
+
+        with self.assertRaises(ValueError):
+            train_and_publish([], self.root)
+
+class TestModelTrainingService(unittest.TestCase):
+    def test_task_lifecycle(self):
+        def job(params):
+            if params.get("fail"):
+                raise RuntimeError("boom")
+            return {"version": "v1", "metrics": {"users": 1}}
+
+        service = ModelTrainingService(executor=ThreadPoolExecutor(max_workers=1), jobs={"als": job})
+        with self.assertRaises(ValueError):
+            service.submit("unknown")
+
+        task = service.submit("als", {})
+        failed = service.submit("als", {"fail": True})
+        deadline = time.time() + 5
+        while time.time() < deadline and service.get(failed["task_id"])["status"] == "training":
+            time.sleep(0.01)
+
+        done = service.get(task["task_id"])
+        self.assertEqual(done["status"], "completed")
+        self.assertEqual(done["version"], "v1")
+        self.assertEqual(done["metrics"], {"users": 1})
+        self.assertEqual(service.get(failed["task_id"])["status"], "failed")
+        self.assertIn("boom", service.get(failed["task_id"])["error"])
+        self.assertIsNone(service.get(12345))
+        service.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import sys
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+# 添加backend和benchmarks目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../benchmarks')))
+
+from fake_redis import FakeRedis, FakeAsyncRedis
+from database import Base
+from models.models import User, Post, PostTag, Event
+from schemas import schemas
+from routers import posts, events
+from services.admission import AdmissionController
+from services.async_recommender import AsyncRecommenderService, CONNECTIONS_PER_REQUEST
+from services.existence import ExistenceService
+from services.feature_store import feature_store
+from services.recent_posts import recent_posts
+from services.user_profile import user_profile_cache
+from services.impressions import impression_log
+
+NOW = datetime.utcnow()
+
+class CountingSessionFactory:
+    """
+    记录同时打开的会话数的异步会话工厂
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.open = 0
+        self.max_open = 0
+
+    def __call__(self):
+        counter = self
+        session = self.factory()
+
+        class Tracked:
+            async def __aenter__(self):
+                counter.open += 1
+                counter.max_open = max(counter.max_open, counter.open)
+                return await session.__aenter__()
+
+            async def __aexit__(self, *exc):
+                counter.open -= 1
+                return await session.__aexit__(*exc)
+        return Tracked()
+
+class TestAsyncRecommender(unittest.TestCase):
+    """
+    异步推荐服务和异步路由，使用aiosqlite文件库和进程内Redis替身
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(self.tmp_dir, "async.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [
+                {"user_id": i, "username": f"用户{i}", "tags": {"interests": []}, "tag_ids": [1] if i == 1 else []}
+                for i in (1, 2)
+            ])
+            conn.execute(Post.__table__.insert(), [
+                {"post_id": post_id, "title": f"帖子{post_id}", "content": "内容", "author_id": 2, "tags": {"tags": []},
+                 "tag_ids": tag_ids, "create_time": NOW - timedelta(hours=post_id), "view_count": 0,
+                 "like_count": 0, "favorite_count": 0}
+                for post_id, tag_ids in ((10, [1]), (11, [1]), (12, [1]), (13, [2]), (14, [2]))
+            ])
+            conn.execute(PostTag.__table__.insert(), [
+                {"post_id": post_id, "tag_id": 1} for post_id in (10, 11, 12)
+            ] + [{"post_id": post_id, "tag_id": 2} for post_id in (13, 14)])
+            # 用户1和用户2都点赞了11，用户2还收藏了13，协同过滤为用户1召回13
+            conn.execute(Event.__table__.insert(), [
+                {"event_id": 1, "user_id": 1, "post_id": 11, "event_type": "like", "timestamp": NOW},
+                {"event_id": 2, "user_id": 2, "post_id": 11, "event_type": "like", "timestamp": NOW},
+                {"event_id": 3, "user_id": 2, "post_id": 13, "event_type": "favorite", "timestamp": NOW},
+            ])
+        engine.dispose()
+        self.async_url = f"sqlite+aiosqlite:///{path}"
+
+        self.redis = FakeRedis()
+        self.redis.sadd("user:viewed:posts:1", "10")
+        self.patches = [
+            patch("redis_client.redis_client", self.redis),
+            patch("redis_client.async_redis_client", FakeAsyncRedis(self.redis)),
+            patch.object(impression_log, "record"),
+        ]
+        for p in self.patches:
+            p.start()
+        user_profile_cache.clear()
+        feature_store.clear()
+        recent_posts.clear()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        user_profile_cache.clear()
+        recent_posts.clear()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def sync_session_factory(self):
+        engine = create_engine(self.async_url.replace("+aiosqlite", ""))
+        self.addCleanup(engine.dispose)
+        return sessionmaker(bind=engine)
+
+    def run_with_sessions(self, body):
+        """
+        在事件循环内创建异步引擎，执行body(会话工厂)后释放
+        """
+        async def run():
+            engine = create_async_engine(self.async_url)
+            factory = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            try:
+                with patch.object(feature_store, "async_session_factory", factory):
+                    return await body(factory)
+            finally:
+                await engine.dispose()
+        return asyncio.run(run())
+
+    def test_get_recommendations(self):
+        async def body(factory):
+            counting = CountingSessionFactory(factory)
+            async with factory() as db:
+                result = await AsyncRecommenderService(db, session_factory=counting).get_recommendations(1, 10, 0)
+            return result, counting.max_open
+
+        result, max_open = self.run_with_sessions(body)
+        post_ids = [post.post_id for post in result["items"]]
+        # 标签召回11、12，协同过滤召回13，已浏览的10被过滤
+        self.assertTrue({11, 12, 13} <= set(post_ids))
+        self.assertNotIn(10, post_ids)
+        self.assertEqual(result["total"], len(post_ids))
+        # 召回源各自使用独立会话，加上请求会话不超过每个请求的连接预算
+        self.assertLessEqual(max_open + 1, CONNECTIONS_PER_REQUEST)
+
+    def test_random_recall_before_first_load(self):
+        async def body(factory):
+            counting = CountingSessionFactory(factory)
+            async with factory() as db:
+                service = AsyncRecommenderService(db, session_factory=counting)
+                empty = await service._recommend_random(3, {}, set())
+                opened = counting.max_open
+                recent_posts.refresh()
+                return empty, opened, await service._recommend_random(3, {}, {10})
+
+        with patch.object(recent_posts, "session_factory", self.sync_session_factory()):
+            empty, opened, sampled = self.run_with_sessions(body)
+        # 第一次加载完成前不在请求路径上访问数据库
+        self.assertEqual((empty, opened), ([], 0))
+        self.assertEqual(len(sampled), 3)
+        self.assertNotIn(10, [post.post_id for post in sampled])
+
+    def test_missing_user(self):
+        async def body(factory):
+            async with factory() as db:
+                return await AsyncRecommenderService(db, session_factory=factory).get_recommendations(99, 10, 0)
+
+        self.assertEqual(self.run_with_sessions(body), {"items": [], "has_more": False, "total": 0})
+
+    def test_get_posts_route(self):
+        controller = AdmissionController(max_in_flight=4, pool_wait_threshold_ms=1000)
+
+        async def body(factory):
+            async with factory() as db:
+                with patch("routers.posts.admission_controller", controller), \
+                        patch("routers.posts.replica_router.async_read_session_factory", return_value=factory):
+                    return await posts.get_posts(user_id=1, count=2, offset=0, filters=None, db=db)
+
+        response = self.run_with_sessions(body)
+        self.assertNotIn("X-Degraded", response.headers)
+        page = json.loads(response.body)
+        self.assertEqual(len(page["items"]), 2)
+        self.assertTrue(page["has_more"])
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_create_event_route(self):
+        existence = ExistenceService()
+
+        async def body(factory):
+            async with factory() as db:
+                with patch("routers.events.existence_service", existence):
+                    created = await events.create_event(schemas.EventCreate(
+                        user_id=1, post_id=12, event_type="like", source="test"), db)
+            async with factory() as db:
+                like_count = (await db.execute(select(Post.like_count).filter(Post.post_id == 12))).scalar()
+            return created, like_count
+
+        created, like_count = self.run_with_sessions(body)
+        self.assertEqual((created.user_id, created.post_id, created.event_type), (1, 12, "like"))
+        self.assertEqual(like_count, 1)
+        self.assertEqual(self.redis.hgetall("stats:counters"), {"event_type:like": "1"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from db_routing import ReplicaRouter, Replica
+from models.models import User
+
+def sqlite_replica(name: str, username: str):
+    """
+    用内存SQLite模拟一个库，写入一个可以区分来源的用户
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    User.__table__.create(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add(User(user_id=1, username=username))
+    db.commit()
+    db.close()
+    return Replica(name, engine, session_factory)
+
+def read_username(session_factory) -> str:
+    db = session_factory()
+    try:
+        return db.get(User, 1).username
+    finally:
+        db.close()
+
+class TestReplicaRouter(unittest.TestCase):
+    def setUp(self):
+        self.primary = sqlite_replica("primary", "primary")
+        self.replicas = [sqlite_replica("replica0", "replica0"), sqlite_replica("replica1", "replica1")]
+        self.router = ReplicaRouter(self.primary.session_factory, replicas=self.replicas, read_your_writes_window=60)
+
+    def test_without_replicas_reads_primary(self):
+        router = ReplicaRouter(self.primary.session_factory)
+        router.record_write(1)
+        self.assertIsNone(router.pick_replica(1))
+        self.assertEqual(read_username(router.read_session_factory()), "primary")
+
+    def test_round_robin(self):
+        sources = [read_username(self.router.read_session_factory()) for _ in range(4)]
+        self.assertEqual(sorted(sources), ["replica0", "replica0", "replica1", "replica1"])
+        self.assertNotEqual(sources[0], sources[1])
+
+    def test_read_your_writes(self):
+        self.router.record_write(1)
+        self.assertEqual(read_username(self.router.read_session_factory(1)), "primary")
+        # 其他用户不受影响
+        self.assertTrue(read_username(self.router.read_session_factory(2)).startswith("replica"))
+
+        self.router.read_your_writes_window = 0
+        self.router.record_write(3)
+        self.assertFalse(self.router.has_recent_write(3))
+
+    def test_health_check(self):
+        failing = MagicMock()
+        failing.connect.side_effect = Exception("connection refused")
+        self.replicas[0].engine, healthy_engine = failing, self.replicas[0].engine
+
+        self.router.check_replicas()
+        self.assertFalse(self.replicas[0].healthy)
+        self.assertEqual({read_username(self.router.read_session_factory()) for _ in range(4)}, {"replica1"})
+
+        # 所有从库不可用时回退到主库
+        self.router.mark_unhealthy(self.replicas[1], "timeout")
+        self.assertEqual(read_username(self.router.read_session_factory()), "primary")
+
+        # 恢复后重新加入轮询
+        self.replicas[0].engine = healthy_engine
+        self.router.check_replicas()
+        self.assertTrue(all(replica.healthy for replica in self.replicas))
+
+    def test_read_dependency_marks_failed_replica(self):
+        from sqlalchemy.exc import OperationalError
+        import database
+
+        request = MagicMock()
+        request.path_params = {"user_id": "2"}
+        with patch.object(database, "replica_router", self.router):
+            dependency = database.get_read_db(request)
+            db = next(dependency)
+            self.assertTrue(db.get(User, 1).username.startswith("replica"))
+            with self.assertRaises(OperationalError):
+                dependency.throw(OperationalError("SELECT 1", {}, Exception("lost connection")))
+        self.assertEqual(sum(not replica.healthy for replica in self.replicas), 1)
+
+if __name__ == '__main__':
+    unittest.main()
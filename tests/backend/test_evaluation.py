@@ -0,0 +1,103 @@
+import sys
+import os
+import math
+import unittest
+from datetime import datetime, timedelta
+
+# 添加backend和benchmarks目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../benchmarks')))
+
+from evaluation import (
+    ReplayEvaluator, PopularityStrategy, PoolStrategy, recall_at_k, ndcg_at_k, split_windows
+)
+
+START = datetime(2024, 1, 1)
+
+def events(*rows):
+    return [(START + timedelta(minutes=i), user_id, post_id, event_type)
+            for i, (user_id, post_id, event_type) in enumerate(rows)]
+
+class OracleStrategy(PopularityStrategy):
+    """
+    测试用策略：总是推荐固定的帖子，记录observe收到的事件数
+    """
+    name = "oracle"
+
+    def __init__(self, post_ids):
+        super().__init__()
+        self.post_ids = post_ids
+        self.observed = []
+
+    def observe(self, events):
+        super().observe(events)
+        self.observed.append(len(events))
+
+    def recommend(self, user_id, k, exclude):
+        return [post_id for post_id in self.post_ids if post_id not in exclude][:k]
+
+class TestMetrics(unittest.TestCase):
+    def test_recall_and_ndcg(self):
+        self.assertEqual(recall_at_k([1, 2, 3], {2, 4}, 2), 0.5)
+        self.assertEqual(recall_at_k([1, 2, 3], set(), 2), 0.0)
+        self.assertEqual(ndcg_at_k([2, 4], {2, 4}, 2), 1.0)
+        self.assertAlmostEqual(ndcg_at_k([1, 2], {2}, 2), 1.0 / math.log2(3))
+        self.assertEqual(ndcg_at_k([1, 2, 3], {3}, 2), 0.0)
+
+    def test_split_windows(self):
+        rows = events(*[(1, i, "view") for i in range(10)])
+        windows = split_windows(rows, 3)
+        self.assertEqual([len(w) for w in windows], [3, 3, 4])
+        self.assertEqual(sum(windows, []), rows)
+        self.assertEqual(len(split_windows(rows[:2], 4)), 2)
+        self.assertEqual(split_windows([], 4), [])
+
+class TestStrategies(unittest.TestCase):
+    def test_popularity_and_pool(self):
+        popularity = PopularityStrategy()
+        popularity.prepare(events((1, 10, "view"), (2, 11, "like"), (3, 11, "view"), (3, 12, "favorite")))
+        self.assertEqual(popularity.recommend(1, 2, set()), [12, 11])
+        self.assertEqual(popularity.recommend(1, 5, {12}), [11, 10])
+
+        pool = PoolStrategy({1: [10, 99]})
+        pool.prepare(events((2, 11, "like"), (3, 12, "favorite")))
+        self.assertEqual(pool.recommend(1, 3, {99}), [10, 12, 11])
+        self.assertEqual(pool.recommend(2, 1, set()), [12])
+
+class TestReplayEvaluator(unittest.TestCase):
+    def setUp(self):
+        self.train = events((1, 10, "like"), (2, 10, "click"), (2, 11, "view"))
+        # 用户1在第一个窗口点击了新帖子11，用户2在第二个窗口点赞了已交互过的帖子11，只有用户3的收藏是新的
+        self.test = events((1, 11, "click"), (1, 12, "view"), (2, 11, "like"), (3, 12, "favorite"))
+
+    def test_prequential_replay(self):
+        oracle = OracleStrategy([11, 12])
+        report = ReplayEvaluator([oracle, PopularityStrategy()], k=2, windows=2).run(self.train, self.test, 4)
+
+        self.assertEqual(oracle.observed, [3, 2, 2])
+        self.assertEqual([(w["events"], w["users"]) for w in report["windows"]], [(2, 1), (2, 1)])
+        oracle_report = report["strategies"]["oracle"]
+        # 用户1和用户3分别命中11和12
+        self.assertEqual(oracle_report["recall_at_k"], 1.0)
+        self.assertEqual(oracle_report["users"], 2)
+        self.assertEqual(oracle_report["coverage"], 0.5)
+        self.assertEqual(oracle_report["latency"]["count"], 2)
+        self.assertIn("memory_bytes", oracle_report["prepare"])
+        # 热门策略为用户1推荐未交互过的11；第二个窗口帖子12的热度仍低于10和11，用户3未命中
+        self.assertEqual(report["strategies"]["popularity"]["recall_at_k"], 0.5)
+
+    def test_parallel_matches_inline(self):
+        inline = ReplayEvaluator([OracleStrategy([11, 12]), PopularityStrategy()], k=2, windows=2).run(
+            self.train, self.test, 4)
+        parallel = ReplayEvaluator([OracleStrategy([11, 12]), PopularityStrategy()], k=2, windows=2, workers=2).run(
+            self.train, self.test, 4)
+        for name in ("oracle", "popularity"):
+            for key in ("recall_at_k", "ndcg_at_k", "coverage", "users"):
+                self.assertEqual(inline["strategies"][name][key], parallel["strategies"][name][key])
+
+    def test_duplicate_names(self):
+        with self.assertRaises(ValueError):
+            ReplayEvaluator([PopularityStrategy(), PopularityStrategy()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.existence import ExistenceService
+from services.invalidation import InvalidationBus, UPDATED, DELETED
+from models.models import User, Post
+
+class TestExistenceService(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+        self.existence = ExistenceService(session_factory=lambda: self.session, refresh_interval=1)
+        self.db = MagicMock()
+
+    def test_known_ids_skip_database(self):
+        with patch.object(self.existence, '_load_ids', side_effect=[{1, 2}, {10}]):
+            self.existence.refresh()
+
+        self.assertTrue(self.existence.user_exists(self.db, 1))
+        self.assertTrue(self.existence.post_exists(self.db, 10))
+        self.db.query.assert_not_called()
+
+    def test_missing_ids_fall_back_to_database(self):
+        self.db.query.return_value.filter.return_value.all.return_value = [(3,)]
+
+        self.assertEqual(self.existence.existing_ids(self.db, User, [3, 4]), {3})
+        # 数据库中查到的ID会补入集合
+        self.db.query.reset_mock()
+        self.assertTrue(self.existence.user_exists(self.db, 3))
+        self.db.query.assert_not_called()
+
+    def test_write_path_updates(self):
+        self.existence.add_post(5)
+        self.assertTrue(self.existence.post_exists(self.db, 5))
+
+        self.db.query.return_value.filter.return_value.all.return_value = []
+        self.existence.remove_post(5)
+        self.assertFalse(self.existence.post_exists(self.db, 5))
+
+    def test_delete_broadcast_from_other_process(self):
+        bus = InvalidationBus("posts:test")
+        bus.subscribe(self.existence.remove_post, events=(DELETED,))
+        self.existence.add_post(5)
+
+        # 其他进程删除帖子后，本进程收到广播即从集合中移除，不等待全量刷新
+        bus.handle_message(f"{UPDATED}:5")
+        self.assertTrue(self.existence.post_exists(self.db, 5))
+        self.db.query.return_value.filter.return_value.all.return_value = []
+        bus.handle_message(f"{DELETED}:5")
+        self.assertFalse(self.existence.post_exists(self.db, 5))
+
+if __name__ == '__main__':
+    unittest.main()
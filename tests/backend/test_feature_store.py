@@ -0,0 +1,84 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.feature_store import FeatureStore
+from models.models import Feature
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Feature.__table__.create(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        db = self.session_factory()
+        db.add_all([
+            Feature(feature_id=1, entity_type="post", entity_id=10, feature_type="post_stats", feature_value={"ctr": 0.1, "like_ratio": 0.5}),
+            Feature(feature_id=2, entity_type="post", entity_id=10, feature_type="quality", feature_value={"score": 3, "label": "good"}),
+            Feature(feature_id=3, entity_type="user", entity_id=10, feature_type="user_tags", feature_value={"ctr": 9.0}),
+        ])
+        db.commit()
+        db.close()
+
+        self.redis_hashes = {
+            "feature:post:20": {"ctr": "0.2", "like_ratio": "0.25"},
+        }
+        self.redis_patch = patch("redis_client.get_feature_hashes", side_effect=self.fake_hashes)
+        self.redis_mock = self.redis_patch.start()
+        self.store = FeatureStore(session_factory=self.session_factory, capacity=4, ttl=60)
+
+    def tearDown(self):
+        self.redis_patch.stop()
+
+    def fake_hashes(self, entity_type, ids):
+        return [self.redis_hashes.get(f"feature:{entity_type}:{entity_id}", {}) for entity_id in ids]
+
+    def test_multi_get_merges_sources(self):
+        block = self.store.get_features("post", [20, 10, 30], ["ctr", "score", "like_ratio"])
+        self.assertEqual(block.values.shape, (3, 3))
+        # 20来自Redis，10回退到features表并合并两组特征，30不存在
+        np.testing.assert_allclose(block.column("ctr", 0.0), [0.2, 0.1, 0.0])
+        self.assertEqual(block.get(10, "score"), 3.0)
+        self.assertIsNone(block.get(20, "score"))
+        self.assertIsNone(block.get(30, "ctr"))
+        self.assertIsNone(block.get(10, "label"))
+        # 实体类型互不影响
+        self.assertEqual(self.store.get_features("user", [10], ["ctr"]).get(10, "ctr"), 9.0)
+
+    def test_cache_hit_and_negative_cache(self):
+        self.store.get_features("post", [20, 10, 30], ["ctr"])
+        self.redis_hashes["feature:post:20"] = {"ctr": "0.9"}
+        self.redis_mock.reset_mock()
+
+        block = self.store.get_features("post", [30, 20, 10], ["ctr", "like_ratio"])
+        self.redis_mock.assert_not_called()
+        self.assertEqual(block.get(20, "ctr"), 0.2)
+        self.assertEqual(block.get(10, "like_ratio"), 0.5)
+        self.assertIsNone(block.get(30, "ctr"))
+
+        self.store.invalidate("post", [20])
+        self.assertEqual(self.store.get_features("post", [20], ["ctr"]).get(20, "ctr"), 0.9)
+        self.redis_mock.assert_called_once_with("post", [20])
+
+    def test_redis_failure_falls_back_to_db(self):
+        self.redis_mock.side_effect = ConnectionError("redis down")
+        block = self.store.get_features("post", [10], ["ctr"])
+        self.assertEqual(block.get(10, "ctr"), 0.1)
+
+    def test_capacity_recycles_rows(self):
+        self.store.get_features("post", [1, 2, 3, 4, 10], ["ctr"])
+        table = self.store._tables["post"]
+        self.assertEqual(len(table.index), 4)
+        self.assertNotIn(1, table.index)
+        self.assertEqual(self.store.get_features("post", [10], ["ctr"]).get(10, "ctr"), 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
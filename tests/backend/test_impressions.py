@@ -0,0 +1,75 @@
+import sys
+import os
+import unittest
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.impressions import ImpressionLog
+from services.recommender import merge_recall_results
+from models.models import Impression
+
+def post(post_id: int):
+    return SimpleNamespace(post_id=post_id)
+
+class TestImpressionLog(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Impression.__table__.create(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+
+    def rows(self):
+        db = self.session_factory()
+        try:
+            return db.query(Impression).order_by(Impression.request_id, Impression.position).all()
+        finally:
+            db.close()
+
+    def test_record_and_flush(self):
+        log = ImpressionLog(session_factory=self.session_factory, batch_size=3)
+        first = log.record(1, [(post(10), 2.5), (post(11), 1.0)], {10: "tag", 11: "random"}, offset=0, latency_ms=12.0)
+        second = log.record(2, [(post(12), 0.5), (post(10), 0.25)], {12: "cf"}, offset=20, latency_ms=8.0)
+        self.assertIsNone(log.record(3, [], {}))
+        self.assertEqual(log.pending(), 2)
+        # 请求路径只写入缓冲区
+        self.assertEqual(self.rows(), [])
+
+        self.assertEqual(log.flush(), 4)
+        self.assertEqual(log.pending(), 0)
+        rows = [(r.request_id, r.position, r.user_id, r.post_id, r.score, r.source, r.latency_ms) for r in self.rows()]
+        self.assertEqual(rows, [
+            (first, 0, 1, 10, 2.5, "tag", 12.0),
+            (first, 1, 1, 11, 1.0, "random", 12.0),
+            (second, 20, 2, 12, 0.5, "cf", 8.0),
+            (second, 21, 2, 10, 0.25, None, 8.0),
+        ])
+        self.assertEqual(log.flush(), 0)
+
+    def test_bounded_buffer_and_failed_write(self):
+        log = ImpressionLog(session_factory=self.session_factory, capacity=1)
+        self.assertIsNotNone(log.record(1, [(post(10), 1.0)], {}))
+        self.assertIsNone(log.record(1, [(post(11), 1.0)], {}))
+        self.assertEqual(log.pending(), 1)
+
+        # 写入失败的批次被丢弃，不影响后续写入
+        Impression.__table__.drop(bind=self.engine)
+        self.assertEqual(log.flush(), 0)
+        self.assertEqual(log.pending(), 0)
+        Impression.__table__.create(bind=self.engine)
+        log.record(1, [(post(12), 1.0)], {})
+        self.assertEqual(log.flush(), 1)
+
+    def test_merge_records_sources(self):
+        sources = {}
+        merged = merge_recall_results(2, [post(1), post(2)], [post(2), post(3)], [post(9)],
+                                      trending_posts=[post(4)], embedding_posts=[post(3), post(5)], sources=sources)
+        self.assertEqual([p.post_id for p in merged], [1, 2, 3, 5])
+        self.assertEqual(sources, {1: "tag", 2: "tag", 3: "cf", 5: "embedding"})
+
+if __name__ == '__main__':
+    unittest.main()
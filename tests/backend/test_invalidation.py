@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加backend和benchmarks目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../benchmarks')))
+
+from fake_redis import FakeRedis
+from services.invalidation import InvalidationBus, UPDATED, DELETED, POST_INVALIDATION_CHANNEL
+
+def wait_until(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+class TestInvalidationBus(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.patch = patch("redis_client.redis_client", self.redis)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_broadcast_to_other_process(self):
+        # 两个总线模拟两个进程，共享同一个Redis
+        publisher, subscriber = InvalidationBus(POST_INVALIDATION_CHANNEL), InvalidationBus(POST_INVALIDATION_CHANNEL)
+        local, updated, deleted = [], [], []
+        publisher.subscribe(local.append)
+        subscriber.subscribe(updated.append)
+        subscriber.subscribe(deleted.append, events=(DELETED,))
+        subscriber.start()
+        try:
+            self.assertTrue(wait_until(lambda: self.redis._subscribers))
+            publisher.publish(7, UPDATED)
+            publisher.publish(8, DELETED)
+            # 本进程立即失效，不等待广播
+            self.assertEqual(local, [7, 8])
+            self.assertTrue(wait_until(lambda: updated == [7, 8]))
+            self.assertEqual(deleted, [8])
+        finally:
+            subscriber.stop()
+
+    def test_invalid_messages_and_failing_handlers(self):
+        bus = InvalidationBus(POST_INVALIDATION_CHANNEL)
+        received = []
+
+        def broken(post_id):
+            raise RuntimeError("boom")
+
+        bus.subscribe(broken)
+        bus.subscribe(received.append)
+        bus.handle_message("renamed:1")
+        bus.handle_message("updated:abc")
+        bus.handle_message("updated:3")
+        self.assertEqual(received, [3])
+
+    def test_publish_without_redis(self):
+        bus = InvalidationBus(POST_INVALIDATION_CHANNEL)
+        received = []
+        bus.subscribe(received.append)
+        with patch.object(self.redis, "publish", side_effect=ConnectionError("down")):
+            bus.publish(5, DELETED)
+        self.assertEqual(received, [5])
+
+if __name__ == '__main__':
+    unittest.main()
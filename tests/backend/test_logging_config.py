@@ -0,0 +1,62 @@
+import sys
+import os
+import logging
+import unittest
+from unittest.mock import patch
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+import logging_config
+from logging_config import RateLimitFilter, RequestContextFilter, bind_request, reset_request, trace_enabled
+
+def make_record(msg, level=logging.DEBUG, args=()):
+    return logging.LogRecord("services.recommender", level, __file__, 1, msg, args, None)
+
+class TestLoggingConfig(unittest.TestCase):
+    def test_rate_limit_filter(self):
+        rate_filter = RateLimitFilter(limit=2, window=60)
+        results = [rate_filter.filter(make_record("推荐系统: 用户[%s]", args=(i,))) for i in range(5)]
+
+        self.assertEqual(results, [True, True, False, False, False])
+        # INFO及以上级别不限流
+        self.assertTrue(rate_filter.filter(make_record("推荐系统: 用户[%s]", logging.WARNING, (1,))))
+        self.assertTrue(all(rate_filter.filter(make_record("推荐系统: 用户[%s]", logging.INFO, (i,))) for i in range(5)))
+
+    def test_rate_limit_keys_bounded(self):
+        rate_filter = RateLimitFilter(limit=1, window=60, max_keys=3)
+        for i in range(10):
+            self.assertTrue(rate_filter.filter(make_record(f"消息{i}")))
+        self.assertEqual(len(rate_filter._buckets), 3)
+        # 最近出现的模板仍在限流，最早的模板已被淘汰
+        self.assertFalse(rate_filter.filter(make_record("消息9")))
+        self.assertTrue(rate_filter.filter(make_record("消息0")))
+
+    def test_rate_limit_reports_suppressed(self):
+        rate_filter = RateLimitFilter(limit=1, window=60)
+        rate_filter.filter(make_record("消息"))
+        rate_filter.filter(make_record("消息"))
+
+        with patch("logging_config.time.monotonic", return_value=10 ** 9):
+            record = make_record("消息")
+            self.assertTrue(rate_filter.filter(record))
+        self.assertIn("丢弃 1 条", record.msg)
+
+    def test_request_context(self):
+        logger = logging.getLogger("test_logging_config")
+        logger.setLevel(logging.DEBUG)
+
+        with patch.object(logging_config, "LOG_TRACE_SAMPLE_RATE", 1.0):
+            tokens = bind_request("req-1")
+        try:
+            record = make_record("消息")
+            RequestContextFilter().filter(record)
+            self.assertEqual(record.request_id, "req-1")
+            self.assertTrue(trace_enabled(logger))
+        finally:
+            reset_request(tokens)
+
+        self.assertFalse(trace_enabled(logger))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+import os
+import asyncio
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from metrics import MetricsRegistry, Histogram, timer, instrument_engine, instrument_redis, REDIS_COMMAND_LATENCY
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_cumulative_buckets(self):
+        histogram = Histogram("test_latency_seconds", "测试", buckets=(0.1, 1.0))
+        histogram.observe(0.05, route="/api/posts")
+        histogram.observe(0.5, route="/api/posts")
+        histogram.observe(5.0, route="/api/posts")
+
+        lines = histogram.render()
+
+        self.assertIn('test_latency_seconds_bucket{route="/api/posts",le="0.1"} 1', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/api/posts",le="1.0"} 2', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/api/posts",le="+Inf"} 3', lines)
+        self.assertIn('test_latency_seconds_count{route="/api/posts"} 3', lines)
+
+    def test_registry_reuses_metrics(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "测试")
+        self.assertIs(registry.counter("test_total", "测试"), counter)
+
+        counter.inc(stage="rank")
+        counter.inc(2, stage="rank")
+
+        self.assertEqual(counter.value(stage="rank"), 3)
+        self.assertIn('test_total{stage="rank"} 3', registry.render())
+
+    def test_timer_records_on_exception(self):
+        histogram = Histogram("test_timer_seconds", "测试")
+        with self.assertRaises(ValueError):
+            with timer(histogram, stage="tag_recall"):
+                raise ValueError("boom")
+
+        self.assertIn('test_timer_seconds_count{stage="tag_recall"} 1', histogram.render())
+
+    def test_instrument_redis(self):
+        client = MagicMock()
+        client.execute_command.return_value = 1
+        instrument_redis(client, name="test")
+
+        self.assertEqual(client.execute_command("SADD", "key", "1"), 1)
+        self.assertIn('redis_command_duration_seconds_count{client="test",command="SADD"} 1',
+                      REDIS_COMMAND_LATENCY.render())
+
+    def test_instrument_redis_pipeline(self):
+        client = MagicMock()
+        client.pipeline.return_value.execute.return_value = [1, 1]
+        instrument_redis(client, name="test_pipeline")
+
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd("key", "1")
+        pipe.expire("key", 60)
+        self.assertEqual(pipe.execute(), [1, 1])
+        self.assertIn('redis_command_duration_seconds_count{client="test_pipeline",command="PIPELINE"} 1',
+                      REDIS_COMMAND_LATENCY.render())
+
+    def test_instrument_async_redis_pipeline(self):
+        client = MagicMock()
+        client.execute_command = AsyncMock(return_value=1)
+        client.pipeline.return_value.execute = AsyncMock(return_value=[1])
+        instrument_redis(client, name="test_async_pipeline")
+
+        self.assertEqual(asyncio.run(client.pipeline().execute()), [1])
+        self.assertEqual(asyncio.run(client.execute_command("GET", "key")), 1)
+        lines = REDIS_COMMAND_LATENCY.render()
+        self.assertIn('redis_command_duration_seconds_count{client="test_async_pipeline",command="PIPELINE"} 1', lines)
+        self.assertIn('redis_command_duration_seconds_count{client="test_async_pipeline",command="GET"} 1', lines)
+
+    def test_instrument_engine_failed_query(self):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine, name="test")
+
+        with engine.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+            # 失败的查询不会在连接上遗留开始时间
+            self.assertEqual(conn.connection.info.get("query_start_time"), [])
+            self.assertEqual(conn.execute(text("SELECT 1")).scalar(), 1)
+            self.assertEqual(conn.connection.info.get("query_start_time"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.model_registry import ModelRegistry
+from services.snapshot import publish_arrays, read_manifest, verify_checksums
+
+class ConstantModel:
+    """
+    测试用模型：predict返回发布时写入的常数，记录加载和预热顺序
+    """
+    events = []
+
+    def __init__(self, path: str):
+        self.manifest = read_manifest(path)
+        self.version = self.manifest["version"]
+        self.value = np.load(os.path.join(path, "value.npy"), mmap_mode="r")
+        self.warmed = False
+        ConstantModel.events.append(("load", self.version))
+
+    def warm(self):
+        self.warmed = True
+        ConstantModel.events.append(("warm", self.version))
+
+    def predict(self) -> int:
+        return int(self.value[0])
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.registry = ModelRegistry(self.root, reload_interval=3600)
+        self.store = self.registry.register("constant", ConstantModel)
+        ConstantModel.events = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def publish(self, value: int, version: str) -> str:
+        return publish_arrays({"value": np.array([value])}, {"model_type": "constant"},
+                              self.registry.path("constant"), version=version)
+
+    def test_checksums(self):
+        version = self.publish(1, "v1")
+        path = os.path.join(self.registry.path("constant"), version)
+        files = read_manifest(path)["files"]
+        self.assertEqual(set(files), {"value.npy"})
+        verify_checksums(path)
+
+        # 大小不变的内容损坏也能被发现
+        with open(os.path.join(path, "value.npy"), "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with self.assertRaises(ValueError):
+            verify_checksums(path)
+
+    def test_hot_swap(self):
+        self.assertIsNone(self.registry.model("constant"))
+        self.publish(1, "v1")
+        self.assertTrue(self.store.reload())
+        first = self.registry.model("constant")
+        self.assertEqual(first.predict(), 1)
+        self.assertTrue(first.warmed)
+        self.assertFalse(self.store.reload())
+
+        # 新版本加载期间读取方看到的始终是完整的旧版本或新版本
+        self.publish(2, "v2")
+        seen, stop = set(), threading.Event()
+        def read():
+            while not stop.is_set():
+                seen.add(self.registry.model("constant").predict())
+        reader = threading.Thread(target=read)
+        reader.start()
+        self.assertTrue(self.store.reload())
+        stop.set()
+        reader.join()
+        self.assertTrue(seen <= {1, 2})
+        self.assertEqual(self.registry.model("constant").predict(), 2)
+        self.assertEqual(ConstantModel.events, [("load", "v1"), ("warm", "v1"), ("load", "v2"), ("warm", "v2")])
+        # 请求持有的旧版本对象不受切换影响
+        self.assertEqual(first.predict(), 1)
+        self.assertEqual(self.store.status()["version"], "v2")
+
+    def test_corrupt_version_keeps_serving(self):
+        self.publish(1, "v1")
+        self.store.reload()
+        version = self.publish(2, "v2")
+        with open(os.path.join(self.registry.path("constant"), version, "value.npy"), "ab") as f:
+            f.write(b"\0")
+        self.assertFalse(self.store.reload())
+        self.assertEqual(self.registry.model("constant").version, "v1")
+
+    def test_versions_and_rollback(self):
+        self.publish(1, "v1")
+        self.publish(2, "v2")
+        self.store.reload()
+        versions = self.registry.versions()
+        self.assertEqual([(v["version"], v["status"], v["loaded"]) for v in versions],
+                         [("v2", "active", True), ("v1", "inactive", False)])
+
+        status = self.registry.activate("constant", "v1")
+        self.assertEqual(status["version"], "v1")
+        self.assertEqual(self.store.current_version(), "v1")
+        self.assertEqual(self.registry.model("constant").predict(), 1)
+
+        with self.assertRaises(KeyError):
+            self.registry.activate("constant", "v3")
+        with self.assertRaises(KeyError):
+            self.registry.activate("constant", "../constant")
+        with self.assertRaises(KeyError):
+            self.registry.activate("unknown", "v1")
+        self.assertEqual(self.registry.versions("unknown"), [])
+
+if __name__ == '__main__':
+    unittest.main()
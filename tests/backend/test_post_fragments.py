@@ -0,0 +1,75 @@
+import sys
+import os
+import json
+import unittest
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from models.models import Post
+from schemas import schemas
+from services.post_fragments import PostFragmentCache
+from utils.json_utils import CustomJSONResponse
+
+def make_post(post_id: int, title: str = "机器学习入门") -> Post:
+    return Post(
+        post_id=post_id,
+        title=title,
+        content="这是一篇关于“推荐系统”的长文\n包含引号\"和反斜杠\\",
+        tags={"tags": ["科技", "编程"]},
+        tag_ids=[1, 2],
+        author_id=1001,
+        create_time=datetime(2023, 6, 15, 8, 30, 15, 123456),
+        view_count=10,
+        like_count=3,
+        favorite_count=1
+    )
+
+class TestPostFragmentCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = PostFragmentCache(capacity=2)
+
+    def test_matches_response_model(self):
+        posts = [make_post(1), make_post(2, "深度学习")]
+        expected = jsonable_encoder([schemas.PostResponse.from_orm(post) for post in posts])
+        encoded = self.cache.encode_posts(posts)
+        self.assertEqual(json.loads(encoded), expected)
+        # 中文字符不转义
+        self.assertIn("机器学习入门".encode("utf-8"), encoded)
+
+        recommendations = {"items": posts, "has_more": True, "total": 12}
+        expected = jsonable_encoder(schemas.RecommendationResponse(
+            items=[schemas.PostResponse.from_orm(post) for post in posts], has_more=True, total=12
+        ))
+        self.assertEqual(json.loads(self.cache.encode_recommendations(recommendations)), expected)
+        self.assertEqual(json.loads(self.cache.encode_posts([])), [])
+
+    def test_counters_are_fresh_and_invalidate(self):
+        post = make_post(1)
+        self.cache.encode_post(post)
+
+        # 计数每次重新编码，不可变字段来自缓存
+        post.like_count = 99
+        post.title = "未失效前的修改"
+        data = json.loads(self.cache.encode_post(post))
+        self.assertEqual(data["like_count"], 99)
+        self.assertEqual(data["title"], "机器学习入门")
+
+        self.cache.invalidate(1)
+        self.assertEqual(json.loads(self.cache.encode_post(post))["title"], "未失效前的修改")
+
+    def test_lru_capacity(self):
+        for post_id in (1, 2, 3):
+            self.cache.fragment(make_post(post_id))
+        self.assertEqual(list(self.cache._fragments), [2, 3])
+
+    def test_response_class_keeps_non_ascii(self):
+        body = CustomJSONResponse(content={"title": "推荐", 1: "整数键"}).body
+        self.assertEqual(json.loads(body), {"title": "推荐", "1": "整数键"})
+        self.assertIn("推荐".encode("utf-8"), body)
+
+if __name__ == '__main__':
+    unittest.main()
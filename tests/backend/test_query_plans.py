@@ -0,0 +1,72 @@
+import sys
+import os
+import unittest
+
+from sqlalchemy import create_engine, select
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from database import Base
+from models import models  # noqa: F401  注册所有模型
+from models.models import Post, PostTag
+from services import event_queries
+
+class TestHotQueryPlans(unittest.TestCase):
+    """
+    用SQLite的EXPLAIN QUERY PLAN检查热路径查询是否命中索引
+    SCAN表示全表扫描（或全索引扫描），热路径查询只允许SEARCH
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+
+    def plan(self, query):
+        sql = str(query.compile(self.engine, compile_kwargs={"literal_binds": True}))
+        with self.engine.connect() as conn:
+            return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+    def assert_index_search(self, query, *indexes: str, covering: bool = False):
+        """
+        断言查询没有全表扫描，并使用indexes中的某个索引
+        """
+        plan = self.plan(query)
+        scans = [detail for detail in plan if detail.startswith("SCAN") and "B-TREE" not in detail]
+        self.assertEqual(scans, [], f"出现全表扫描: {plan}")
+        expected = [f"USING {'COVERING ' if covering else ''}INDEX {index} " for index in indexes]
+        self.assertTrue(any(e in detail + " " for e in expected for detail in plan), f"未使用{indexes}: {plan}")
+
+    def test_recent_interactions(self):
+        # 两个索引都能避免全表扫描：按类型过滤后排序，或按时间顺序读取并过滤类型
+        self.assert_index_search(event_queries.recent_interactions_query(1, 200),
+                                 "idx_events_user_type_time", "idx_events_user_time")
+
+    def test_viewed_posts(self):
+        self.assert_index_search(event_queries.viewed_posts_query(1), "idx_events_user_type_time", covering=True)
+
+    def test_collaborative_filtering(self):
+        self.assert_index_search(event_queries.similar_users_query([1, 2, 3], 1),
+                                 "idx_events_post_type_time_user", covering=True)
+        self.assert_index_search(event_queries.users_interactions_query([1, 2, 3]),
+                                 "idx_events_user_type_time", covering=True)
+
+    def test_event_history(self):
+        self.assert_index_search(event_queries.user_events_query(1, 50), "idx_events_user_time")
+        self.assert_index_search(event_queries.user_events_query(1, 50, "like"), "idx_events_user_type_time")
+        self.assert_index_search(event_queries.post_events_query(1, 50), "idx_events_post_time")
+
+    def test_tag_recall(self):
+        query = select(Post).join(PostTag, PostTag.post_id == Post.post_id).filter(PostTag.tag_id == 1).limit(20)
+        plan = self.plan(query)
+        self.assertTrue(any("post_tags USING PRIMARY KEY" in detail or "post_tags USING COVERING INDEX" in detail
+                            for detail in plan), plan)
+        self.assertFalse(any(detail.startswith("SCAN") for detail in plan), plan)
+
+if __name__ == '__main__':
+    unittest.main()
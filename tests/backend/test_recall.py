@@ -0,0 +1,106 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.recall import (
+    RecallOrchestrator, RecallCancelled, bind_deadline, RECALL_TIMEOUTS, RECALL_ERRORS, RECALL_CANCELLED
+)
+
+def failing_source():
+    raise RuntimeError("数据库不可用")
+
+class TestRecallOrchestrator(unittest.TestCase):
+    def setUp(self):
+        self.orchestrator = RecallOrchestrator(budget_ms=50)
+
+    def test_run_merges_returned_sources(self):
+        timeouts_before = RECALL_TIMEOUTS.value(source="slow")
+        errors_before = RECALL_ERRORS.value(source="broken")
+
+        result = self.orchestrator.run({
+            "fast": lambda: [1, 2],
+            "slow": lambda: time.sleep(0.5) or [3],
+            "broken": failing_source
+        })
+
+        self.assertEqual(result.get("fast"), [1, 2])
+        self.assertEqual(result.get("slow"), [])
+        self.assertEqual(result.timed_out, ["slow"])
+        self.assertEqual(result.failed, ["broken"])
+        self.assertLess(result.elapsed, 0.5)
+        self.assertEqual(RECALL_TIMEOUTS.value(source="slow"), timeouts_before + 1)
+        self.assertEqual(RECALL_ERRORS.value(source="broken"), errors_before + 1)
+
+    def test_run_async_cancels_timed_out_sources(self):
+        cancelled = []
+
+        async def fast():
+            return [1]
+
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+                return [2]
+            except asyncio.CancelledError:
+                cancelled.append("slow")
+                raise
+
+        async def run():
+            result = await self.orchestrator.run_async({"fast": fast, "slow": slow})
+            # 让被取消的任务执行清理
+            await asyncio.sleep(0)
+            return result
+
+        result = asyncio.run(run())
+
+        self.assertEqual(result.get("fast"), [1])
+        self.assertEqual(result.timed_out, ["slow"])
+        self.assertEqual(cancelled, ["slow"])
+
+    def test_timed_out_sync_source_stops_and_closes_session(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        session_factory = sessionmaker(bind=engine)
+        cancelled_before = RECALL_CANCELLED.value(stage="slow_recall")
+        queries = []
+        closed = threading.Event()
+
+        def slow():
+            db = session_factory()
+            bind_deadline(db, self.orchestrator.deadline(), "slow_recall")
+            try:
+                queries.append(db.execute(text("SELECT 1")).scalar())
+                time.sleep(0.1)
+                # 超出预算后的下一次查询被取消
+                queries.append(db.execute(text("SELECT 2")).scalar())
+                return [1]
+            finally:
+                db.close()
+                closed.set()
+
+        result = self.orchestrator.run({"slow": slow})
+        self.assertEqual(result.timed_out, ["slow"])
+        self.assertTrue(closed.wait(1))
+        self.assertEqual(queries, [1])
+        self.assertEqual(RECALL_CANCELLED.value(stage="slow_recall"), cancelled_before + 1)
+
+    def test_cancelled_source_counts_as_timed_out(self):
+        def cancelled():
+            raise RecallCancelled("late")
+
+        result = self.orchestrator.run({"late": cancelled, "fast": lambda: [1]})
+        self.assertEqual(result.timed_out, ["late"])
+        self.assertEqual(result.failed, [])
+        self.assertEqual(result.get("fast"), [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.recent_posts import RecentPosts
+from models.models import Post
+
+NOW = datetime(2024, 6, 1)
+
+class TestRecentPosts(unittest.TestCase):
+    def setUp(self):
+        self.ring = RecentPosts(capacity=5, fresh_days=7)
+        # 帖子1、2发布于一个月前，3、4、5为最近一周
+        for post_id, days in ((1, 30), (2, 20), (3, 3), (4, 2), (5, 1)):
+            self.ring.add(post_id, author_id=post_id % 2, create_time=NOW - timedelta(days=days))
+
+    def test_sample_prefers_fresh_posts(self):
+        for _ in range(20):
+            sampled = self.ring.sample(2, now=NOW)
+            self.assertEqual(len(sampled), 2)
+            self.assertEqual(len(set(sampled)), 2)
+            self.assertTrue(set(sampled) <= {3, 4, 5})
+
+        # 最近一周不足时从更早的帖子补足，且不重复
+        sampled = self.ring.sample(4, exclude={4}, now=NOW)
+        self.assertEqual(sorted(sampled[:2]), [3, 5])
+        self.assertEqual(sorted(sampled), [1, 2, 3, 5])
+        self.assertEqual(sorted(self.ring.sample(10, now=NOW)), [1, 2, 3, 4, 5])
+
+    def test_filters(self):
+        self.assertEqual(sorted(self.ring.sample(10, filters={"author_id": 1}, now=NOW)), [1, 3, 5])
+        created_after = (NOW - timedelta(days=2, hours=12)).isoformat()
+        self.assertEqual(sorted(self.ring.sample(10, filters={"created_after": created_after}, now=NOW)), [4, 5])
+
+    def test_overwrite_and_remove(self):
+        self.ring.add(6, author_id=0, create_time=NOW)
+        self.ring.add(6, author_id=0, create_time=NOW)
+        self.ring.remove(4)
+        self.ring.remove(42)
+        self.assertEqual(sorted(self.ring.sample(10, now=NOW)), [2, 3, 5, 6])
+        # 新帖子写满后按时间顺序覆盖
+        for post_id in (7, 8, 9):
+            self.ring.add(post_id, author_id=0, create_time=NOW)
+        self.assertEqual(sorted(self.ring.sample(10, now=NOW)), [5, 6, 7, 8, 9])
+
+    def test_refresh_from_database(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Post.__table__.create(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        db = session_factory()
+        db.add_all([
+            Post(post_id=post_id, title="t", content="c", author_id=1, create_time=NOW - timedelta(days=post_id))
+            for post_id in range(1, 9)
+        ])
+        db.commit()
+        db.close()
+
+        ring = RecentPosts(session_factory=session_factory, capacity=3)
+        self.assertFalse(ring.loaded)
+        ring.refresh()
+        self.assertTrue(ring.loaded)
+        self.assertEqual(sorted(ring.sample(10, now=NOW)), [1, 2, 3])
+        # 最近一周没有帖子时从缓冲区中更早的帖子采样
+        self.assertIn(ring.sample(1, now=NOW + timedelta(days=30)), ([1], [2], [3]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.snapshot import build_snapshot_arrays, write_snapshot, SnapshotStore
+
+POSTS = [
+    (30, datetime(2024, 1, 3)),
+    (10, datetime(2024, 1, 1)),
+    (20, datetime(2024, 1, 2)),
+]
+POST_TAGS = [(1, 10), (1, 20), (1, 30), (3, 20), (3, 99)]
+INTERACTIONS = [(100, 10), (100, 20), (101, 10), (101, 20), (101, 30), (102, 30)]
+
+class TestServingSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = SnapshotStore(root=self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_build_and_query(self):
+        self.assertFalse(self.store.reload())
+        self.assertIsNone(self.store.snapshot)
+
+        write_snapshot(build_snapshot_arrays(POSTS, POST_TAGS, INTERACTIONS), self.root, version="v1")
+        self.assertTrue(self.store.reload())
+        snapshot = self.store.snapshot
+
+        # 倒排表按发布时间降序，不存在的帖子被忽略
+        self.assertEqual(snapshot.posts_for_tag(1, 10), [30, 20, 10])
+        self.assertEqual(snapshot.posts_for_tag(1, 2), [30, 20])
+        self.assertEqual(snapshot.posts_for_tag(3, 10), [20])
+        self.assertEqual(snapshot.posts_for_tag(2, 10), [])
+        self.assertEqual(snapshot.posts_for_tag(42, 10), [])
+
+        # 10和20被两个用户共同点赞，30只与它们共同出现一次
+        self.assertEqual(snapshot.neighbors(10, 10), [20, 30])
+        self.assertEqual(snapshot.neighbors(30, 1), [10])
+        self.assertEqual(snapshot.neighbors(99, 10), [])
+
+    def test_atomic_swap(self):
+        write_snapshot(build_snapshot_arrays(POSTS, POST_TAGS, INTERACTIONS), self.root, version="v1", keep=1)
+        self.store.reload()
+        old = self.store.snapshot
+
+        write_snapshot(build_snapshot_arrays(POSTS[:1], [(1, 30)], []), self.root, version="v2", keep=1)
+        self.assertTrue(self.store.reload())
+        self.assertFalse(self.store.reload())
+        self.assertEqual(self.store.snapshot.posts_for_tag(1, 10), [30])
+
+        # 旧版本目录已被清理，但仍持有旧快照的请求可以继续读取
+        self.assertFalse(os.path.exists(os.path.join(self.root, "v1")))
+        self.assertEqual(old.posts_for_tag(1, 10), [30, 20, 10])
+
+    def test_empty_snapshot(self):
+        write_snapshot(build_snapshot_arrays([], [], []), self.root, version="empty")
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.snapshot.posts_for_tag(1, 10), [])
+        self.assertEqual(self.store.snapshot.neighbors(1, 10), [])
+
+if __name__ == '__main__':
+    unittest.main()
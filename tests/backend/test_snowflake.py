@@ -0,0 +1,111 @@
+import sys
+import os
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from utils.snowflake import (
+    SnowflakeIdGenerator, WorkerIdLease, MAX_SEQUENCE, RESERVED_WORKER_ID, RESERVED_WORKER_SLOTS, worker_id_base
+)
+
+class TestSnowflakeIdGenerator(unittest.TestCase):
+    def setUp(self):
+        self.generator = SnowflakeIdGenerator(worker_id=5)
+
+    def test_ids_are_monotonic_and_parseable(self):
+        ids = [self.generator.next_id() for _ in range(1000)] + self.generator.next_ids(5000)
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(self.generator.parse(ids[0])["worker_id"], 5)
+        # 大于旧格式（毫秒时间戳*10000+随机数）的ID
+        self.assertGreater(ids[0], 9999999999999 * 10000 + 9999)
+        self.assertLess(ids[-1], 2 ** 63)
+
+    def test_sequence_overflow_and_clock_rollback(self):
+        with patch("utils.snowflake.time.time", return_value=1700000000.0):
+            ids = self.generator.next_ids(MAX_SEQUENCE + 10)
+        parsed = [self.generator.parse(i) for i in (ids[0], ids[MAX_SEQUENCE], ids[MAX_SEQUENCE + 1])]
+        self.assertEqual(parsed[0]["sequence"], 0)
+        self.assertEqual(parsed[1]["sequence"], MAX_SEQUENCE)
+        self.assertEqual(parsed[2]["timestamp_ms"], parsed[0]["timestamp_ms"] + 1)
+
+        # 时钟回拨后继续递增
+        with patch("utils.snowflake.time.time", return_value=1600000000.0):
+            later = self.generator.next_ids(3)
+        self.assertGreater(later[0], ids[-1])
+        self.assertEqual(later, sorted(set(later)))
+
+    def test_threads_do_not_collide(self):
+        results = []
+        def worker():
+            results.extend(self.generator.next_ids(2000) + [self.generator.next_id() for _ in range(500)])
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), len(set(results)))
+
+    def test_workers_do_not_collide(self):
+        other = SnowflakeIdGenerator(worker_id=6)
+        with patch("utils.snowflake.time.time", return_value=1700000000.0):
+            self.assertFalse(set(self.generator.next_ids(100)) & set(other.next_ids(100)))
+        with self.assertRaises(ValueError):
+            SnowflakeIdGenerator(worker_id=1024)
+
+def child_worker_id(generator, queue):
+    generator.next_id()
+    queue.put(generator.worker_id)
+
+class TestWorkerIdLease(unittest.TestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.lock_dir, ignore_errors=True)
+
+    def test_processes_lease_distinct_ids(self):
+        generators = [SnowflakeIdGenerator(lease=WorkerIdLease(base=40, slots=2, lock_dir=self.lock_dir)) for _ in range(3)]
+        ids = generators[0].next_ids(10) + generators[1].next_ids(10)
+        self.assertEqual({generators[0].worker_id, generators[1].worker_id}, {40, 41})
+        self.assertEqual(len(set(ids)), 20)
+        # 区间内的ID全部被占用时拒绝生成，而不是复用已被占用的ID
+        with self.assertRaises(RuntimeError):
+            generators[2].next_id()
+
+    def test_forked_child_leases_new_id(self):
+        generator = SnowflakeIdGenerator(lease=WorkerIdLease(base=40, slots=4, lock_dir=self.lock_dir))
+        generator.next_id()
+        queue = multiprocessing.get_context("fork").Queue()
+        child = multiprocessing.get_context("fork").Process(target=child_worker_id, args=(generator, queue))
+        child.start()
+        child_id = queue.get(timeout=10)
+        child.join()
+        self.assertEqual(generator.worker_id, 40)
+        self.assertEqual(child_id, 41)
+
+    def test_configured_base(self):
+        with patch.dict(os.environ, {"ID_WORKER_ID": "64"}):
+            self.assertEqual(worker_id_base(16), 64)
+        with patch.dict(os.environ, {"ID_WORKER_ID": "1020"}):
+            with self.assertRaises(ValueError):
+                worker_id_base(16)
+        # 后端进程的区间不能与批量任务保留的区间重叠
+        with patch.dict(os.environ, {"ID_WORKER_ID": str(RESERVED_WORKER_ID - 15)}):
+            with self.assertRaises(ValueError):
+                worker_id_base(16)
+
+    def test_reserved_range_for_batch_jobs(self):
+        leases = [WorkerIdLease(base=RESERVED_WORKER_ID, slots=RESERVED_WORKER_SLOTS, lock_dir=self.lock_dir)
+                  for _ in range(2)]
+        worker_ids = {lease.acquire() for lease in leases}
+        self.assertEqual(len(worker_ids), 2)
+        self.assertTrue(all(RESERVED_WORKER_ID <= worker_id <= 1023 for worker_id in worker_ids))
+
+if __name__ == '__main__':
+    unittest.main()
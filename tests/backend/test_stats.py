@@ -0,0 +1,80 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+# 添加backend和benchmarks目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../benchmarks')))
+
+from fake_redis import FakeRedis
+from services.stats import StatsService
+
+class TestStatsService(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+        self.redis = FakeRedis()
+        self.patch = patch("redis_client.redis_client", self.redis)
+        self.patch.start()
+        self.stats = StatsService(session_factory=lambda: self.session, refresh_interval=1, reconcile_interval=60)
+        self.snapshot = {
+            "user_count": 2,
+            "post_count": 3,
+            "event_count": 4,
+            "event_types": {"view": 4},
+            "top_tags": [{"tag": "科技", "count": 2}],
+            "daily_active_users": 1,
+            "weekly_active_users": 2,
+            "monthly_active_users": 2,
+            "updated_at": "2023-06-15T00:00:00"
+        }
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_not_ready_before_reconcile(self):
+        self.stats.record_event("view")
+        self.assertIsNone(self.stats.get_snapshot())
+
+    def test_reconcile_runs_once_per_interval(self):
+        other = StatsService(session_factory=lambda: self.session, reconcile_interval=60)
+        with patch.object(StatsService, '_compute_snapshot', return_value=dict(self.snapshot)) as mock_compute:
+            self.assertTrue(self.stats.reconcile())
+            # 其他进程在锁过期前不再重复全量计算
+            self.assertFalse(other.reconcile())
+            self.assertFalse(self.stats.reconcile())
+
+            self.assertEqual(mock_compute.call_count, 1)
+            self.session.close.assert_called_once()
+
+    def test_failed_reconcile_releases_lock(self):
+        with patch.object(StatsService, '_compute_snapshot', side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.stats.reconcile()
+        with patch.object(StatsService, '_compute_snapshot', return_value=dict(self.snapshot)):
+            self.assertTrue(self.stats.reconcile())
+
+    def test_record_event_updates_counters(self):
+        with patch.object(StatsService, '_compute_snapshot', return_value=dict(self.snapshot)):
+            self.stats.reconcile()
+
+        # 计数保存在Redis中，其他进程的写入同样可见
+        other = StatsService(session_factory=lambda: self.session)
+        self.stats.record_event("view")
+        other.record_event("like", 2)
+        self.stats.record_user_created()
+
+        result = self.stats.get_snapshot()
+        self.assertEqual(result["event_count"], 7)
+        self.assertEqual(result["event_types"], {"view": 5, "like": 2})
+        self.assertEqual(result["user_count"], 3)
+        self.assertEqual(result["post_count"], 3)
+        self.assertEqual(result["top_tags"], [{"tag": "科技", "count": 2}])
+
+        # 校准以数据库结果为准
+        with patch.object(StatsService, '_compute_snapshot', return_value=dict(self.snapshot)):
+            self.stats.reconcile(force=True)
+        self.assertEqual(self.stats.get_snapshot()["event_types"], {"view": 4})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.tag_vocab import TagVocabulary, post_tag_ids, replace_post_tags
+from models.models import Tag, PostTag
+
+class TestTagVocabulary(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Tag.__table__.create(bind=engine)
+        PostTag.__table__.create(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        db = self.session_factory()
+        db.add_all([Tag(tag_id=1, name="科技"), Tag(tag_id=2, name="编程")])
+        db.commit()
+        db.close()
+        self.vocab = TagVocabulary(session_factory=self.session_factory)
+
+    def test_encode_assigns_ids_to_new_tags(self):
+        self.assertEqual(self.vocab.encode(["编程", " 科技 ", "编程", ""]), [2, 1])
+
+        ids = self.vocab.encode(["音乐", "科技"])
+        self.assertEqual(ids[1], 1)
+        self.assertEqual(self.vocab.decode(ids), ["音乐", "科技"])
+
+        # 其他进程加载词表时可以读到新标签
+        other = TagVocabulary(session_factory=self.session_factory)
+        self.assertEqual(other.lookup(["音乐"]), [ids[0]])
+
+    def test_lookup_does_not_create(self):
+        self.assertEqual(self.vocab.lookup(["科技", "未知"]), [1])
+        self.assertEqual(self.vocab.encode(["未知"], create=False), [])
+        self.assertIsNone(self.vocab.name(3))
+
+    def test_post_tag_ids_prefers_stored_ids(self):
+        post = MagicMock()
+        post.tag_ids = [5, 6]
+        self.assertEqual(post_tag_ids(post), [5, 6])
+
+    def test_replace_post_tags(self):
+        db = self.session_factory()
+        replace_post_tags(db, 100, [1, 2, 1])
+        replace_post_tags(db, 101, [2])
+        replace_post_tags(db, 100, [2])
+        db.commit()
+
+        rows = db.query(PostTag.tag_id, PostTag.post_id).order_by(PostTag.tag_id, PostTag.post_id).all()
+        self.assertEqual(rows, [(2, 100), (2, 101)])
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# 添加backend和benchmarks目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../benchmarks')))
+
+from fake_redis import FakeRedis, FakeAsyncRedis
+from services.trending import TrendingService
+from models.models import PostTag
+
+HOUR = 3600.0
+# 位于一个切换周期的起点之后
+NOW = 1700000000.0
+
+class TestTrendingService(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        PostTag.__table__.create(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        db = session_factory()
+        db.add_all([PostTag(post_id=1, tag_id=7), PostTag(post_id=2, tag_id=7), PostTag(post_id=3, tag_id=8)])
+        db.commit()
+        db.close()
+
+        self.redis = FakeRedis()
+        self.patches = [
+            patch("redis_client.redis_client", self.redis),
+            patch("redis_client.async_redis_client", FakeAsyncRedis(self.redis)),
+        ]
+        for p in self.patches:
+            p.start()
+        self.trending = TrendingService(session_factory=session_factory, half_life=HOUR, max_size=2)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_decayed_counts_and_tags(self):
+        # 帖子1在两个半衰期前获得大量互动，帖子2刚获得少量互动
+        self.trending.record_event(1, "favorite", count=4, now=NOW - 2 * HOUR)
+        self.trending.record_event(2, "favorite", count=2, now=NOW)
+        self.trending.record_event(3, "like", now=NOW)
+        self.trending.record_event(3, "share", now=NOW)
+        self.assertEqual(self.trending.flush(), 3)
+        self.assertEqual(self.trending.flush(), 0)
+
+        top = self.trending.top_posts(10, now=NOW)
+        self.assertEqual([post_id for post_id, _ in top], [2, 1])
+        self.assertAlmostEqual(top[0][1], 2.0)
+        self.assertAlmostEqual(top[1][1], 1.0)
+        self.assertEqual([post_id for post_id, _ in self.trending.top_posts(10, tag_id=7, now=NOW)], [2, 1])
+        self.assertEqual([post_id for post_id, _ in self.trending.top_posts(10, tag_id=8, now=NOW)], [3])
+
+        # 榜单只保留max_size个帖子，帖子3被裁剪
+        self.assertEqual(self.trending.scores([1, 2, 3], now=NOW + HOUR), [0.5, 1.0, 0.0])
+
+    def test_async_reads(self):
+        self.trending.record_event(1, "like", now=NOW)
+        self.trending.flush()
+        top = asyncio.run(self.trending.async_top_posts_many([None, 7, 8], 5, now=NOW))
+        self.assertEqual(top, [[(1, 0.5)], [(1, 0.5)], []])
+        self.assertEqual(asyncio.run(self.trending.async_scores([1, 9], now=NOW)), [0.5, 0.0])
+
+    def test_rebase_carries_scores_forward(self):
+        period = self.trending.rebase_period
+        boundary = (NOW // period + 1) * period
+        self.trending.record_event(1, "favorite", count=8, now=boundary - HOUR)
+        self.trending.flush()
+        self.trending.record_event(2, "favorite", now=boundary + HOUR)
+        self.trending.flush()
+
+        scores = self.trending.scores([1, 2], now=boundary + HOUR)
+        self.assertAlmostEqual(scores[0], 2.0)
+        self.assertAlmostEqual(scores[1], 1.0)
+        self.assertEqual([post_id for post_id, _ in self.trending.top_posts(10, tag_id=7, now=boundary + HOUR)], [1, 2])
+
+    def test_failed_rebase_is_retried(self):
+        period = self.trending.rebase_period
+        boundary = (NOW // period + 1) * period
+        self.trending.record_event(1, "favorite", count=8, now=boundary - HOUR)
+        self.trending.flush()
+
+        # 合并失败时这一批增量被丢弃，下一次写入重新合并
+        with patch.object(self.redis, "zunionstore", side_effect=ConnectionError("redis down")):
+            self.trending.record_event(2, "favorite", now=boundary + HOUR)
+            self.assertEqual(self.trending.flush(), 0)
+        self.trending.record_event(2, "favorite", now=boundary + HOUR)
+        self.assertEqual(self.trending.flush(), 1)
+
+        scores = self.trending.scores([1, 2], now=boundary + HOUR)
+        self.assertAlmostEqual(scores[0], 2.0)
+        self.assertAlmostEqual(scores[1], 1.0)
+
+    def test_redis_failure(self):
+        with patch.object(self.redis, "pipeline", side_effect=ConnectionError("redis down")):
+            self.trending.record_event(1, "like", now=NOW)
+            self.assertEqual(self.trending.flush(), 0)
+            self.assertEqual(self.trending.top_posts(10, now=NOW), [])
+            self.assertIsNone(self.trending.scores([1], now=NOW))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from services.user_profile import UserProfile, UserProfileCache, RECENT_INTERACTIONS_LIMIT
+from services.tag_vocab import post_tag_list
+from models.models import User
+
+class TestUserProfile(unittest.TestCase):
+    def setUp(self):
+        self.user = MagicMock(spec=User)
+        self.user.user_id = 1
+        self.user.tags = {"interests": ["科技", "编程"]}
+        self.user.tag_ids = [1, 2]
+
+    def test_build_merges_weights(self):
+        profile = UserProfile.build(self.user, {2: 3.0, 5: 0.5}, [10, 11])
+
+        self.assertEqual(profile.interests, (2, 1, 5))
+        self.assertEqual(profile.tag_weights[1], 1.0)
+        self.assertEqual(profile.interacted_post_ids, frozenset({10, 11}))
+        self.assertEqual(profile.tag_score([2, 5, 7]), 3.5)
+
+    def test_post_tag_list(self):
+        self.assertEqual(post_tag_list({"tags": ["科技"]}), ["科技"])
+        self.assertEqual(post_tag_list(["科技"]), ["科技"])
+        self.assertEqual(post_tag_list(None), [])
+
+class TestUserProfileCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = UserProfileCache(capacity=2, ttl=60)
+        self.db = MagicMock()
+        self.db.execute.return_value.scalars.return_value.all.return_value = [10]
+
+    def make_user(self, user_id):
+        user = MagicMock(spec=User)
+        user.user_id = user_id
+        user.tags = {"interests": ["科技"]}
+        user.tag_ids = [1]
+        return user
+
+    @patch("services.user_profile.get_user_tag_weights", return_value={})
+    def test_get_caches_profile(self, mock_weights):
+        self.db.get.return_value = self.make_user(1)
+
+        self.cache.get(self.db, 1)
+        profile = self.cache.get(self.db, 1)
+
+        self.assertEqual(profile.interacted_post_ids, frozenset({10}))
+        self.assertEqual(self.db.get.call_count, 1)
+
+        # 更新用户后失效，下次重新加载
+        self.cache.invalidate(1)
+        self.cache.get(self.db, 1)
+        self.assertEqual(self.db.get.call_count, 2)
+
+    @patch("services.user_profile.get_user_tag_weights", return_value={})
+    def test_lru_eviction_and_interactions(self, mock_weights):
+        self.db.get.side_effect = lambda model, user_id: self.make_user(user_id)
+
+        self.cache.get(self.db, 1)
+        self.cache.get(self.db, 2)
+        self.cache.get(self.db, 1)
+        self.cache.get(self.db, 3)  # 淘汰最久未使用的用户2
+
+        self.cache.record_interaction(1, 20)
+        self.assertEqual(self.cache.get(self.db, 1).interacted_post_ids, frozenset({10, 20}))
+        self.db.get.reset_mock()
+        self.cache.get(self.db, 2)
+        self.db.get.assert_called_once()
+
+    @patch("services.user_profile.get_user_tag_weights", return_value={})
+    def test_remove_and_trim_interactions(self, mock_weights):
+        self.db.get.return_value = self.make_user(1)
+        self.cache.get(self.db, 1)
+
+        self.cache.record_interaction(1, 20)
+        self.cache.remove_interaction(1, 10)
+        self.assertEqual(self.cache.get(self.db, 1).recent_post_ids, (20,))
+
+        # 交互集合只保留最新的RECENT_INTERACTIONS_LIMIT个帖子
+        for post_id in range(100, 100 + RECENT_INTERACTIONS_LIMIT + 5):
+            self.cache.record_interaction(1, post_id)
+        profile = self.cache.get(self.db, 1)
+        self.assertEqual(len(profile.interacted_post_ids), RECENT_INTERACTIONS_LIMIT)
+        self.assertEqual(profile.recent_post_ids[0], 100 + RECENT_INTERACTIONS_LIMIT + 4)
+        self.assertNotIn(20, profile.interacted_post_ids)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import sys
+import os
+import unittest
+from datetime import datetime
+
+# 添加docker/scripts目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../docker/scripts')))
+
+class TestCompactRawEvents(unittest.TestCase):
+    """集成测试：在数据仓库PostgreSQL上验证明细压缩，所有写入在结束时回滚"""
+
+    USER_ID = -1001
+    EVENT_DATE = datetime(2000, 1, 15)
+
+    def setUp(self):
+        try:
+            from event_partitions import COMPACT_SQL, connect_postgres
+            self.conn = connect_postgres()
+        except Exception as e:
+            self.skipTest(f"无法连接到PostgreSQL: {e}")
+        self.compact_sql = COMPACT_SQL
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("CREATE TEMP TABLE compact_test_events (LIKE raw.events)")
+
+    def tearDown(self):
+        self.cursor.close()
+        self.conn.rollback()
+        self.conn.close()
+
+    def compact(self, event_ids):
+        """
+        写入一批明细后压缩并删除，与compact_raw_events处理默认分区的方式一致
+        """
+        for event_id in event_ids:
+            self.cursor.execute(
+                "INSERT INTO compact_test_events (event_id, user_id, post_id, event_type, timestamp, source) "
+                "VALUES (%s, %s, 1, 'like', %s, 'test')",
+                (event_id, self.USER_ID, self.EVENT_DATE)
+            )
+        self.cursor.execute(self.compact_sql.format(table="compact_test_events"), (datetime(2000, 2, 1),))
+        self.cursor.execute("DELETE FROM compact_test_events")
+
+    def test_compacting_same_day_twice_accumulates(self):
+        self.compact([1, 2])
+        # 之后才过期的迟到明细与已有汇总属于同一天
+        self.compact([3])
+
+        self.cursor.execute(
+            "SELECT event_count FROM dw.fact_event_daily_counts WHERE user_id = %s AND event_date = %s",
+            (self.USER_ID, self.EVENT_DATE.date())
+        )
+        self.assertEqual(self.cursor.fetchall(), [(3,)])
+
+if __name__ == '__main__':
+    unittest.main()